@@ -2,11 +2,13 @@ from typing import Optional, List
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from jose import JWTError, jwt
 
 from app.core.config import settings
 from app.core.database import get_db
-from app.core.security import decode_token, decode_access_token
+from app.core.security import decode_token_async
+from app.core.principal_cache import principal_cache
 from app.core.permissions import Permission, PermissionChecker, has_permission
 from app.models.user import User, UserRole
 from app.core.exceptions import (
@@ -17,13 +19,20 @@ from app.core.exceptions import (
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_PREFIX}/auth/login")
 
 
-def get_current_user(
+def _load_user(db: Session, user_id: int) -> Optional[User]:
+    return db.query(User).filter(User.id == user_id).first()
+
+
+async def get_current_user(
     db: Session = Depends(get_db),
     token: str = Depends(oauth2_scheme)
 ) -> User:
     """
     Get current authenticated user from JWT token.
     
+    The user behind a verified token is cached briefly (see
+    app.core.principal_cache), so most requests skip the user query.
+    
     Args:
         db: Database session
         token: JWT access token
@@ -38,14 +47,23 @@ def get_current_user(
         AuthenticationError: If user not found
     """
     try:
-        # Decode token and get user ID
-        user_id = decode_access_token(token)
+        # Decode token (signature, expiry, revocation) and get user ID
+        payload = await decode_token_async(token, "access")
+        user_id = payload.get("sub")
+        if not user_id:
+            raise TokenError(detail="Invalid access token: missing user identifier")
+        
+        # Cached principal for this token
+        principal = await principal_cache.get(token, payload)
+        if principal is not None:
+            return principal_cache.attach(db, principal)
         
         # Get user from database
-        user = db.query(User).filter(User.id == int(user_id)).first()
+        user = await run_in_threadpool(_load_user, db, int(user_id))
         if user is None:
             raise AuthenticationError(detail=f"User not found: {user_id}")
         
+        await principal_cache.set(token, payload, user)
         return user
         
     except TokenExpiredError:
@@ -24,12 +24,21 @@ def login(
         models.User.email == form_data.username
     ).first()
     
-    if not user or not security.verify_password(form_data.password, user.password):
+    if user:
+        password_valid, new_hash = security.verify_and_update_password(
+            form_data.password, user.password
+        )
+    if not user or not password_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
     
+    # Upgrade hashes made with an old cost factor
+    if new_hash:
+        user.password = new_hash
+        db.commit()
+    
     if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -68,7 +77,7 @@ def refresh_token(
 
 
 @router.post("/logout")
-def logout(
+async def logout(
     current_user: models.User = Depends(deps.get_current_active_user),
     token: str = Depends(deps.oauth2_scheme),
     refresh_token: Optional[str] = Body(None, embed=True)
@@ -77,11 +86,11 @@ def logout(
     Logout user by revoking tokens.
     """
     # Revoke access token
-    security.revoke_token(token, "access")
+    await security.revoke_token_async(token, "access")
     
     # Revoke refresh token if provided
     if refresh_token:
-        security.revoke_token(refresh_token, "refresh")
+        await security.revoke_token_async(refresh_token, "refresh")
     
     return {"message": "Successfully logged out"}
 
@@ -8,7 +8,7 @@ from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, Query, HTTPException, Depends, Body
 from pydantic import BaseModel, Field
 
-from app.core.logger import get_logger
+from app.core.logger import get_logger, logger as app_logger
 from app.core.log_aggregator import (
     log_aggregator, LogLevel, LogSource, LogEntry, LogAnalysis,
     log_to_aggregator, get_log_analysis
@@ -461,7 +461,8 @@ async def get_log_stats():
             "status": "success",
             "system_stats": stats,
             "top_patterns": pattern_stats[:10],
-            "error_signatures": len(log_aggregator.error_signatures)
+            "error_signatures": len(log_aggregator.error_signatures),
+            "pipeline": app_logger.get_pipeline_stats()
         }
         
     except Exception as e:
@@ -13,8 +13,6 @@ from app.core.metrics_collector import (
     metrics_collector, MetricType, AlertSeverity, AlertState, 
     AlertRule, Alert, record_metric
 )
-from app.core.redis_client import redis_client
-import json
 
 logger = get_logger(__name__)
 
@@ -40,6 +38,8 @@ class AlertRuleRequest(BaseModel):
     severity: str = Field(..., regex="^(info|warning|critical)$")
     duration_seconds: int = Field(default=60, ge=1, le=3600)
     cooldown_seconds: int = Field(default=300, ge=60, le=7200)
+    aggregation: str = Field(default="last", regex="^(last|avg|min|max|p95|p99|rate|absent)$")
+    window_seconds: int = Field(default=60, ge=1, le=86400)
     description: Optional[str] = ""
     enabled: bool = True
     labels: Optional[Dict[str, str]] = None
@@ -52,6 +52,8 @@ class AlertRuleUpdate(BaseModel):
     severity: Optional[str] = None
     duration_seconds: Optional[int] = None
     cooldown_seconds: Optional[int] = None
+    aggregation: Optional[str] = Field(default=None, regex="^(last|avg|min|max|p95|p99|rate|absent)$")
+    window_seconds: Optional[int] = Field(default=None, ge=1, le=86400)
     description: Optional[str] = None
     enabled: Optional[bool] = None
     labels: Optional[Dict[str, str]] = None
@@ -162,6 +164,18 @@ async def list_metrics():
         logger.error(f"Failed to list metrics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/cardinality")
+async def get_label_cardinality():
+    """Series, label values and approximate memory per metric"""
+    try:
+        return {
+            "status": "success",
+            "data": metrics_collector.label_limiter.get_stats()
+        }
+    except Exception as e:
+        logger.error(f"Failed to get label cardinality: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/{metric_name}")
 async def get_metric_details(
     metric_name: str,
@@ -174,30 +188,12 @@ async def get_metric_details(
         if not summary:
             raise HTTPException(status_code=404, detail=f"Metric {metric_name} not found")
         
-        # Get historical data from Redis
+        # Get historical data: raw points for short ranges, rollups for long ones
         end_time = datetime.utcnow()
         start_time = end_time - timedelta(hours=hours)
         
-        historical_data = []
-        current_time = start_time
-        
-        while current_time <= end_time:
-            key = f"metric:{metric_name}:{current_time.strftime('%Y%m%d_%H')}"
-            data = await redis_client.lrange(key, 0, -1)
-            
-            for item in data:
-                try:
-                    point = json.loads(item)
-                    point_time = datetime.fromisoformat(point["timestamp"])
-                    if start_time <= point_time <= end_time:
-                        historical_data.append(point)
-                except (json.JSONDecodeError, KeyError, ValueError):
-                    continue
-            
-            current_time += timedelta(hours=1)
-        
-        # Sort by timestamp
-        historical_data.sort(key=lambda x: x["timestamp"])
+        history = await metrics_collector.get_metric_history(metric_name, start_time, end_time)
+        historical_data = history["points"]
         
         return {
             "status": "success",
@@ -207,6 +203,7 @@ async def get_metric_details(
                 "end": end_time.isoformat(),
                 "hours": hours
             },
+            "resolution": history["resolution"],
             "data_points": len(historical_data),
             "historical_data": historical_data[-1000:]  # Limit to last 1000 points
         }
@@ -228,26 +225,13 @@ async def get_metric_aggregated(
         end_time = datetime.utcnow()
         start_time = end_time - timedelta(hours=hours)
         
-        aggregated_data = []
-        current_time = start_time
-        
-        while current_time <= end_time:
-            key = f"metric_hourly:{metric_name}:{current_time.strftime('%Y%m%d_%H')}"
-            data = await redis_client.get(key)
-            
-            if data:
-                try:
-                    hourly_data = json.loads(data)
-                    
-                    if aggregation in hourly_data:
-                        aggregated_data.append({
-                            "timestamp": current_time.isoformat(),
-                            "value": hourly_data[aggregation]
-                        })
-                except json.JSONDecodeError:
-                    pass
-            
-            current_time += timedelta(hours=1)
+        _, buckets = await metrics_collector.metric_store.query_rollups(
+            metric_name, start_time, end_time, resolution="1h"
+        )
+        aggregated_data = [
+            {"timestamp": bucket["timestamp"], "value": bucket[aggregation]}
+            for bucket in buckets
+        ]
         
         return {
             "status": "success",
@@ -281,6 +265,8 @@ async def create_alert_rule(rule_request: AlertRuleRequest):
             severity=AlertSeverity(rule_request.severity),
             duration_seconds=rule_request.duration_seconds,
             cooldown_seconds=rule_request.cooldown_seconds,
+            aggregation=rule_request.aggregation,
+            window_seconds=rule_request.window_seconds,
             description=rule_request.description or "",
             enabled=rule_request.enabled,
             labels=rule_request.labels or {},
@@ -319,6 +305,8 @@ async def list_alert_rules():
                 "severity": rule.severity.value,
                 "duration_seconds": rule.duration_seconds,
                 "cooldown_seconds": rule.cooldown_seconds,
+                "aggregation": rule.aggregation,
+                "window_seconds": rule.window_seconds,
                 "description": rule.description,
                 "enabled": rule.enabled,
                 "labels": rule.labels,
@@ -335,6 +323,17 @@ async def list_alert_rules():
         logger.error(f"Failed to list alert rules: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _rule_state(rule_id: str) -> Optional[Dict[str, Any]]:
+    state = metrics_collector.alert_engine.get_state(rule_id)
+    if state is None:
+        return None
+    return {
+        "firing": state.firing,
+        "pending_since": datetime.utcfromtimestamp(state.pending_since).isoformat() if state.pending_since else None,
+        "value": state.value,
+        "evaluated_at": datetime.utcfromtimestamp(state.evaluated_at).isoformat() if state.evaluated_at else None
+    }
+
 @router.get("/alerts/rules/{rule_id}")
 async def get_alert_rule(rule_id: str):
     """Get specific alert rule"""
@@ -355,11 +354,14 @@ async def get_alert_rule(rule_id: str):
                 "severity": rule.severity.value,
                 "duration_seconds": rule.duration_seconds,
                 "cooldown_seconds": rule.cooldown_seconds,
+                "aggregation": rule.aggregation,
+                "window_seconds": rule.window_seconds,
                 "description": rule.description,
                 "enabled": rule.enabled,
                 "labels": rule.labels,
                 "notification_channels": rule.notification_channels
-            }
+            },
+            "state": _rule_state(rule_id)
         }
         
     except HTTPException:
@@ -390,6 +392,10 @@ async def update_alert_rule(rule_id: str, update_request: AlertRuleUpdate):
             rule.duration_seconds = update_request.duration_seconds
         if update_request.cooldown_seconds is not None:
             rule.cooldown_seconds = update_request.cooldown_seconds
+        if update_request.aggregation is not None:
+            rule.aggregation = update_request.aggregation
+        if update_request.window_seconds is not None:
+            rule.window_seconds = update_request.window_seconds
         if update_request.description is not None:
             rule.description = update_request.description
         if update_request.enabled is not None:
@@ -399,6 +405,10 @@ async def update_alert_rule(rule_id: str, update_request: AlertRuleUpdate):
         if update_request.notification_channels is not None:
             rule.notification_channels = update_request.notification_channels
         
+        # Re-index the rule in case its metric window changed
+        if not metrics_collector.add_alert_rule(rule):
+            raise HTTPException(status_code=400, detail="Invalid alert rule")
+        
         return {
             "status": "success",
             "message": f"Alert rule {rule_id} updated"
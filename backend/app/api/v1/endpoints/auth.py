@@ -6,7 +6,9 @@ from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.core.database import get_db
-from app.core.security import create_access_token, verify_password, get_password_hash
+from app.core.security import (
+    create_access_token, get_password_hash_async, verify_and_update_password_async
+)
 from app.models.user import User, UserRole, UserProfile
 from app.models.character import Character, SubjectLevel
 from app.schemas.user import UserCreate, UserResponse, Token, UserLogin
@@ -58,7 +60,7 @@ async def register(
     new_user = User(
         email=user_data.email,
         username=user_data.username,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await get_password_hash_async(user_data.password),
         role=user_data.role,
         parent_id=parent_id
     )
@@ -124,13 +126,22 @@ async def login(
     # Find user by username
     user = db.query(User).filter(User.username == form_data.username).first()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if user:
+        password_valid, new_hash = await verify_and_update_password_async(
+            form_data.password, user.hashed_password
+        )
+    if not user or not password_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Upgrade hashes made with an old cost factor
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
+    
     if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -146,8 +146,8 @@ async def update_user(
         requested_user.username = user_update.username
     
     if user_update.password is not None:
-        from app.core.security import get_password_hash
-        requested_user.hashed_password = get_password_hash(user_update.password)
+        from app.core.security import get_password_hash_async
+        requested_user.hashed_password = await get_password_hash_async(user_update.password)
     
     if user_update.is_active is not None and current_user.role == UserRole.ADMIN:
         requested_user.is_active = user_update.is_active
@@ -0,0 +1,118 @@
+"""
+Adaptive Limits
+AIMD control of a cluster-wide rate limit from shared load samples
+"""
+
+import math
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterable, Tuple
+
+
+@dataclass
+class LoadSample:
+    """One worker's load over the last sampling interval"""
+    worker_id: str
+    load: float
+    requests: int
+    errors: int
+    timestamp: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LoadSample":
+        return cls(
+            worker_id=str(data["worker_id"]),
+            load=float(data["load"]),
+            requests=int(data["requests"]),
+            errors=int(data["errors"]),
+            timestamp=float(data["timestamp"])
+        )
+
+
+def aggregate_samples(samples: Iterable[LoadSample], now: float,
+                      max_age: float) -> Tuple[float, float, int]:
+    """
+    Cluster load, error rate and live worker count from recent samples.
+
+    Load is the mean over live workers; the error rate is pooled over all
+    their requests so a quiet worker's single error does not dominate.
+    """
+    live = [sample for sample in samples if now - sample.timestamp <= max_age]
+    if not live:
+        return 0.0, 0.0, 0
+
+    load = sum(sample.load for sample in live) / len(live)
+    requests = sum(sample.requests for sample in live)
+    errors = sum(sample.errors for sample in live)
+    return load, (errors / requests if requests else 0.0), len(live)
+
+
+def fair_share(limit: int, workers: int) -> int:
+    """One worker's part of a cluster-wide limit"""
+    return max(1, math.ceil(limit / max(1, workers)))
+
+
+class AIMDController:
+    """
+    Additive-increase / multiplicative-decrease for a shared limit.
+
+    Inputs are smoothed with an EWMA first. While smoothed load is above
+    ``high_load`` or the error rate above ``max_error_rate`` the limit is cut
+    by ``decrease_factor``; while load is under ``target_load`` it grows by
+    ``additive_step``; in between it holds. The dead band plus slow growth and
+    fast backoff keep the limit from oscillating.
+    """
+
+    def __init__(self, base_limit: int = 100, min_limit: int = 10, max_limit: int = 1000,
+                 additive_step: int = 5, decrease_factor: float = 0.7,
+                 target_load: float = 0.6, high_load: float = 0.8,
+                 max_error_rate: float = 0.05, smoothing: float = 0.3):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.additive_step = additive_step
+        self.decrease_factor = decrease_factor
+        self.target_load = target_load
+        self.high_load = high_load
+        self.max_error_rate = max_error_rate
+        self.smoothing = smoothing
+
+        self.limit = float(min(max(base_limit, min_limit), max_limit))
+        self.load_ewma = 0.0
+        self.error_ewma = 0.0
+        self.updates = 0
+
+    def update(self, load: float, error_rate: float) -> int:
+        """Apply one control step and return the new limit"""
+        if self.updates == 0:
+            self.load_ewma, self.error_ewma = load, error_rate
+        else:
+            self.load_ewma += self.smoothing * (load - self.load_ewma)
+            self.error_ewma += self.smoothing * (error_rate - self.error_ewma)
+        self.updates += 1
+
+        if self.load_ewma > self.high_load or self.error_ewma > self.max_error_rate:
+            self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        elif self.load_ewma < self.target_load:
+            self.limit = min(self.max_limit, self.limit + self.additive_step)
+        return self.current_limit
+
+    @property
+    def current_limit(self) -> int:
+        return int(self.limit)
+
+    def get_state(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "load_ewma": self.load_ewma,
+            "error_ewma": self.error_ewma,
+            "updates": self.updates
+        }
+
+    def load_state(self, state: Dict[str, Any]):
+        """Continue from state computed by another worker"""
+        self.limit = min(max(float(state["limit"]), self.min_limit), self.max_limit)
+        self.load_ewma = float(state["load_ewma"])
+        self.error_ewma = float(state["error_ewma"])
+        self.updates = int(state["updates"])
@@ -5,13 +5,15 @@ High-performance caching with multiple strategies and optimization features
 
 import json
 import time
+import math
+import random
 import asyncio
 import hashlib
-import pickle
+import fnmatch
 import zlib
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Union, Callable, Tuple
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from collections import defaultdict, deque
 from contextlib import asynccontextmanager
 from enum import Enum
@@ -20,9 +22,18 @@ import functools
 from app.core.logger import get_logger
 from app.core.config import settings
 from app.core.redis_client import redis_client
+from app.core.l1_cache import L1CacheEngine
+from app.core.single_flight import SingleFlight
+from app.core.disk_cache import PersistentDiskCache
+from app.core.cache_codecs import CodecRegistry
+from app.core.cache_tag_index import CacheTagIndex
+from app.core.hot_keys import HotKeyTracker
 
 logger = get_logger(__name__)
 
+# Sentinel distinguishing "not cached" from a cached None
+_MISSING = object()
+
 class CacheStrategy(Enum):
     """Cache eviction strategies"""
     LRU = "lru"  # Least Recently Used
@@ -53,33 +64,85 @@ class CacheConfiguration:
     default_ttl: int = 300  # 5 minutes
     max_memory_size: int = 100 * 1024 * 1024  # 100MB
     compression_threshold: int = 1024  # Compress data larger than 1KB
-    serialization_method: str = "json"  # json, pickle, msgpack
+    serialization_method: str = "json"  # json, orjson, msgpack (pickle only via namespace_codecs)
+    compression_algorithm: str = "zlib"  # none, zlib, lz4, zstd
+    namespace_codecs: Dict[str, str] = field(default_factory=dict)  # key prefix -> codec
     enable_compression: bool = True
     enable_versioning: bool = True
     max_versions: int = 3
+    eviction_strategy: CacheStrategy = CacheStrategy.LRU
+    enable_l3: bool = False
+    l3_path: str = "cache/l3_cache.db"
+    l3_max_size: int = 1024 * 1024 * 1024  # 1GB
+    l3_key_prefixes: Tuple[str, ...] = ("content:", "report:", "asset_manifest")
+    hot_keys_top_k: int = 200
 
 class MultiLayerCache:
-    """Multi-layer caching system with L1 (memory) and L2 (Redis) layers"""
+    """
+    Multi-layer caching system with L1 (memory), L2 (Redis) and optional
+    L3 (local disk) layers.
+    
+    L3 holds large, rarely changing entries (keys under ``l3_key_prefixes`` or
+    set with ``persist=True``) so they survive restarts without being pushed
+    back into Redis; L3 hits are promoted to L1 only.
+    """
     
     def __init__(self, config: CacheConfiguration = None):
         self.config = config or CacheConfiguration()
         
-        # L1 Cache (In-memory)
-        self.l1_cache: Dict[str, Any] = {}
-        self.l1_access_times: Dict[str, float] = {}
-        self.l1_access_counts: Dict[str, int] = defaultdict(int)
-        self.l1_current_size = 0
+        # L1 Cache (In-memory, bounded by serialized payload bytes)
+        self.l1_cache = L1CacheEngine(
+            max_size_bytes=self.config.max_memory_size,
+            strategy=self.config.eviction_strategy
+        )
+        
+        # Serialization codecs (tagged with a binary header in the payload)
+        self.codecs = CodecRegistry(
+            default_codec=self.config.serialization_method,
+            default_compressor=self.config.compression_algorithm,
+            compression_threshold=self.config.compression_threshold,
+            enable_compression=self.config.enable_compression
+        )
+        for namespace, codec_name in self.config.namespace_codecs.items():
+            self.codecs.set_namespace_codec(namespace, codec_name)
+        
+        # Coalesces concurrent L2 reads and loader calls per key
+        self.single_flight = SingleFlight()
+        
+        # Cross-worker L1 invalidation (see app.core.cache_invalidation_bus)
+        self.invalidation_bus = None
+        
+        # Tag -> key index in Redis sets for scan-free invalidation; entries
+        # written before it existed are matched by key pattern for one window
+        self.tag_index = CacheTagIndex(
+            legacy_window_seconds=getattr(settings, 'CACHE_TAG_LEGACY_WINDOW_SECONDS', 86400)
+        )
+        
+        # Key popularity (count-min sketch + top-K), used by CacheWarmer
+        self.hot_keys = HotKeyTracker(top_k=self.config.hot_keys_top_k)
+        
+        # L3 Cache (local disk)
+        self.l3_cache: Optional[PersistentDiskCache] = None
+        if self.config.enable_l3:
+            self.l3_cache = PersistentDiskCache(
+                self.config.l3_path,
+                max_size_bytes=self.config.l3_max_size
+            )
         
         # Cache metrics
         self.metrics: deque = deque(maxlen=10000)
         self.stats = {
-            "l1_hits": 0,
-            "l1_misses": 0,
             "l2_hits": 0,
             "l2_misses": 0,
+            "l3_hits": 0,
+            "l3_misses": 0,
             "total_sets": 0,
             "total_deletes": 0,
-            "compression_saves": 0
+            "compression_saves": 0,
+            "stale_hits": 0,
+            "early_refreshes": 0,
+            "background_refreshes": 0,
+            "refresh_errors": 0
         }
         
         # Background cleanup task
@@ -89,7 +152,11 @@ class MultiLayerCache:
     def _start_background_cleanup(self):
         """Start background cleanup task"""
         if self._cleanup_task is None:
-            self._cleanup_task = asyncio.create_task(self._periodic_cleanup())
+            try:
+                self._cleanup_task = asyncio.get_running_loop().create_task(self._periodic_cleanup())
+            except RuntimeError:
+                # Created outside an event loop (e.g. at import); started by the first set()
+                pass
     
     async def _periodic_cleanup(self):
         """Periodic cleanup of expired L1 cache entries"""
@@ -97,6 +164,8 @@ class MultiLayerCache:
             try:
                 await asyncio.sleep(60)  # Run every minute
                 await self._cleanup_l1_cache()
+                if self.l3_cache is not None:
+                    await self.l3_cache.apurge_expired()
             except asyncio.CancelledError:
                 break
             except Exception as e:
@@ -104,104 +173,85 @@ class MultiLayerCache:
     
     async def _cleanup_l1_cache(self):
         """Clean up expired L1 cache entries"""
-        current_time = time.time()
-        expired_keys = []
-        
-        for key, access_time in self.l1_access_times.items():
-            if current_time - access_time > self.config.default_ttl:
-                expired_keys.append(key)
-        
-        for key in expired_keys:
-            if key in self.l1_cache:
-                data_size = len(str(self.l1_cache[key]))
-                del self.l1_cache[key]
-                del self.l1_access_times[key]
-                if key in self.l1_access_counts:
-                    del self.l1_access_counts[key]
-                self.l1_current_size -= data_size
-        
-        if expired_keys:
-            logger.debug(f"Cleaned up {len(expired_keys)} expired L1 cache entries")
-    
-    def _evict_l1_if_needed(self):
-        """Evict L1 cache entries if memory limit is exceeded"""
-        while self.l1_current_size > self.config.max_memory_size:
-            # Use LRU eviction by default
-            if not self.l1_access_times:
-                break
-            
-            oldest_key = min(self.l1_access_times.keys(), 
-                           key=lambda k: self.l1_access_times[k])
-            
-            if oldest_key in self.l1_cache:
-                data_size = len(str(self.l1_cache[oldest_key]))
-                del self.l1_cache[oldest_key]
-                del self.l1_access_times[oldest_key]
-                if oldest_key in self.l1_access_counts:
-                    del self.l1_access_counts[oldest_key]
-                self.l1_current_size -= data_size
-    
-    def _serialize_data(self, data: Any) -> Tuple[bytes, str]:
-        """Serialize data based on configuration"""
-        if self.config.serialization_method == "pickle":
-            serialized = pickle.dumps(data)
-            method = "pickle"
-        elif self.config.serialization_method == "msgpack":
-            try:
-                import msgpack
-                serialized = msgpack.packb(data)
-                method = "msgpack"
-            except ImportError:
-                serialized = json.dumps(data, default=str).encode()
-                method = "json"
-        else:
-            serialized = json.dumps(data, default=str).encode()
-            method = "json"
-        
-        # Compress if enabled and data is large enough
-        if (self.config.enable_compression and 
-            len(serialized) > self.config.compression_threshold):
-            serialized = zlib.compress(serialized)
-            method += "_compressed"
+        expired_count = self.l1_cache.purge_expired()
+        
+        if expired_count:
+            logger.debug(f"Cleaned up {expired_count} expired L1 cache entries")
+    
+    def _should_persist(self, key: str, persist: Optional[bool]) -> bool:
+        """Whether key belongs in the L3 disk tier"""
+        if self.l3_cache is None:
+            return False
+        if persist is not None:
+            return persist
+        return key.startswith(self.config.l3_key_prefixes)
+    
+    async def _get_from_l3(self, key: str) -> Any:
+        """Load a key from the disk tier into L1; returns _MISSING when absent"""
+        if self.l3_cache is None:
+            return _MISSING
+        
+        try:
+            record = await self.l3_cache.aget(key)
+            if record is not None:
+                data, method = record
+                result = self._deserialize_data(data, method, key)
+                self._store_in_l1(key, result, len(data))
+                self.stats["l3_hits"] += 1
+                return result
+        except Exception as e:
+            logger.error(f"Disk cache get error for key {key}: {e}")
+        
+        self.stats["l3_misses"] += 1
+        return _MISSING
+    
+    @property
+    def l1_current_size(self) -> int:
+        """Current L1 size in serialized payload bytes"""
+        return self.l1_cache.size_bytes
+    
+    def _serialize_data(self, data: Any, key: Optional[str] = None) -> Tuple[bytes, str]:
+        """Serialize data with the codec selected for the key's namespace"""
+        serialized, compressed = self.codecs.encode(data, key)
+        if compressed:
             self.stats["compression_saves"] += 1
         
-        return serialized, method
+        # Codec and compressor are identified by the payload header
+        return serialized, "codec"
     
-    def _deserialize_data(self, data: bytes, method: str) -> Any:
-        """Deserialize data based on method"""
-        # Decompress if needed
+    def _deserialize_data(self, data: bytes, method: str, key: Optional[str] = None) -> Any:
+        """Deserialize data based on method, with only the codecs enabled for key"""
+        if method == "codec":
+            return self.codecs.decode(data, key)
+        
+        # Entries written before the codec header: "<codec>[_compressed]"
         if method.endswith("_compressed"):
             data = zlib.decompress(data)
             method = method[:-11]  # Remove "_compressed"
         
-        if method == "pickle":
-            return pickle.loads(data)
-        elif method == "msgpack":
-            try:
-                import msgpack
-                return msgpack.unpackb(data)
-            except ImportError:
-                return json.loads(data.decode())
-        else:
-            return json.loads(data.decode())
+        codec = self.codecs.get_codec(method) or self.codecs.get_codec("json")
+        if not self.codecs.codec_allowed(codec, key):
+            raise ValueError(f"Cache codec '{method}' is not enabled for key {key}")
+        return codec.loads(data)
     
     async def get(self, key: str, default: Any = None) -> Any:
         """Get value from cache with multi-layer fallback"""
         start_time = time.time()
+        self.hot_keys.record(key)
         
         # Try L1 cache first
-        if key in self.l1_cache:
-            self.l1_access_times[key] = time.time()
-            self.l1_access_counts[key] += 1
-            self.stats["l1_hits"] += 1
-            
+        entry = self.l1_cache.lookup(key)
+        if entry is not None:
             self._record_metric(key, CacheLayer.L1_MEMORY.value, "hit", 
-                              time.time() - start_time, len(str(self.l1_cache[key])))
-            return self.l1_cache[key]
+                              time.time() - start_time, entry.size)
+            return entry.value
         
-        self.stats["l1_misses"] += 1
-        
-        # Try L2 cache (Redis)
+        # Try L2 cache (Redis); concurrent misses for the same key share one lookup
+        result = await self.single_flight.do(f"l2:{key}", lambda: self._get_from_l2(key, start_time))
+        return default if result is _MISSING else result
+    
+    async def _get_from_l2(self, key: str, start_time: float) -> Any:
+        """Load a key from Redis into L1; returns _MISSING when absent"""
         try:
             redis_data = await redis_client.hgetall(f"cache:{key}")
             if redis_data and b"data" in redis_data:
@@ -209,10 +259,10 @@ class MultiLayerCache:
                 method = redis_data.get(b"method", b"json").decode()
                 
                 # Deserialize
-                result = self._deserialize_data(data, method)
+                result = self._deserialize_data(data, method, key)
                 
                 # Store in L1 cache
-                self._store_in_l1(key, result)
+                self._store_in_l1(key, result, len(data))
                 
                 self.stats["l2_hits"] += 1
                 self._record_metric(key, CacheLayer.L2_REDIS.value, "hit",
@@ -223,51 +273,82 @@ class MultiLayerCache:
             logger.error(f"Redis cache get error for key {key}: {e}")
         
         self.stats["l2_misses"] += 1
+        
+        # Try L3 cache (disk)
+        result = await self._get_from_l3(key)
+        if result is not _MISSING:
+            self._record_metric(key, CacheLayer.L3_PERSISTENT.value, "hit",
+                              time.time() - start_time, 0)
+            return result
+        
         self._record_metric(key, CacheLayer.L2_REDIS.value, "miss",
                           time.time() - start_time, 0)
-        return default
+        return _MISSING
     
-    def _store_in_l1(self, key: str, value: Any):
-        """Store value in L1 cache"""
-        data_size = len(str(value))
+    async def get_or_set(self, key: str, loader: Callable[[], Any], 
+                        ttl: Optional[int] = None) -> Any:
+        """
+        Get key from cache, computing it with loader on a miss.
         
-        # Check if we need to evict
-        if self.l1_current_size + data_size > self.config.max_memory_size:
-            self._evict_l1_if_needed()
+        Only one coroutine per key runs the loader; concurrent callers wait for
+        and share its result or exception.
+        """
+        result = await self.get(key, _MISSING)
+        if result is not _MISSING:
+            return result
+        
+        async def load_and_store():
+            value = await loader()
+            await self.set(key, value, ttl)
+            return value
         
-        self.l1_cache[key] = value
-        self.l1_access_times[key] = time.time()
-        self.l1_access_counts[key] = 1
-        self.l1_current_size += data_size
+        return await self.single_flight.do(f"load:{key}", load_and_store)
+    
+    def _store_in_l1(self, key: str, value: Any, data_size: int, ttl: Optional[int] = None):
+        """Store value in L1 cache, accounted by its serialized payload size"""
+        self.l1_cache.set(key, value, data_size, ttl or self.config.default_ttl)
+    
+    def _build_l2_record(self, key: str, value: Any) -> Dict[str, Any]:
+        """Serialize value into the Redis hash layout used for L2 entries"""
+        serialized_data, method = self._serialize_data(value, key)
+        return {
+            "data": serialized_data,
+            "method": method,
+            "created_at": datetime.utcnow().isoformat(),
+            "size": len(serialized_data)
+        }
     
     async def set(self, key: str, value: Any, ttl: Optional[int] = None, 
-                 store_in_l1: bool = True) -> bool:
-        """Set value in cache with multi-layer storage"""
+                 store_in_l1: bool = True, persist: Optional[bool] = None,
+                 tags: Optional[List[str]] = None) -> bool:
+        """Set value in cache with multi-layer storage
+        
+        ``persist`` forces (True) or skips (False) the L3 disk tier; by default
+        keys under the configured L3 prefixes are persisted. ``tags`` are indexed
+        in addition to the entity tags derived from the key.
+        """
         start_time = time.time()
         ttl = ttl or self.config.default_ttl
+        self._start_background_cleanup()
         
         try:
-            # Serialize data
-            serialized_data, method = self._serialize_data(value)
-            data_size = len(serialized_data)
-            
-            # Store in L2 (Redis) with metadata
-            cache_data = {
-                "data": serialized_data,
-                "method": method,
-                "created_at": datetime.utcnow().isoformat(),
-                "size": data_size
-            }
+            cache_data = self._build_l2_record(key, value)
+            data_size = cache_data["size"]
             
             # Use Redis hash for metadata and pipeline for atomic operation
             async with redis_client.pipeline() as pipe:
                 pipe.hset(f"cache:{key}", mapping=cache_data)
                 pipe.expire(f"cache:{key}", ttl)
+                self.tag_index.add_to_pipeline(pipe, key, self.tag_index.derive_tags(key, tags))
                 await pipe.execute()
             
+            # Store in L3 for large, rarely changing data
+            if self._should_persist(key, persist):
+                await self.l3_cache.aset(key, cache_data["data"], cache_data["method"], ttl)
+            
             # Store in L1 if requested and not too large
             if store_in_l1 and data_size < self.config.max_memory_size // 10:
-                self._store_in_l1(key, value)
+                self._store_in_l1(key, value, data_size, ttl)
             
             self.stats["total_sets"] += 1
             self._record_metric(key, CacheLayer.L2_REDIS.value, "set",
@@ -282,14 +363,17 @@ class MultiLayerCache:
         """Delete value from all cache layers"""
         start_time = time.time()
         
-        # Delete from L1
-        if key in self.l1_cache:
-            data_size = len(str(self.l1_cache[key]))
-            del self.l1_cache[key]
-            del self.l1_access_times[key]
-            if key in self.l1_access_counts:
-                del self.l1_access_counts[key]
-            self.l1_current_size -= data_size
+        # Delete from L1 here and on the other workers
+        self.l1_cache.delete(key)
+        if self.invalidation_bus is not None:
+            self.invalidation_bus.publish_keys([key])
+        
+        # Delete from L3 (disk)
+        if self.l3_cache is not None:
+            try:
+                await self.l3_cache.adelete_many([key])
+            except Exception as e:
+                logger.error(f"Disk cache delete error for key {key}: {e}")
         
         # Delete from L2 (Redis)
         try:
@@ -305,12 +389,14 @@ class MultiLayerCache:
     async def invalidate_pattern(self, pattern: str) -> int:
         """Invalidate cache keys matching pattern"""
         try:
-            # Invalidate L1 cache
-            l1_deleted = 0
-            keys_to_delete = [k for k in self.l1_cache.keys() if pattern in k]
-            for key in keys_to_delete:
-                await self.delete(key)
-                l1_deleted += 1
+            # Invalidate L1 cache here and on the other workers
+            l1_deleted = self.evict_local_pattern(pattern)
+            if self.invalidation_bus is not None:
+                self.invalidation_bus.publish_pattern(pattern)
+            
+            # Invalidate L3 cache
+            if self.l3_cache is not None:
+                await self.l3_cache.adelete_pattern(f"*{pattern}*")
             
             # Invalidate L2 cache
             redis_keys = await redis_client.keys(f"cache:*{pattern}*")
@@ -326,6 +412,215 @@ class MultiLayerCache:
             logger.error(f"Cache pattern invalidation error: {e}")
             return 0
     
+    async def invalidate_tag(self, tag: Union[str, Enum]) -> List[str]:
+        """
+        Invalidate every key indexed under tag and return those keys.
+        
+        Reads the tag's member set and deletes those entries in pipelined
+        batches, so the cost is proportional to the tagged keys rather than the
+        keyspace. Members whose entry already expired are dropped from the set too.
+        
+        While entries written before the tag index existed may still be cached,
+        the key patterns implied by the tag are invalidated as well.
+        """
+        start_time = time.time()
+        
+        try:
+            keys = await self.tag_index.members(tag)
+            deleted = 0
+            
+            if keys:
+                # Invalidate L1 here and on the other workers
+                for key in keys:
+                    self.l1_cache.delete(key)
+                if self.invalidation_bus is not None:
+                    self.invalidation_bus.publish_keys(keys)
+                
+                if self.l3_cache is not None:
+                    await self.l3_cache.adelete_many(keys)
+                
+                deleted = await self.tag_index.delete_tagged(tag, keys)
+            
+            legacy_patterns = self.tag_index.legacy_patterns(tag)
+            if legacy_patterns and await self.tag_index.legacy_fallback_active():
+                self.tag_index.stats["legacy_fallbacks"] += 1
+                for pattern in legacy_patterns:
+                    deleted += await self.invalidate_pattern(pattern)
+            
+            if not keys and not deleted:
+                return []
+            
+            self.stats["total_deletes"] += deleted
+            self._record_metric(f"tag:{self.tag_index.normalize_tag(tag)}", "all_layers",
+                              "invalidate_tag", time.time() - start_time, 0)
+            
+            logger.info(f"Invalidated {deleted} cache entries for tag: {self.tag_index.normalize_tag(tag)}")
+            return keys
+            
+        except Exception as e:
+            logger.error(f"Cache tag invalidation error for {tag}: {e}")
+            return []
+    
+    # Bulk operations
+    async def get_many(self, keys: List[str], track: bool = True) -> Dict[str, Any]:
+        """
+        Get several keys at once.
+        
+        L1 is checked first; the remaining keys are fetched from Redis in a single
+        pipelined round trip. Returns a mapping containing only the keys found,
+        in the order they were requested.
+        ``track=False`` keeps the reads out of the hot-key statistics (warming).
+        """
+        start_time = time.time()
+        requested = list(dict.fromkeys(keys))
+        found: Dict[str, Any] = {}
+        remaining: List[str] = []
+        
+        for key in requested:
+            if track:
+                self.hot_keys.record(key)
+            entry = self.l1_cache.lookup(key)
+            if entry is not None:
+                found[key] = entry.value
+            else:
+                remaining.append(key)
+        
+        if not remaining:
+            return found
+        
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for key in remaining:
+                    pipe.hgetall(f"cache:{key}")
+                responses = await pipe.execute()
+        except Exception as e:
+            logger.error(f"Redis cache get_many error for {len(remaining)} keys: {e}")
+            self.stats["l2_misses"] += len(remaining)
+            return found
+        
+        total_size = 0
+        l2_missing: List[str] = []
+        for key, redis_data in zip(remaining, responses):
+            if not redis_data or b"data" not in redis_data:
+                self.stats["l2_misses"] += 1
+                l2_missing.append(key)
+                continue
+            
+            try:
+                data = redis_data[b"data"]
+                value = self._deserialize_data(data, redis_data.get(b"method", b"json").decode(), key)
+            except Exception as e:
+                logger.error(f"Cache deserialize error for key {key}: {e}")
+                self.stats["l2_misses"] += 1
+                continue
+            
+            self._store_in_l1(key, value, len(data))
+            self.stats["l2_hits"] += 1
+            total_size += len(data)
+            found[key] = value
+        
+        for key in l2_missing:
+            value = await self._get_from_l3(key)
+            if value is not _MISSING:
+                found[key] = value
+        
+        self._record_metric(f"bulk:{len(remaining)}", CacheLayer.L2_REDIS.value, "get_many",
+                          time.time() - start_time, total_size)
+        return {key: found[key] for key in requested if key in found}
+    
+    async def set_many(self, mapping: Dict[str, Any], 
+                      ttl: Union[int, Dict[str, int], None] = None,
+                      store_in_l1: bool = True,
+                      tags: Union[List[str], Dict[str, List[str]], None] = None) -> bool:
+        """
+        Set several keys with one pipelined write.
+        
+        ``ttl`` may be a single value for every key or a per-key mapping; keys
+        missing from the mapping use the default TTL. ``tags`` works the same way.
+        """
+        if not mapping:
+            return True
+        
+        start_time = time.time()
+        records: Dict[str, Tuple[Dict[str, Any], int]] = {}
+        
+        try:
+            for key, value in mapping.items():
+                key_ttl = ttl.get(key) if isinstance(ttl, dict) else ttl
+                records[key] = (self._build_l2_record(key, value), key_ttl or self.config.default_ttl)
+            
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for key, (cache_data, key_ttl) in records.items():
+                    pipe.hset(f"cache:{key}", mapping=cache_data)
+                    pipe.expire(f"cache:{key}", key_ttl)
+                    key_tags = tags.get(key) if isinstance(tags, dict) else tags
+                    self.tag_index.add_to_pipeline(pipe, key, self.tag_index.derive_tags(key, key_tags))
+                await pipe.execute()
+            
+            for key, (cache_data, key_ttl) in records.items():
+                if self._should_persist(key, None):
+                    await self.l3_cache.aset(key, cache_data["data"], cache_data["method"], key_ttl)
+        except Exception as e:
+            logger.error(f"Cache set_many error for {len(mapping)} keys: {e}")
+            return False
+        
+        total_size = 0
+        for key, (cache_data, key_ttl) in records.items():
+            data_size = cache_data["size"]
+            total_size += data_size
+            if store_in_l1 and data_size < self.config.max_memory_size // 10:
+                self._store_in_l1(key, mapping[key], data_size, key_ttl)
+        
+        self.stats["total_sets"] += len(records)
+        self._record_metric(f"bulk:{len(records)}", CacheLayer.L2_REDIS.value, "set_many",
+                          time.time() - start_time, total_size)
+        return True
+    
+    async def delete_many(self, keys: List[str]) -> int:
+        """Delete several keys from all layers with a single Redis DEL"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return 0
+        
+        start_time = time.time()
+        
+        for key in keys:
+            self.l1_cache.delete(key)
+        if self.invalidation_bus is not None:
+            self.invalidation_bus.publish_keys(keys)
+        
+        if self.l3_cache is not None:
+            try:
+                await self.l3_cache.adelete_many(keys)
+            except Exception as e:
+                logger.error(f"Disk cache delete_many error for {len(keys)} keys: {e}")
+        
+        try:
+            deleted = await redis_client.delete(*[f"cache:{key}" for key in keys])
+            self.stats["total_deletes"] += len(keys)
+            self._record_metric(f"bulk:{len(keys)}", "all_layers", "delete_many",
+                              time.time() - start_time, 0)
+            return deleted
+        except Exception as e:
+            logger.error(f"Cache delete_many error for {len(keys)} keys: {e}")
+            return 0
+    
+    def attach_invalidation_bus(self, bus):
+        """Publish local invalidations through bus (None to detach)"""
+        self.invalidation_bus = bus
+    
+    def evict_local(self, key: str) -> bool:
+        """Drop key from this worker's L1 only"""
+        return self.l1_cache.delete(key)
+    
+    def evict_local_pattern(self, pattern: str) -> int:
+        """Drop L1 keys matching pattern from this worker only (same glob as the L2 scan)"""
+        glob = f"*{pattern}*"
+        keys_to_delete = [k for k in self.l1_cache.keys() if fnmatch.fnmatchcase(k, glob)]
+        for key in keys_to_delete:
+            self.l1_cache.delete(key)
+        return len(keys_to_delete)
+    
     def _record_metric(self, key: str, layer: str, operation: str, 
                       execution_time: float, data_size: int, ttl: Optional[int] = None):
         """Record cache operation metrics"""
@@ -342,34 +637,51 @@ class MultiLayerCache:
     
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get comprehensive cache statistics"""
-        total_l1_requests = self.stats["l1_hits"] + self.stats["l1_misses"]
+        l1_stats = self.l1_cache.stats()
+        total_l1_requests = l1_stats["hits"] + l1_stats["misses"]
         total_l2_requests = self.stats["l2_hits"] + self.stats["l2_misses"]
         
-        l1_hit_rate = (self.stats["l1_hits"] / total_l1_requests * 100) if total_l1_requests > 0 else 0
+        l1_hit_rate = (l1_stats["hits"] / total_l1_requests * 100) if total_l1_requests > 0 else 0
         l2_hit_rate = (self.stats["l2_hits"] / total_l2_requests * 100) if total_l2_requests > 0 else 0
         
         return {
             "l1_cache": {
-                "entries": len(self.l1_cache),
-                "size_bytes": self.l1_current_size,
+                "entries": l1_stats["entries"],
+                "size_bytes": l1_stats["size_bytes"],
+                "max_size_bytes": l1_stats["max_size_bytes"],
+                "strategy": l1_stats["strategy"],
                 "hit_rate": round(l1_hit_rate, 2),
-                "hits": self.stats["l1_hits"],
-                "misses": self.stats["l1_misses"]
+                "hits": l1_stats["hits"],
+                "misses": l1_stats["misses"],
+                "evictions": l1_stats["evictions"],
+                "expirations": l1_stats["expirations"]
             },
             "l2_cache": {
                 "hit_rate": round(l2_hit_rate, 2),
                 "hits": self.stats["l2_hits"],
                 "misses": self.stats["l2_misses"]
             },
+            "l3_cache": self.l3_cache.get_stats() if self.l3_cache is not None else None,
             "operations": {
                 "total_sets": self.stats["total_sets"],
                 "total_deletes": self.stats["total_deletes"],
                 "compression_saves": self.stats["compression_saves"]
             },
+            "revalidation": {
+                "stale_hits": self.stats["stale_hits"],
+                "early_refreshes": self.stats["early_refreshes"],
+                "background_refreshes": self.stats["background_refreshes"],
+                "refresh_errors": self.stats["refresh_errors"]
+            },
             "performance": {
                 "avg_get_time": self._calculate_avg_operation_time("get"),
                 "avg_set_time": self._calculate_avg_operation_time("set")
-            }
+            },
+            "serialization": self.codecs.get_stats(),
+            "single_flight": self.single_flight.get_stats(),
+            "invalidation_bus": self.invalidation_bus.get_stats() if self.invalidation_bus else None,
+            "tag_index": self.tag_index.get_stats(),
+            "hot_keys": self.hot_keys.get_stats()
         }
     
     def _calculate_avg_operation_time(self, operation: str) -> float:
@@ -433,16 +745,52 @@ class SmartCache:
         return await self.cache.set(key, value, ttl)
 
 class CacheWarmer:
-    """Cache warming system for preloading frequently accessed data"""
+    """
+    Cache warming system for preloading frequently accessed data.
+    
+    Besides hand-registered strategies, the warmer uses the cache's hot-key
+    tracker: the hot set is persisted to Redis periodically, and at startup the
+    top ``top_n`` keys are pulled into L1 (from L2/L3, or from a registered key
+    loader). While running, hot keys whose Redis TTL drops below ``lead_time``
+    are reloaded through their loader before they expire.
+    """
     
-    def __init__(self, cache: MultiLayerCache):
+    def __init__(self, cache: MultiLayerCache, top_n: int = 100, interval: float = 30.0,
+                 lead_time: float = 60.0, persist_key: str = "cache_hot_keys",
+                 decay_every: int = 10):
         self.cache = cache
         self.warming_strategies: List[Callable] = []
+        self.key_loaders: Dict[str, Callable[[str], Any]] = {}
+        
+        self.top_n = top_n
+        self.interval = interval
+        self.lead_time = lead_time
+        self.persist_key = persist_key
+        self.decay_every = decay_every
+        
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "warmed_from_cache": 0,
+            "warmed_from_loader": 0,
+            "refreshed_before_expiry": 0,
+            "persisted": 0,
+            "errors": 0
+        }
     
     def register_warming_strategy(self, strategy: Callable):
         """Register a cache warming strategy"""
         self.warming_strategies.append(strategy)
     
+    def register_key_loader(self, prefix: str, loader: Callable[[str], Any]):
+        """Register an async loader that recomputes the value of keys under prefix"""
+        self.key_loaders[prefix] = loader
+    
+    def _loader_for(self, key: str) -> Optional[Callable[[str], Any]]:
+        for prefix, loader in self.key_loaders.items():
+            if key.startswith(prefix):
+                return loader
+        return None
+    
     async def warm_cache(self, strategy_name: Optional[str] = None):
         """Execute cache warming strategies"""
         strategies_to_run = self.warming_strategies
@@ -457,46 +805,300 @@ class CacheWarmer:
                 logger.info(f"Cache warming strategy '{strategy.__name__}' completed")
             except Exception as e:
                 logger.error(f"Cache warming strategy '{strategy.__name__}' failed: {e}")
+    
+    # Hot-key warming
+    async def load_hot_set(self) -> int:
+        """Seed the hot-key tracker from the persisted hot set"""
+        try:
+            data = await redis_client.get(self.persist_key)
+            if not data:
+                return 0
+            snapshot = json.loads(data)
+            self.cache.hot_keys.load(snapshot)
+            return len(snapshot)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Failed to load persisted hot key set: {e}")
+            return 0
+    
+    async def persist_hot_set(self):
+        """Save the current hot set so the next process can warm from it"""
+        snapshot = self.cache.hot_keys.snapshot()
+        if not snapshot:
+            return
+        try:
+            await redis_client.setex(self.persist_key, 86400, json.dumps(snapshot))
+            self.stats["persisted"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Failed to persist hot key set: {e}")
+    
+    async def _reload(self, key: str, loader: Callable[[str], Any]) -> bool:
+        try:
+            value = await loader(key)
+            return await self.cache.set(key, value)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Cache warming loader failed for key {key}: {e}")
+            return False
+    
+    async def warm_hot_keys(self, top_n: Optional[int] = None) -> int:
+        """Pull the hottest keys into L1; returns the number of keys warmed"""
+        keys = [key for key, _ in self.cache.hot_keys.top(top_n or self.top_n)]
+        if not keys:
+            return 0
+        
+        found = await self.cache.get_many(keys, track=False)
+        self.stats["warmed_from_cache"] += len(found)
+        warmed = len(found)
+        
+        for key in keys:
+            if key in found:
+                continue
+            loader = self._loader_for(key)
+            if loader is not None and await self._reload(key, loader):
+                self.stats["warmed_from_loader"] += 1
+                warmed += 1
+        
+        logger.info(f"Warmed {warmed} of {len(keys)} hot cache keys")
+        return warmed
+    
+    async def refresh_expiring(self) -> int:
+        """Reload hot keys whose L2 entry expires within lead_time"""
+        keys = [key for key, _ in self.cache.hot_keys.top(self.top_n) if self._loader_for(key)]
+        if not keys:
+            return 0
+        
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.ttl(f"cache:{key}")
+                ttls = await pipe.execute()
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Failed to read TTLs of hot cache keys: {e}")
+            return 0
+        
+        refreshed = 0
+        for key, ttl in zip(keys, ttls):
+            # -2: missing, -1: no expiry
+            if ttl is not None and 0 <= ttl <= self.lead_time:
+                if await self._reload(key, self._loader_for(key)):
+                    refreshed += 1
+        
+        self.stats["refreshed_before_expiry"] += refreshed
+        return refreshed
+    
+    async def start(self):
+        """Warm the hottest keys from the persisted hot set and start the refresh loop"""
+        if self._task is not None:
+            return
+        
+        await self.load_hot_set()
+        await self.warm_hot_keys()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the refresh loop and persist the hot set"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.persist_hot_set()
+    
+    async def _run(self):
+        iteration = 0
+        while True:
+            try:
+                await asyncio.sleep(self.interval)
+                iteration += 1
+                await self.refresh_expiring()
+                await self.persist_hot_set()
+                if iteration % self.decay_every == 0:
+                    self.cache.hot_keys.decay()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Cache warmer loop error: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "top_n": self.top_n,
+            "key_loaders": list(self.key_loaders),
+            **self.stats
+        }
 
 class CacheDecorator:
-    """Decorator for automatic function result caching"""
+    """
+    Decorator for automatic function result caching
+    
+    ``ttl`` is the hard expiry of the cached entry. With ``soft_ttl`` set, results
+    older than ``soft_ttl`` are still served immediately while a single background
+    refresh recomputes them (stale-while-revalidate). With ``early_refresh_beta``
+    > 0, refreshes start probabilistically before the freshness deadline (XFetch),
+    weighted by how long the function took to compute, so a popular key is not
+    recomputed by every worker at the same instant.
+    """
+    
+    ENVELOPE_MARKER = "__swr__"
     
     def __init__(self, cache: MultiLayerCache, ttl: Optional[int] = None, 
-                 key_prefix: str = "", invalidate_on: Optional[List[str]] = None):
+                 key_prefix: str = "", invalidate_on: Optional[List[str]] = None,
+                 soft_ttl: Optional[int] = None, early_refresh_beta: float = 0.0):
         self.cache = cache
         self.ttl = ttl
         self.key_prefix = key_prefix
         self.invalidate_on = invalidate_on or []
+        self.soft_ttl = soft_ttl
+        self.early_refresh_beta = early_refresh_beta
+        self._refreshing: Dict[str, asyncio.Task] = {}
+    
+    @property
+    def revalidates(self) -> bool:
+        """Whether entries carry freshness metadata"""
+        return self.soft_ttl is not None or self.early_refresh_beta > 0
+    
+    def _build_cache_key(self, func: Callable, args: tuple, kwargs: dict) -> str:
+        """Generate cache key from function name and arguments"""
+        key_parts = [self.key_prefix, func.__name__]
+        
+        # Add args to key
+        if args:
+            key_parts.extend([str(arg) for arg in args])
+        
+        # Add kwargs to key
+        if kwargs:
+            key_parts.extend([f"{k}:{v}" for k, v in sorted(kwargs.items())])
+        
+        cache_key = ":".join(key_parts)
+        return hashlib.md5(cache_key.encode()).hexdigest()
     
     def __call__(self, func: Callable):
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
-            # Generate cache key
-            key_parts = [self.key_prefix, func.__name__]
+            cache_key = self._build_cache_key(func, args, kwargs)
             
-            # Add args to key
-            if args:
-                key_parts.extend([str(arg) for arg in args])
+            if not self.revalidates:
+                # Get from cache; on a miss only one caller executes the function
+                return await self.cache.get_or_set(
+                    cache_key, lambda: func(*args, **kwargs), self.ttl
+                )
             
-            # Add kwargs to key
-            if kwargs:
-                key_parts.extend([f"{k}:{v}" for k, v in sorted(kwargs.items())])
+            envelope = await self.cache.get_or_set(
+                cache_key, lambda: self._compute_envelope(func, args, kwargs), self.ttl
+            )
+            if not self._is_envelope(envelope):
+                return envelope
             
-            cache_key = ":".join(key_parts)
-            cache_key = hashlib.md5(cache_key.encode()).hexdigest()
+            if self._needs_refresh(envelope):
+                self._schedule_refresh(cache_key, func, args, kwargs)
             
-            # Try to get from cache
-            result = await self.cache.get(cache_key)
-            if result is not None:
-                return result
+            return envelope["value"]
+        
+        return wrapper
+    
+    async def _compute_envelope(self, func: Callable, args: tuple, kwargs: dict) -> Dict[str, Any]:
+        """Run the function and wrap its result with freshness metadata"""
+        start_time = time.time()
+        value = await func(*args, **kwargs)
+        return {
+            self.ENVELOPE_MARKER: 1,
+            "value": value,
+            "stored_at": time.time(),
+            "delta": time.time() - start_time
+        }
+    
+    def _is_envelope(self, cached: Any) -> bool:
+        return isinstance(cached, dict) and cached.get(self.ENVELOPE_MARKER) == 1
+    
+    def _needs_refresh(self, envelope: Dict[str, Any]) -> bool:
+        """Decide whether a cached envelope should be recomputed in the background"""
+        fresh_for = self.soft_ttl or self.ttl or self.cache.config.default_ttl
+        fresh_until = envelope["stored_at"] + fresh_for
+        now = time.time()
+        
+        if now >= fresh_until:
+            self.cache.stats["stale_hits"] += 1
+            return True
+        
+        if self.early_refresh_beta > 0:
+            # XFetch: now - delta * beta * ln(rand) >= expiry; ln(rand) <= 0
+            delta = max(envelope.get("delta", 0.0), 0.001)
+            if now - delta * self.early_refresh_beta * math.log(1.0 - random.random()) >= fresh_until:
+                self.cache.stats["early_refreshes"] += 1
+                return True
+        
+        return False
+    
+    def _schedule_refresh(self, cache_key: str, func: Callable, args: tuple, kwargs: dict):
+        """Start one background refresh per key; later callers keep serving the cached value"""
+        if cache_key in self._refreshing:
+            return
+        
+        async def refresh():
+            try:
+                envelope = await self._compute_envelope(func, args, kwargs)
+                await self.cache.set(cache_key, envelope, self.ttl)
+                self.cache.stats["background_refreshes"] += 1
+            except Exception as e:
+                self.cache.stats["refresh_errors"] += 1
+                logger.error(f"Background cache refresh failed for {func.__name__}: {e}")
+            finally:
+                self._refreshing.pop(cache_key, None)
+        
+        self._refreshing[cache_key] = asyncio.create_task(refresh())
+
+class CachedManyDecorator:
+    """
+    Decorator for functions that load many items by id
+    
+    The wrapped function takes a list of ids as its first argument and returns a
+    mapping of id -> value. Each id is cached under its own key, so a call only
+    passes the ids missing from the cache to the function, and results are
+    written back with one pipelined write.
+    """
+    
+    def __init__(self, cache: MultiLayerCache, ttl: Optional[int] = None, 
+                 key_prefix: str = ""):
+        self.cache = cache
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+    
+    def _build_key_base(self, func: Callable, args: tuple, kwargs: dict) -> str:
+        """Key prefix shared by all ids for one combination of extra arguments"""
+        key_parts = [str(arg) for arg in args]
+        key_parts.extend([f"{k}:{v}" for k, v in sorted(kwargs.items())])
+        args_hash = hashlib.md5(":".join(key_parts).encode()).hexdigest()[:12]
+        return f"{self.key_prefix}:{func.__name__}:{args_hash}"
+    
+    def __call__(self, func: Callable):
+        @functools.wraps(func)
+        async def wrapper(ids: List[Any], *args, **kwargs) -> Dict[Any, Any]:
+            key_base = self._build_key_base(func, args, kwargs)
+            keys = {item_id: f"{key_base}:{item_id}" for item_id in ids}
             
-            # Execute function
-            result = await func(*args, **kwargs)
+            cached_values = await self.cache.get_many(list(keys.values()))
+            missing_ids = [item_id for item_id, key in keys.items() if key not in cached_values]
             
-            # Cache result
-            await self.cache.set(cache_key, result, self.ttl)
+            loaded: Dict[Any, Any] = {}
+            if missing_ids:
+                loaded = await func(missing_ids, *args, **kwargs) or {}
+                await self.cache.set_many(
+                    {keys[item_id]: value for item_id, value in loaded.items() if item_id in keys},
+                    self.ttl
+                )
             
-            return result
+            results = {}
+            for item_id, key in keys.items():
+                if key in cached_values:
+                    results[item_id] = cached_values[key]
+                elif item_id in loaded:
+                    results[item_id] = loaded[item_id]
+            return results
         
         return wrapper
 
@@ -505,17 +1107,41 @@ cache_config = CacheConfiguration(
     default_ttl=getattr(settings, 'CACHE_DEFAULT_TTL', 300),
     max_memory_size=getattr(settings, 'CACHE_MAX_MEMORY', 100 * 1024 * 1024),
     compression_threshold=getattr(settings, 'CACHE_COMPRESSION_THRESHOLD', 1024),
-    enable_compression=getattr(settings, 'CACHE_ENABLE_COMPRESSION', True)
+    serialization_method=getattr(settings, 'CACHE_SERIALIZATION_METHOD', "json"),
+    compression_algorithm=getattr(settings, 'CACHE_COMPRESSION_ALGORITHM', "zlib"),
+    namespace_codecs=getattr(settings, 'CACHE_NAMESPACE_CODECS', {}),
+    enable_compression=getattr(settings, 'CACHE_ENABLE_COMPRESSION', True),
+    eviction_strategy=CacheStrategy(getattr(settings, 'CACHE_EVICTION_STRATEGY', CacheStrategy.LRU.value)),
+    enable_l3=getattr(settings, 'CACHE_L3_ENABLED', False),
+    l3_path=getattr(settings, 'CACHE_L3_PATH', "cache/l3_cache.db"),
+    l3_max_size=getattr(settings, 'CACHE_L3_MAX_SIZE', 1024 * 1024 * 1024),
+    hot_keys_top_k=getattr(settings, 'CACHE_HOT_KEYS_TOP_K', 200)
 )
 
 multi_layer_cache = MultiLayerCache(cache_config)
 smart_cache = SmartCache(multi_layer_cache)
-cache_warmer = CacheWarmer(multi_layer_cache)
+cache_warmer = CacheWarmer(
+    multi_layer_cache,
+    top_n=getattr(settings, 'CACHE_WARM_TOP_N', 100),
+    interval=getattr(settings, 'CACHE_WARM_INTERVAL', 30.0),
+    lead_time=getattr(settings, 'CACHE_WARM_LEAD_TIME', 60.0)
+)
 
 # Convenience decorator
-def cached(ttl: Optional[int] = None, key_prefix: str = "func_cache"):
-    """Decorator for caching function results"""
-    return CacheDecorator(multi_layer_cache, ttl, key_prefix)
+def cached(ttl: Optional[int] = None, key_prefix: str = "func_cache",
+           soft_ttl: Optional[int] = None, early_refresh_beta: float = 0.0):
+    """Decorator for caching function results
+    
+    Pass ``soft_ttl`` to serve stale results while refreshing in the background,
+    and ``early_refresh_beta`` (typically 1.0) to spread refreshes of hot keys
+    ahead of expiry.
+    """
+    return CacheDecorator(multi_layer_cache, ttl, key_prefix,
+                          soft_ttl=soft_ttl, early_refresh_beta=early_refresh_beta)
+
+def cached_many(ttl: Optional[int] = None, key_prefix: str = "func_cache_many"):
+    """Decorator for caching per-id results of functions that take a list of ids"""
+    return CachedManyDecorator(multi_layer_cache, ttl, key_prefix)
 
 # Context manager for cache operations
 @asynccontextmanager
@@ -0,0 +1,359 @@
+"""
+Alert Rule Engine
+Sliding-window alert rules evaluated as metric points arrive
+"""
+
+import os
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from app.core.logger import get_logger
+from app.core.redis_client import redis_client
+from app.core.streaming_stats import WindowAggregator
+
+logger = get_logger(__name__)
+
+AGGREGATIONS = ("last", "avg", "min", "max", "p95", "p99", "rate", "absent")
+
+_QUANTILES = {"p95": 0.95, "p99": 0.99}
+
+
+def compare(value: float, condition: str, threshold: float) -> bool:
+    """Evaluate an alert condition such as ``value > threshold``"""
+    if condition == ">":
+        return value > threshold
+    elif condition == ">=":
+        return value >= threshold
+    elif condition == "<":
+        return value < threshold
+    elif condition == "<=":
+        return value <= threshold
+    elif condition == "==":
+        return abs(value - threshold) < 0.001  # Float comparison
+    elif condition == "!=":
+        return abs(value - threshold) >= 0.001
+    raise ValueError(f"Unknown condition: {condition}")
+
+
+class MetricWindow:
+    """
+    The points of one metric from the last ``window_seconds``.
+
+    Points enter with ``add`` and leave, oldest first, once they fall out of
+    the window (or past ``max_points``), so every aggregation is kept up to
+    date in O(1) amortized per point by a ``WindowAggregator``.
+    """
+
+    def __init__(self, window_seconds: float, max_points: int = 10000,
+                 created_at: Optional[float] = None):
+        self.window_seconds = window_seconds
+        self.max_points = max_points
+        self.created_at = created_at
+        self._points: Deque[Tuple[float, float]] = deque()
+        self._aggregator = WindowAggregator()
+        self._first_timestamp: Optional[float] = None
+
+    @property
+    def count(self) -> int:
+        return len(self._points)
+
+    def add(self, value: float, timestamp: float):
+        if self._points and timestamp < self._points[-1][0]:
+            # Late points count as the newest so the window stays ordered
+            timestamp = self._points[-1][0]
+        if self._first_timestamp is None:
+            self._first_timestamp = timestamp
+        if self.created_at is None:
+            self.created_at = timestamp
+        if len(self._points) >= self.max_points:
+            self._aggregator.remove_oldest(self._points.popleft()[1])
+        self._points.append((timestamp, value))
+        self._aggregator.add(value, timestamp)
+
+    def expire(self, now: float):
+        horizon = now - self.window_seconds
+        while self._points and self._points[0][0] <= horizon:
+            self._aggregator.remove_oldest(self._points.popleft()[1])
+
+    def value(self, aggregation: str, now: float) -> Optional[float]:
+        """The aggregation over the window, or None without points"""
+        self.expire(now)
+        if aggregation == "absent":
+            return float(self.count)
+        if not self._points:
+            return None
+        if aggregation == "last":
+            return self._points[-1][1]
+        if aggregation == "avg":
+            return self._aggregator.stats.mean
+        if aggregation == "min":
+            return self._aggregator.minimum
+        if aggregation == "max":
+            return self._aggregator.maximum
+        if aggregation in _QUANTILES:
+            value = self._aggregator.sketch.quantile(_QUANTILES[aggregation])
+            return min(max(value, self._aggregator.minimum), self._aggregator.maximum)
+        if aggregation == "rate":
+            # Recorded increments per second; a window that started recently
+            # is averaged over the time it covers
+            span = min(self.window_seconds, max(now - self._first_timestamp, 1.0))
+            return self._aggregator.stats.total / span
+        raise ValueError(f"Unknown aggregation: {aggregation}")
+
+
+@dataclass
+class RuleState:
+    """Evaluation state of one rule"""
+    pending_since: Optional[float] = None
+    firing: bool = False
+    value: Optional[float] = None
+    evaluated_at: Optional[float] = None
+
+
+@dataclass
+class RuleTransition:
+    """A rule that started or stopped firing"""
+    rule: Any
+    action: str  # "fired" or "resolved"
+    value: Optional[float]
+    timestamp: float
+
+
+class AlertRuleEngine:
+    """
+    Evaluates alert rules over sliding windows as points are recorded.
+
+    Rules are indexed by metric, so ``observe`` only evaluates the rules of
+    the metric that just received a point. A rule's condition is checked
+    against an aggregation of its window (last, avg, min, max, p95, p99,
+    rate or absent) and the rule fires only once the condition has held for
+    ``duration_seconds`` (the rule's ``for:``), so a single spike doesn't
+    page anyone. Rules sharing a metric and window share one window.
+
+    Conditions that change with time alone, such as a metric going quiet,
+    a pending ``for:`` elapsing or a firing rule's data ageing out, are
+    picked up by ``tick``, which only visits absent, pending and firing
+    rules.
+    """
+
+    def __init__(self, max_window_points: int = 10000):
+        self.max_window_points = max_window_points
+        self._rules: Dict[str, Any] = {}
+        # Where each rule is indexed, kept apart from the rule so rules
+        # edited in place can still be unindexed
+        self._placement: Dict[str, Tuple[str, float]] = {}
+        self._rules_by_metric: Dict[str, Dict[str, Any]] = {}
+        self._windows: Dict[str, Dict[float, MetricWindow]] = {}
+        self._states: Dict[str, RuleState] = {}
+        self._timed: Set[str] = set()
+
+    def add_rule(self, rule: Any, now: Optional[float] = None):
+        """Add or re-index a rule; its state is kept when it already existed"""
+        if rule.aggregation not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation: {rule.aggregation}")
+        if rule.aggregation != "absent":
+            compare(0.0, rule.condition, rule.threshold)
+
+        if self._placement.get(rule.id) != (rule.metric_name, rule.window_seconds):
+            # Moved to another metric or window: its old window may go
+            self.remove_rule(rule.id, keep_state=True)
+        self._rules[rule.id] = rule
+        self._placement[rule.id] = (rule.metric_name, rule.window_seconds)
+        self._rules_by_metric.setdefault(rule.metric_name, {})[rule.id] = rule
+        windows = self._windows.setdefault(rule.metric_name, {})
+        if rule.window_seconds not in windows:
+            windows[rule.window_seconds] = MetricWindow(rule.window_seconds, self.max_window_points, now)
+        self._states.setdefault(rule.id, RuleState())
+        if rule.aggregation == "absent":
+            self._timed.add(rule.id)
+
+    def remove_rule(self, rule_id: str, keep_state: bool = False):
+        if rule_id not in self._rules:
+            return
+        del self._rules[rule_id]
+        metric_name, window_seconds = self._placement.pop(rule_id)
+
+        rules = self._rules_by_metric.get(metric_name, {})
+        rules.pop(rule_id, None)
+        if not any(self._placement[other] == (metric_name, window_seconds) for other in rules):
+            self._windows[metric_name].pop(window_seconds, None)
+        if not rules:
+            self._rules_by_metric.pop(metric_name, None)
+            self._windows.pop(metric_name, None)
+        if not keep_state:
+            self._states.pop(rule_id, None)
+        self._timed.discard(rule_id)
+
+    def get_state(self, rule_id: str) -> Optional[RuleState]:
+        return self._states.get(rule_id)
+
+    def observe(self, metric_name: str, value: float, timestamp: float) -> List[RuleTransition]:
+        """Record a point and evaluate the rules of its metric"""
+        rules = self._rules_by_metric.get(metric_name)
+        if not rules:
+            return []
+
+        for window in self._windows[metric_name].values():
+            window.add(value, timestamp)
+
+        transitions = []
+        for rule in list(rules.values()):
+            transition = self.evaluate(rule, timestamp)
+            if transition is not None:
+                transitions.append(transition)
+        return transitions
+
+    def tick(self, now: float) -> List[RuleTransition]:
+        """Evaluate the rules whose outcome can change without new points"""
+        transitions = []
+        for rule_id in list(self._timed):
+            rule = self._rules.get(rule_id)
+            if rule is None:
+                self._timed.discard(rule_id)
+                continue
+            transition = self.evaluate(rule, now)
+            if transition is not None:
+                transitions.append(transition)
+        return transitions
+
+    def evaluate(self, rule: Any, now: float) -> Optional[RuleTransition]:
+        """Evaluate one rule at time now; returns a transition if it fired or resolved"""
+        if not rule.enabled or rule.id not in self._rules:
+            return None
+
+        metric_name, window_seconds = self._placement[rule.id]
+        window = self._windows[metric_name][window_seconds]
+        value = window.value(rule.aggregation, now)
+        if rule.aggregation == "absent":
+            # Give a new window the time to see its first point
+            started = window.created_at if window.created_at is not None else now
+            window.created_at = started
+            condition_met = value == 0 and now - started >= rule.window_seconds
+        else:
+            condition_met = value is not None and compare(value, rule.condition, rule.threshold)
+
+        state = self._states.setdefault(rule.id, RuleState())
+        state.value = value
+        state.evaluated_at = now
+
+        transition = None
+        if condition_met:
+            if state.pending_since is None:
+                state.pending_since = now
+            if not state.firing and now - state.pending_since >= rule.duration_seconds:
+                state.firing = True
+                transition = RuleTransition(rule, "fired", value, now)
+        else:
+            state.pending_since = None
+            if state.firing:
+                state.firing = False
+                transition = RuleTransition(rule, "resolved", value, now)
+
+        if state.firing or state.pending_since is not None or rule.aggregation == "absent":
+            self._timed.add(rule.id)
+        else:
+            self._timed.discard(rule.id)
+        return transition
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "rules": len(self._rules),
+            "indexed_metrics": len(self._rules_by_metric),
+            "windows": sum(len(windows) for windows in self._windows.values()),
+            "window_points": sum(
+                window.count for windows in self._windows.values() for window in windows.values()
+            ),
+            "pending": sum(1 for state in self._states.values() if state.pending_since is not None and not state.firing),
+            "firing": sum(1 for state in self._states.values() if state.firing)
+        }
+
+
+class AlertStateStore:
+    """
+    Alert state shared by all workers through Redis.
+
+    Each worker evaluates rules against the points it records, so several
+    workers can fire the same alert. A worker that fires adds itself to the
+    alert's firing set, a sorted set scored by the worker's last heartbeat,
+    and notifications are claimed with ``SET NX`` keys that expire after the
+    rule's cooldown: only the first worker to fire sends "fired", and
+    "resolved" is sent once the last firing worker resolves. Firing workers
+    refresh their heartbeat on every tick; members not refreshed for
+    ``stale_after_seconds`` belong to workers that died and are dropped, so
+    they can't hold an alert open. If Redis is unavailable every worker
+    notifies, as before, rather than dropping alerts.
+    """
+
+    def __init__(self, state_ttl_seconds: int = 900, stale_after_seconds: int = 60):
+        self.state_ttl_seconds = state_ttl_seconds
+        self.stale_after_seconds = stale_after_seconds
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._firing: Set[str] = set()
+
+    @staticmethod
+    def firing_key(alert_id: str) -> str:
+        return f"alert_firing:{alert_id}"
+
+    @staticmethod
+    def notification_key(alert_id: str, action: str) -> str:
+        return f"alert_notified:{alert_id}:{action}"
+
+    async def _claim(self, alert_id: str, action: str, cooldown_seconds: int) -> bool:
+        claimed = await redis_client.set(
+            self.notification_key(alert_id, action), self.worker_id,
+            ex=max(int(cooldown_seconds), 1), nx=True
+        )
+        return bool(claimed)
+
+    async def mark_firing(self, alert_id: str, cooldown_seconds: int,
+                          now: Optional[float] = None) -> bool:
+        """Record that this worker fired alert_id; True if it should notify"""
+        now = time.time() if now is None else now
+        self._firing.add(alert_id)
+        try:
+            key = self.firing_key(alert_id)
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.zadd(key, {self.worker_id: now})
+                pipe.expire(key, self.state_ttl_seconds)
+                await pipe.execute()
+            return await self._claim(alert_id, "fired", cooldown_seconds)
+        except Exception as e:
+            logger.error(f"Failed to share alert state for {alert_id}: {e}")
+            return True
+
+    async def mark_resolved(self, alert_id: str, cooldown_seconds: int,
+                            now: Optional[float] = None) -> bool:
+        """Record that this worker resolved alert_id; True if it should notify"""
+        now = time.time() if now is None else now
+        self._firing.discard(alert_id)
+        try:
+            key = self.firing_key(alert_id)
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.zrem(key, self.worker_id)
+                pipe.zremrangebyscore(key, "-inf", now - self.stale_after_seconds)
+                pipe.zcard(key)
+                *_, still_firing = await pipe.execute()
+            if still_firing:
+                return False
+            return await self._claim(alert_id, "resolved", cooldown_seconds)
+        except Exception as e:
+            logger.error(f"Failed to share alert state for {alert_id}: {e}")
+            return True
+
+    async def refresh(self, now: Optional[float] = None):
+        """Heartbeat this worker's firing alerts in the shared state"""
+        if not self._firing:
+            return
+        now = time.time() if now is None else now
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for alert_id in self._firing:
+                    key = self.firing_key(alert_id)
+                    pipe.zadd(key, {self.worker_id: now})
+                    pipe.expire(key, self.state_ttl_seconds)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to refresh shared alert state: {e}")
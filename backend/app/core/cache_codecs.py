@@ -0,0 +1,339 @@
+"""
+Cache Serialization Codecs
+Pluggable serializers and compressors with a compact binary header
+"""
+
+import json
+import logging
+import pickle
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Header layout: MAGIC byte followed by (codec_id << 4 | compressor_id)
+HEADER_MAGIC = 0xC7
+HEADER_SIZE = 2
+
+
+@dataclass
+class Codec:
+    """Serializer registered under a 4-bit id"""
+    name: str
+    codec_id: int
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+    # Codecs that can execute code on load (pickle) are only decoded for
+    # namespaces that opted in to them
+    safe: bool = True
+
+
+# Registered only when a namespace opts in through set_namespace_codec
+PICKLE_CODEC = Codec(
+    "pickle", 4,
+    lambda obj: pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL),
+    pickle.loads,
+    safe=False
+)
+_OPT_IN_CODECS = {PICKLE_CODEC.name: PICKLE_CODEC}
+
+
+@dataclass
+class Compressor:
+    """Compressor registered under a 4-bit id"""
+    name: str
+    compressor_id: int
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+@dataclass
+class AdaptiveCompressionPolicy:
+    """
+    Per-namespace compression threshold driven by the measured ratio.
+
+    Payloads at or above ``threshold`` bytes are compressed. The ratio
+    (compressed / raw) is tracked as an exponential moving average: when
+    compression stops paying off the threshold doubles (up to
+    ``max_threshold``), and when it pays off well it halves back towards
+    ``base_threshold``. Every ``probe_interval``-th payload below the current
+    threshold but above the base is still compressed so the ratio keeps being
+    measured after the threshold has moved up.
+    """
+    base_threshold: int = 1024
+    max_threshold: int = 256 * 1024
+    poor_ratio: float = 0.9
+    good_ratio: float = 0.6
+    probe_interval: int = 50
+    threshold: int = 0
+    ratio_ema: Optional[float] = None
+    samples: int = 0
+    _skipped: int = field(default=0, repr=False)
+
+    def __post_init__(self):
+        if not self.threshold:
+            self.threshold = self.base_threshold
+
+    def should_compress(self, size: int) -> bool:
+        if size >= self.threshold:
+            return True
+        if size >= self.base_threshold:
+            self._skipped += 1
+            if self._skipped >= self.probe_interval:
+                self._skipped = 0
+                return True
+        return False
+
+    def record(self, raw_size: int, compressed_size: int):
+        ratio = compressed_size / raw_size if raw_size else 1.0
+        self.ratio_ema = ratio if self.ratio_ema is None else 0.8 * self.ratio_ema + 0.2 * ratio
+        self.samples += 1
+
+        if self.ratio_ema > self.poor_ratio:
+            self.threshold = min(self.threshold * 2, self.max_threshold)
+        elif self.ratio_ema < self.good_ratio:
+            self.threshold = max(self.threshold // 2, self.base_threshold)
+
+
+class CodecRegistry:
+    """
+    Registry of serialization codecs and compressors.
+
+    Encoded payloads start with a two byte header identifying the codec and the
+    compressor, so any registered format can be decoded regardless of the
+    current configuration. Codecs are chosen per namespace (the key prefix
+    before the first ``:``; keys without one use the default namespace) with a
+    registry-wide default. Compression policies are kept per namespace for the
+    ``max_policies`` most recently used namespaces.
+
+    Anyone able to write a cache key picks the header, so unsafe codecs
+    (pickle) are never a default: a namespace has to opt in with
+    ``set_namespace_codec``, and ``decode`` refuses them for every other
+    namespace.
+    """
+
+    def __init__(self, default_codec: str = "json", default_compressor: str = "zlib",
+                 compression_threshold: int = 1024, enable_compression: bool = True,
+                 max_policies: int = 256):
+        self._codecs: Dict[str, Codec] = {}
+        self._codecs_by_id: Dict[int, Codec] = {}
+        self._compressors: Dict[str, Compressor] = {}
+        self._compressors_by_id: Dict[int, Compressor] = {}
+        self._namespace_codecs: Dict[str, str] = {}
+        self._policies: "OrderedDict[str, AdaptiveCompressionPolicy]" = OrderedDict()
+        self.max_policies = max_policies
+
+        self.compression_threshold = compression_threshold
+        self.enable_compression = enable_compression
+
+        self._register_builtins()
+        self.default_codec = self._resolve_codec(default_codec).name
+        self.default_compressor = self._resolve_compressor(default_compressor).name
+
+        self.stats = {
+            "encoded": 0,
+            "decoded": 0,
+            "compressed": 0,
+            "compression_skipped": 0,
+            "bytes_raw": 0,
+            "bytes_stored": 0
+        }
+
+    # ------------------------------------------------------------------
+    # Registration
+    # ------------------------------------------------------------------
+
+    def register_codec(self, codec: Codec):
+        if not 0 < codec.codec_id < 16:
+            raise ValueError("Codec id must fit in 4 bits (1-15)")
+        self._codecs[codec.name] = codec
+        self._codecs_by_id[codec.codec_id] = codec
+
+    def register_compressor(self, compressor: Compressor):
+        if not 0 <= compressor.compressor_id < 16:
+            raise ValueError("Compressor id must fit in 4 bits (0-15)")
+        self._compressors[compressor.name] = compressor
+        self._compressors_by_id[compressor.compressor_id] = compressor
+
+    def _register_builtins(self):
+        self.register_codec(Codec(
+            "json", 1,
+            lambda obj: json.dumps(obj, default=str, separators=(",", ":")).encode(),
+            lambda data: json.loads(data)
+        ))
+        self.register_compressor(Compressor("none", 0, lambda data: data, lambda data: data))
+        self.register_compressor(Compressor("zlib", 1, lambda data: zlib.compress(data, 6), zlib.decompress))
+
+        try:
+            import orjson
+            self.register_codec(Codec(
+                "orjson", 2,
+                lambda obj: orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS),
+                orjson.loads
+            ))
+        except ImportError:
+            pass
+
+        try:
+            import msgpack
+            self.register_codec(Codec(
+                "msgpack", 3,
+                lambda obj: msgpack.packb(obj, default=str, use_bin_type=True),
+                lambda data: msgpack.unpackb(data, raw=False, strict_map_key=False)
+            ))
+        except ImportError:
+            pass
+
+        try:
+            import lz4.frame
+            self.register_compressor(Compressor("lz4", 2, lz4.frame.compress, lz4.frame.decompress))
+        except ImportError:
+            pass
+
+        try:
+            import zstandard
+            zstd_compressor = zstandard.ZstdCompressor(level=3)
+            zstd_decompressor = zstandard.ZstdDecompressor()
+            self.register_compressor(Compressor(
+                "zstd", 3, zstd_compressor.compress, zstd_decompressor.decompress
+            ))
+        except ImportError:
+            pass
+
+    def _resolve_codec(self, name: str) -> Codec:
+        codec = self._codecs.get(name)
+        if name in _OPT_IN_CODECS:
+            logger.warning(f"Cache codec '{name}' can only be enabled per namespace, falling back to json")
+            codec = self._codecs["json"]
+        if codec is None:
+            logger.warning(f"Cache codec '{name}' is not available, falling back to json")
+            codec = self._codecs["json"]
+        return codec
+
+    def _resolve_compressor(self, name: str) -> Compressor:
+        compressor = self._compressors.get(name)
+        if compressor is None:
+            logger.warning(f"Cache compressor '{name}' is not available, falling back to zlib")
+            compressor = self._compressors["zlib"]
+        return compressor
+
+    def set_namespace_codec(self, namespace: str, codec_name: str):
+        """Use codec_name for keys in namespace (the only way to enable pickle)"""
+        opt_in = _OPT_IN_CODECS.get(codec_name)
+        if opt_in is not None:
+            self.register_codec(opt_in)
+            self._namespace_codecs[namespace] = opt_in.name
+        else:
+            self._namespace_codecs[namespace] = self._resolve_codec(codec_name).name
+
+    def get_codec(self, name: str) -> Optional[Codec]:
+        return self._codecs.get(name)
+
+    def codec_allowed(self, codec: Codec, key: Optional[str]) -> bool:
+        """Whether payloads of codec may be decoded for key"""
+        return codec.safe or self._namespace_codecs.get(self.namespace_of(key)) == codec.name
+
+    @property
+    def available_codecs(self) -> Tuple[str, ...]:
+        return tuple(self._codecs)
+
+    @property
+    def available_compressors(self) -> Tuple[str, ...]:
+        return tuple(self._compressors)
+
+    # ------------------------------------------------------------------
+    # Encoding
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def namespace_of(key: Optional[str]) -> str:
+        if not key or ":" not in key:
+            return ""
+        return key.split(":", 1)[0]
+
+    def _policy_for(self, namespace: str) -> AdaptiveCompressionPolicy:
+        policy = self._policies.get(namespace)
+        if policy is None:
+            policy = AdaptiveCompressionPolicy(base_threshold=self.compression_threshold)
+            self._policies[namespace] = policy
+            if len(self._policies) > self.max_policies:
+                self._policies.popitem(last=False)
+        else:
+            self._policies.move_to_end(namespace)
+        return policy
+
+    def encode(self, value: Any, key: Optional[str] = None, codec: Optional[str] = None,
+               compressor: Optional[str] = None) -> Tuple[bytes, bool]:
+        """Serialize value; returns (header + payload, compressed)"""
+        namespace = self.namespace_of(key)
+        codec_obj = self._resolve_codec(codec) if codec else \
+            self._codecs[self._namespace_codecs.get(namespace, self.default_codec)]
+        payload = codec_obj.dumps(value)
+        raw_size = len(payload)
+
+        compressor_obj = self._compressors["none"]
+        if self.enable_compression:
+            policy = self._policy_for(namespace)
+            if policy.should_compress(raw_size):
+                candidate = self._resolve_compressor(compressor) if compressor else \
+                    self._compressors[self.default_compressor]
+                compressed = candidate.compress(payload)
+                policy.record(raw_size, len(compressed))
+                if len(compressed) < raw_size:
+                    payload = compressed
+                    compressor_obj = candidate
+                else:
+                    self.stats["compression_skipped"] += 1
+
+        self.stats["encoded"] += 1
+        self.stats["bytes_raw"] += raw_size
+        self.stats["bytes_stored"] += len(payload) + HEADER_SIZE
+        compressed = compressor_obj.compressor_id != 0
+        if compressed:
+            self.stats["compressed"] += 1
+
+        header = bytes((HEADER_MAGIC, (codec_obj.codec_id << 4) | compressor_obj.compressor_id))
+        return header + payload, compressed
+
+    @staticmethod
+    def has_header(data: bytes) -> bool:
+        return len(data) >= HEADER_SIZE and data[0] == HEADER_MAGIC
+
+    def decode(self, data: bytes, key: Optional[str] = None) -> Any:
+        """Deserialize a payload produced by encode for key"""
+        if not self.has_header(data):
+            raise ValueError("Payload has no codec header")
+
+        codec_id, compressor_id = data[1] >> 4, data[1] & 0x0F
+        codec = self._codecs_by_id.get(codec_id)
+        compressor = self._compressors_by_id.get(compressor_id)
+        if codec is None or compressor is None:
+            raise ValueError(f"Unknown cache codec/compressor ids {codec_id}/{compressor_id}")
+        if not self.codec_allowed(codec, key):
+            raise ValueError(
+                f"Cache codec '{codec.name}' is not enabled for namespace '{self.namespace_of(key)}'"
+            )
+
+        self.stats["decoded"] += 1
+        return codec.loads(compressor.decompress(data[HEADER_SIZE:]))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Codec usage and per-namespace compression thresholds"""
+        return {
+            "default_codec": self.default_codec,
+            "default_compressor": self.default_compressor,
+            "namespace_codecs": dict(self._namespace_codecs),
+            "compression_ratio": round(self.stats["bytes_stored"] / self.stats["bytes_raw"], 3)
+            if self.stats["bytes_raw"] else None,
+            "thresholds": {
+                namespace or "default": {
+                    "threshold": policy.threshold,
+                    "ratio_ema": round(policy.ratio_ema, 3) if policy.ratio_ema is not None else None,
+                    "samples": policy.samples
+                }
+                for namespace, policy in self._policies.items()
+            },
+            **self.stats
+        }
@@ -71,6 +71,10 @@ class SmartCacheInvalidator:
         # Event handlers
         self.event_handlers: Dict[str, List[Callable]] = defaultdict(list)
         
+        # Keys under these namespaces are indexed by the namespace tag as well
+        multi_layer_cache.tag_index.namespace_tags.update(tag.value for tag in CacheTag)
+        multi_layer_cache.tag_index.namespace_tags.add("homepage")
+        
         # Background task for periodic cleanup
         self._cleanup_task = None
         self._start_background_tasks()
@@ -87,7 +91,11 @@ class SmartCacheInvalidator:
     def _start_background_tasks(self):
         """Start background tasks"""
         if self._cleanup_task is None:
-            self._cleanup_task = asyncio.create_task(self._periodic_cleanup())
+            try:
+                self._cleanup_task = asyncio.get_running_loop().create_task(self._periodic_cleanup())
+            except RuntimeError:
+                # Created outside an event loop (e.g. at import); started by the first invalidation
+                pass
     
     async def _periodic_cleanup(self):
         """Periodic cleanup of old dependencies and history"""
@@ -237,15 +245,22 @@ class SmartCacheInvalidator:
         
         return dependent_keys
     
-    async def invalidate_by_tag(self, tag: str) -> List[str]:
-        """Invalidate cache by tag"""
+    async def invalidate_by_tag(self, tag: Union[str, CacheTag]) -> List[str]:
+        """Invalidate cache by tag
+        
+        Keys come from the Redis tag index kept by the cache (cost proportional
+        to the tagged keys) plus any keys registered with that tag here.
+        """
         try:
-            cache_keys = list(self.tag_mappings.get(tag, set()))
-            invalidated_keys = []
+            if isinstance(tag, CacheTag):
+                tag = tag.value
             
-            for cache_key in cache_keys:
-                await multi_layer_cache.delete(cache_key)
-                invalidated_keys.append(cache_key)
+            invalidated_keys = await multi_layer_cache.invalidate_tag(tag)
+            
+            registered_keys = list(self.tag_mappings.get(tag, set()) - set(invalidated_keys))
+            if registered_keys:
+                await multi_layer_cache.delete_many(registered_keys)
+                invalidated_keys.extend(registered_keys)
             
             # Record invalidation event
             await self._record_invalidation_event(
@@ -350,6 +365,7 @@ class SmartCacheInvalidator:
                                        affected_keys: List[str], trigger: str,
                                        metadata: Dict[str, Any] = None):
         """Record cache invalidation event"""
+        self._start_background_tasks()
         try:
             event = InvalidationEvent(
                 event_id=hashlib.md5(f"{trigger}:{time.time()}".encode()).hexdigest(),
@@ -502,19 +518,8 @@ async def user_data_changed_handler(event_data: Dict[str, Any]) -> List[str]:
     if not user_id:
         return []
     
-    # Invalidate user-related cache keys
-    invalidated_keys = []
-    patterns = [
-        f"user:{user_id}:*",
-        f"profile:{user_id}",
-        f"settings:{user_id}:*"
-    ]
-    
-    for pattern in patterns:
-        keys = await cache_invalidator.invalidate_by_pattern(pattern)
-        invalidated_keys.extend(keys)
-    
-    return invalidated_keys
+    # user:{id}:*, profile:{id} and settings:{id}:* are all indexed under user:{id}
+    return await cache_invalidator.invalidate_by_tag(f"user:{user_id}")
 
 async def content_updated_handler(event_data: Dict[str, Any]) -> List[str]:
     """Handle content update events"""
@@ -526,14 +531,14 @@ async def content_updated_handler(event_data: Dict[str, Any]) -> List[str]:
     
     # Invalidate content-related cache
     invalidated_keys = []
-    patterns = [
-        f"content:{content_id}:*",
-        f"list:{content_type}:*",
-        "homepage:*"  # Homepage might show this content
+    tags = [
+        f"content:{content_id}",    # content:{id}:*
+        f"content:{content_type}",  # list:{type}:*
+        "homepage"  # Homepage might show this content
     ]
     
-    for pattern in patterns:
-        keys = await cache_invalidator.invalidate_by_pattern(pattern)
+    for tag in tags:
+        keys = await cache_invalidator.invalidate_by_tag(tag)
         invalidated_keys.extend(keys)
     
     return invalidated_keys
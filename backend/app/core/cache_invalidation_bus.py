@@ -0,0 +1,283 @@
+"""
+Cross-Worker Cache Invalidation Bus
+Propagates L1 invalidations between application workers over Redis pub/sub
+"""
+
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from app.core.logger import get_logger
+from app.core.config import settings
+from app.core.redis_client import redis_client
+from app.core.advanced_cache import MultiLayerCache, multi_layer_cache
+
+logger = get_logger(__name__)
+
+MESSAGE_VERSION = 1
+
+
+class CacheInvalidationBus:
+    """
+    Batched L1 invalidation fan-out over a Redis channel.
+
+    Local deletes are queued and published together after ``batch_interval``
+    seconds (or as soon as ``max_batch_size`` entries are pending). Each key and
+    pattern carries a version that increases monotonically per sender;
+    receivers remember the last version applied per sender and key and drop
+    messages from that sender that arrive out of order. Versions are never
+    compared across senders, whose clocks may disagree.
+
+    When Redis is unreachable publishes are counted as failures and the local
+    L1 keeps working. After the subscription is re-established the local L1 is
+    cleared, because invalidations sent while disconnected were missed.
+    """
+
+    def __init__(self, cache: MultiLayerCache, channel: str = "cache:invalidation",
+                 batch_interval: float = 0.05, max_batch_size: int = 500,
+                 max_tracked_versions: int = 50000):
+        self.cache = cache
+        self.channel = channel
+        self.batch_interval = batch_interval
+        self.max_batch_size = max_batch_size
+        self.max_tracked_versions = max_tracked_versions
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        # Outgoing batch: key/pattern -> version
+        self._pending_keys: Dict[str, int] = {}
+        self._pending_patterns: Dict[str, int] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_version = 0
+
+        # Last applied version per (origin, key/pattern), oldest dropped first
+        self._applied_versions: "OrderedDict[Tuple[Optional[str], str], int]" = OrderedDict()
+
+        self._listener_task: Optional[asyncio.Task] = None
+        self._running = False
+        self.connected = False
+        self._ever_connected = False
+        self._publish_degraded = False
+
+        self.stats = {
+            "messages_published": 0,
+            "keys_published": 0,
+            "patterns_published": 0,
+            "publish_failures": 0,
+            "messages_received": 0,
+            "keys_evicted": 0,
+            "patterns_evicted": 0,
+            "out_of_order_dropped": 0,
+            "reconnects": 0,
+            "resync_clears": 0
+        }
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        """Attach to the cache and start listening for remote invalidations"""
+        if self._running:
+            return
+
+        self._running = True
+        self.cache.attach_invalidation_bus(self)
+        self._listener_task = asyncio.create_task(self._listen_loop())
+        logger.info(f"Cache invalidation bus started on channel {self.channel} as {self.node_id}")
+
+    async def stop(self):
+        """Flush pending invalidations and stop listening"""
+        self._running = False
+
+        if self._pending_keys or self._pending_patterns:
+            await self._publish_pending()
+
+        for task in (self._flush_task, self._listener_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+        self.cache.attach_invalidation_bus(None)
+        self.connected = False
+        logger.info("Cache invalidation bus stopped")
+
+    # ------------------------------------------------------------------
+    # Publishing
+    # ------------------------------------------------------------------
+
+    def _next_version(self) -> int:
+        """Monotonic version based on wall-clock nanoseconds"""
+        version = max(time.time_ns(), self._last_version + 1)
+        self._last_version = version
+        return version
+
+    def publish_keys(self, keys: Iterable[str]):
+        """Queue key invalidations for other workers"""
+        for key in keys:
+            self._pending_keys[key] = self._next_version()
+        self._schedule_flush()
+
+    def publish_pattern(self, pattern: str):
+        """Queue a pattern invalidation for other workers"""
+        self._pending_patterns[pattern] = self._next_version()
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        """Flush now if the batch is full, otherwise after batch_interval"""
+        if not self._running:
+            return
+
+        pending = len(self._pending_keys) + len(self._pending_patterns)
+        if self._flush_task is None or self._flush_task.done():
+            delay = 0 if pending >= self.max_batch_size else self.batch_interval
+            self._flush_task = asyncio.create_task(self._flush_after(delay))
+
+    async def _flush_after(self, delay: float):
+        if delay:
+            await asyncio.sleep(delay)
+        await self._publish_pending()
+
+        # Anything queued while publishing goes out in the next batch
+        if self._pending_keys or self._pending_patterns:
+            self._flush_task = asyncio.create_task(self._flush_after(self.batch_interval))
+
+    async def _publish_pending(self):
+        """Publish the queued invalidations as batched messages"""
+        keys, self._pending_keys = self._pending_keys, {}
+        patterns, self._pending_patterns = self._pending_patterns, {}
+
+        key_items = list(keys.items())
+        batches = [key_items[i:i + self.max_batch_size]
+                   for i in range(0, len(key_items), self.max_batch_size)] or [[]]
+
+        for index, batch in enumerate(batches):
+            message = {
+                "v": MESSAGE_VERSION,
+                "origin": self.node_id,
+                "keys": dict(batch),
+                "patterns": patterns if index == 0 else {}
+            }
+            if not message["keys"] and not message["patterns"]:
+                continue
+
+            try:
+                await redis_client.publish(self.channel, json.dumps(message, separators=(",", ":")))
+                self.stats["messages_published"] += 1
+                self.stats["keys_published"] += len(message["keys"])
+                self.stats["patterns_published"] += len(message["patterns"])
+                if self._publish_degraded:
+                    self._publish_degraded = False
+                    logger.info("Cache invalidation bus publishing recovered")
+            except Exception as e:
+                self.stats["publish_failures"] += 1
+                if not self._publish_degraded:
+                    self._publish_degraded = True
+                    logger.warning(f"Cache invalidation bus publish failed, remote L1 caches may be stale: {e}")
+
+    # ------------------------------------------------------------------
+    # Receiving
+    # ------------------------------------------------------------------
+
+    async def _listen_loop(self):
+        """Subscribe to the channel, reconnecting with backoff"""
+        backoff = 1.0
+
+        while self._running:
+            pubsub = None
+            try:
+                await redis_client.initialize()
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(self.channel)
+
+                if self._ever_connected and not self.connected:
+                    # Invalidations published while we were away were lost
+                    self.cache.l1_cache.clear()
+                    self.stats["resync_clears"] += 1
+                    self.stats["reconnects"] += 1
+                    logger.info("Cache invalidation bus reconnected; cleared local L1 cache")
+
+                self.connected = True
+                self._ever_connected = True
+                backoff = 1.0
+
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self.handle_message(message.get("data"))
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                if self.connected:
+                    logger.warning(f"Cache invalidation bus disconnected: {e}")
+                self.connected = False
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+    def handle_message(self, data: Any):
+        """Apply a remote invalidation message to the local L1 cache"""
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            logger.warning("Ignoring malformed cache invalidation message")
+            return
+
+        if message.get("v") != MESSAGE_VERSION or message.get("origin") == self.node_id:
+            return
+
+        self.stats["messages_received"] += 1
+        origin = message.get("origin")
+
+        for key, version in message.get("keys", {}).items():
+            if self._accept_version((origin, f"k:{key}"), version):
+                self.cache.evict_local(key)
+                self.stats["keys_evicted"] += 1
+
+        for pattern, version in message.get("patterns", {}).items():
+            if self._accept_version((origin, f"p:{pattern}"), version):
+                self.cache.evict_local_pattern(pattern)
+                self.stats["patterns_evicted"] += 1
+
+    def _accept_version(self, name: Tuple[Optional[str], str], version: int) -> bool:
+        """Record version for (origin, name); False if that origin already sent an equal or newer one"""
+        last_version = self._applied_versions.get(name)
+        if last_version is not None and version <= last_version:
+            self.stats["out_of_order_dropped"] += 1
+            return False
+
+        self._applied_versions[name] = version
+        self._applied_versions.move_to_end(name)
+        if len(self._applied_versions) > self.max_tracked_versions:
+            self._applied_versions.popitem(last=False)
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Bus statistics"""
+        return {
+            "node_id": self.node_id,
+            "channel": self.channel,
+            "connected": self.connected,
+            "pending": len(self._pending_keys) + len(self._pending_patterns),
+            **self.stats
+        }
+
+
+# Global invalidation bus instance
+cache_invalidation_bus = CacheInvalidationBus(
+    multi_layer_cache,
+    channel=getattr(settings, 'CACHE_INVALIDATION_CHANNEL', "cache:invalidation"),
+    batch_interval=getattr(settings, 'CACHE_INVALIDATION_BATCH_INTERVAL', 0.05)
+)
@@ -0,0 +1,193 @@
+"""
+Cache Tag Index
+Redis set index from tags to cache keys for scan-free invalidation
+"""
+
+import asyncio
+import random
+import time
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.core.logger import get_logger
+from app.core.redis_client import redis_client
+
+logger = get_logger(__name__)
+
+
+class CacheTagIndex:
+    """
+    Tag -> cache key index stored as Redis sets (``cache_tag:{tag}``).
+
+    Tags are written in the same pipeline as the cache entry. Besides explicit
+    tags, entity tags are derived from the key layout: ``user:42:profile`` is
+    tagged ``user:42`` and keys whose first segment is a registered namespace
+    (e.g. a ``CacheTag`` value) are tagged with that namespace.
+
+    Tag sets have no TTL. Members whose entry has expired are garbage-collected
+    lazily: invalidation simply deletes them along with live keys, and writes
+    occasionally sample a tag set and remove members that no longer exist.
+
+    Entries written before the index existed are in no tag set. For
+    ``legacy_window_seconds`` after indexing started (recorded once in Redis
+    under ``SINCE_KEY``) invalidation also falls back to the key patterns that
+    ``legacy_patterns`` derives from the tag, until those entries have expired.
+    """
+
+    TAG_PREFIX = "cache_tag:"
+    SINCE_KEY = "cache_tag_index:since"
+
+    def __init__(self, batch_size: int = 500, gc_probability: float = 0.01,
+                 gc_sample_size: int = 100, legacy_window_seconds: float = 86400):
+        self.batch_size = batch_size
+        self.gc_probability = gc_probability
+        self.gc_sample_size = gc_sample_size
+        self.legacy_window_seconds = legacy_window_seconds
+        self._indexed_since: Optional[float] = None
+
+        # key prefix -> entity tag namespace ("profile:42" -> "user:42")
+        self.entity_prefixes: Dict[str, str] = {
+            "user": "user",
+            "profile": "user",
+            "settings": "user",
+            "content": "content",
+            "list": "content"
+        }
+        # first key segments that are tags on their own
+        self.namespace_tags: Set[str] = set()
+
+        self._gc_tasks: Set[asyncio.Task] = set()
+        self.stats = {
+            "tagged_writes": 0,
+            "invalidated_tags": 0,
+            "invalidated_keys": 0,
+            "gc_runs": 0,
+            "gc_removed": 0,
+            "legacy_fallbacks": 0
+        }
+
+    @staticmethod
+    def normalize_tag(tag: Any) -> str:
+        return tag.value if isinstance(tag, Enum) else str(tag)
+
+    def tag_key(self, tag: Any) -> str:
+        return f"{self.TAG_PREFIX}{self.normalize_tag(tag)}"
+
+    def derive_tags(self, key: str, tags: Optional[Iterable[Any]] = None) -> Set[str]:
+        """Explicit tags plus the tags implied by the key layout"""
+        derived = {self.normalize_tag(tag) for tag in tags or ()}
+
+        parts = key.split(":", 2)
+        if len(parts) >= 2 and parts[0] in self.entity_prefixes and parts[1]:
+            derived.add(f"{self.entity_prefixes[parts[0]]}:{parts[1]}")
+        if parts[0] in self.namespace_tags:
+            derived.add(parts[0])
+
+        return derived
+
+    def legacy_patterns(self, tag: Any) -> List[str]:
+        """Key patterns covering the keys derive_tags indexes under tag"""
+        tag = self.normalize_tag(tag)
+        patterns = []
+
+        namespace, _, entity_id = tag.partition(":")
+        if entity_id and ":" not in entity_id:
+            patterns.extend(
+                f"{prefix}:{entity_id}"
+                for prefix, target in self.entity_prefixes.items() if target == namespace
+            )
+        if tag in self.namespace_tags:
+            patterns.append(f"{tag}:")
+
+        return patterns
+
+    async def legacy_fallback_active(self, now: Optional[float] = None) -> bool:
+        """Whether untagged entries from before the index may still be cached"""
+        now = now if now is not None else time.time()
+        if self._indexed_since is None:
+            try:
+                # The first worker to ask records when indexing started
+                await redis_client.set(self.SINCE_KEY, str(now), nx=True)
+                since = await redis_client.get(self.SINCE_KEY)
+                self._indexed_since = float(since) if since is not None else now
+            except Exception as e:
+                logger.warning(f"Could not read tag index start time: {e}")
+                return True
+        return now < self._indexed_since + self.legacy_window_seconds
+
+    def add_to_pipeline(self, pipe, key: str, tags: Iterable[str]) -> int:
+        """Queue SADDs for key's tags on an existing pipeline"""
+        count = 0
+        for tag in tags:
+            pipe.sadd(self.tag_key(tag), key)
+            count += 1
+            self._maybe_schedule_gc(tag)
+        if count:
+            self.stats["tagged_writes"] += 1
+        return count
+
+    async def members(self, tag: Any) -> List[str]:
+        """All cache keys currently indexed under tag"""
+        members = await redis_client.smembers(self.tag_key(tag))
+        return [m.decode() if isinstance(m, bytes) else m for m in members or ()]
+
+    async def delete_tagged(self, tag: Any, keys: List[str]) -> int:
+        """
+        Delete the cache entries for keys and drop them from the tag set.
+
+        Runs in pipelined batches of ``batch_size`` keys; returns the number of
+        cache entries that still existed.
+        """
+        tag_key = self.tag_key(tag)
+        deleted = 0
+
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start:start + self.batch_size]
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.delete(*[f"cache:{key}" for key in batch])
+                pipe.srem(tag_key, *batch)
+                results = await pipe.execute()
+            deleted += results[0] or 0
+
+        self.stats["invalidated_tags"] += 1
+        self.stats["invalidated_keys"] += len(keys)
+        return deleted
+
+    def _maybe_schedule_gc(self, tag: str):
+        if self.gc_probability <= 0 or random.random() >= self.gc_probability:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(self.collect_garbage(tag))
+        except RuntimeError:
+            return
+        self._gc_tasks.add(task)
+        task.add_done_callback(self._gc_tasks.discard)
+
+    async def collect_garbage(self, tag: Any) -> int:
+        """Remove a sample of members whose cache entry no longer exists"""
+        tag_key = self.tag_key(tag)
+        try:
+            sample = await redis_client.client.srandmember(tag_key, self.gc_sample_size)
+            if not sample:
+                return 0
+
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for member in sample:
+                    member = member.decode() if isinstance(member, bytes) else member
+                    pipe.exists(f"cache:{member}")
+                exists = await pipe.execute()
+
+            dead = [member for member, alive in zip(sample, exists) if not alive]
+            if dead:
+                await redis_client.srem(tag_key, *dead)
+
+            self.stats["gc_runs"] += 1
+            self.stats["gc_removed"] += len(dead)
+            return len(dead)
+
+        except Exception as e:
+            logger.debug(f"Tag index GC failed for {tag_key}: {e}")
+            return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats)
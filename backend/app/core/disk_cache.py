@@ -0,0 +1,326 @@
+"""
+Persistent Disk Cache (L3)
+Size-bounded local key-value file used as the tier behind Redis
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class PersistentDiskCache:
+    """
+    Local persistent cache stored in a single SQLite file.
+
+    - Crash safety: writes go through SQLite's write-ahead log, so a crash or kill
+      leaves either the old or the new value, never a torn entry.
+    - Size limit: payload bytes are totalled in a one-row table kept up to date
+      by triggers in the same transaction as each write, so every worker
+      sharing the file sees the same total. When ``max_size_bytes`` is exceeded
+      the least recently accessed entries are deleted down to ``low_watermark``
+      and freed pages are returned with an incremental vacuum.
+    - Access times are only rewritten when older than ``touch_interval`` seconds,
+      so reads stay read-only in the common case.
+
+    All methods are synchronous and thread-safe; the ``a*`` variants run them in
+    a worker thread so the event loop never blocks on disk I/O.
+    """
+
+    def __init__(self, path: str, max_size_bytes: int = 1024 * 1024 * 1024,
+                 low_watermark: float = 0.9, touch_interval: float = 60.0):
+        self.path = Path(path)
+        self.max_size_bytes = max_size_bytes
+        self.low_watermark = low_watermark
+        self.touch_interval = touch_interval
+
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "deletes": 0,
+            "expirations": 0,
+            "compactions": 0,
+            "compacted_entries": 0,
+            "errors": 0
+        }
+
+    # ------------------------------------------------------------------
+    # Connection management
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                " key TEXT PRIMARY KEY,"
+                " data BLOB NOT NULL,"
+                " method TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache_entries(last_access)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires_at ON cache_entries(expires_at)")
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS cache_size ("
+                    " id INTEGER PRIMARY KEY CHECK (id = 0),"
+                    " total INTEGER NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS cache_size_insert AFTER INSERT ON cache_entries"
+                    " BEGIN UPDATE cache_size SET total = total + NEW.size WHERE id = 0; END"
+                )
+                conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS cache_size_delete AFTER DELETE ON cache_entries"
+                    " BEGIN UPDATE cache_size SET total = total - OLD.size WHERE id = 0; END"
+                )
+                conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS cache_size_update AFTER UPDATE OF size ON cache_entries"
+                    " BEGIN UPDATE cache_size SET total = total - OLD.size + NEW.size WHERE id = 0; END"
+                )
+                # Files written before the total existed start from the current sum
+                conn.execute(
+                    "INSERT OR IGNORE INTO cache_size (id, total)"
+                    " SELECT 0, COALESCE(SUM(size), 0) FROM cache_entries"
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                conn.close()
+                raise
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _total(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT total FROM cache_size WHERE id = 0").fetchone()[0]
+
+    def close(self):
+        """Checkpoint the write-ahead log and close the file"""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                finally:
+                    self._conn.close()
+                    self._conn = None
+
+    @property
+    def size_bytes(self) -> int:
+        """Payload bytes in the file, written by any worker"""
+        with self._lock:
+            return self._total(self._connect())
+
+    # ------------------------------------------------------------------
+    # Synchronous API
+    # ------------------------------------------------------------------
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """Return (data, method) for a live key, or None"""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT data, method, size, expires_at, last_access FROM cache_entries WHERE key = ?",
+                (key,)
+            ).fetchone()
+
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+
+            data, method, size, expires_at, last_access = row
+            now = time.time()
+
+            if expires_at <= now:
+                conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return None
+
+            if now - last_access > self.touch_interval:
+                conn.execute("UPDATE cache_entries SET last_access = ? WHERE key = ?", (now, key))
+
+            self.stats["hits"] += 1
+            return bytes(data), method
+
+    def set(self, key: str, data: bytes, method: str, ttl: float) -> bool:
+        """Store serialized data for ttl seconds; False if larger than the whole tier"""
+        size = len(data)
+        if size > self.max_size_bytes:
+            return False
+
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # An upsert, not INSERT OR REPLACE: REPLACE skips delete triggers
+                conn.execute(
+                    "INSERT INTO cache_entries (key, data, method, size, expires_at, last_access)"
+                    " VALUES (?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT(key) DO UPDATE SET data = excluded.data, method = excluded.method,"
+                    " size = excluded.size, expires_at = excluded.expires_at,"
+                    " last_access = excluded.last_access",
+                    (key, sqlite3.Binary(data), method, size, now + ttl, now)
+                )
+                total = self._total(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                self.stats["errors"] += 1
+                raise
+
+            self.stats["writes"] += 1
+
+            if total > self.max_size_bytes:
+                self._compact_locked()
+            return True
+
+    def delete(self, key: str) -> bool:
+        """Delete key; returns True if it existed"""
+        return self.delete_many([key]) > 0
+
+    def delete_many(self, keys: List[str]) -> int:
+        """Delete several keys in one transaction"""
+        if not keys:
+            return 0
+
+        with self._lock:
+            conn = self._connect()
+            deleted = 0
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for key in keys:
+                    deleted += conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,)).rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                self.stats["errors"] += 1
+                raise
+
+            self.stats["deletes"] += deleted
+            return deleted
+
+    def delete_pattern(self, glob: str) -> int:
+        """Delete keys matching a glob pattern"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                deleted = conn.execute("DELETE FROM cache_entries WHERE key GLOB ?", (glob,)).rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                self.stats["errors"] += 1
+                raise
+
+            self.stats["deletes"] += deleted
+            return deleted
+
+    def purge_expired(self) -> int:
+        """Delete all expired entries"""
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired = conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,)).rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                self.stats["errors"] += 1
+                raise
+
+            self.stats["expirations"] += expired
+            return expired
+
+    def compact(self) -> int:
+        """Evict least recently used entries down to the low watermark"""
+        with self._lock:
+            self._connect()
+            return self._compact_locked()
+
+    def _compact_locked(self) -> int:
+        conn = self._conn
+        target = int(self.max_size_bytes * self.low_watermark)
+
+        evicted = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Read under the write lock: other workers may have compacted already
+            total = self._total(conn)
+            if total <= target:
+                conn.execute("COMMIT")
+                return 0
+
+            # Expired entries go first, then the least recently accessed
+            for key, size in conn.execute(
+                "SELECT key, size FROM cache_entries ORDER BY expires_at > ?, last_access",
+                (time.time(),)
+            ).fetchall():
+                if total <= target:
+                    break
+                conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            self.stats["errors"] += 1
+            raise
+
+        conn.execute("PRAGMA incremental_vacuum")
+
+        self.stats["compactions"] += 1
+        self.stats["compacted_entries"] += evicted
+        return evicted
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Tier statistics"""
+        with self._lock:
+            conn = self._connect()
+            entries = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+            size_bytes = self._total(conn)
+
+        total = self.stats["hits"] + self.stats["misses"]
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "size_bytes": size_bytes,
+            "max_size_bytes": self.max_size_bytes,
+            "hit_rate": round(self.stats["hits"] / total * 100, 2) if total else 0,
+            **self.stats
+        }
+
+    # ------------------------------------------------------------------
+    # Async wrappers
+    # ------------------------------------------------------------------
+
+    async def aget(self, key: str) -> Optional[Tuple[bytes, str]]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, data: bytes, method: str, ttl: float) -> bool:
+        return await asyncio.to_thread(self.set, key, data, method, ttl)
+
+    async def adelete_many(self, keys: List[str]) -> int:
+        return await asyncio.to_thread(self.delete_many, keys)
+
+    async def adelete_pattern(self, glob: str) -> int:
+        return await asyncio.to_thread(self.delete_pattern, glob)
+
+    async def apurge_expired(self) -> int:
+        return await asyncio.to_thread(self.purge_expired)
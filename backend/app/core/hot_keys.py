@@ -0,0 +1,156 @@
+"""
+Hot Key Tracking
+Count-min sketch and top-K table for cache key popularity
+"""
+
+import heapq
+from typing import Any, Dict, List, Optional, Tuple
+
+_MASK64 = (1 << 64) - 1
+
+
+class CountMinSketch:
+    """
+    Fixed-size frequency sketch.
+
+    ``depth`` rows of ``width`` counters; a key's estimate is the minimum of its
+    counters, which never underestimates and overestimates by at most
+    ``2 * total / width`` with high probability. Row indexes are derived from a
+    single hash (double hashing) to keep ``add`` cheap on the read path.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        if width <= 0 or depth <= 0:
+            raise ValueError("width and depth must be positive")
+        self.width = width
+        self.depth = depth
+        self._rows: List[List[int]] = [[0] * width for _ in range(depth)]
+        self.total = 0
+
+    def _indexes(self, key: str) -> List[int]:
+        h = hash(key) & _MASK64
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, key: str, count: int = 1) -> int:
+        """Increment key and return its new estimate"""
+        estimate = None
+        for row, index in zip(self._rows, self._indexes(key)):
+            row[index] += count
+            if estimate is None or row[index] < estimate:
+                estimate = row[index]
+        self.total += count
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+    def decay(self, factor: float = 0.5):
+        """Scale every counter so old popularity fades"""
+        for row in self._rows:
+            for i, value in enumerate(row):
+                if value:
+                    row[i] = int(value * factor)
+        self.total = int(self.total * factor)
+
+    def clear(self):
+        for row in self._rows:
+            for i in range(self.width):
+                row[i] = 0
+        self.total = 0
+
+
+class HotKeyTracker:
+    """
+    Top-K most accessed keys backed by a count-min sketch.
+
+    ``record`` is called for every cache read. Keys whose estimate beats the
+    smallest tracked count replace it in the top-K table. Counts are decayed
+    with ``decay`` so the hot set follows current traffic.
+
+    The smallest tracked count comes from a min-heap with lazy deletion: a
+    count update pushes a new entry and entries that no longer match ``_top``
+    are skipped when they reach the root, so ``record`` is O(log K).
+    """
+
+    def __init__(self, top_k: int = 200, width: int = 2048, depth: int = 4):
+        self.top_k = top_k
+        self.sketch = CountMinSketch(width, depth)
+
+        self._top: Dict[str, int] = {}
+        self._heap: List[Tuple[int, str]] = []
+
+        self.stats = {
+            "recorded": 0,
+            "replacements": 0,
+            "decays": 0
+        }
+
+    def record(self, key: str, count: int = 1):
+        """Count an access to key"""
+        estimate = self.sketch.add(key, count)
+        self.stats["recorded"] += count
+
+        top = self._top
+        if key in top or len(top) < self.top_k:
+            top[key] = estimate
+            self._push(key, estimate)
+            return
+
+        coldest, coldest_count = self._min()
+        if estimate > coldest_count:
+            heapq.heappop(self._heap)
+            del top[coldest]
+            top[key] = estimate
+            self._push(key, estimate)
+            self.stats["replacements"] += 1
+
+    def _push(self, key: str, count: int):
+        heapq.heappush(self._heap, (count, key))
+        # Stale entries are bounded by rebuilding once they outnumber live ones
+        if len(self._heap) > 2 * len(self._top) + 16:
+            self._rebuild_heap()
+
+    def _min(self) -> Tuple[str, int]:
+        """Coldest tracked key, dropping stale heap entries on the way"""
+        heap, top = self._heap, self._top
+        while top.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        count, key = heap[0]
+        return key, count
+
+    def _rebuild_heap(self):
+        self._heap = [(count, key) for key, count in self._top.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Hottest keys first"""
+        ranked = sorted(self._top.items(), key=lambda item: item[1], reverse=True)
+        return ranked if n is None else ranked[:n]
+
+    def decay(self, factor: float = 0.5):
+        """Age all counts"""
+        self.sketch.decay(factor)
+        for key in self._top:
+            self._top[key] = int(self._top[key] * factor)
+        self._rebuild_heap()
+        self.stats["decays"] += 1
+
+    def snapshot(self, n: Optional[int] = None) -> List[List[Any]]:
+        """Serializable [key, count] pairs, hottest first"""
+        return [[key, count] for key, count in self.top(n)]
+
+    def load(self, snapshot: List[List[Any]]):
+        """Seed counts from a snapshot taken by another process"""
+        for key, count in snapshot:
+            if count > 0:
+                self.record(str(key), int(count))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "tracked": len(self._top),
+            "top_k": self.top_k,
+            "total_accesses": self.sketch.total,
+            "hottest": self.top(10),
+            **self.stats
+        }
@@ -5,6 +5,7 @@ import json
 
 from ..services.i18n_service import i18n_service
 from ..database import SessionLocal
+from ..middleware.request_context import ContextMiddleware, RequestContext
 
 class I18nMiddleware(BaseHTTPMiddleware):
     """Middleware to handle i18n for requests"""
@@ -77,6 +78,20 @@ class I18nMiddleware(BaseHTTPMiddleware):
         return languages
 
 
+class ASGII18nMiddleware(ContextMiddleware, I18nMiddleware):
+    """Pure-ASGI I18nMiddleware"""
+    
+    async def handle(self, context: RequestContext, receive, send):
+        language_code = await self._get_request_language(context.request)
+        context.state.language = language_code
+        
+        def add_language_header(response):
+            response.headers["Content-Language"] = language_code
+        
+        context.on_response_start(add_language_header)
+        await self.app(context.scope, receive, send)
+
+
 def get_request_language(request: Request) -> str:
     """Helper function to get language from request"""
     return getattr(request.state, "language", i18n_service.default_language)
\ No newline at end of file
@@ -12,6 +12,7 @@ from ipaddress import ip_address, ip_network
 from app.core.logger import get_logger
 from app.core.redis_client import redis_client
 from app.core.config import settings
+from app.core.threat_scanner import threat_scanner
 
 logger = get_logger(__name__)
 
@@ -32,6 +33,10 @@ class IntrusionDetectionSystem:
         }
         self.detection_rules = self._initialize_rules()
         
+        # Registered with the shared scanner, which checks every attack type in one pass
+        for attack_type, patterns in self.attack_patterns.items():
+            threat_scanner.register(f"ids.{attack_type}", patterns)
+        
     def _load_attack_patterns(self) -> Dict[str, List[re.Pattern]]:
         """Load attack signature patterns"""
         return {
@@ -142,25 +147,24 @@ class IntrusionDetectionSystem:
         """Check request against known attack patterns"""
         threats = []
         
-        # Check URL and parameters
-        url = request_data.get("url", "")
-        params = request_data.get("params", "")
         body = request_data.get("body", "")
-        headers = request_data.get("headers", {})
-        
-        # Combine all input for checking
-        combined_input = f"{url} {params} {body} {' '.join(headers.values())}"
-        
-        for attack_type, patterns in self.attack_patterns.items():
-            for pattern in patterns:
-                if pattern.search(combined_input):
-                    threats.append({
-                        "type": attack_type,
-                        "severity": "high",
-                        "pattern": pattern.pattern,
-                        "confidence": 0.9
-                    })
-                    break
+        scan = threat_scanner.scan(
+            path=str(request_data.get("url", "")),
+            query=str(request_data.get("params", "")),
+            headers=request_data.get("headers", {}),
+            body=body if isinstance(body, (str, bytes)) else str(body)
+        )
+        matched = scan.tags()
+        
+        for attack_type in self.attack_patterns:
+            pattern = matched.get(f"ids.{attack_type}")
+            if pattern:
+                threats.append({
+                    "type": attack_type,
+                    "severity": "high",
+                    "pattern": pattern,
+                    "confidence": 0.9
+                })
         
         return threats
     
@@ -0,0 +1,275 @@
+"""
+L1 In-Memory Cache Engine
+Size-aware in-process cache with constant-time eviction for every CacheStrategy
+"""
+
+import heapq
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@dataclass
+class L1Entry:
+    """Single L1 cache entry"""
+    value: Any
+    size: int
+    expires_at: float  # float("inf") when the entry never expires
+    stored_at: float
+    seq: int
+    frequency: int = 1
+
+
+class L1CacheEngine:
+    """
+    In-memory cache bounded by payload bytes.
+
+    Eviction order follows the configured strategy:
+    - lru:  least recently used entry first (ordered dict, move-to-end on access)
+    - fifo: oldest inserted entry first (ordered dict, no reordering)
+    - lfu:  least frequently used entry first (frequency buckets, O(1) per access)
+    - ttl:  entry closest to expiry first (expiry heap with lazy deletion)
+
+    Expired entries are dropped lazily on access and in bulk by ``purge_expired``,
+    which pops the expiry heap instead of scanning every key.
+    """
+
+    STRATEGIES = ("lru", "lfu", "ttl", "fifo")
+
+    def __init__(self, max_size_bytes: int, strategy: Any = "lru",
+                 max_entries: Optional[int] = None):
+        strategy = getattr(strategy, "value", strategy)
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unsupported L1 eviction strategy: {strategy}")
+
+        self.max_size_bytes = max_size_bytes
+        self.max_entries = max_entries
+        self.strategy = strategy
+
+        self._entries: Dict[str, L1Entry] = {}
+        self._size_bytes = 0
+        self._seq = 0
+
+        # LRU / FIFO ordering
+        self._order: "OrderedDict[str, None]" = OrderedDict()
+
+        # LFU frequency buckets: frequency -> keys in insertion order
+        self._freq_buckets: Dict[int, "OrderedDict[str, None]"] = {}
+        self._min_freq = 0
+
+        # Expiry heap of (expires_at, seq, key); stale items are skipped lazily
+        self._expiry_heap: List[Tuple[float, int, str]] = []
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry.expires_at > time.time()
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size_bytes
+
+    def keys(self) -> List[str]:
+        """Snapshot of the current keys (expired entries may still be listed)"""
+        return list(self._entries.keys())
+
+    def lookup(self, key: str) -> Optional[L1Entry]:
+        """Return the live entry for key and record the access, or None on miss"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry.expires_at <= time.time():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._touch(key, entry)
+        return entry
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached value for key, or default on miss"""
+        entry = self.lookup(key)
+        return entry.value if entry is not None else default
+
+    def set(self, key: str, value: Any, size: int, ttl: Optional[float] = None) -> bool:
+        """
+        Store value accounted as ``size`` bytes for ``ttl`` seconds.
+
+        Returns False when the entry alone exceeds the memory budget.
+        """
+        if size > self.max_size_bytes:
+            self.rejections += 1
+            return False
+
+        if key in self._entries:
+            self._remove(key)
+
+        now = time.time()
+        self._seq += 1
+        entry = L1Entry(
+            value=value,
+            size=size,
+            expires_at=now + ttl if ttl else float("inf"),
+            stored_at=now,
+            seq=self._seq
+        )
+
+        self._make_room(size)
+
+        self._entries[key] = entry
+        self._size_bytes += size
+
+        if self.strategy == "lfu":
+            self._freq_buckets.setdefault(1, OrderedDict())[key] = None
+            self._min_freq = 1
+        else:
+            self._order[key] = None
+
+        if entry.expires_at != float("inf"):
+            heapq.heappush(self._expiry_heap, (entry.expires_at, entry.seq, key))
+            self._compact_heap_if_needed()
+
+        return True
+
+    def delete(self, key: str) -> bool:
+        """Remove key; returns True if it was present"""
+        if key not in self._entries:
+            return False
+        self._remove(key)
+        return True
+
+    def purge_expired(self) -> int:
+        """Drop every expired entry; returns the number removed"""
+        now = time.time()
+        removed = 0
+
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, seq, key = heapq.heappop(self._expiry_heap)
+            entry = self._entries.get(key)
+            if entry is not None and entry.seq == seq:
+                self._remove(key)
+                removed += 1
+
+        self.expirations += removed
+        return removed
+
+    def clear(self):
+        """Remove all entries (counters are kept)"""
+        self._entries.clear()
+        self._order.clear()
+        self._freq_buckets.clear()
+        self._expiry_heap.clear()
+        self._min_freq = 0
+        self._size_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Engine counters and occupancy"""
+        return {
+            "strategy": self.strategy,
+            "entries": len(self._entries),
+            "size_bytes": self._size_bytes,
+            "max_size_bytes": self.max_size_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "rejections": self.rejections
+        }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _touch(self, key: str, entry: L1Entry):
+        """Update recency/frequency bookkeeping after a hit"""
+        if self.strategy == "lru":
+            self._order.move_to_end(key)
+        elif self.strategy == "lfu":
+            bucket = self._freq_buckets[entry.frequency]
+            del bucket[key]
+            if not bucket:
+                del self._freq_buckets[entry.frequency]
+                if self._min_freq == entry.frequency:
+                    self._min_freq = entry.frequency + 1
+            entry.frequency += 1
+            self._freq_buckets.setdefault(entry.frequency, OrderedDict())[key] = None
+        else:
+            entry.frequency += 1
+
+    def _make_room(self, incoming_size: int):
+        """Evict entries until incoming_size fits in the budget"""
+        while self._entries and (
+            self._size_bytes + incoming_size > self.max_size_bytes or
+            (self.max_entries is not None and len(self._entries) >= self.max_entries)
+        ):
+            victim = self._select_victim()
+            if victim is None:
+                break
+            self._remove(victim)
+            self.evictions += 1
+
+    def _select_victim(self) -> Optional[str]:
+        """Pick the next key to evict according to the strategy"""
+        if self.strategy in ("lru", "fifo"):
+            return next(iter(self._order), None)
+
+        if self.strategy == "lfu":
+            bucket = self._freq_buckets.get(self._min_freq)
+            if not bucket:
+                # min_freq can lag behind after removals; resync from the buckets
+                if not self._freq_buckets:
+                    return None
+                self._min_freq = min(self._freq_buckets)
+                bucket = self._freq_buckets[self._min_freq]
+            return next(iter(bucket))
+
+        # ttl: soonest-expiring entry; entries without expiry go last (insertion order)
+        while self._expiry_heap:
+            _, seq, key = self._expiry_heap[0]
+            entry = self._entries.get(key)
+            if entry is not None and entry.seq == seq:
+                return key
+            heapq.heappop(self._expiry_heap)
+        return next(iter(self._order), None)
+
+    def _remove(self, key: str):
+        """Remove key from all indexes (heap items are invalidated lazily)"""
+        entry = self._entries.pop(key)
+        self._size_bytes -= entry.size
+
+        if self.strategy == "lfu":
+            bucket = self._freq_buckets.get(entry.frequency)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self._freq_buckets[entry.frequency]
+        else:
+            self._order.pop(key, None)
+
+    def _compact_heap_if_needed(self):
+        """Rebuild the expiry heap once stale items dominate it"""
+        if len(self._expiry_heap) > 2 * len(self._entries) + 64:
+            self._expiry_heap = [
+                (entry.expires_at, entry.seq, key)
+                for key, entry in self._entries.items()
+                if entry.expires_at != float("inf")
+            ]
+            heapq.heapify(self._expiry_heap)
@@ -0,0 +1,139 @@
+"""
+Label Cardinality
+Bounded label values per metric so unseen paths and ids can't multiply series
+"""
+
+import sys
+from collections import defaultdict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from app.core.config import settings
+
+OVERFLOW_VALUE = "__overflow__"
+
+
+class MetricCardinality:
+    """Label values and series seen so far for one metric"""
+
+    __slots__ = ("values", "series", "overflowed", "series_overflowed", "names_overflowed")
+
+    def __init__(self):
+        self.values: Dict[str, Set[str]] = {}
+        self.series: Set[Tuple[Tuple[str, str], ...]] = set()
+        self.overflowed: Dict[str, int] = defaultdict(int)
+        self.series_overflowed = 0
+        self.names_overflowed = 0
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held for this metric's labels and series"""
+        total = sys.getsizeof(self.values) + sys.getsizeof(self.series)
+        for name, values in self.values.items():
+            total += sys.getsizeof(name) + sys.getsizeof(values)
+            total += sum(sys.getsizeof(value) for value in values)
+        # Series tuples reference the strings counted above
+        for series in self.series:
+            total += sys.getsizeof(series) + sum(sys.getsizeof(pair) for pair in series)
+        return total
+
+
+class LabelCardinalityLimiter:
+    """
+    Caps the distinct values each label of a metric can take.
+
+    The first ``max_values_per_label`` values of a label are kept as they
+    are; later unseen values are replaced with ``overflow_value``, so a burst
+    of new ids lands in one bucket instead of one series each. Label sets are
+    also capped per metric at ``max_series_per_metric``: once that many
+    combinations exist, a new combination is reported with every value set
+    to the overflow bucket. Values already admitted stay admitted, and the
+    check for them is a set lookup per label.
+
+    Label names are capped too: past ``max_labels_per_metric`` names, labels
+    with an unseen name are folded into a single ``overflow_value`` label, so
+    callers passing free-form label names can't grow the tables either.
+    """
+
+    def __init__(self, max_values_per_label: int = 100, max_series_per_metric: int = 1000,
+                 max_labels_per_metric: int = 20, overflow_value: str = OVERFLOW_VALUE):
+        self.max_values_per_label = max_values_per_label
+        self.max_series_per_metric = max_series_per_metric
+        self.max_labels_per_metric = max_labels_per_metric
+        self.overflow_value = overflow_value
+        self._metrics: Dict[str, MetricCardinality] = {}
+
+    def limit(self, metric_name: str, labels: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Labels to record for metric_name, with over-limit values replaced"""
+        if not labels:
+            return {}
+
+        state = self._metrics.get(metric_name)
+        if state is None:
+            state = self._metrics[metric_name] = MetricCardinality()
+
+        limited = {}
+        for name, value in labels.items():
+            value = str(value)
+            seen = state.values.get(name)
+            if seen is None:
+                if len(state.values) >= self.max_labels_per_metric:
+                    state.names_overflowed += 1
+                    limited[self.overflow_value] = self.overflow_value
+                    continue
+                seen = state.values[name] = set()
+            if value not in seen:
+                if len(seen) >= self.max_values_per_label:
+                    state.overflowed[name] += 1
+                    value = self.overflow_value
+                else:
+                    seen.add(value)
+            limited[name] = value
+
+        series = tuple(sorted(limited.items()))
+        if series not in state.series:
+            if len(state.series) >= self.max_series_per_metric:
+                state.series_overflowed += 1
+                limited = {name: self.overflow_value for name in limited}
+                series = tuple(sorted(limited.items()))
+            state.series.add(series)
+        return limited
+
+    def reset(self, metric_name: Optional[str] = None):
+        """Forget admitted values, for one metric or all of them"""
+        if metric_name is None:
+            self._metrics.clear()
+        else:
+            self._metrics.pop(metric_name, None)
+
+    def get_metric_stats(self, metric_name: str) -> Optional[Dict[str, Any]]:
+        state = self._metrics.get(metric_name)
+        if state is None:
+            return None
+        return {
+            "series": len(state.series),
+            "series_overflowed": state.series_overflowed,
+            "labels_overflowed": state.names_overflowed,
+            "labels": {
+                name: {"values": len(values), "overflowed": state.overflowed.get(name, 0)}
+                for name, values in state.values.items()
+            },
+            "memory_bytes": state.memory_bytes()
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        metrics = {name: self.get_metric_stats(name) for name in list(self._metrics)}
+        return {
+            "max_values_per_label": self.max_values_per_label,
+            "max_series_per_metric": self.max_series_per_metric,
+            "max_labels_per_metric": self.max_labels_per_metric,
+            "total_series": sum(stats["series"] for stats in metrics.values()),
+            "total_memory_bytes": sum(stats["memory_bytes"] for stats in metrics.values()),
+            "metrics": metrics
+        }
+
+
+# Global limiter shared by the metrics middleware and collector
+label_limiter = LabelCardinalityLimiter(
+    max_values_per_label=getattr(settings, 'METRICS_MAX_LABEL_VALUES', 100),
+    max_series_per_metric=getattr(settings, 'METRICS_MAX_SERIES_PER_METRIC', 1000),
+    max_labels_per_metric=getattr(settings, 'METRICS_MAX_LABELS_PER_METRIC', 20)
+)
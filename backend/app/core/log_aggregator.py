@@ -358,17 +358,19 @@ class LogAggregator:
                 hour_key = entry.timestamp.strftime('%Y%m%d_%H')
                 hourly_groups[hour_key].append(entry.to_dict())
             
-            # Store each hourly group
+            # Store each hourly group; the commands are issued together so the
+            # client's auto-pipelining sends them in a single round trip
+            commands = []
             for hour_key, entries in hourly_groups.items():
                 # Store in main log stream
                 log_key = f"logs:{hour_key}"
-                for entry in entries:
-                    await redis_client.lpush(log_key, json.dumps(entry))
-                
-                await redis_client.expire(log_key, 86400 * self.retention_days)
+                commands.extend(redis_client.lpush(log_key, json.dumps(entry)) for entry in entries)
+                commands.append(redis_client.expire(log_key, 86400 * self.retention_days))
                 
                 # Store compressed aggregated data
-                await self._store_compressed_logs(hour_key, entries)
+                commands.append(self._store_compressed_logs(hour_key, entries))
+            
+            await asyncio.gather(*commands)
             
         except Exception as e:
             logger.error(f"Failed to store log batch: {e}")
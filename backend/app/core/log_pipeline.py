@@ -0,0 +1,213 @@
+"""
+Log Pipeline
+Queue-based log handler that formats and writes records off the request path
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from typing import Dict, List, Optional
+
+
+class QueueLogHandler(logging.Handler):
+    """
+    Hands records to a background writer instead of writing them inline.
+
+    ``emit`` only puts the record on a bounded queue. A daemon thread takes
+    records off in batches, formats each one once per formatter, writes it to
+    every target handler and flushes each target once per batch, so the
+    caller never waits on JSON encoding or file and console I/O.
+
+    When the queue is full, records below ``WARNING`` are dropped and counted;
+    warnings and errors are written synchronously instead, so they are never
+    lost. Drops are reported in ``get_stats`` and by a warning the writer
+    logs to the targets once the queue has room again.
+    """
+
+    def __init__(self, handlers: List[logging.Handler], queue_size: int = 10000,
+                 batch_size: int = 256, flush_interval: float = 0.5):
+        super().__init__()
+        self.handlers = list(handlers)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[logging.LogRecord]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+        self._reported_drops = 0
+        self.stats = {
+            "enqueued": 0,
+            "written": 0,
+            "batches": 0,
+            "dropped": 0,
+            "sync_writes": 0,
+            "flush_errors": 0
+        }
+        self.dropped_by_level: Dict[str, int] = {}
+        atexit.register(self.close)
+
+    def _ensure_writer(self):
+        # A forked worker inherits the queue but not the writer thread
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            if self._pid is not None:
+                self._queue = queue.Queue(maxsize=self.queue_size)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self._ensure_writer()
+            # Render %-style args now, while the objects they refer to are unchanged
+            if record.args:
+                record.msg = record.getMessage()
+                record.args = None
+            self._queue.put_nowait(record)
+            self.stats["enqueued"] += 1
+        except queue.Full:
+            if record.levelno >= logging.WARNING:
+                self.stats["sync_writes"] += 1
+                self._write_batch([record])
+            else:
+                self.stats["dropped"] += 1
+                self.dropped_by_level[record.levelname] = self.dropped_by_level.get(record.levelname, 0) + 1
+        except Exception:
+            self.handleError(record)
+
+    def _run(self):
+        while True:
+            try:
+                record = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch: List[logging.LogRecord] = []
+            waiters: List[threading.Event] = []
+            stop = False
+            while True:
+                if record is None:
+                    stop = True
+                elif hasattr(record, "flush_event"):
+                    waiters.append(record.flush_event)
+                else:
+                    batch.append(record)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            self._report_drops(batch)
+            if batch:
+                self._write_batch(batch)
+                self.stats["batches"] += 1
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def _report_drops(self, batch: List[logging.LogRecord]):
+        dropped = self.stats["dropped"]
+        if dropped > self._reported_drops:
+            record = logging.LogRecord(
+                "app.log_pipeline", logging.WARNING, __file__, 0,
+                "Log queue overflow: dropped %d records since last report",
+                (dropped - self._reported_drops,), None
+            )
+            record.msg = record.getMessage()
+            record.args = None
+            record.extra_fields = {
+                "log_type": "log_pipeline",
+                "dropped_total": dropped,
+                "dropped_by_level": dict(self.dropped_by_level)
+            }
+            self._reported_drops = dropped
+            batch.append(record)
+
+    def _write_batch(self, records: List[logging.LogRecord]):
+        # Last record written to each handler, for reporting flush errors
+        touched: Dict[logging.Handler, logging.LogRecord] = {}
+        for record in records:
+            formatted: Dict[int, str] = {}
+            for handler in self.handlers:
+                if record.levelno < handler.level or not handler.filter(record):
+                    continue
+                formatter = handler.formatter or logging._defaultFormatter
+                try:
+                    if id(formatter) not in formatted:
+                        formatted[id(formatter)] = formatter.format(record)
+                    self._write(handler, record, formatted[id(formatter)])
+                    touched[handler] = record
+                except Exception:
+                    handler.handleError(record)
+            self.stats["written"] += 1
+
+        for handler, record in touched.items():
+            try:
+                handler.flush()
+            except Exception:
+                # Never through the logging tree: that would queue a new
+                # record per failing batch and keep the writer busy forever
+                self.stats["flush_errors"] += 1
+                handler.handleError(record)
+
+    def _write(self, handler: logging.Handler, record: logging.LogRecord, message: str):
+        if not isinstance(handler, logging.StreamHandler):
+            # No way to write a preformatted message; let the handler format it
+            handler.handle(record)
+            return
+
+        with handler.lock:
+            line = message + handler.terminator
+            if isinstance(handler, logging.FileHandler) and handler.stream is None:
+                handler.stream = handler._open()
+            if isinstance(handler, logging.handlers.RotatingFileHandler):
+                if handler.maxBytes > 0:
+                    position = handler.stream.tell()
+                    if position and position + len(line) >= handler.maxBytes:
+                        handler.doRollover()
+            elif isinstance(handler, logging.handlers.BaseRotatingHandler):
+                if handler.shouldRollover(record):
+                    handler.doRollover()
+            handler.stream.write(line)
+
+    def flush(self):
+        """Wait until every record queued so far has been written"""
+        if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+            return
+        done = threading.Event()
+        marker = logging.LogRecord("app.log_pipeline", logging.NOTSET, __file__, 0, "", None, None)
+        marker.flush_event = done
+        # Wait for room rather than drop the marker
+        self._queue.put(marker)
+        done.wait(timeout=5)
+
+    def close(self):
+        """Drain the queue, stop the writer and close the target handlers"""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+        self._thread = None
+        for handler in self.handlers:
+            try:
+                handler.close()
+            except Exception:
+                pass
+        super().close()
+
+    def get_stats(self) -> Dict[str, object]:
+        return {
+            **self.stats,
+            "queued": self._queue.qsize(),
+            "queue_size": self.queue_size,
+            "dropped_by_level": dict(self.dropped_by_level)
+        }
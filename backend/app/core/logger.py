@@ -12,6 +12,7 @@ from functools import wraps
 import time
 
 from app.core.config import settings
+from app.core.log_pipeline import QueueLogHandler
 
 
 class JSONFormatter(logging.Formatter):
@@ -20,7 +21,8 @@ class JSONFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
         """Format log record as JSON"""
         log_data = {
-            "timestamp": datetime.utcnow().isoformat(),
+            # When the record was created, not when a queued record is written
+            "timestamp": datetime.utcfromtimestamp(record.created).isoformat(),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -32,7 +34,7 @@ class JSONFormatter(logging.Formatter):
         }
         
         # Add exception info if present
-        if record.exc_info:
+        if record.exc_info and record.exc_info[0] is not None:
             log_data["exception"] = {
                 "type": record.exc_info[0].__name__,
                 "message": str(record.exc_info[1]),
@@ -61,6 +63,7 @@ class AppLogger:
     
     def __init__(self, name: str = "app"):
         self.logger = logging.getLogger(name)
+        self.pipeline: Optional[QueueLogHandler] = None
         self._setup_logger()
     
     def _setup_logger(self):
@@ -75,7 +78,6 @@ class AppLogger:
         # Console handler with JSON formatter
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setFormatter(JSONFormatter())
-        self.logger.addHandler(console_handler)
         
         # File handler for errors
         error_log_path = Path("logs/error.log")
@@ -88,7 +90,6 @@ class AppLogger:
         )
         error_handler.setLevel(logging.ERROR)
         error_handler.setFormatter(JSONFormatter())
-        self.logger.addHandler(error_handler)
         
         # File handler for all logs
         app_log_path = Path("logs/app.log")
@@ -98,7 +99,34 @@ class AppLogger:
             backupCount=10
         )
         app_handler.setFormatter(JSONFormatter())
-        self.logger.addHandler(app_handler)
+        
+        handlers = [console_handler, error_handler, app_handler]
+        
+        # Format and write on a background thread; the caller only enqueues
+        if getattr(settings, 'LOG_ASYNC', True):
+            if self.pipeline is not None:
+                self.pipeline.close()
+            self.pipeline = QueueLogHandler(
+                handlers,
+                queue_size=getattr(settings, 'LOG_QUEUE_SIZE', 10000),
+                batch_size=getattr(settings, 'LOG_BATCH_SIZE', 256),
+                flush_interval=getattr(settings, 'LOG_FLUSH_INTERVAL', 0.5)
+            )
+            self.logger.addHandler(self.pipeline)
+        else:
+            for handler in handlers:
+                self.logger.addHandler(handler)
+    
+    def flush(self):
+        """Wait for queued records to be written"""
+        if self.pipeline is not None:
+            self.pipeline.flush()
+    
+    def get_pipeline_stats(self) -> Dict[str, Any]:
+        """Queue, batch and drop counters of the log pipeline"""
+        if self.pipeline is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.pipeline.get_stats()}
     
     def _log_with_context(
         self,
@@ -259,6 +287,11 @@ class AppLogger:
 logger = AppLogger()
 
 
+def get_logger(name: str) -> logging.Logger:
+    """Module logger; names under ``app.`` propagate to the application logger's handlers"""
+    return logging.getLogger(name)
+
+
 def log_function_call(log_args: bool = False, log_result: bool = False):
     """Decorator to log function calls"""
     def decorator(func):
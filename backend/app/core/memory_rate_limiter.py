@@ -0,0 +1,185 @@
+"""
+Memory Rate Limiter
+Constant-memory sliding-window counters in a bounded LRU table
+"""
+
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+class SlidingWindowCounter:
+    """
+    Approximate sliding window over ``slots`` fixed-width sub-windows.
+
+    The count for the last ``window`` seconds is the sum of the slots fully
+    inside it plus the oldest slot weighted by how much of it is still inside.
+    Memory is ``slots + 1`` integers regardless of traffic, and the error is
+    bounded by one slot's worth of requests.
+    """
+
+    __slots__ = ("window", "slots", "slot_width", "counts", "head")
+
+    def __init__(self, window: float, slots: int = 10):
+        self.window = window
+        self.slots = slots
+        self.slot_width = window / slots
+        self.counts = [0] * (slots + 1)
+        self.head = 0
+
+    def _advance(self, slot: int):
+        """Move the newest slot to ``slot``, zeroing slots that were skipped"""
+        if slot <= self.head:
+            return
+        if slot - self.head > self.slots:
+            for index in range(len(self.counts)):
+                self.counts[index] = 0
+        else:
+            for skipped in range(self.head + 1, slot + 1):
+                self.counts[skipped % len(self.counts)] = 0
+        self.head = slot
+
+    def estimate(self, now: float) -> float:
+        self._advance(int(now // self.slot_width))
+        size = len(self.counts)
+        oldest = self.head - self.slots
+        # Clamped so a clock step backwards can not inflate the oldest slot
+        fraction = min(max(now / self.slot_width - self.head, 0.0), 1.0)
+        newer = sum(self.counts[index % size] for index in range(oldest + 1, self.head + 1))
+        return newer + self.counts[oldest % size] * (1 - fraction)
+
+    def add(self, now: float, amount: int = 1):
+        self._advance(int(now // self.slot_width))
+        self.counts[self.head % len(self.counts)] += amount
+
+    def retry_after(self, now: float, limit: int) -> float:
+        """Seconds until one more request fits under limit"""
+        fraction = min(max(now / self.slot_width - self.head, 0.0), 1.0)
+        size = len(self.counts)
+        for ahead in range(self.slots + 1):
+            slot = self.head + ahead
+            oldest = slot - self.slots
+            newer = sum(self.counts[index % size] for index in range(oldest + 1, self.head + 1))
+            room = limit - 1 - newer
+            if room < 0:
+                continue
+
+            oldest_count = self.counts[oldest % size]
+            start = fraction if ahead == 0 else 0.0
+            # The oldest slot's weight falls linearly across the current slot
+            needed = 1 - room / oldest_count if oldest_count > room else 0.0
+            return max(0.0, (slot + max(start, needed)) * self.slot_width - now)
+        return self.window
+
+    def reset_at(self) -> float:
+        """When every request recorded so far has left the window"""
+        return (self.head + self.slots + 1) * self.slot_width
+
+    def idle(self, now: float) -> bool:
+        return now >= self.reset_at()
+
+
+class MemoryRateLimiter:
+    """
+    Per-process rate limiter with flat memory under abusive traffic.
+
+    Each identifier gets one ``SlidingWindowCounter`` per window, so memory per
+    identifier is fixed and a check is O(slots). The identifier table holds at
+    most ``max_entries``; the least recently seen identifier is evicted first.
+    Identifiers idle longer than their longest window are swept every
+    ``sweep_interval`` seconds from the cold end of the table, as part of a
+    regular check, so no background task is needed.
+    """
+
+    def __init__(self, max_entries: int = 10000, slots: int = 10, sweep_interval: float = 60.0):
+        self.max_entries = max_entries
+        self.slots = slots
+        self.sweep_interval = sweep_interval
+        self._table: "OrderedDict[str, List[SlidingWindowCounter]]" = OrderedDict()
+        self._next_sweep = 0.0
+        self.stats = {
+            "checks": 0,
+            "rejected": 0,
+            "evictions": 0,
+            "swept": 0
+        }
+
+    def check(self, identifier: str, windows: Sequence[Tuple[int, float]],
+              now: Optional[float] = None) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Check and record one request against every (limit, window_seconds) window.
+
+        The request is recorded only if every window allows it. Returns the
+        limit, remaining, reset (epoch seconds) and retry_after of the most
+        restrictive window.
+        """
+        now = time.time() if now is None else now
+        self.stats["checks"] += 1
+        if now >= self._next_sweep:
+            self.sweep(now)
+
+        counters = self._counters(identifier, windows)
+        estimates = [counter.estimate(now) for counter in counters]
+        allowed = all(estimate + 1 <= limit for estimate, (limit, _) in zip(estimates, windows))
+
+        if allowed:
+            for counter in counters:
+                counter.add(now)
+        else:
+            self.stats["rejected"] += 1
+
+        info = None
+        for counter, estimate, (limit, _) in zip(counters, estimates, windows):
+            remaining = max(0, math.floor(limit - estimate - (1 if allowed else 0)))
+            retry_after = 0 if estimate + 1 <= limit else math.ceil(counter.retry_after(now, limit))
+            if (info is None or retry_after > info["retry_after"] or
+                    (retry_after == info["retry_after"] and remaining < info["remaining"])):
+                info = {
+                    "limit": limit,
+                    "remaining": remaining,
+                    "reset": math.ceil(counter.reset_at()),
+                    "retry_after": retry_after
+                }
+        return allowed, info
+
+    def _counters(self, identifier: str, windows: Sequence[Tuple[int, float]]) -> List[SlidingWindowCounter]:
+        counters = self._table.get(identifier)
+        if counters is not None and len(counters) == len(windows):
+            self._table.move_to_end(identifier)
+            return counters
+
+        counters = [SlidingWindowCounter(window, self.slots) for _, window in windows]
+        self._table[identifier] = counters
+        self._table.move_to_end(identifier)
+        while len(self._table) > self.max_entries:
+            self._table.popitem(last=False)
+            self.stats["evictions"] += 1
+        return counters
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Drop identifiers whose windows have all emptied"""
+        now = time.time() if now is None else now
+        self._next_sweep = now + self.sweep_interval
+
+        removed = 0
+        # Least recently seen first; stop at the first identifier still active
+        while self._table:
+            identifier, counters = next(iter(self._table.items()))
+            if not all(counter.idle(now) for counter in counters):
+                break
+            del self._table[identifier]
+            removed += 1
+
+        self.stats["swept"] += removed
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "identifiers": len(self._table),
+            "max_entries": self.max_entries,
+            **self.stats
+        }
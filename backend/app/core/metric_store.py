@@ -0,0 +1,311 @@
+"""
+Metric Store
+Buffered, downsampled persistence of metric points in Redis
+"""
+
+import asyncio
+import json
+import os
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from app.core.logger import get_logger
+from app.core.redis_client import redis_client
+from app.core.config import settings
+
+logger = get_logger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Rollup accumulator: [count, sum, min, max]
+Rollup = List[float]
+
+
+def _epoch_seconds(timestamp: datetime) -> float:
+    return (timestamp - _EPOCH).total_seconds()
+
+
+def merge_rollup(into: Optional[Rollup], other: Rollup) -> Rollup:
+    """Combine two rollups of the same bucket"""
+    if into is None:
+        return list(other)
+    into[0] += other[0]
+    into[1] += other[1]
+    into[2] = min(into[2], other[2])
+    into[3] = max(into[3], other[3])
+    return into
+
+
+@dataclass(frozen=True)
+class Resolution:
+    """A rollup granularity and how long its buckets are kept"""
+    name: str
+    seconds: int
+    retention_seconds: int
+
+
+def default_resolutions(retention_days: int = 30) -> Tuple[Resolution, ...]:
+    return (
+        Resolution("10s", 10, getattr(settings, 'METRICS_10S_RETENTION_HOURS', 24) * 3600),
+        Resolution("1m", 60, getattr(settings, 'METRICS_1M_RETENTION_DAYS', 7) * 86400),
+        Resolution("1h", 3600, retention_days * 86400),
+    )
+
+
+class MetricStore:
+    """
+    Buffers metric points and writes them to Redis in pipelined batches.
+
+    ``add`` is synchronous and O(1): it appends the raw point to a bounded
+    buffer and folds the value into in-memory count/sum/min/max rollups for
+    each resolution (10s, 1m and 1h by default). ``flush``, run on a timer by
+    the collector, writes the buffered raw points with one ``RPUSH`` per
+    hour key and the rollup buckets that changed as members of a
+    per-resolution sorted set scored by bucket start, then trims every
+    touched key to its resolution's retention.
+
+    Each worker keeps the running rollup of its open buckets and writes it
+    as one member per bucket, tagged with the worker: a flush replaces the
+    member it wrote before (``ZREM`` then ``ZADD``), so a bucket holds one
+    member per worker however often it is flushed, and readers merge the
+    workers' members. Buckets are forgotten ``close_after_seconds`` after
+    they end; a late point opens a new member for the bucket. Raw points
+    are kept for ``raw_retention_seconds`` only, and longer queries read
+    the coarsest rollup that still gives enough points. When the buffer is
+    full the oldest raw points are dropped (and counted), but their values
+    are already in the rollups. Rollups that fail to flush are rewritten
+    with the next flush.
+    """
+
+    def __init__(self, resolutions: Optional[Tuple[Resolution, ...]] = None,
+                 raw_retention_seconds: int = 86400, max_buffered_points: int = 50000,
+                 batch_size: int = 500, close_after_seconds: int = 60):
+        self.resolutions = resolutions or default_resolutions()
+        self.raw_retention_seconds = raw_retention_seconds
+        self.max_buffered_points = max_buffered_points
+        self.batch_size = batch_size
+        self.close_after_seconds = close_after_seconds
+        self._raw: Deque[Tuple[str, datetime, float, Dict[str, str], Dict[str, Any]]] = deque()
+        # Running rollups of open buckets, and the ones changed since the last flush
+        self._rollups: Dict[Tuple[str, str, int], Rollup] = {}
+        self._dirty: Set[Tuple[str, str, int]] = set()
+        # Writer tag of each open bucket, and the members written for it that
+        # the next write replaces (more than one only after failed flushes)
+        self._tags: Dict[Tuple[str, str, int], str] = {}
+        self._written: Dict[Tuple[str, str, int], Set[str]] = {}
+        self._writer_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._flush_seq = 0
+        self._flush_lock = asyncio.Lock()
+        self.stats = {
+            "points": 0,
+            "dropped_points": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "commands": 0
+        }
+
+    @staticmethod
+    def raw_key(metric_name: str, timestamp: datetime) -> str:
+        return f"metric:{metric_name}:{timestamp.strftime('%Y%m%d_%H')}"
+
+    @staticmethod
+    def rollup_key(metric_name: str, resolution: Resolution) -> str:
+        return f"metric_rollup:{metric_name}:{resolution.name}"
+
+    def get_resolution(self, name: str) -> Resolution:
+        for resolution in self.resolutions:
+            if resolution.name == name:
+                return resolution
+        raise ValueError(f"Unknown resolution: {name}")
+
+    def add(self, metric_name: str, timestamp: datetime, value: float,
+            labels: Optional[Dict[str, str]] = None, metadata: Optional[Dict[str, Any]] = None):
+        """Buffer a point and fold it into the rollups"""
+        if len(self._raw) >= self.max_buffered_points:
+            self._raw.popleft()
+            self.stats["dropped_points"] += 1
+        self._raw.append((metric_name, timestamp, value, labels or {}, metadata or {}))
+        self.stats["points"] += 1
+
+        seconds = _epoch_seconds(timestamp)
+        point = [1, value, value, value]
+        for resolution in self.resolutions:
+            bucket = int(seconds // resolution.seconds) * resolution.seconds
+            key = (metric_name, resolution.name, bucket)
+            self._rollups[key] = merge_rollup(self._rollups.get(key), point)
+            self._dirty.add(key)
+
+    def _flush_commands(self, raw, dirty: Set[Tuple[str, str, int]],
+                        now: float) -> Tuple[List[Tuple[Any, ...]], Dict[Tuple[str, str, int], str]]:
+        commands: List[Tuple[Any, ...]] = []
+
+        by_key: Dict[str, List[str]] = {}
+        for metric_name, timestamp, value, labels, metadata in raw:
+            by_key.setdefault(self.raw_key(metric_name, timestamp), []).append(json.dumps({
+                "timestamp": timestamp.isoformat(),
+                "value": value,
+                "labels": labels,
+                "metadata": metadata
+            }))
+        for key, points in by_key.items():
+            commands.append(("rpush", key, *points))
+            commands.append(("expire", key, self.raw_retention_seconds))
+
+        self._flush_seq += 1
+        written: Dict[Tuple[str, str, int], str] = {}
+        replaced: Dict[Tuple[str, str], List[str]] = {}
+        members: Dict[Tuple[str, str], Dict[str, float]] = {}
+        for bucket_key in dirty:
+            metric_name, resolution_name, bucket = bucket_key
+            count, total, low, high = self._rollups[bucket_key]
+            writer = self._tags.setdefault(bucket_key, f"{self._writer_id}:{self._flush_seq}")
+            member = json.dumps({"t": bucket, "c": count, "s": total, "mn": low, "mx": high, "w": writer})
+            written[bucket_key] = member
+            replaced.setdefault((metric_name, resolution_name), []).extend(self._written.get(bucket_key, ()))
+            members.setdefault((metric_name, resolution_name), {})[member] = bucket
+        for (metric_name, resolution_name), mapping in members.items():
+            resolution = self.get_resolution(resolution_name)
+            key = self.rollup_key(metric_name, resolution)
+            previous = replaced.get((metric_name, resolution_name))
+            if previous:
+                commands.append(("zrem", key, *previous))
+            commands.append(("zadd", key, mapping))
+            commands.append(("zremrangebyscore", key, "-inf", now - resolution.retention_seconds))
+            commands.append(("expire", key, resolution.retention_seconds))
+        return commands, written
+
+    def _close_buckets(self, now: float):
+        """Forget flushed buckets that ended more than close_after_seconds ago"""
+        for bucket_key in list(self._rollups):
+            if bucket_key in self._dirty:
+                continue
+            metric_name, resolution_name, bucket = bucket_key
+            if bucket + self.get_resolution(resolution_name).seconds + self.close_after_seconds <= now:
+                del self._rollups[bucket_key]
+                self._tags.pop(bucket_key, None)
+                self._written.pop(bucket_key, None)
+
+    async def flush(self) -> int:
+        """Write everything buffered so far; returns the number of commands sent"""
+        async with self._flush_lock:
+            if not self._raw and not self._dirty:
+                return 0
+            raw, self._raw = self._raw, deque()
+            dirty, self._dirty = self._dirty, set()
+
+            now = _epoch_seconds(datetime.utcnow())
+            commands, written = self._flush_commands(raw, dirty, now)
+            sent = 0
+            try:
+                for start in range(0, len(commands), self.batch_size):
+                    batch = commands[start:start + self.batch_size]
+                    async with redis_client.pipeline(transaction=False) as pipe:
+                        for name, *args in batch:
+                            getattr(pipe, name)(*args)
+                        await pipe.execute()
+                    sent += len(batch)
+                for bucket_key, member in written.items():
+                    self._written[bucket_key] = {member}
+            except Exception as e:
+                # The new members may or may not have been applied: remove
+                # them too when the buckets are rewritten next flush. Raw
+                # pushes are not idempotent, so those points are dropped
+                for bucket_key, member in written.items():
+                    self._written.setdefault(bucket_key, set()).add(member)
+                self._dirty |= dirty
+                unsent = commands[sent:]
+                self.stats["dropped_points"] += sum(len(command) - 2 for command in unsent if command[0] == "rpush")
+                self.stats["flush_errors"] += 1
+                logger.error(f"Failed to flush metric points: {e}")
+            self._close_buckets(now)
+            self.stats["flushes"] += 1
+            self.stats["commands"] += sent
+            return sent
+
+    def choose_resolution(self, start: datetime, end: datetime, max_points: int = 1000,
+                          now: Optional[datetime] = None) -> Resolution:
+        """Finest resolution that covers the range with at most max_points buckets"""
+        span = (end - start).total_seconds()
+        age = ((now or datetime.utcnow()) - start).total_seconds()
+        for resolution in self.resolutions:
+            if span / resolution.seconds <= max_points and age <= resolution.retention_seconds:
+                return resolution
+        return self.resolutions[-1]
+
+    async def query_raw(self, metric_name: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """Raw points between start and end, oldest first"""
+        points = []
+        current_time = start.replace(minute=0, second=0, microsecond=0)
+        while current_time <= end:
+            for item in await redis_client.lrange(self.raw_key(metric_name, current_time), 0, -1):
+                try:
+                    point = json.loads(item)
+                    point_time = datetime.fromisoformat(point["timestamp"])
+                    if start <= point_time <= end:
+                        points.append(point)
+                except (json.JSONDecodeError, KeyError, ValueError):
+                    continue
+            current_time += timedelta(hours=1)
+
+        for metric, timestamp, value, labels, metadata in list(self._raw):
+            if metric == metric_name and start <= timestamp <= end:
+                points.append({
+                    "timestamp": timestamp.isoformat(),
+                    "value": value,
+                    "labels": labels,
+                    "metadata": metadata
+                })
+
+        points.sort(key=lambda point: point["timestamp"])
+        return points
+
+    async def query_rollups(self, metric_name: str, start: datetime, end: datetime,
+                            resolution: Optional[str] = None,
+                            max_points: int = 1000) -> Tuple[Resolution, List[Dict[str, Any]]]:
+        """Rollup buckets between start and end, merged across writers, oldest first"""
+        chosen = self.get_resolution(resolution) if resolution else self.choose_resolution(start, end, max_points)
+        low = int(_epoch_seconds(start) // chosen.seconds) * chosen.seconds
+        high = _epoch_seconds(end)
+
+        buckets: Dict[int, Rollup] = {}
+        for item in await redis_client.zrangebyscore(self.rollup_key(metric_name, chosen), low, high):
+            try:
+                partial = json.loads(item)
+                bucket = int(partial["t"])
+                if partial.get("w") == self._tags.get((metric_name, chosen.name, bucket)):
+                    # This worker's open bucket: the in-memory rollup is newer
+                    continue
+                buckets[bucket] = merge_rollup(
+                    buckets.get(bucket), [partial["c"], partial["s"], partial["mn"], partial["mx"]]
+                )
+            except (json.JSONDecodeError, KeyError, ValueError, TypeError):
+                continue
+
+        # This worker's open buckets, including what it has not flushed yet
+        for (metric, resolution_name, bucket), rollup in self._rollups.items():
+            if metric == metric_name and resolution_name == chosen.name and low <= bucket <= high:
+                buckets[bucket] = merge_rollup(buckets.get(bucket), rollup)
+
+        return chosen, [
+            {
+                "timestamp": (_EPOCH + timedelta(seconds=bucket)).isoformat(),
+                "count": count,
+                "sum": total,
+                "min": minimum,
+                "max": maximum,
+                "avg": total / count if count else 0.0
+            }
+            for bucket, (count, total, minimum, maximum) in sorted(buckets.items())
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "buffered_points": len(self._raw),
+            "open_buckets": len(self._rollups),
+            "dirty_buckets": len(self._dirty),
+            "resolutions": [resolution.name for resolution in self.resolutions]
+        }
@@ -5,8 +5,6 @@ Comprehensive metrics collection with intelligent alerting
 
 import asyncio
 import time
-import json
-import statistics
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Callable, Union
 from dataclasses import dataclass, asdict, field
@@ -17,9 +15,12 @@ from email.mime.text import MimeText
 from email.mime.multipart import MimeMultipart
 
 from app.core.logger import get_logger
-from app.core.redis_client import redis_client
 from app.core.config import settings
 from app.core.distributed_tracing import distributed_tracer, trace_operation
+from app.core.streaming_stats import WindowAggregator
+from app.core.metric_store import MetricStore, default_resolutions
+from app.core.label_cardinality import label_limiter
+from app.core.alert_engine import AlertRuleEngine, AlertStateStore, RuleTransition, compare
 
 logger = get_logger(__name__)
 
@@ -63,6 +64,8 @@ class Metric:
     data_points: deque = field(default_factory=lambda: deque(maxlen=10000))
     aggregations: Dict[str, float] = field(default_factory=dict)
     last_updated: Optional[datetime] = None
+    # Follows data_points: every append and eviction goes through it
+    aggregator: WindowAggregator = field(default_factory=WindowAggregator)
 
 @dataclass
 class AlertRule:
@@ -73,12 +76,14 @@ class AlertRule:
     condition: str  # e.g., "> 0.8", "< 100", "== 0"
     threshold: float
     severity: AlertSeverity
-    duration_seconds: int = 60  # How long condition must be true
+    duration_seconds: int = 60  # How long condition must be true (for:)
     cooldown_seconds: int = 300  # Minimum time between alerts
     description: str = ""
     enabled: bool = True
     labels: Dict[str, str] = field(default_factory=dict)
     notification_channels: List[str] = field(default_factory=list)
+    aggregation: str = "last"  # last, avg, min, max, p95, p99, rate or absent
+    window_seconds: int = 60  # Sliding window the aggregation covers
 
 @dataclass
 class Alert:
@@ -97,6 +102,12 @@ class Alert:
     labels: Dict[str, str] = field(default_factory=dict)
     annotations: Dict[str, str] = field(default_factory=dict)
 
+_EPOCH = datetime(1970, 1, 1)
+
+def _epoch_seconds(timestamp: datetime) -> float:
+    """Seconds since the epoch for the naive UTC datetimes used by the collector"""
+    return (timestamp - _EPOCH).total_seconds()
+
 class MetricsCollector:
     """Advanced metrics collection system"""
     
@@ -110,7 +121,31 @@ class MetricsCollector:
         self.collection_interval = 10  # seconds
         self.retention_days = 30
         
+        # Buffered persistence, flushed on a timer
+        self.flush_interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        self.metric_store = MetricStore(
+            resolutions=default_resolutions(self.retention_days),
+            raw_retention_seconds=getattr(settings, 'METRICS_RAW_RETENTION_HOURS', 24) * 3600,
+            max_buffered_points=getattr(settings, 'METRICS_BUFFER_MAX_POINTS', 50000)
+        )
+        
+        # Bounded label values per metric
+        self.label_limiter = label_limiter
+        
+        # Windowed alert rules, evaluated as points are recorded; ticks
+        # only catch rules that change with time (absent, for:, ageing out)
+        self.alert_engine = AlertRuleEngine()
+        self.alert_state = AlertStateStore(
+            state_ttl_seconds=getattr(settings, 'ALERT_STATE_TTL_SECONDS', 900),
+            stale_after_seconds=getattr(settings, 'ALERT_STATE_STALE_SECONDS', 60)
+        )
+        self.alert_tick_interval = getattr(settings, 'ALERT_TICK_SECONDS', 10)
+        # Shared-state updates and notifications run off the recording path,
+        # chained per alert so "resolved" never overtakes "fired"
+        self._alert_tasks: Dict[str, asyncio.Task] = {}
+        
         # Background tasks
+        self._flush_task = None
         self._collection_task = None
         self._alert_evaluation_task = None
         self._cleanup_task = None
@@ -127,6 +162,9 @@ class MetricsCollector:
     
     def _start_background_tasks(self):
         """Start background collection and evaluation tasks"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        
         if self._collection_task is None:
             self._collection_task = asyncio.create_task(self._collection_loop())
         
@@ -156,7 +194,7 @@ class MetricsCollector:
                            "95th percentile response time", "seconds")
     
     def _register_builtin_alert_rules(self):
-        """Register built-in alert rules"""
+        """Register built-in alert rules, averaged over a minute so one sample can't fire them"""
         # High CPU usage
         self.add_alert_rule(AlertRule(
             id="high_cpu_usage",
@@ -166,6 +204,8 @@ class MetricsCollector:
             threshold=80.0,
             severity=AlertSeverity.WARNING,
             duration_seconds=120,
+            aggregation="avg",
+            window_seconds=60,
             description="System CPU usage is above 80%",
             notification_channels=["email", "webhook"]
         ))
@@ -179,6 +219,8 @@ class MetricsCollector:
             threshold=95.0,
             severity=AlertSeverity.CRITICAL,
             duration_seconds=60,
+            aggregation="avg",
+            window_seconds=60,
             description="System CPU usage is above 95%",
             notification_channels=["email", "slack", "webhook"]
         ))
@@ -192,6 +234,8 @@ class MetricsCollector:
             threshold=85.0,
             severity=AlertSeverity.WARNING,
             duration_seconds=300,
+            aggregation="avg",
+            window_seconds=60,
             description="System memory usage is above 85%",
             notification_channels=["email"]
         ))
@@ -205,6 +249,8 @@ class MetricsCollector:
             threshold=5.0,
             severity=AlertSeverity.CRITICAL,
             duration_seconds=60,
+            aggregation="avg",
+            window_seconds=60,
             description="Application error rate is above 5%",
             notification_channels=["email", "slack"]
         ))
@@ -218,6 +264,8 @@ class MetricsCollector:
             threshold=2.0,
             severity=AlertSeverity.WARNING,
             duration_seconds=180,
+            aggregation="avg",
+            window_seconds=60,
             description="95th percentile response time is above 2 seconds",
             notification_channels=["email"]
         ))
@@ -236,7 +284,11 @@ class MetricsCollector:
                 type=metric_type,
                 description=description,
                 unit=unit,
-                labels=labels or {}
+                labels=labels or {},
+                aggregator=WindowAggregator(
+                    track_rate=metric_type == MetricType.COUNTER,
+                    rate_window=getattr(settings, 'METRICS_RATE_WINDOW_SECONDS', 60)
+                )
             )
             
             self.metrics[name] = metric
@@ -262,14 +314,20 @@ class MetricsCollector:
             data_point = MetricPoint(
                 timestamp=timestamp or datetime.utcnow(),
                 value=value,
-                labels=labels or {}
+                labels=self.label_limiter.limit(name, labels)
             )
             
+            # Update aggregations
+            self._update_aggregations(metric, data_point)
+            
             metric.data_points.append(data_point)
             metric.last_updated = data_point.timestamp
             
-            # Update aggregations
-            await self._update_aggregations(metric)
+            # Evaluate the alert rules of this metric
+            for transition in self.alert_engine.observe(
+                name, value, _epoch_seconds(data_point.timestamp)
+            ):
+                self._handle_alert_transition(transition)
             
             # Store in Redis for persistence
             await self._store_metric_point(name, data_point)
@@ -280,114 +338,65 @@ class MetricsCollector:
             logger.error(f"Failed to record metric {name}: {e}")
             return False
     
-    async def _update_aggregations(self, metric: Metric):
-        """Update metric aggregations"""
+    def _update_aggregations(self, metric: Metric, data_point: MetricPoint):
+        """Add a point to the metric's window aggregations, evicting the oldest if full"""
         try:
-            if not metric.data_points:
-                return
-            
-            values = [dp.value for dp in metric.data_points]
-            
-            # Basic aggregations
-            metric.aggregations.update({
-                "count": len(values),
-                "sum": sum(values),
-                "avg": statistics.mean(values),
-                "min": min(values),
-                "max": max(values)
-            })
-            
-            # Advanced aggregations for sufficient data
-            if len(values) >= 2:
-                metric.aggregations.update({
-                    "stddev": statistics.stdev(values),
-                    "median": statistics.median(values)
-                })
-            
-            # Percentiles for sufficient data
-            if len(values) >= 10:
-                sorted_values = sorted(values)
-                metric.aggregations.update({
-                    "p50": sorted_values[int(len(values) * 0.5)],
-                    "p90": sorted_values[int(len(values) * 0.9)],
-                    "p95": sorted_values[int(len(values) * 0.95)],
-                    "p99": sorted_values[int(len(values) * 0.99)]
-                })
-            
-            # Rate calculation for counters
-            if metric.type == MetricType.COUNTER and len(values) >= 2:
-                recent_points = list(metric.data_points)[-10:]  # Last 10 points
-                if len(recent_points) >= 2:
-                    time_diff = (recent_points[-1].timestamp - recent_points[0].timestamp).total_seconds()
-                    value_diff = recent_points[-1].value - recent_points[0].value
-                    if time_diff > 0:
-                        metric.aggregations["rate_per_second"] = value_diff / time_diff
+            points = metric.data_points
+            if points.maxlen is not None and len(points) == points.maxlen:
+                metric.aggregator.remove_oldest(points[0].value)
+            metric.aggregator.add(data_point.value, _epoch_seconds(data_point.timestamp))
             
         except Exception as e:
             logger.error(f"Failed to update aggregations for {metric.name}: {e}")
     
     async def _store_metric_point(self, metric_name: str, data_point: MetricPoint):
-        """Store metric data point in Redis"""
+        """Buffer metric data point for the next batched write to Redis"""
         try:
-            # Store individual data point
-            key = f"metric:{metric_name}:{data_point.timestamp.strftime('%Y%m%d_%H')}"
-            
-            point_data = {
-                "timestamp": data_point.timestamp.isoformat(),
-                "value": data_point.value,
-                "labels": data_point.labels,
-                "metadata": data_point.metadata
-            }
-            
-            await redis_client.lpush(key, json.dumps(point_data))
-            await redis_client.expire(key, 86400 * self.retention_days)
-            
-            # Store aggregated hourly data
-            await self._store_hourly_aggregation(metric_name, data_point)
-            
+            self.metric_store.add(
+                metric_name,
+                data_point.timestamp,
+                data_point.value,
+                data_point.labels,
+                data_point.metadata
+            )
         except Exception as e:
             logger.error(f"Failed to store metric point: {e}")
     
-    async def _store_hourly_aggregation(self, metric_name: str, data_point: MetricPoint):
-        """Store hourly aggregated metric data"""
-        try:
-            hour_key = f"metric_hourly:{metric_name}:{data_point.timestamp.strftime('%Y%m%d_%H')}"
-            
-            # Get existing aggregation
-            existing_data = await redis_client.get(hour_key)
-            if existing_data:
-                hourly_data = json.loads(existing_data)
-            else:
-                hourly_data = {
-                    "count": 0,
-                    "sum": 0,
-                    "min": float('inf'),
-                    "max": float('-inf'),
-                    "values": []
-                }
-            
-            # Update aggregation
-            hourly_data["count"] += 1
-            hourly_data["sum"] += data_point.value
-            hourly_data["min"] = min(hourly_data["min"], data_point.value)
-            hourly_data["max"] = max(hourly_data["max"], data_point.value)
-            hourly_data["values"].append(data_point.value)
-            
-            # Keep only recent values for percentile calculation
-            if len(hourly_data["values"]) > 1000:
-                hourly_data["values"] = hourly_data["values"][-1000:]
-            
-            # Calculate derived metrics
-            hourly_data["avg"] = hourly_data["sum"] / hourly_data["count"]
-            
-            await redis_client.setex(hour_key, 86400 * self.retention_days, json.dumps(hourly_data))
-            
-        except Exception as e:
-            logger.error(f"Failed to store hourly aggregation: {e}")
+    async def _flush_loop(self):
+        """Background loop writing buffered metric points"""
+        while True:
+            try:
+                await asyncio.sleep(self.flush_interval)
+                await self.metric_store.flush()
+            except asyncio.CancelledError:
+                await self.metric_store.flush()
+                break
+            except Exception as e:
+                logger.error(f"Metrics flush error: {e}")
+    
+    async def get_metric_history(self, metric_name: str, start_time: datetime, end_time: datetime,
+                                 max_points: int = 1000) -> Dict[str, Any]:
+        """
+        Stored values of a metric between two times.
+        
+        Ranges within the raw retention and short enough to list come back
+        as raw points; longer ones come from the coarsest rollup needed to
+        stay under max_points buckets.
+        """
+        raw_query_seconds = getattr(settings, 'METRICS_RAW_QUERY_MAX_HOURS', 1) * 3600
+        if (end_time - start_time).total_seconds() <= raw_query_seconds:
+            points = await self.metric_store.query_raw(metric_name, start_time, end_time)
+            return {"resolution": "raw", "points": points}
+        
+        resolution, buckets = await self.metric_store.query_rollups(
+            metric_name, start_time, end_time, max_points=max_points
+        )
+        return {"resolution": resolution.name, "points": buckets}
     
     def add_alert_rule(self, rule: AlertRule) -> bool:
         """Add alert rule"""
         try:
+            self.alert_engine.add_rule(rule, _epoch_seconds(datetime.utcnow()))
             self.alert_rules[rule.id] = rule
             logger.info(f"Added alert rule: {rule.name}")
             return True
@@ -400,6 +409,7 @@ class MetricsCollector:
         try:
             if rule_id in self.alert_rules:
                 del self.alert_rules[rule_id]
+                self.alert_engine.remove_rule(rule_id)
                 logger.info(f"Removed alert rule: {rule_id}")
                 return True
             return False
@@ -449,110 +459,117 @@ class MetricsCollector:
             logger.error(f"System metrics collection failed: {e}")
     
     async def _alert_evaluation_loop(self):
-        """Background alert evaluation loop"""
+        """Background loop for rules that change without new points"""
         while True:
             try:
-                await asyncio.sleep(30)  # Evaluate every 30 seconds
+                await asyncio.sleep(self.alert_tick_interval)
                 await self._evaluate_alert_rules()
+                await self.alert_state.refresh()
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"Alert evaluation error: {e}")
     
     async def _evaluate_alert_rules(self):
-        """Evaluate all alert rules"""
-        for rule_id, rule in self.alert_rules.items():
-            if not rule.enabled:
-                continue
-            
-            try:
-                await self._evaluate_single_rule(rule)
-            except Exception as e:
-                logger.error(f"Failed to evaluate rule {rule_id}: {e}")
+        """Evaluate absent, pending and firing rules"""
+        try:
+            for transition in self.alert_engine.tick(_epoch_seconds(datetime.utcnow())):
+                self._handle_alert_transition(transition)
+        except Exception as e:
+            logger.error(f"Failed to evaluate alert rules: {e}")
     
     async def _evaluate_single_rule(self, rule: AlertRule):
-        """Evaluate a single alert rule"""
+        """Evaluate a single alert rule over its window"""
         try:
-            # Get metric
-            if rule.metric_name not in self.metrics:
-                return
-            
-            metric = self.metrics[rule.metric_name]
-            
-            # Check if we have recent data
-            if not metric.data_points:
-                return
-            
-            latest_point = metric.data_points[-1]
-            
-            # Check if data is recent enough
-            if (datetime.utcnow() - latest_point.timestamp).total_seconds() > 300:  # 5 minutes
-                return
+            transition = self.alert_engine.evaluate(rule, _epoch_seconds(datetime.utcnow()))
+            if transition is not None:
+                self._handle_alert_transition(transition)
             
-            # Evaluate condition
-            current_value = latest_point.value
-            condition_met = self._evaluate_condition(current_value, rule.condition, rule.threshold)
+        except Exception as e:
+            logger.error(f"Failed to evaluate rule {rule.id}: {e}")
+    
+    def _alert_message(self, rule: AlertRule, value: Optional[float]) -> str:
+        if rule.aggregation == "absent":
+            return f"{rule.name}: no {rule.metric_name} data for {rule.window_seconds}s"
+        return (
+            f"{rule.name}: {rule.aggregation}({rule.metric_name}[{rule.window_seconds}s]) "
+            f"is {value:g} {rule.condition} {rule.threshold}"
+        )
+    
+    def _handle_alert_transition(self, transition: RuleTransition):
+        """Create or resolve the alert of a rule that fired or resolved; notifies in the background"""
+        rule = transition.rule
+        alert_id = f"{rule.id}_{rule.metric_name}"
+        
+        try:
+            if transition.action == "fired":
+                if alert_id in self.active_alerts:
+                    return
+                
+                alert = Alert(
+                    id=alert_id,
+                    rule_id=rule.id,
+                    metric_name=rule.metric_name,
+                    message=self._alert_message(rule, transition.value),
+                    severity=rule.severity,
+                    state=AlertState.ACTIVE,
+                    value=transition.value,
+                    threshold=rule.threshold,
+                    fired_at=datetime.utcnow(),
+                    labels=rule.labels,
+                    annotations={"description": rule.description}
+                )
+                
+                self.active_alerts[alert_id] = alert
+                self.alert_history.append(alert)
+                self._schedule_alert_notification(alert, rule, "fired")
+                
+                logger.warning(f"Alert fired: {alert.message}")
+            else:
+                alert = self.active_alerts.pop(alert_id, None)
+                if alert is None:
+                    return
+                
+                alert.state = AlertState.RESOLVED
+                alert.resolved_at = datetime.utcnow()
+                self._schedule_alert_notification(alert, rule, "resolved")
+                
+                logger.info(f"Alert resolved: {alert.message}")
             
-            alert_id = f"{rule.id}_{rule.metric_name}"
+        except Exception as e:
+            logger.error(f"Failed to handle alert transition for {rule.id}: {e}")
+    
+    def _schedule_alert_notification(self, alert: Alert, rule: AlertRule, action: str):
+        """Share the transition and notify in a task queued behind the alert's previous one"""
+        previous = self._alert_tasks.get(alert.id)
+        task = asyncio.create_task(self._notify_alert_transition(alert, rule, action, previous))
+        self._alert_tasks[alert.id] = task
+        task.add_done_callback(
+            lambda done: self._alert_tasks.pop(alert.id, None) if self._alert_tasks.get(alert.id) is done else None
+        )
+    
+    async def _notify_alert_transition(self, alert: Alert, rule: AlertRule, action: str,
+                                       previous: Optional[asyncio.Task] = None):
+        try:
+            if previous is not None:
+                await asyncio.wait([previous])
             
-            if condition_met:
-                # Check if alert already exists
-                if alert_id not in self.active_alerts:
-                    # Create new alert
-                    alert = Alert(
-                        id=alert_id,
-                        rule_id=rule.id,
-                        metric_name=rule.metric_name,
-                        message=f"{rule.name}: {rule.metric_name} is {current_value} {rule.condition} {rule.threshold}",
-                        severity=rule.severity,
-                        state=AlertState.ACTIVE,
-                        value=current_value,
-                        threshold=rule.threshold,
-                        fired_at=datetime.utcnow(),
-                        labels=rule.labels,
-                        annotations={"description": rule.description}
-                    )
-                    
-                    self.active_alerts[alert_id] = alert
-                    self.alert_history.append(alert)
-                    
-                    # Send notifications
+            if action == "fired":
+                # Only the first worker to fire within the cooldown notifies
+                if await self.alert_state.mark_firing(alert.id, rule.cooldown_seconds):
                     await self._send_alert_notifications(alert, rule)
-                    
-                    logger.warning(f"Alert fired: {alert.message}")
             else:
-                # Check if alert should be resolved
-                if alert_id in self.active_alerts:
-                    alert = self.active_alerts[alert_id]
-                    alert.state = AlertState.RESOLVED
-                    alert.resolved_at = datetime.utcnow()
-                    
-                    # Send resolution notification
+                # Notify once no live worker has the alert firing any more
+                if await self.alert_state.mark_resolved(alert.id, rule.cooldown_seconds):
                     await self._send_resolution_notifications(alert, rule)
-                    
-                    # Move to history
-                    del self.active_alerts[alert_id]
-                    
-                    logger.info(f"Alert resolved: {alert.message}")
-            
         except Exception as e:
-            logger.error(f"Failed to evaluate rule {rule.id}: {e}")
+            logger.error(f"Failed to send {action} notifications for {alert.id}: {e}")
     
     def _evaluate_condition(self, value: float, condition: str, threshold: float) -> bool:
         """Evaluate alert condition"""
-        if condition == ">":
-            return value > threshold
-        elif condition == ">=":
-            return value >= threshold
-        elif condition == "<":
-            return value < threshold
-        elif condition == "<=":
-            return value <= threshold
-        elif condition == "==":
-            return abs(value - threshold) < 0.001  # Float comparison
-        elif condition == "!=":
-            return abs(value - threshold) >= 0.001
-        else:
+        try:
+            return compare(value, condition, threshold)
+        except ValueError:
             logger.error(f"Unknown condition: {condition}")
             return False
     
@@ -602,7 +619,7 @@ class MetricsCollector:
                 # Remove old data points
                 while (metric.data_points and 
                        metric.data_points[0].timestamp < cutoff_date):
-                    metric.data_points.popleft()
+                    metric.aggregator.remove_oldest(metric.data_points.popleft().value)
             
             # Clean up old alerts from history
             while (self.alert_history and 
@@ -621,6 +638,7 @@ class MetricsCollector:
                 return None
             
             metric = self.metrics[metric_name]
+            metric.aggregations = metric.aggregator.summary(_epoch_seconds(datetime.utcnow()))
             
             return {
                 "name": metric.name,
@@ -630,7 +648,8 @@ class MetricsCollector:
                 "labels": metric.labels,
                 "data_points_count": len(metric.data_points),
                 "last_updated": metric.last_updated.isoformat() if metric.last_updated else None,
-                "aggregations": metric.aggregations
+                "aggregations": metric.aggregations,
+                "cardinality": self.label_limiter.get_metric_stats(metric_name)
             }
             
         except Exception as e:
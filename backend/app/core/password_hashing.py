@@ -0,0 +1,136 @@
+"""
+Password Hashing
+bcrypt hashing on a bounded thread pool, with rehash on cost factor change
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing that keeps the event loop free.
+
+    The async methods run bcrypt on a dedicated thread pool of
+    ``max_concurrency`` workers; bcrypt releases the GIL, so the loop keeps
+    serving other requests while hashes are computed, and a login storm can
+    occupy at most ``max_concurrency`` cores. Excess work queues in the pool
+    rather than spawning threads, and the time spent queued is tracked.
+
+    Hashes are produced with ``rounds``. Verifying a hash made with a different
+    cost factor (or a deprecated scheme) returns a replacement hash, so stored
+    passwords migrate to the current cost as users log in.
+    """
+
+    def __init__(self, rounds: int = 12, max_concurrency: int = 4):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.rounds = rounds
+        self.max_concurrency = max_concurrency
+        self.context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "hashes": 0,
+            "verifications": 0,
+            "failed_verifications": 0,
+            "rehashes": 0,
+            "offloaded": 0,
+            "queued": 0,
+            "max_queued": 0,
+            "queue_wait_seconds": 0.0,
+            "max_queue_wait_seconds": 0.0
+        }
+
+    # ------------------------------------------------------------------
+    # Synchronous API (for code already running off the event loop)
+    # ------------------------------------------------------------------
+
+    def hash(self, password: str) -> str:
+        self.stats["hashes"] += 1
+        return self.context.hash(password)
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        return self.verify_and_update(password, hashed_password)[0]
+
+    def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """(valid, new_hash); new_hash is set when the stored hash is outdated"""
+        self.stats["verifications"] += 1
+        try:
+            valid, new_hash = self.context.verify_and_update(password, hashed_password)
+        except (ValueError, TypeError):
+            # Malformed or unknown hash format
+            valid, new_hash = False, None
+
+        if not valid:
+            self.stats["failed_verifications"] += 1
+        elif new_hash:
+            self.stats["rehashes"] += 1
+        return valid, new_hash
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        return self.context.needs_update(hashed_password)
+
+    # ------------------------------------------------------------------
+    # Async API
+    # ------------------------------------------------------------------
+
+    async def hash_async(self, password: str) -> str:
+        return await self._run(self.hash, password)
+
+    async def verify_async(self, password: str, hashed_password: str) -> bool:
+        return (await self._run(self.verify_and_update, password, hashed_password))[0]
+
+    async def verify_and_update_async(self, password: str,
+                                      hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self._run(self.verify_and_update, password, hashed_password)
+
+    async def _run(self, func: Callable[..., Any], *args) -> Any:
+        submitted = time.perf_counter()
+        with self._stats_lock:
+            self.stats["queued"] += 1
+            self.stats["max_queued"] = max(self.stats["max_queued"], self.stats["queued"])
+
+        def task():
+            waited = time.perf_counter() - submitted
+            with self._stats_lock:
+                self.stats["queued"] -= 1
+                self.stats["offloaded"] += 1
+                self.stats["queue_wait_seconds"] += waited
+                self.stats["max_queue_wait_seconds"] = max(self.stats["max_queue_wait_seconds"], waited)
+            return func(*args)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), task)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_concurrency,
+                        thread_name_prefix="password-hash"
+                    )
+        return self._executor
+
+    def shutdown(self, wait: bool = True):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        offloaded = self.stats["offloaded"]
+        return {
+            "rounds": self.rounds,
+            "max_concurrency": self.max_concurrency,
+            "avg_queue_wait_ms": round(self.stats["queue_wait_seconds"] / offloaded * 1000, 2) if offloaded else 0,
+            **self.stats
+        }
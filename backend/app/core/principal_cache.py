@@ -0,0 +1,149 @@
+"""
+Verified Principal Cache
+Short-lived cache of authenticated users keyed by access token
+"""
+
+import asyncio
+import hashlib
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.advanced_cache import multi_layer_cache
+from app.models.user import User, UserRole
+
+logger = get_logger(__name__)
+
+# User columns needed by authentication and permission checks
+PRINCIPAL_FIELDS = ("id", "email", "username", "role", "is_active", "is_verified", "parent_id")
+
+
+class PrincipalCache:
+    """
+    Caches the user behind a verified access token.
+
+    Entries are keyed by the token's ``jti`` (or a hash of the token), live at
+    most ``ttl`` seconds and never beyond the token's own expiry, and are stored
+    through the multi-layer cache (L1 + Redis) tagged ``user:{id}`` so that
+    ``invalidate_user_cache`` drops them on every worker. Committed updates or
+    deletes of a ``User`` invalidate that user's entries automatically.
+
+    Revocation is not cached here: callers check it before looking up the
+    principal, so a revoked token never reaches a cached entry.
+    """
+
+    def __init__(self, ttl: int = 60, key_prefix: str = "principal"):
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "invalidations": 0
+        }
+
+    def cache_key(self, token: str, payload: Dict[str, Any]) -> str:
+        token_id = payload.get("jti") or hashlib.sha256(token.encode()).hexdigest()[:32]
+        return f"{self.key_prefix}:{token_id}"
+
+    async def get(self, token: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Cached principal fields for a verified token, or None"""
+        self._loop = asyncio.get_running_loop()
+
+        principal = await multi_layer_cache.get(self.cache_key(token, payload))
+        if principal is None or str(principal.get("id")) != str(payload.get("sub")):
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["hits"] += 1
+        return principal
+
+    async def set(self, token: str, payload: Dict[str, Any], user: User) -> bool:
+        """Cache user for the remaining lifetime of the token (capped at ttl)"""
+        ttl = self.ttl
+        exp = payload.get("exp")
+        if exp:
+            ttl = min(ttl, int(exp - time.time()))
+        if ttl <= 0:
+            return False
+
+        principal = {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+        principal["role"] = user.role.value if isinstance(user.role, UserRole) else user.role
+
+        stored = await multi_layer_cache.set(
+            self.cache_key(token, payload), principal, ttl,
+            tags=[f"user:{user.id}"]
+        )
+        if stored:
+            self.stats["stores"] += 1
+        return stored
+
+    @staticmethod
+    def attach(db: Session, principal: Dict[str, Any]) -> User:
+        """
+        Build a session-bound User from cached fields without a SELECT.
+
+        Columns not cached are expired and load on first access, as do
+        relationships, so the result behaves like a queried user.
+        """
+        fields = dict(principal)
+        fields["role"] = UserRole(fields["role"])
+        user = User(**fields)
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+
+    async def invalidate_users(self, user_ids: Iterable[int]):
+        for user_id in user_ids:
+            await multi_layer_cache.invalidate_tag(f"user:{user_id}")
+            self.stats["invalidations"] += 1
+
+    def invalidate_users_threadsafe(self, user_ids: Iterable[int]):
+        """Schedule invalidation from sync code (e.g. threadpool endpoints)"""
+        user_ids = list(user_ids)
+        try:
+            asyncio.get_running_loop().create_task(self.invalidate_users(user_ids))
+            return
+        except RuntimeError:
+            pass
+
+        if self._loop is not None and self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.invalidate_users(user_ids), self._loop)
+        else:
+            logger.warning(f"No event loop to invalidate cached principals for users {user_ids}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.stats["hits"] + self.stats["misses"]
+        return {
+            "hit_rate": round(self.stats["hits"] / total * 100, 2) if total else 0,
+            **self.stats
+        }
+
+
+# Global principal cache
+principal_cache = PrincipalCache(ttl=getattr(settings, 'PRINCIPAL_CACHE_TTL', 60))
+
+
+# Invalidate after commit, so a concurrent request can not re-cache the old row
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _mark_principal_stale(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("stale_principals", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_stale_principals(session):
+    user_ids = session.info.pop("stale_principals", None)
+    if user_ids:
+        principal_cache.invalidate_users_threadsafe(user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_stale_principals(session):
+    session.info.pop("stale_principals", None)
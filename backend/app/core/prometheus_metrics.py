@@ -0,0 +1,225 @@
+"""
+Prometheus Metrics
+Shared registry and exposition for request, database, cache and business metrics
+"""
+
+import os
+from ipaddress import ip_address, ip_network
+from typing import Iterable, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+# prometheus_client reads this when it is first imported: with it set, every
+# metric value lives in an mmap'd file in that directory, one file per
+# process, and a scrape merges the files of all workers. The directory has
+# to exist and should be emptied before the server (not each worker) starts.
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+def multiprocess_enabled() -> bool:
+    """Whether metric values are shared between worker processes"""
+    directory = os.environ.get(MULTIPROC_DIR_ENV) or os.environ.get(MULTIPROC_DIR_ENV.lower())
+    return bool(directory) and os.path.isdir(directory)
+
+
+# HTTP
+request_count = Counter(
+    'http_requests_total',
+    'Total HTTP requests',
+    ['method', 'endpoint', 'status']
+)
+
+request_duration = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request duration in seconds',
+    ['method', 'endpoint'],
+    buckets=LATENCY_BUCKETS
+)
+
+request_errors = Counter(
+    'http_requests_errors_total',
+    'HTTP requests that failed with a 4xx/5xx status or an exception',
+    ['method', 'endpoint', 'error_type']
+)
+
+request_size = Histogram(
+    'http_request_size_bytes',
+    'HTTP request body size in bytes',
+    ['method', 'endpoint'],
+    buckets=SIZE_BUCKETS
+)
+
+response_size = Histogram(
+    'http_response_size_bytes',
+    'HTTP response body size in bytes',
+    ['method', 'endpoint'],
+    buckets=SIZE_BUCKETS
+)
+
+active_requests = Gauge(
+    'http_requests_active',
+    'Number of active HTTP requests',
+    multiprocess_mode='livesum'
+)
+
+websocket_connections = Gauge(
+    'websocket_connections_active',
+    'Number of active WebSocket connections',
+    multiprocess_mode='livesum'
+)
+
+# Database
+db_query_duration = Histogram(
+    'db_query_duration_seconds',
+    'Database query duration in seconds',
+    ['operation', 'table']
+)
+
+db_queries = Counter(
+    'db_queries_total',
+    'Database queries by outcome',
+    ['operation', 'status']
+)
+
+db_rows_affected = Counter(
+    'db_rows_affected_total',
+    'Rows affected by database queries',
+    ['operation']
+)
+
+# Cache
+cache_hit_rate = Counter(
+    'cache_hits_total',
+    'Cache hit/miss counter',
+    ['cache_type', 'hit']
+)
+
+cache_operations = Counter(
+    'cache_operations_total',
+    'Cache operations by result',
+    ['operation', 'result']
+)
+
+cache_operation_size = Histogram(
+    'cache_operation_size_bytes',
+    'Size of cached values in bytes',
+    ['operation'],
+    buckets=SIZE_BUCKETS
+)
+
+# Business
+user_actions = Counter(
+    'user_actions_total',
+    'User actions',
+    ['action', 'user_type']
+)
+
+business_events = Counter(
+    'business_events_total',
+    'Business events, weighted by their value',
+    ['event']
+)
+
+# System, sampled by each worker; the scrape reports the latest sample
+cpu_usage = Gauge('system_cpu_usage_percent', 'CPU usage percentage', multiprocess_mode='mostrecent')
+memory_usage = Gauge('system_memory_usage_percent', 'Memory usage percentage', multiprocess_mode='mostrecent')
+disk_usage = Gauge('system_disk_usage_percent', 'Disk usage percentage', multiprocess_mode='mostrecent')
+
+
+def observe_request(method: str, endpoint: str, status: int, duration: float,
+                    request_bytes: int = 0, response_bytes: int = 0):
+    """Record a completed HTTP request"""
+    request_count.labels(method=method, endpoint=endpoint, status=status).inc()
+    request_duration.labels(method=method, endpoint=endpoint).observe(duration)
+    if request_bytes > 0:
+        request_size.labels(method=method, endpoint=endpoint).observe(request_bytes)
+    if response_bytes > 0:
+        response_size.labels(method=method, endpoint=endpoint).observe(response_bytes)
+    if status >= 400:
+        request_errors.labels(method=method, endpoint=endpoint, error_type="http_error").inc()
+
+
+def observe_request_failure(method: str, endpoint: str, duration: float, error: Exception):
+    """Record an HTTP request whose handler raised"""
+    request_count.labels(method=method, endpoint=endpoint, status=500).inc()
+    request_duration.labels(method=method, endpoint=endpoint).observe(duration)
+    request_errors.labels(method=method, endpoint=endpoint, error_type=type(error).__name__).inc()
+
+
+def observe_db_query(operation: str, duration: float, table: str = "unknown",
+                     error: Optional[Exception] = None, rows_affected: int = 0):
+    """Record a finished database query"""
+    db_query_duration.labels(operation=operation, table=table).observe(duration)
+    db_queries.labels(operation=operation, status="error" if error else "success").inc()
+    if rows_affected > 0:
+        db_rows_affected.labels(operation=operation).inc(rows_affected)
+
+
+def observe_cache_operation(operation: str, hit: Optional[bool] = None, size: Optional[int] = None):
+    """Record a cache operation"""
+    result = "none" if hit is None else ("hit" if hit else "miss")
+    cache_operations.labels(operation=operation, result=result).inc()
+    if size is not None:
+        cache_operation_size.labels(operation=operation).observe(size)
+
+
+def generate_metrics() -> Tuple[bytes, str]:
+    """
+    Render every metric in the text exposition format.
+
+    Returns the body and its content type. In multiprocess mode the values
+    are read from the files of all workers, live or not, so each scrape sees
+    the whole server whichever worker answers it.
+    """
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def scrape_allowed(client_host: Optional[str], allowed: Iterable[str]) -> bool:
+    """
+    Whether client_host may scrape the metrics endpoint.
+
+    allowed holds addresses or networks ("10.0.0.0/8"). Only the socket
+    peer is checked: X-Forwarded-For is set by the client and can't be
+    trusted here.
+    """
+    if not client_host:
+        return False
+    try:
+        address = ip_address(client_host)
+    except ValueError:
+        return False
+    for entry in allowed:
+        try:
+            if address in ip_network(entry, strict=False):
+                return True
+        except ValueError:
+            continue
+    return False
+
+
+def mark_process_dead(pid: Optional[int] = None):
+    """
+    Drop the live gauge files of an exited worker.
+
+    Counters and histograms of the worker stay in the totals; ``live*``
+    gauges such as active requests stop counting it.
+    """
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid or os.getpid())
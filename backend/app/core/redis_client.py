@@ -30,19 +30,10 @@ except ImportError:
 
 from app.core.config import settings
 from app.core.logger import get_logger
+from app.core.redis_metrics import RedisOperationMetrics
 
 logger = get_logger(__name__)
 
-@dataclass
-class RedisMetrics:
-    """Redis operation metrics"""
-    operation: str
-    execution_time: float
-    success: bool
-    error_type: Optional[str]
-    data_size: int
-    timestamp: datetime
-
 @dataclass
 class ConnectionHealth:
     """Redis connection health status"""
@@ -54,7 +45,25 @@ class ConnectionHealth:
     last_check: datetime
 
 class EnhancedRedisClient:
-    """Enhanced Redis client with advanced features"""
+    """Enhanced Redis client with advanced features
+    
+    With ``auto_pipeline`` enabled, commands issued concurrently (in the same
+    event-loop tick, or within ``pipeline_max_delay`` seconds) are sent together
+    in one non-transactional pipeline and each caller's future is resolved with
+    its own reply. Callers still go through ``_execute_with_metrics``, so
+    per-command metrics and circuit-breaker accounting are unchanged.
+    """
+    
+    # Commands that are never batched: health checks and server-wide
+    # operations, blocking commands (which would hold up every command queued
+    # behind them) and pub/sub, which needs its own connection
+    PIPELINE_EXCLUDED = frozenset({
+        "ping", "info", "flushdb",
+        "blpop", "brpop", "brpoplpush", "blmove", "blmpop",
+        "bzpopmin", "bzpopmax", "bzmpop", "xread", "xreadgroup", "wait",
+        "publish", "subscribe", "psubscribe", "ssubscribe", "unsubscribe",
+        "punsubscribe", "sunsubscribe", "monitor"
+    })
     
     def __init__(self, url: Optional[str] = None, **kwargs):
         self.url = url or getattr(settings, 'REDIS_URL', 'redis://localhost:6379/0')
@@ -68,8 +77,26 @@ class EnhancedRedisClient:
         self.retry_on_timeout = kwargs.get('retry_on_timeout', True)
         self.health_check_interval = kwargs.get('health_check_interval', 30)
         
+        # Auto-pipelining
+        self.auto_pipeline = kwargs.get('auto_pipeline', False)
+        self.pipeline_max_delay = kwargs.get('pipeline_max_delay', 0.0)
+        self.pipeline_max_batch = kwargs.get('pipeline_max_batch', 1000)
+        self._pending_commands: List[Tuple[str, tuple, dict, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.Handle] = None
+        self._flush_tasks: set = set()
+        self.pipeline_stats = {
+            "batches": 0,
+            "commands": 0,
+            "max_batch_size": 0,
+            "batch_failures": 0
+        }
+        
         # Metrics and monitoring
-        self.metrics: List[RedisMetrics] = []
+        self.metrics = RedisOperationMetrics(
+            ring_seconds=kwargs.get('metrics_window', 300),
+            sample_rate=kwargs.get('metrics_sample_rate', 1.0),
+            size_accounting=kwargs.get('metrics_size_accounting', False)
+        )
         self.connection_health = ConnectionHealth(
             is_connected=False,
             latency_ms=0.0,
@@ -89,12 +116,18 @@ class EnhancedRedisClient:
         # Background tasks
         self._health_check_task = None
         self._initialized = False
+        self._init_lock = asyncio.Lock()
     
     async def initialize(self):
         """Initialize Redis connection and start background tasks"""
         if self._initialized:
             return
         
+        async with self._init_lock:
+            if not self._initialized:
+                await self._initialize()
+    
+    async def _initialize(self):
         try:
             # Create connection pool
             self.connection_pool = ConnectionPool.from_url(
@@ -136,6 +169,14 @@ class EnhancedRedisClient:
         if self.connection_pool:
             await self.connection_pool.disconnect()
         
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for _, _, _, future in self._pending_commands:
+            if not future.done():
+                future.set_exception(ConnectionError("Redis client closed"))
+        self._pending_commands = []
+        
         self._initialized = False
         logger.info("Redis client closed")
     
@@ -223,50 +264,88 @@ class EnhancedRedisClient:
         
         self._check_circuit_breaker()
         
-        start_time = time.time()
-        success = False
-        error_type = None
-        data_size = 0
+        start_time = time.perf_counter()
         
         try:
-            result = await func(*args, **kwargs)
-            success = True
-            
-            # Estimate data size
-            if isinstance(result, (str, bytes)):
-                data_size = len(result)
-            elif isinstance(result, (list, tuple)):
-                data_size = sum(len(str(item)) for item in result)
-            
-            # Reset failure count on success
-            if self.failure_count > 0:
-                self.failure_count = max(0, self.failure_count - 1)
-            
-            return result
-            
+            if self.auto_pipeline and self._can_pipeline(func):
+                result = await self._enqueue_command(func.__name__, args, kwargs)
+            else:
+                result = await func(*args, **kwargs)
         except Exception as e:
-            error_type = type(e).__name__
-            self._handle_failure()
+            self.metrics.record(operation, start_time, False, type(e).__name__)
+            # A command error reply (WRONGTYPE, NOSCRIPT, ...) means Redis is up
+            if not isinstance(e, ResponseError):
+                self._handle_failure()
             raise
-            
-        finally:
-            execution_time = time.time() - start_time
-            
-            # Record metrics
-            metric = RedisMetrics(
-                operation=operation,
-                execution_time=execution_time,
-                success=success,
-                error_type=error_type,
-                data_size=data_size,
-                timestamp=datetime.utcnow()
-            )
-            
-            self.metrics.append(metric)
-            
-            # Keep only recent metrics
-            if len(self.metrics) > 1000:
-                self.metrics = self.metrics[-500:]
+        
+        self.metrics.record(operation, start_time, True, result=result)
+        
+        # Reset failure count on success
+        if self.failure_count > 0:
+            self.failure_count = max(0, self.failure_count - 1)
+        
+        return result
+    
+    # Auto-pipelining
+    def _can_pipeline(self, func) -> bool:
+        """Only plain client commands are batched"""
+        return (getattr(func, "__self__", None) is self.client and
+                func.__name__ not in self.PIPELINE_EXCLUDED)
+    
+    def _enqueue_command(self, name: str, args: tuple, kwargs: dict) -> asyncio.Future:
+        """Queue a command for the next pipeline flush and return its future"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending_commands.append((name, args, kwargs, future))
+        
+        if len(self._pending_commands) >= self.pipeline_max_batch:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+            self._start_flush()
+        elif self._flush_handle is None:
+            if self.pipeline_max_delay > 0:
+                self._flush_handle = loop.call_later(self.pipeline_max_delay, self._start_flush)
+            else:
+                self._flush_handle = loop.call_soon(self._start_flush)
+        
+        return future
+    
+    def _start_flush(self):
+        self._flush_handle = None
+        batch, self._pending_commands = self._pending_commands, []
+        if not batch:
+            return
+        
+        task = asyncio.get_running_loop().create_task(self._flush_commands(batch))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+    
+    async def _flush_commands(self, batch: List[Tuple[str, tuple, dict, asyncio.Future]]):
+        """Send a batch in one pipeline and resolve every caller's future"""
+        self.pipeline_stats["batches"] += 1
+        self.pipeline_stats["commands"] += len(batch)
+        self.pipeline_stats["max_batch_size"] = max(self.pipeline_stats["max_batch_size"], len(batch))
+        
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for name, args, kwargs, _ in batch:
+                    getattr(pipe, name)(*args, **kwargs)
+                results = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            self.pipeline_stats["batch_failures"] += 1
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        # Per-command errors are returned in place of the reply
+        for (_, _, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
     
     # Basic Redis operations with metrics
     async def ping(self) -> bool:
@@ -278,9 +357,10 @@ class EnhancedRedisClient:
         """Get value by key"""
         return await self._execute_with_metrics("get", self.client.get, key)
     
-    async def set(self, key: str, value: Union[str, bytes], ex: Optional[int] = None) -> bool:
-        """Set key-value pair"""
-        return await self._execute_with_metrics("set", self.client.set, key, value, ex=ex)
+    async def set(self, key: str, value: Union[str, bytes], ex: Optional[int] = None,
+                  nx: bool = False) -> bool:
+        """Set key-value pair (only if absent when nx)"""
+        return await self._execute_with_metrics("set", self.client.set, key, value, ex=ex, nx=nx)
     
     async def setex(self, key: str, time: int, value: Union[str, bytes]) -> bool:
         """Set key-value pair with expiration"""
@@ -387,6 +467,30 @@ class EnhancedRedisClient:
         """Remove from sorted set"""
         return await self._execute_with_metrics("zrem", self.client.zrem, name, *values)
     
+    async def zscore(self, name: str, value: str) -> Optional[float]:
+        """Get member score"""
+        return await self._execute_with_metrics("zscore", self.client.zscore, name, value)
+    
+    async def zrangebyscore(self, name: str, min: Union[float, str], max: Union[float, str],
+                            **kwargs) -> List[Any]:
+        """Get sorted set members by score"""
+        return await self._execute_with_metrics("zrangebyscore", self.client.zrangebyscore,
+                                                name, min, max, **kwargs)
+    
+    async def zremrangebyscore(self, name: str, min: Union[float, str], max: Union[float, str]) -> int:
+        """Remove sorted set members by score"""
+        return await self._execute_with_metrics("zremrangebyscore", self.client.zremrangebyscore,
+                                                name, min, max)
+    
+    # Pub/Sub operations
+    async def publish(self, channel: str, message: Union[str, bytes]) -> int:
+        """Publish message to channel"""
+        return await self._execute_with_metrics("publish", self.client.publish, channel, message)
+    
+    def pubsub(self, **kwargs) -> redis.client.PubSub:
+        """Create pub/sub connection"""
+        return self.client.pubsub(**kwargs)
+    
     # Pipeline operations
     def pipeline(self, transaction: bool = True) -> redis.client.Pipeline:
         """Create pipeline"""
@@ -405,6 +509,14 @@ class EnhancedRedisClient:
         """Execute Lua script"""
         return await self._execute_with_metrics("eval", self.client.eval, script, numkeys, *keys_and_args)
     
+    async def evalsha(self, sha: str, numkeys: int, *keys_and_args) -> Any:
+        """Execute a loaded Lua script by SHA"""
+        return await self._execute_with_metrics("evalsha", self.client.evalsha, sha, numkeys, *keys_and_args)
+    
+    async def script_load(self, script: str) -> str:
+        """Load a Lua script and return its SHA"""
+        return await self._execute_with_metrics("script_load", self.client.script_load, script)
+    
     async def info(self, section: Optional[str] = None) -> Dict[str, Any]:
         """Get server info"""
         return await self._execute_with_metrics("info", self.client.info, section)
@@ -423,33 +535,29 @@ class EnhancedRedisClient:
                 "failure_count": self.failure_count,
                 "last_failure": self.last_failure_time
             },
-            "metrics_summary": self._get_metrics_summary()
+            "auto_pipeline": {
+                "enabled": self.auto_pipeline,
+                "pending": len(self._pending_commands),
+                "avg_batch_size": round(self.pipeline_stats["commands"] / self.pipeline_stats["batches"], 2)
+                if self.pipeline_stats["batches"] else 0,
+                **self.pipeline_stats
+            },
+            "metrics_summary": self._get_metrics_summary(),
+            "operations": self.metrics.operation_summary()
         }
     
     def _get_metrics_summary(self) -> Dict[str, Any]:
-        """Get metrics summary"""
-        if not self.metrics:
-            return {"total_operations": 0}
-        
-        recent_metrics = [m for m in self.metrics 
-                         if m.timestamp > datetime.utcnow() - timedelta(minutes=5)]
-        
-        if not recent_metrics:
-            return {"total_operations": len(self.metrics)}
-        
-        total_time = sum(m.execution_time for m in recent_metrics)
-        successful_ops = sum(1 for m in recent_metrics if m.success)
-        
-        return {
-            "total_operations": len(self.metrics),
-            "recent_operations": len(recent_metrics),
-            "success_rate": round(successful_ops / len(recent_metrics) * 100, 2),
-            "avg_response_time_ms": round(total_time / len(recent_metrics) * 1000, 2),
-            "operations_per_minute": len(recent_metrics) * 12  # Scale to per minute
-        }
+        """Get metrics summary for the last 5 minutes"""
+        return self.metrics.summary(window=300)
 
 # Global Redis client instance
-redis_client = EnhancedRedisClient()
+redis_client = EnhancedRedisClient(
+    metrics_sample_rate=getattr(settings, 'REDIS_METRICS_SAMPLE_RATE', 1.0),
+    metrics_size_accounting=getattr(settings, 'REDIS_METRICS_SIZE_ACCOUNTING', False),
+    auto_pipeline=getattr(settings, 'REDIS_AUTO_PIPELINE', True),
+    pipeline_max_delay=getattr(settings, 'REDIS_PIPELINE_MAX_DELAY', 0.0),
+    pipeline_max_batch=getattr(settings, 'REDIS_PIPELINE_MAX_BATCH', 1000)
+)
 
 # Context manager for Redis operations
 @asynccontextmanager
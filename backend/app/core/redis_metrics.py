@@ -0,0 +1,189 @@
+"""
+Redis Operation Metrics
+Per-operation counters, latency histograms and a preallocated ring buffer
+"""
+
+import random
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+# Latency bucket upper bounds in seconds: 50us .. ~26s, doubling each bucket
+LATENCY_BUCKETS: Tuple[float, ...] = tuple(0.00005 * 2 ** i for i in range(20))
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (cumulative over the process lifetime)"""
+
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket containing the q-quantile"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class OperationStats:
+    """Counters for a single Redis command"""
+
+    __slots__ = ("calls", "errors", "error_types", "bytes", "sized_calls", "histogram")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.error_types: Dict[str, int] = {}
+        self.bytes = 0
+        self.sized_calls = 0
+        self.histogram = LatencyHistogram()
+
+
+class RedisOperationMetrics:
+    """
+    Low-overhead metrics for Redis commands.
+
+    Every call updates its operation's counters and latency histogram, and the
+    slot for the current second in a preallocated ring of per-second buckets
+    (calls, successes, latency sum) that backs the "recent" summary. Nothing is
+    allocated per call. Result size accounting is optional because walking a
+    reply costs more than many commands; when enabled it is applied to a
+    ``sample_rate`` fraction of calls.
+    """
+
+    def __init__(self, ring_seconds: int = 300, sample_rate: float = 1.0,
+                 size_accounting: bool = False):
+        self.ring_seconds = ring_seconds
+        self.sample_rate = sample_rate
+        self.size_accounting = size_accounting
+
+        self._slot_second = [-1] * ring_seconds
+        self._slot_calls = [0] * ring_seconds
+        self._slot_ok = [0] * ring_seconds
+        self._slot_latency = [0.0] * ring_seconds
+
+        self.operations: Dict[str, OperationStats] = {}
+        self.total_operations = 0
+
+    def record(self, operation: str, started: float, success: bool,
+               error_type: Optional[str] = None, result: Any = None):
+        """Record one call; ``started`` is its time.perf_counter() start"""
+        now = time.perf_counter()
+        latency = now - started
+
+        stats = self.operations.get(operation)
+        if stats is None:
+            stats = self.operations[operation] = OperationStats()
+        stats.calls += 1
+        stats.histogram.observe(latency)
+        self.total_operations += 1
+
+        second = int(now)
+        slot = second % self.ring_seconds
+        if self._slot_second[slot] != second:
+            self._slot_second[slot] = second
+            self._slot_calls[slot] = 0
+            self._slot_ok[slot] = 0
+            self._slot_latency[slot] = 0.0
+        self._slot_calls[slot] += 1
+        self._slot_latency[slot] += latency
+
+        if success:
+            self._slot_ok[slot] += 1
+            if self.size_accounting and result is not None and (
+                    self.sample_rate >= 1.0 or random.random() < self.sample_rate):
+                stats.bytes += self._result_size(result)
+                stats.sized_calls += 1
+        else:
+            stats.errors += 1
+            stats.error_types[error_type] = stats.error_types.get(error_type, 0) + 1
+
+    @staticmethod
+    def _result_size(result: Any) -> int:
+        if isinstance(result, (bytes, str)):
+            return len(result)
+        if isinstance(result, (list, tuple)):
+            return sum(len(item) for item in result if isinstance(item, (bytes, str)))
+        return 0
+
+    def summary(self, window: int = 300) -> Dict[str, Any]:
+        """Totals plus the last ``window`` seconds, in the shape of the old summary"""
+        if not self.total_operations:
+            return {"total_operations": 0}
+
+        window = min(window, self.ring_seconds)
+        cutoff = int(time.perf_counter()) - window
+        calls = successes = 0
+        latency_sum = 0.0
+        for slot in range(self.ring_seconds):
+            if self._slot_second[slot] > cutoff:
+                calls += self._slot_calls[slot]
+                successes += self._slot_ok[slot]
+                latency_sum += self._slot_latency[slot]
+
+        if not calls:
+            return {"total_operations": self.total_operations}
+
+        return {
+            "total_operations": self.total_operations,
+            "recent_operations": calls,
+            "success_rate": round(successes / calls * 100, 2),
+            "avg_response_time_ms": round(latency_sum / calls * 1000, 2),
+            "operations_per_minute": round(calls * 60 / window)
+        }
+
+    def operation_summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per-command counters and latency percentiles"""
+        result = {}
+        for operation, stats in self.operations.items():
+            histogram = stats.histogram
+            entry = {
+                "calls": stats.calls,
+                "errors": stats.errors,
+                "avg_ms": round(histogram.mean * 1000, 3),
+                "p50_ms": round(histogram.quantile(0.5) * 1000, 3),
+                "p95_ms": round(histogram.quantile(0.95) * 1000, 3),
+                "p99_ms": round(histogram.quantile(0.99) * 1000, 3),
+                "max_ms": round(histogram.max * 1000, 3)
+            }
+            if stats.error_types:
+                entry["error_types"] = dict(stats.error_types)
+            if stats.sized_calls:
+                entry["avg_bytes"] = round(stats.bytes / stats.sized_calls)
+            result[operation] = entry
+        return result
+
+    def histogram_buckets(self, operation: str) -> List[Tuple[float, int]]:
+        """Cumulative (upper bound, count) pairs for an operation"""
+        stats = self.operations.get(operation)
+        if stats is None:
+            return []
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(stats.histogram.bounds + (float("inf"),), stats.histogram.counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return buckets
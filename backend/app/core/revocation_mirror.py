@@ -0,0 +1,140 @@
+"""
+Token Revocation Mirror
+Local Bloom filter plus exact set of revoked token ids
+"""
+
+import hashlib
+import math
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class BloomFilter:
+    """
+    Bit-array Bloom filter sized for ``capacity`` items at ``error_rate``.
+
+    Membership answers "definitely not present" or "maybe present". Items can
+    not be removed; rebuild the filter to drop them.
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001):
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be positive and error_rate in (0, 1)")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationMirror:
+    """
+    In-process copy of the revoked token ids.
+
+    Lookups hit the Bloom filter first, so a token that was never revoked (the
+    common case) is answered without touching the exact set. Bloom positives are
+    confirmed against the exact ``jti -> exp`` mapping. Expired ids are pruned
+    from the exact set, and the filter is rebuilt once it holds noticeably more
+    items than are still revoked.
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._revoked: Dict[str, float] = {}
+        self._bloom = BloomFilter(capacity, error_rate)
+        self.stats = {
+            "checks": 0,
+            "bloom_negatives": 0,
+            "bloom_false_positives": 0,
+            "revoked_hits": 0,
+            "rebuilds": 0
+        }
+
+    def add(self, jti: str, expires_at: float):
+        """Mark jti revoked until expires_at (epoch seconds)"""
+        with self._lock:
+            if jti not in self._revoked:
+                self._bloom.add(jti)
+            self._revoked[jti] = max(expires_at, self._revoked.get(jti, 0))
+            if len(self._revoked) > self._bloom.capacity:
+                self._rebuild_locked()
+
+    def add_many(self, entries: Iterable[Tuple[str, float]]):
+        for jti, expires_at in entries:
+            self.add(jti, expires_at)
+
+    def is_revoked(self, jti: str, now: Optional[float] = None) -> bool:
+        self.stats["checks"] += 1
+        if jti not in self._bloom:
+            self.stats["bloom_negatives"] += 1
+            return False
+
+        expires_at = self._revoked.get(jti)
+        if expires_at is None:
+            self.stats["bloom_false_positives"] += 1
+            return False
+        if expires_at <= (time.time() if now is None else now):
+            return False
+
+        self.stats["revoked_hits"] += 1
+        return True
+
+    def replace(self, entries: Iterable[Tuple[str, float]]):
+        """Swap in a full snapshot (after a resync)"""
+        now = time.time()
+        revoked = {jti: exp for jti, exp in entries if exp > now}
+        bloom = BloomFilter(max(self.capacity, len(revoked) * 2), self.error_rate)
+        for jti in revoked:
+            bloom.add(jti)
+        with self._lock:
+            self._revoked = revoked
+            self._bloom = bloom
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop expired ids; rebuild the filter if it is mostly stale"""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [jti for jti, exp in self._revoked.items() if exp <= now]
+            for jti in expired:
+                del self._revoked[jti]
+            if self._bloom.count > 2 * len(self._revoked) + 1000:
+                self._rebuild_locked()
+        return len(expired)
+
+    def _rebuild_locked(self):
+        bloom = BloomFilter(max(self.capacity, len(self._revoked) * 2), self.error_rate)
+        for jti in self._revoked:
+            bloom.add(jti)
+        self._bloom = bloom
+        self.stats["rebuilds"] += 1
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "revoked": len(self._revoked),
+            "bloom_items": self._bloom.count,
+            "bloom_bits": self._bloom.num_bits,
+            **self.stats
+        }
@@ -1,7 +1,6 @@
 from datetime import datetime, timedelta
 from typing import Optional, Union, Dict, Any
 from jose import JWTError, jwt, ExpiredSignatureError
-from passlib.context import CryptContext
 from cryptography.fernet import Fernet
 import secrets
 import redis
@@ -14,12 +13,18 @@ from app.core.exceptions import (
     TokenError, TokenExpiredError, TokenBlacklistedError, 
     InvalidTokenTypeError, EncryptionError, DecryptionError
 )
+from app.core.password_hashing import PasswordHasher
+from app.core.token_revocation import token_revocation_service
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = PasswordHasher(
+    rounds=getattr(settings, 'BCRYPT_ROUNDS', 12),
+    max_concurrency=getattr(settings, 'PASSWORD_HASH_MAX_CONCURRENCY', 4)
+)
+pwd_context = password_hasher.context
 
 # Data encryption
 ENCRYPTION_KEY = settings.ENCRYPTION_KEY if hasattr(settings, 'ENCRYPTION_KEY') else Fernet.generate_key()
@@ -144,7 +149,22 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Returns:
         True if password matches, False otherwise
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """
+    Verify a password and return a replacement hash if the stored one is outdated.
+    
+    Args:
+        plain_password: The plain text password
+        hashed_password: The hashed password to check against
+    
+    Returns:
+        (valid, new_hash) where new_hash is None unless the password matched
+        and the hash uses an old cost factor or scheme
+    """
+    return password_hasher.verify_and_update(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
@@ -157,23 +177,31 @@ def get_password_hash(password: str) -> str:
     Returns:
         The hashed password
     """
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 
-def decode_token(token: str, token_type: str = "access") -> Optional[Dict[str, Any]]:
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the password hashing pool, for async handlers"""
+    return await password_hasher.verify_async(plain_password, hashed_password)
+
+
+async def verify_and_update_password_async(plain_password: str,
+                                           hashed_password: str) -> tuple[bool, Optional[str]]:
+    """verify_and_update_password on the password hashing pool, for async handlers"""
+    return await password_hasher.verify_and_update_async(plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the password hashing pool, for async handlers"""
+    return await password_hasher.hash_async(password)
+
+
+def _decode_jwt(token: str, token_type: str) -> Dict[str, Any]:
     """
-    Decode and validate a JWT token.
-    
-    Args:
-        token: The JWT token to decode
-        token_type: Type of token ("access" or "refresh")
+    Verify signature, expiry and type of a JWT token (no revocation check).
     
-    Returns:
-        The payload if valid
-        
     Raises:
         TokenExpiredError: If token has expired
-        TokenBlacklistedError: If token is blacklisted
         InvalidTokenTypeError: If token type doesn't match
         TokenError: For other JWT validation errors
     """
@@ -194,25 +222,11 @@ def decode_token(token: str, token_type: str = "access") -> Optional[Dict[str, A
             logger.warning(f"Token type mismatch. Expected: {token_type}, Got: {actual_type}")
             raise InvalidTokenTypeError(expected=token_type, actual=actual_type or "unknown")
         
-        # Check if token is blacklisted (if Redis is available)
-        if redis_client:
-            try:
-                jti = payload.get("jti")
-                if jti and redis_client.get(f"blacklist:{jti}"):
-                    logger.warning(f"Blacklisted token attempted: JTI={jti}")
-                    raise TokenBlacklistedError(token_type=token_type)
-            except redis.RedisError as e:
-                logger.error(f"Redis error checking token blacklist: {e}")
-                # Continue without blacklist check if Redis fails
-            except (TokenBlacklistedError, InvalidTokenTypeError):
-                # Re-raise our custom exceptions
-                raise
-        
         return payload
     except ExpiredSignatureError:
         logger.info(f"Expired {token_type} token attempted")
         raise TokenExpiredError(token_type=token_type)
-    except (TokenExpiredError, TokenBlacklistedError, InvalidTokenTypeError):
+    except (TokenExpiredError, InvalidTokenTypeError):
         # Re-raise our custom exceptions
         raise
     except JWTError as e:
@@ -220,6 +234,73 @@ def decode_token(token: str, token_type: str = "access") -> Optional[Dict[str, A
         raise TokenError(detail=f"Invalid {token_type} token")
 
 
+def _is_revoked_in_redis(jti: str) -> bool:
+    """Synchronous fallback used while the local revocation mirror is not synced"""
+    if not redis_client:
+        return False
+    try:
+        expires_at = redis_client.zscore(token_revocation_service.key, jti)
+        if expires_at is not None and expires_at > datetime.utcnow().timestamp():
+            return True
+        # Tokens revoked before the sorted set existed until they are imported
+        return bool(redis_client.exists(f"blacklist:{jti}"))
+    except redis.RedisError as e:
+        logger.error(f"Redis error checking token blacklist: {e}")
+        # Continue without blacklist check if Redis fails
+        return False
+
+
+def decode_token(token: str, token_type: str = "access") -> Optional[Dict[str, Any]]:
+    """
+    Decode and validate a JWT token.
+    
+    Revocation is checked against the worker's local mirror of revoked token
+    ids; Redis is only queried while that mirror is not synced.
+    
+    Args:
+        token: The JWT token to decode
+        token_type: Type of token ("access" or "refresh")
+    
+    Returns:
+        The payload if valid
+        
+    Raises:
+        TokenExpiredError: If token has expired
+        TokenBlacklistedError: If token is blacklisted
+        InvalidTokenTypeError: If token type doesn't match
+        TokenError: For other JWT validation errors
+    """
+    payload = _decode_jwt(token, token_type)
+    
+    jti = payload.get("jti")
+    if jti:
+        revoked = token_revocation_service.is_revoked_local(jti)
+        if revoked is None:
+            revoked = _is_revoked_in_redis(jti)
+        if revoked:
+            logger.warning(f"Blacklisted token attempted: JTI={jti}")
+            raise TokenBlacklistedError(token_type=token_type)
+    
+    return payload
+
+
+async def decode_token_async(token: str, token_type: str = "access") -> Dict[str, Any]:
+    """
+    Async variant of decode_token for use on the event loop.
+    
+    The revocation check never blocks: it is answered by the local mirror, or
+    by the async Redis client while the mirror is not synced.
+    """
+    payload = _decode_jwt(token, token_type)
+    
+    jti = payload.get("jti")
+    if jti and await token_revocation_service.is_revoked(jti):
+        logger.warning(f"Blacklisted token attempted: JTI={jti}")
+        raise TokenBlacklistedError(token_type=token_type)
+    
+    return payload
+
+
 def decode_access_token(token: str) -> str:
     """
     Decode a JWT access token.
@@ -241,6 +322,24 @@ def decode_access_token(token: str) -> str:
     return user_id
 
 
+async def decode_access_token_async(token: str) -> str:
+    """
+    Async variant of decode_access_token.
+    
+    Args:
+        token: The JWT token to decode
+    
+    Returns:
+        The subject (user ID) if valid
+    """
+    payload = await decode_token_async(token, "access")
+    user_id = payload.get("sub")
+    if not user_id:
+        logger.error("Access token missing 'sub' claim or invalid token")
+        raise TokenError(detail="Invalid access token: missing user identifier")
+    return user_id
+
+
 def revoke_token(token: str, token_type: str = "access") -> bool:
     """
     Revoke a token by adding it to blacklist.
@@ -263,18 +362,45 @@ def revoke_token(token: str, token_type: str = "access") -> bool:
         jti = payload.get("jti")
         exp = payload.get("exp")
         
-        if jti and exp:
-            # Calculate TTL for Redis
-            ttl = exp - datetime.utcnow().timestamp()
-            if ttl > 0:
-                redis_client.setex(f"blacklist:{jti}", int(ttl), "1")
-                return True
-    except:
-        pass
+        if jti and exp and exp > datetime.utcnow().timestamp():
+            # Record locally, persist and announce to the other workers
+            token_revocation_service.mirror.add(jti, exp)
+            redis_client.zadd(token_revocation_service.key, {jti: exp})
+            redis_client.publish(
+                token_revocation_service.channel,
+                json.dumps({"jti": jti, "exp": exp})
+            )
+            return True
+    except Exception as e:
+        logger.error(f"Error revoking token: {e}")
     
     return False
 
 
+async def revoke_token_async(token: str, token_type: str = "access") -> bool:
+    """
+    Revoke a token without blocking the event loop.
+    
+    Args:
+        token: The token to revoke
+        token_type: Type of token ("access" or "refresh")
+    
+    Returns:
+        True if successfully revoked, False otherwise
+    """
+    try:
+        payload = _decode_jwt(token, token_type)
+    except TokenError:
+        return False
+    
+    jti = payload.get("jti")
+    exp = payload.get("exp")
+    if not jti or not exp or exp <= datetime.utcnow().timestamp():
+        return False
+    
+    return await token_revocation_service.revoke(jti, exp)
+
+
 def create_token_pair(
     subject: Union[str, int],
     additional_claims: Optional[Dict[str, Any]] = None
@@ -0,0 +1,137 @@
+"""
+Single-Flight Request Coalescing
+Ensures only one coroutine per key computes a value while concurrent callers share its outcome
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+@dataclass
+class FlightStats:
+    """Per-key coalescing statistics"""
+    flights: int = 0          # leader executions
+    waiters: int = 0          # callers that joined an in-flight execution
+    max_waiters: int = 0      # largest number of waiters on a single flight
+    wait_time: float = 0.0    # total seconds spent waiting by joined callers
+    errors: int = 0           # flights that ended with an exception
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key.
+
+    The first caller for a key becomes the leader and runs the loader; callers
+    arriving while it runs await the leader's future and receive the same result
+    or the same exception. The key is released as soon as the leader finishes,
+    so later calls start a fresh flight.
+    """
+
+    def __init__(self, max_tracked_keys: int = 1000):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._inflight_waiters: Dict[str, int] = {}
+        self._key_stats: "OrderedDict[str, FlightStats]" = OrderedDict()
+        self.max_tracked_keys = max_tracked_keys
+
+        self.total_flights = 0
+        self.total_waiters = 0
+        self.total_wait_time = 0.0
+
+    def in_flight(self, key: str) -> bool:
+        """Check whether a flight is currently running for key"""
+        return key in self._inflight
+
+    async def do(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Run loader once for all concurrent callers of key"""
+        future = self._inflight.get(key)
+        if future is not None:
+            return await self._wait(key, future, loader)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self._inflight_waiters[key] = 0
+        stats = self._stats_for(key)
+        stats.flights += 1
+        self.total_flights += 1
+
+        try:
+            result = await loader()
+        except asyncio.CancelledError:
+            # Waiters retry on their own rather than inheriting our cancellation
+            future.cancel()
+            raise
+        except BaseException as e:
+            stats.errors += 1
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody was waiting
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            stats.max_waiters = max(stats.max_waiters, self._inflight_waiters.pop(key, 0))
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def _wait(self, key: str, future: asyncio.Future,
+                    loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Join an in-flight execution"""
+        stats = self._stats_for(key)
+        stats.waiters += 1
+        self.total_waiters += 1
+        self._inflight_waiters[key] = self._inflight_waiters.get(key, 0) + 1
+
+        start_time = time.perf_counter()
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if future.cancelled():
+                # Leader was cancelled; start (or join) a new flight
+                return await self.do(key, loader)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start_time
+            stats.wait_time += elapsed
+            self.total_wait_time += elapsed
+
+    def _stats_for(self, key: str) -> FlightStats:
+        """Get per-key stats, keeping only the most recently used keys"""
+        stats = self._key_stats.get(key)
+        if stats is None:
+            stats = FlightStats()
+            self._key_stats[key] = stats
+            if len(self._key_stats) > self.max_tracked_keys:
+                self._key_stats.popitem(last=False)
+        else:
+            self._key_stats.move_to_end(key)
+        return stats
+
+    def get_stats(self, top: int = 20) -> Dict[str, Any]:
+        """Aggregate and per-key coalescing statistics"""
+        hottest = sorted(self._key_stats.items(), key=lambda item: item[1].waiters, reverse=True)
+
+        return {
+            "in_flight": len(self._inflight),
+            "total_flights": self.total_flights,
+            "total_waiters": self.total_waiters,
+            "total_wait_time_ms": round(self.total_wait_time * 1000, 2),
+            "keys": {
+                key: {
+                    "flights": stats.flights,
+                    "waiters": stats.waiters,
+                    "max_waiters": stats.max_waiters,
+                    "avg_wait_ms": round(stats.wait_time / stats.waiters * 1000, 2) if stats.waiters else 0.0,
+                    "total_wait_ms": round(stats.wait_time * 1000, 2),
+                    "errors": stats.errors
+                }
+                for key, stats in hottest[:top]
+                if stats.waiters > 0
+            }
+        }
+
+    def get_key_stats(self, key: str) -> Optional[FlightStats]:
+        """Stats for a single key, if tracked"""
+        return self._key_stats.get(key)
@@ -0,0 +1,290 @@
+"""
+Streaming Statistics
+Constant-cost aggregators for metric windows
+"""
+
+import math
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+PERCENTILES = (("p50", 0.5), ("p90", 0.9), ("p95", 0.95), ("p99", 0.99))
+
+
+class RunningStats:
+    """
+    Count, sum, mean and variance by Welford's method.
+
+    Values can be removed again, oldest or not, so the statistics can follow
+    a sliding window without revisiting the values that remain in it.
+    """
+
+    __slots__ = ("count", "total", "mean", "_m2")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    def remove(self, value: float):
+        if self.count <= 1:
+            self.__init__()
+            return
+        self.count -= 1
+        self.total -= value
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        # Rounding can leave a tiny negative sum of squares
+        self._m2 = max(self._m2 - delta * (value - self.mean), 0.0)
+
+    @property
+    def variance(self) -> float:
+        """Sample variance, as ``statistics.variance``"""
+        return self._m2 / (self.count - 1) if self.count >= 2 else 0.0
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch with relative error guarantees.
+
+    Each value is counted in the bucket ``ceil(log_gamma(|value|))``, so any
+    quantile is reported within ``relative_accuracy`` of a value that was
+    actually at that rank. Buckets are plain counts: values can be removed,
+    which lets the sketch follow a sliding window, and two sketches with the
+    same accuracy merge by adding counts. Memory grows with the logarithm of
+    the value range, not the number of values (about 1000 buckets span
+    microseconds to hours at 1%).
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-9):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._positive: Dict[int, int] = {}
+        self._negative: Dict[int, int] = {}
+        self._zero = 0
+        self.count = 0
+
+    def _key(self, magnitude: float) -> int:
+        return math.ceil(math.log(magnitude) / self._log_gamma)
+
+    def _bucket_value(self, key: int) -> float:
+        return 2 * self._gamma ** key / (self._gamma + 1)
+
+    def _bucket(self, value: float) -> Tuple[Optional[Dict[int, int]], int]:
+        if value > self.min_value:
+            return self._positive, self._key(value)
+        if value < -self.min_value:
+            return self._negative, self._key(-value)
+        return None, 0
+
+    def add(self, value: float, count: int = 1):
+        buckets, key = self._bucket(value)
+        if buckets is None:
+            self._zero += count
+        else:
+            buckets[key] = buckets.get(key, 0) + count
+        self.count += count
+
+    def remove(self, value: float, count: int = 1):
+        buckets, key = self._bucket(value)
+        if buckets is None:
+            self._zero -= count
+        else:
+            remaining = buckets.get(key, 0) - count
+            if remaining > 0:
+                buckets[key] = remaining
+            else:
+                buckets.pop(key, None)
+        self.count -= count
+
+    def merge(self, other: "QuantileSketch"):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, count in other._positive.items():
+            self._positive[key] = self._positive.get(key, 0) + count
+        for key, count in other._negative.items():
+            self._negative[key] = self._negative.get(key, 0) + count
+        self._zero += other._zero
+        self.count += other.count
+
+    def quantiles(self, qs: List[float]) -> List[Optional[float]]:
+        """Values at the given quantiles, in one pass over the buckets"""
+        if self.count <= 0:
+            return [None] * len(qs)
+
+        # Same rank as indexing the sorted values at int(q * n)
+        ranks = sorted((min(int(q * self.count), self.count - 1), index) for index, q in enumerate(qs))
+        results: List[Optional[float]] = [None] * len(qs)
+        buckets = [(-self._bucket_value(key), count) for key, count in sorted(self._negative.items(), reverse=True)]
+        buckets.append((0.0, self._zero))
+        buckets.extend((self._bucket_value(key), count) for key, count in sorted(self._positive.items()))
+
+        seen = 0
+        position = 0
+        for value, count in buckets:
+            seen += count
+            while position < len(ranks) and ranks[position][0] < seen:
+                results[ranks[position][1]] = value
+                position += 1
+            if position == len(ranks):
+                break
+        return results
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self.quantiles([q])[0]
+
+    @property
+    def bucket_count(self) -> int:
+        return len(self._positive) + len(self._negative) + (1 if self._zero else 0)
+
+
+class WindowedRate:
+    """
+    Sum of values recorded over the last ``window_seconds``, per second.
+
+    Values are added into one-second buckets and buckets that leave the
+    window are subtracted from a running total, so both recording and
+    reading are O(1) amortized.
+    """
+
+    def __init__(self, window_seconds: float = 60.0):
+        self.window_seconds = window_seconds
+        self._buckets: Deque[List[float]] = deque()
+        self._total = 0.0
+        self._first_timestamp: Optional[float] = None
+
+    def _expire(self, now: float):
+        horizon = math.floor(now) - self.window_seconds
+        while self._buckets and self._buckets[0][0] <= horizon:
+            self._total -= self._buckets.popleft()[1]
+
+    def add(self, value: float, timestamp: float):
+        second = math.floor(timestamp)
+        if self._first_timestamp is None:
+            self._first_timestamp = timestamp
+        if self._buckets and self._buckets[-1][0] >= second:
+            # Late values count in the newest bucket
+            self._buckets[-1][1] += value
+        else:
+            self._buckets.append([second, value])
+        self._total += value
+        self._expire(timestamp)
+
+    def rate(self, now: float) -> float:
+        self._expire(now)
+        if self._first_timestamp is None:
+            return 0.0
+        # A window that started recently is averaged over the time it covers
+        span = min(self.window_seconds, max(now - self._first_timestamp, 1.0))
+        return self._total / span
+
+
+class WindowAggregator:
+    """
+    Aggregations over a FIFO window of metric values.
+
+    ``add`` takes each new value and ``remove_oldest`` the value leaving the
+    window, both in O(1) amortized: mean and variance by Welford, min and max
+    by monotonic queues, percentiles from a ``QuantileSketch`` and, for
+    counters, a ``WindowedRate`` of the recorded increments. ``summary``
+    returns the keys the collector has always exposed; percentiles are read
+    from the sketch only when a summary is requested.
+    """
+
+    def __init__(self, track_rate: bool = False, rate_window: float = 60.0,
+                 relative_accuracy: float = 0.01):
+        self.stats = RunningStats()
+        self.sketch = QuantileSketch(relative_accuracy)
+        self.rate = WindowedRate(rate_window) if track_rate else None
+        self._minimums: Deque[Tuple[int, float]] = deque()
+        self._maximums: Deque[Tuple[int, float]] = deque()
+        self._next_seq = 0
+        self._oldest_seq = 0
+        self._last_timestamp: Optional[float] = None
+        self._summary: Optional[Dict[str, float]] = None
+
+    def add(self, value: float, timestamp: float):
+        seq = self._next_seq
+        self._next_seq += 1
+
+        self.stats.add(value)
+        self.sketch.add(value)
+        while self._minimums and self._minimums[-1][1] >= value:
+            self._minimums.pop()
+        self._minimums.append((seq, value))
+        while self._maximums and self._maximums[-1][1] <= value:
+            self._maximums.pop()
+        self._maximums.append((seq, value))
+
+        if self.rate is not None:
+            self.rate.add(value, timestamp)
+        self._last_timestamp = timestamp
+        self._summary = None
+
+    def remove_oldest(self, value: float):
+        """Remove the oldest value still in the window"""
+        if self.stats.count == 0:
+            return
+        seq = self._oldest_seq
+        self._oldest_seq += 1
+
+        self.stats.remove(value)
+        self.sketch.remove(value)
+        if self._minimums and self._minimums[0][0] == seq:
+            self._minimums.popleft()
+        if self._maximums and self._maximums[0][0] == seq:
+            self._maximums.popleft()
+        self._summary = None
+
+    @property
+    def minimum(self) -> Optional[float]:
+        return self._minimums[0][1] if self._minimums else None
+
+    @property
+    def maximum(self) -> Optional[float]:
+        return self._maximums[0][1] if self._maximums else None
+
+    def summary(self, now: Optional[float] = None) -> Dict[str, float]:
+        count = self.stats.count
+        if count == 0:
+            return {}
+
+        if self._summary is None:
+            low, high = self.minimum, self.maximum
+            summary = {
+                "count": count,
+                "sum": self.stats.total,
+                "avg": self.stats.mean,
+                "min": low,
+                "max": high
+            }
+
+            if count >= 2:
+                summary["stddev"] = self.stats.stddev
+                summary["median"] = min(max(self.sketch.quantile(0.5), low), high)
+
+            if count >= 10:
+                values = self.sketch.quantiles([q for _, q in PERCENTILES])
+                for (key, _), value in zip(PERCENTILES, values):
+                    summary[key] = min(max(value, low), high)
+            self._summary = summary
+
+        summary = dict(self._summary)
+        if self.rate is not None and count >= 2:
+            summary["rate_per_second"] = self.rate.rate(
+                now if now is not None else self._last_timestamp
+            )
+        return summary
@@ -0,0 +1,314 @@
+"""
+Threat Scanner
+One scan per request over every registered attack signature
+"""
+
+import codecs
+import re
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple, Union
+
+try:
+    import re._parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from app.core.config import settings
+
+LOCATIONS = ("path", "query", "headers", "body")
+
+# Character classes with more members than this are not useful as anchors
+_MAX_CLASS_ANCHORS = 8
+
+_ATOMIC_GROUP = getattr(sre_parse, "ATOMIC_GROUP", None)
+_REPEATS = tuple(
+    op for op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, "POSSESSIVE_REPEAT", None))
+    if op is not None
+)
+
+
+def _best(candidates: List[FrozenSet[str]]) -> Optional[FrozenSet[str]]:
+    """The most selective literal set: longest shortest member, then fewest members"""
+    if not candidates:
+        return None
+    return max(candidates, key=lambda literals: (min(map(len, literals)), -len(literals)))
+
+
+def _sequence_literals(items) -> Optional[FrozenSet[str]]:
+    candidates: List[FrozenSet[str]] = []
+    run: List[str] = []
+
+    def end_run():
+        if run:
+            candidates.append(frozenset(["".join(run).casefold()]))
+            run.clear()
+
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        end_run()
+
+        if op is sre_parse.SUBPATTERN:
+            literals = _sequence_literals(av[-1])
+        elif _ATOMIC_GROUP is not None and op is _ATOMIC_GROUP:
+            literals = _sequence_literals(av)
+        elif op is sre_parse.BRANCH:
+            branches = [_sequence_literals(branch) for branch in av[1]]
+            literals = None if any(b is None for b in branches) else frozenset().union(*branches)
+        elif op in _REPEATS and av[0] >= 1:
+            literals = _sequence_literals(av[2])
+        elif op is sre_parse.IN and all(code is sre_parse.LITERAL for code, _ in av):
+            literals = frozenset(chr(value).casefold() for _, value in av)
+            if len(literals) > _MAX_CLASS_ANCHORS:
+                literals = None
+        else:
+            literals = None
+
+        if literals:
+            candidates.append(literals)
+    end_run()
+
+    return _best(candidates)
+
+
+def required_literals(pattern: "re.Pattern") -> Optional[FrozenSet[str]]:
+    """
+    Casefolded literals at least one of which occurs in every match of pattern.
+
+    Returns None when no such set can be derived, in which case the pattern
+    has to be run on every input.
+    """
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    except Exception:
+        return None
+
+    literals = _sequence_literals(list(parsed))
+    if not literals or "" in literals:
+        return None
+    # A literal containing another one is implied by it
+    return frozenset(
+        literal for literal in literals
+        if not any(other != literal and other in literal for other in literals)
+    )
+
+
+class ScanResult:
+    """Signature tags matched per request location"""
+
+    def __init__(self):
+        self.matches: Dict[str, Dict[str, str]] = {}
+        self.body_bytes = 0
+        self.body_scanned = False
+        self.body_truncated = False
+        self.body_undecodable = False
+
+    def add(self, location: str, found: Mapping[str, str]):
+        if found:
+            self.matches.setdefault(location, {}).update(found)
+
+    def matched(self, tag: str, locations: Iterable[str] = LOCATIONS) -> bool:
+        return any(tag in self.matches.get(location, {}) for location in locations)
+
+    def tags(self, locations: Iterable[str] = LOCATIONS) -> Dict[str, str]:
+        """Matched tags and the first signature that matched each"""
+        tags: Dict[str, str] = {}
+        for location in locations:
+            for tag, signature in self.matches.get(location, {}).items():
+                tags.setdefault(tag, signature)
+        return tags
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "matches": self.matches,
+            "body_bytes": self.body_bytes,
+            "body_scanned": self.body_scanned,
+            "body_truncated": self.body_truncated,
+            "body_undecodable": self.body_undecodable
+        }
+
+
+class ThreatScanner:
+    """
+    Shared signature scanner for the request security layers.
+
+    Each layer registers its patterns under a tag and reads its tags back
+    from one ``ScanResult`` per request, instead of decoding the body and
+    running its own list. All signatures are compiled into one anchor table:
+    the literals that must occur in any match of each pattern, derived from
+    the regex itself. A scan casefolds the input once, looks up the anchors
+    and runs only the patterns whose anchors are present, so clean input
+    costs a few substring searches instead of every regex. Patterns with no
+    derivable anchor always run. Results are the same as running every
+    pattern separately.
+
+    A combined alternation regex was measured slower than the separate
+    patterns with the stdlib engine, which loses its literal-prefix
+    optimisation across alternatives, so the anchor table is used instead.
+    """
+
+    def __init__(self, max_body_bytes: int = 10 * 1024 * 1024):
+        self.max_body_bytes = max_body_bytes
+        self._signatures: Dict[str, List["re.Pattern"]] = {}
+        self._anchors: Optional[Dict[str, List[Tuple[str, int]]]] = None
+        self._unanchored: List[Tuple[str, int]] = []
+        self._order: Dict[str, int] = {}
+        self.stats = {
+            "scans": 0,
+            "candidates": 0,
+            "regex_runs": 0
+        }
+
+    def register(self, tag: str, patterns: Iterable[Union[str, "re.Pattern"]]):
+        """Register (or replace) the signatures reported under tag"""
+        self._signatures[tag] = [
+            pattern if isinstance(pattern, re.Pattern) else re.compile(pattern)
+            for pattern in patterns
+        ]
+        self._anchors = None
+
+    @property
+    def tags(self) -> List[str]:
+        return list(self._signatures)
+
+    def _build(self) -> Dict[str, List[Tuple[str, int]]]:
+        anchors: Dict[str, List[Tuple[str, int]]] = {}
+        unanchored: List[Tuple[str, int]] = []
+        for tag, patterns in self._signatures.items():
+            for index, pattern in enumerate(patterns):
+                literals = required_literals(pattern)
+                if literals is None:
+                    unanchored.append((tag, index))
+                    continue
+                for literal in literals:
+                    anchors.setdefault(literal, []).append((tag, index))
+
+        self._anchors = anchors
+        self._unanchored = unanchored
+        self._order = {tag: order for order, tag in enumerate(self._signatures)}
+        return self._anchors
+
+    def scan_text(self, text: str, skip: Iterable[str] = ()) -> Dict[str, str]:
+        """Tags whose signatures match text, with the first matching signature of each"""
+        anchors = self._anchors if self._anchors is not None else self._build()
+        skip = set(skip)
+        if not text or len(skip) >= len(self._signatures):
+            return {}
+        self.stats["scans"] += 1
+
+        folded = text.casefold()
+        candidates: Set[Tuple[str, int]] = set(self._unanchored)
+        for anchor, signatures in anchors.items():
+            if anchor in folded:
+                candidates.update(signatures)
+        if not candidates:
+            return {}
+        self.stats["candidates"] += len(candidates)
+
+        found: Dict[str, str] = {}
+        # Registration order, so the first matching signature of a tag is reported
+        for tag, index in sorted(candidates, key=lambda c: (self._order[c[0]], c[1])):
+            if tag in found or tag in skip:
+                continue
+            pattern = self._signatures[tag][index]
+            self.stats["regex_runs"] += 1
+            if pattern.search(text):
+                found[tag] = pattern.pattern
+        return found
+
+    def session(self) -> "ScanSession":
+        return ScanSession(self)
+
+    def scan(self, path: str = "", query: str = "", headers: Optional[Mapping[str, str]] = None,
+             body: Union[bytes, str] = b"") -> ScanResult:
+        """Scan a whole request at once"""
+        session = self.session()
+        session.scan("path", path)
+        session.scan("query", query)
+        session.scan_headers(headers or {})
+        if body:
+            session.feed_body(body.encode("utf-8") if isinstance(body, str) else body)
+        return session.finish()
+
+    def get_stats(self) -> Dict[str, object]:
+        if self._anchors is None:
+            self._build()
+        return {
+            "tags": len(self._signatures),
+            "signatures": sum(len(patterns) for patterns in self._signatures.values()),
+            "anchors": len(self._anchors),
+            "unanchored": len(self._unanchored),
+            **self.stats
+        }
+
+
+class ScanSession:
+    """
+    Scan of one request, fed location by location.
+
+    The body is decoded incrementally as chunks arrive and scanned once, as
+    a whole, by ``finish``, so a match split across chunks is found whatever
+    its length. Only the first ``max_body_bytes`` are scanned and
+    ``body_truncated`` is set when there were more; callers that guard on
+    the body should refuse truncated bodies. A body that is not valid UTF-8
+    is not scanned.
+    """
+
+    def __init__(self, scanner: ThreatScanner):
+        self.scanner = scanner
+        self.result = ScanResult()
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._body: List[str] = []
+
+    def scan(self, location: str, text: str):
+        if text:
+            self.result.add(location, self.scanner.scan_text(text, self.result.matches.get(location, ())))
+
+    def scan_headers(self, headers: Union[Mapping[str, str], Iterable[Tuple[str, str]]]):
+        items = headers.items() if isinstance(headers, Mapping) else headers
+        self.scan("headers", "\n".join(value for _, value in items))
+
+    def feed_body(self, chunk: bytes):
+        result = self.result
+        result.body_bytes += len(chunk)
+        if result.body_undecodable or result.body_truncated or not chunk:
+            return
+
+        room = self.scanner.max_body_bytes - (result.body_bytes - len(chunk))
+        if len(chunk) > room:
+            chunk = chunk[:max(room, 0)]
+            result.body_truncated = True
+
+        try:
+            self._body.append(self._decoder.decode(chunk))
+        except UnicodeDecodeError:
+            self._reject_body()
+
+    def refuse_body(self, length: int):
+        """Mark a body as too large to scan without reading it, e.g. from Content-Length"""
+        self.result.body_bytes = max(self.result.body_bytes, length)
+        self.result.body_truncated = True
+
+    def _reject_body(self):
+        self.result.body_undecodable = True
+        self._body = []
+
+    def finish(self) -> ScanResult:
+        result = self.result
+        if self._body and not result.body_undecodable:
+            if not result.body_truncated:
+                try:
+                    self._decoder.decode(b"", final=True)
+                except UnicodeDecodeError:
+                    self._reject_body()
+            if self._body:
+                # A cut at the cap can end mid-character; the partial one is left out
+                result.body_scanned = True
+                self.scan("body", "".join(self._body))
+        self._body = []
+        return result
+
+
+threat_scanner = ThreatScanner(
+    max_body_bytes=getattr(settings, 'THREAT_SCAN_MAX_BODY_BYTES', 10 * 1024 * 1024)
+)
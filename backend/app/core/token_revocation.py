@@ -0,0 +1,204 @@
+"""
+Token Revocation Service
+Revoked JWT ids stored in Redis and mirrored in every worker
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.redis_client import redis_client
+from app.core.revocation_mirror import RevocationMirror
+
+logger = get_logger(__name__)
+
+
+class TokenRevocationService:
+    """
+    Revoked token ids (``jti``) live in a Redis sorted set scored by token
+    expiry and are announced on a pub/sub channel.
+
+    Each worker keeps a ``RevocationMirror`` (Bloom filter + exact set) that is
+    loaded from the sorted set when the subscription is established and then
+    updated from channel messages. While the mirror is synced, revocation checks
+    are answered locally; while it is not (startup, lost subscription) checks
+    fall back to a Redis lookup.
+    """
+
+    def __init__(self, key: str = "revoked_tokens", channel: str = "token_revocation",
+                 capacity: int = 100000, prune_interval: float = 60.0):
+        self.key = key
+        self.channel = channel
+        self.prune_interval = prune_interval
+        self.mirror = RevocationMirror(capacity=capacity)
+
+        self.synced = False
+        self._running = False
+        self._listener_task: Optional[asyncio.Task] = None
+        self._legacy_imported = False
+
+        self.stats = {
+            "revocations": 0,
+            "messages_received": 0,
+            "remote_checks": 0,
+            "resyncs": 0,
+            "errors": 0
+        }
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        """Load the revoked set and keep the local mirror in sync"""
+        if self._running:
+            return
+        self._running = True
+        self._listener_task = asyncio.create_task(self._listen_loop())
+
+    async def stop(self):
+        self._running = False
+        self.synced = False
+        if self._listener_task and not self._listener_task.done():
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+
+    async def _listen_loop(self):
+        """Subscribe first, then snapshot, so no revocation falls in between"""
+        backoff = 1.0
+
+        while self._running:
+            pubsub = None
+            try:
+                await redis_client.initialize()
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(self.channel)
+                await self.load_snapshot()
+
+                self.synced = True
+                backoff = 1.0
+                next_prune = time.monotonic() + self.prune_interval
+
+                while self._running:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message and message.get("type") == "message":
+                        self.handle_message(message.get("data"))
+
+                    if time.monotonic() >= next_prune:
+                        self.mirror.prune()
+                        next_prune = time.monotonic() + self.prune_interval
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                if self.synced:
+                    logger.warning(f"Token revocation subscription lost, checking Redis directly: {e}")
+                self.synced = False
+                self.stats["errors"] += 1
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+    async def load_snapshot(self):
+        """Replace the mirror with the live entries of the revoked set"""
+        now = time.time()
+        await redis_client.zremrangebyscore(self.key, "-inf", now)
+        entries = await redis_client.zrangebyscore(self.key, now, "+inf", withscores=True)
+
+        revoked = [(jti.decode() if isinstance(jti, bytes) else jti, score) for jti, score in entries]
+        if not self._legacy_imported:
+            revoked.extend(await self._import_legacy_blacklist(now))
+            self._legacy_imported = True
+
+        self.mirror.replace(revoked)
+        self.stats["resyncs"] += 1
+        logger.info(f"Token revocation mirror loaded {len(self.mirror)} revoked tokens")
+
+    async def _import_legacy_blacklist(self, now: float):
+        """Move ids revoked through ``blacklist:{jti}`` keys into the sorted set"""
+        imported = []
+        async for name in redis_client.client.scan_iter(match="blacklist:*", count=1000):
+            name = name.decode() if isinstance(name, bytes) else name
+            ttl = await redis_client.ttl(name)
+            if ttl > 0:
+                imported.append((name.split(":", 1)[1], now + ttl))
+
+        if imported:
+            await redis_client.zadd(self.key, dict(imported))
+        return imported
+
+    def handle_message(self, data: Any):
+        """Apply a revocation announced by another worker"""
+        try:
+            message = json.loads(data)
+            self.mirror.add(message["jti"], float(message["exp"]))
+            self.stats["messages_received"] += 1
+        except (TypeError, ValueError, KeyError):
+            logger.warning("Ignoring malformed token revocation message")
+
+    # ------------------------------------------------------------------
+    # Revocation and checks
+    # ------------------------------------------------------------------
+
+    async def revoke(self, jti: str, expires_at: float) -> bool:
+        """Revoke jti until expires_at (epoch seconds) on every worker"""
+        self.mirror.add(jti, expires_at)
+        self.stats["revocations"] += 1
+        try:
+            await redis_client.zadd(self.key, {jti: expires_at})
+            await redis_client.publish(self.channel, json.dumps({"jti": jti, "exp": expires_at}))
+            return True
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Failed to publish token revocation: {e}")
+            return False
+
+    def is_revoked_local(self, jti: str) -> Optional[bool]:
+        """Local answer, or None when the mirror may be missing revocations"""
+        if self.mirror.is_revoked(jti):
+            return True
+        return False if self.synced else None
+
+    async def is_revoked(self, jti: str) -> bool:
+        """Whether jti is revoked; no network call while the mirror is synced"""
+        revoked = self.is_revoked_local(jti)
+        if revoked is not None:
+            return revoked
+
+        self.stats["remote_checks"] += 1
+        try:
+            expires_at = await redis_client.zscore(self.key, jti)
+            if expires_at is not None and expires_at > time.time():
+                return True
+            # Legacy revocations are only in the sorted set after the first sync
+            return bool(await redis_client.exists(f"blacklist:{jti}"))
+        except Exception as e:
+            # Continue without the revocation check if Redis fails
+            logger.error(f"Redis error checking token revocation: {e}")
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "synced": self.synced,
+            "mirror": self.mirror.get_stats(),
+            **self.stats
+        }
+
+
+# Global revocation service
+token_revocation_service = TokenRevocationService(
+    key=getattr(settings, 'TOKEN_REVOCATION_KEY', "revoked_tokens"),
+    channel=getattr(settings, 'TOKEN_REVOCATION_CHANNEL', "token_revocation"),
+    capacity=getattr(settings, 'TOKEN_REVOCATION_CAPACITY', 100000)
+)
@@ -508,7 +508,10 @@ class UserExperienceMonitor:
             if not batch:
                 return
             
-            # Store in Redis
+            # Store in Redis; commands are issued together so the client's
+            # auto-pipelining sends them in a single round trip
+            commands = []
+            bucket_keys = set()
             for interaction in batch:
                 interaction_data = {
                     "interaction_id": interaction.interaction_id,
@@ -530,8 +533,11 @@ class UserExperienceMonitor:
                 hour_key = interaction.timestamp.strftime('%Y%m%d_%H')
                 key = f"ux_interactions:{hour_key}"
                 
-                await redis_client.lpush(key, json.dumps(interaction_data))
-                await redis_client.expire(key, 86400 * 30)  # Keep for 30 days
+                commands.append(redis_client.lpush(key, json.dumps(interaction_data)))
+                bucket_keys.add(key)
+            
+            commands.extend(redis_client.expire(key, 86400 * 30) for key in bucket_keys)  # Keep for 30 days
+            await asyncio.gather(*commands)
             
             logger.debug(f"Processed {len(batch)} interactions")
             
@@ -553,7 +559,9 @@ class UserExperienceMonitor:
             if not batch:
                 return
             
-            # Store in Redis
+            # Store in Redis (pipelined by the client, see _process_interactions)
+            commands = []
+            bucket_keys = set()
             for performance in batch:
                 perf_data = {
                     "session_id": performance.session_id,
@@ -576,8 +584,11 @@ class UserExperienceMonitor:
                 hour_key = performance.timestamp.strftime('%Y%m%d_%H')
                 key = f"ux_performance:{hour_key}"
                 
-                await redis_client.lpush(key, json.dumps(perf_data))
-                await redis_client.expire(key, 86400 * 30)  # Keep for 30 days
+                commands.append(redis_client.lpush(key, json.dumps(perf_data)))
+                bucket_keys.add(key)
+            
+            commands.extend(redis_client.expire(key, 86400 * 30) for key in bucket_keys)  # Keep for 30 days
+            await asyncio.gather(*commands)
             
             logger.debug(f"Processed {len(batch)} performance records")
             
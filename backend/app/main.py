@@ -1,8 +1,8 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import socketio
 
 from app.core.config import settings
@@ -13,26 +13,26 @@ from app.websocket.manager import websocket_manager
 from app.middleware.security import (
     SecurityMiddleware,
     IPWhitelistMiddleware,
-    RateLimitMiddleware as EnhancedRateLimitMiddleware,
-    XSSProtectionMiddleware as EnhancedXSSProtectionMiddleware,
     setup_cors
 )
 from app.middleware import (
-    RateLimitMiddleware,
-    SecurityHeadersMiddleware,
-    SQLInjectionProtectionMiddleware,
-    XSSProtectionMiddleware,
-    RequestValidationMiddleware,
+    ASGIRateLimitMiddleware,
+    ASGISecurityHeadersMiddleware,
+    ASGISQLInjectionProtectionMiddleware,
+    ASGIXSSProtectionMiddleware,
+    ASGIRequestValidationMiddleware,
     create_cors_middleware
 )
 from app.middleware.error_handler import error_handler_middleware, create_exception_handlers
 from app.middleware.logging_middleware import (
-    LoggingMiddleware,
-    PerformanceLoggingMiddleware,
-    AuditLoggingMiddleware
+    ASGILoggingMiddleware,
+    ASGIPerformanceLoggingMiddleware,
+    ASGIAuditLoggingMiddleware
 )
 from app.core.logger import logger, configure_external_loggers
-from app.core.i18n_middleware import I18nMiddleware
+from app.core.i18n_middleware import ASGII18nMiddleware
+from app.middleware.metrics import ASGIMetricsMiddleware
+from app.core.prometheus_metrics import generate_metrics, mark_process_dead, scrape_allowed
 
 # Configure external loggers
 configure_external_loggers()
@@ -55,6 +55,8 @@ app = FastAPI(
 create_exception_handlers(app)
 
 # Add security middlewares (order matters - executed in reverse order)
+# The ASGI* middlewares share one RequestContext per request (headers parsed
+# once, body read once) instead of wrapping each layer in BaseHTTPMiddleware.
 
 # 1. CORS middleware (should be last to be added, first to execute)
 setup_cors(app)
@@ -80,48 +82,51 @@ if hasattr(settings, 'ALLOWED_HOSTS'):
     )
 
 # 6. Security headers
-app.add_middleware(SecurityHeadersMiddleware)
+app.add_middleware(ASGISecurityHeadersMiddleware)
 
 # 7. Request validation
-app.add_middleware(RequestValidationMiddleware)
+app.add_middleware(ASGIRequestValidationMiddleware)
 
 # 8. Enhanced XSS protection
-app.add_middleware(EnhancedXSSProtectionMiddleware)
+app.add_middleware(ASGIXSSProtectionMiddleware)
 
 # 9. SQL injection protection
-app.add_middleware(SQLInjectionProtectionMiddleware)
+app.add_middleware(ASGISQLInjectionProtectionMiddleware)
 
-# 10. Enhanced Rate limiting
+# 10. Rate limiting (ASGI, so the ASGI layers stay contiguous around it)
 app.add_middleware(
-    EnhancedRateLimitMiddleware,
+    ASGIRateLimitMiddleware,
     requests_per_minute=settings.RATE_LIMIT_PER_MINUTE if hasattr(settings, 'RATE_LIMIT_PER_MINUTE') else 60
 )
 
 # 11. I18n middleware
-app.add_middleware(I18nMiddleware)
+app.add_middleware(ASGII18nMiddleware)
 
-# 12. Logging middlewares
+# 12. Request metrics (Prometheus and the metrics collector)
+app.add_middleware(ASGIMetricsMiddleware)
+
+# 13. Logging middlewares
 app.add_middleware(
-    AuditLoggingMiddleware,
+    ASGIAuditLoggingMiddleware,
     audit_paths=["/api/v1/users", "/api/v1/auth", "/api/v1/admin"],
     audit_methods=["POST", "PUT", "PATCH", "DELETE"]
 )
 
 app.add_middleware(
-    PerformanceLoggingMiddleware,
+    ASGIPerformanceLoggingMiddleware,
     slow_request_threshold=1.0,
     log_all_requests=settings.DEBUG
 )
 
 app.add_middleware(
-    LoggingMiddleware,
+    ASGILoggingMiddleware,
     log_request_body=settings.DEBUG,
     log_response_body=False,
     exclude_paths=["/health", "/metrics", "/docs", "/openapi.json"],
     sensitive_fields=["password", "token", "secret", "api_key", "authorization"]
 )
 
-# 13. Error handler middleware (should be one of the first middleware added)
+# 14. Error handler middleware (should be one of the first middleware added)
 app.middleware("http")(error_handler_middleware)
 
 
@@ -141,6 +146,19 @@ async def health_check():
     return {"status": "healthy"}
 
 
+# Off by default; when on, only the addresses in METRICS_ALLOWED_IPS may scrape
+if getattr(settings, 'METRICS_ENDPOINT_ENABLED', False):
+    metrics_allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', ["127.0.0.1", "::1"])
+
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics(request: Request):
+        """Prometheus scrape endpoint (sync, so merging worker files runs off the event loop)"""
+        if not scrape_allowed(request.client.host if request.client else None, metrics_allowed_ips):
+            return JSONResponse(status_code=403, content={"detail": "Forbidden"})
+        body, content_type = generate_metrics()
+        return Response(content=body, media_type=content_type)
+
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
 
@@ -164,6 +182,26 @@ async def startup_event():
     await analytics_websocket_manager.start_analytics_stream()
     
     logger.info("Analytics services started")
+    
+    # Start cross-worker L1 cache invalidation
+    from app.core.cache_invalidation_bus import cache_invalidation_bus
+    
+    await cache_invalidation_bus.start()
+    
+    # Mirror revoked token ids locally so token checks skip Redis
+    from app.core.token_revocation import token_revocation_service
+    
+    await token_revocation_service.start()
+    
+    # Pre-load the hottest cache keys recorded by previous processes
+    from app.core.advanced_cache import cache_warmer
+    
+    await cache_warmer.start()
+    
+    # Share one adaptive rate limit across workers
+    from app.middleware.api_optimization import adaptive_rate_limiter
+    
+    await adaptive_rate_limiter.start()
 
 # Shutdown event
 @app.on_event("shutdown")
@@ -179,6 +217,34 @@ async def shutdown_event():
     await analytics_websocket_manager.stop_analytics_stream()
     
     logger.info("Analytics services stopped")
+    
+    # Stop cross-worker L1 cache invalidation
+    from app.core.cache_invalidation_bus import cache_invalidation_bus
+    
+    await cache_invalidation_bus.stop()
+    
+    # Stop the token revocation mirror
+    from app.core.token_revocation import token_revocation_service
+    
+    await token_revocation_service.stop()
+    
+    # Persist the hot key set for the next deploy
+    from app.core.advanced_cache import cache_warmer
+    
+    await cache_warmer.stop()
+    
+    # Stop the adaptive rate limit sync
+    from app.middleware.api_optimization import adaptive_rate_limiter
+    
+    await adaptive_rate_limiter.stop()
+    
+    # Stop the password hashing pool
+    from app.core.security import password_hasher
+    
+    password_hasher.shutdown(wait=False)
+    
+    # Stop counting this worker in the live gauges of the metrics endpoint
+    mark_process_dead()
 
 
 # Mount Socket.IO app
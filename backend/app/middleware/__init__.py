@@ -1,4 +1,4 @@
-from .rate_limiter import RateLimitMiddleware, create_rate_limit_decorator
+from .rate_limiter import RateLimitMiddleware, ASGIRateLimitMiddleware, create_rate_limit_decorator
 from .security import (
     SecurityHeadersMiddleware,
     SQLInjectionProtectionMiddleware,
@@ -6,11 +6,17 @@ from .security import (
     RequestValidationMiddleware,
     IPWhitelistMiddleware,
     APIKeyMiddleware,
-    create_cors_middleware
+    create_cors_middleware,
+    ASGISecurityHeadersMiddleware,
+    ASGISQLInjectionProtectionMiddleware,
+    ASGIXSSProtectionMiddleware,
+    ASGIRequestValidationMiddleware
 )
+from .request_context import RequestContext, ContextMiddleware, get_request_context
 
 __all__ = [
     "RateLimitMiddleware",
+    "ASGIRateLimitMiddleware",
     "create_rate_limit_decorator",
     "SecurityHeadersMiddleware",
     "SQLInjectionProtectionMiddleware",
@@ -18,5 +24,12 @@ __all__ = [
     "RequestValidationMiddleware",
     "IPWhitelistMiddleware",
     "APIKeyMiddleware",
-    "create_cors_middleware"
+    "create_cors_middleware",
+    "ASGISecurityHeadersMiddleware",
+    "ASGISQLInjectionProtectionMiddleware",
+    "ASGIXSSProtectionMiddleware",
+    "ASGIRequestValidationMiddleware",
+    "RequestContext",
+    "ContextMiddleware",
+    "get_request_context"
 ]
\ No newline at end of file
@@ -4,9 +4,12 @@ Request/Response optimization, rate limiting, and performance monitoring
 """
 
 import asyncio
+import os
+import socket
 import time
 import json
 import hashlib
+import uuid
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Callable
 from collections import defaultdict, deque
@@ -17,9 +20,11 @@ from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response as StarletteResponse
 
+from app.core.config import settings
 from app.core.logger import get_logger
 from app.core.redis_client import redis_client
 from app.core.api_optimizer import api_optimizer
+from app.core.adaptive_limits import AIMDController, LoadSample, aggregate_samples, fair_share
 
 logger = get_logger(__name__)
 
@@ -126,10 +131,143 @@ class RequestQueue:
             "semaphore_available": self.semaphore._value
         }
 
+class ClusterLimitCoordinator:
+    """
+    Keeps one adaptive rate limit for all workers.
+    
+    Every ``interval`` each worker writes a load sample (queue load, requests
+    and 5xx responses since its last sample) to a Redis hash and reads back
+    everyone's samples. The first worker to claim the interval's tick key
+    advances the shared AIMD controller from the cluster-wide load and error
+    rate; the others pick up its state. Each worker then enforces its fair
+    share of the shared limit, so the effective limit no longer scales with
+    the number of workers.
+    """
+    
+    def __init__(self, controller: AIMDController, interval: float = 10.0,
+                 key_prefix: str = "adaptive_limit"):
+        self.controller = controller
+        self.interval = interval
+        self.samples_key = f"{key_prefix}:samples"
+        self.state_key = f"{key_prefix}:state"
+        self.tick_key = f"{key_prefix}:tick"
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        
+        self.requests = 0
+        self.errors = 0
+        self.active_workers = 1
+        self.synced_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "syncs": 0,
+            "controller_updates": 0,
+            "sync_errors": 0
+        }
+    
+    def record(self, status_code: int):
+        """Count a response toward this worker's next sample"""
+        self.requests += 1
+        if status_code >= 500:
+            self.errors += 1
+    
+    def start(self, load_fn: Callable[[], float]):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(load_fn))
+    
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+    
+    @property
+    def synced(self) -> bool:
+        return time.time() - self.synced_at <= 3 * self.interval
+    
+    def worker_limit(self) -> Optional[int]:
+        """This worker's share of the cluster limit, or None if out of sync"""
+        if not self.synced:
+            return None
+        return fair_share(self.controller.current_limit, self.active_workers)
+    
+    async def _run(self, load_fn: Callable[[], float]):
+        while True:
+            try:
+                await self.sync(load_fn())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["sync_errors"] += 1
+                logger.error(f"Adaptive limit sync failed: {e}")
+            await asyncio.sleep(self.interval)
+    
+    async def sync(self, load: float):
+        """Publish this worker's sample and refresh the shared limit"""
+        now = time.time()
+        max_age = 3 * self.interval
+        sample = LoadSample(self.worker_id, load, self.requests, self.errors, now)
+        self.requests = 0
+        self.errors = 0
+        
+        await redis_client.hset(self.samples_key, self.worker_id, json.dumps(sample.to_dict()))
+        await redis_client.expire(self.samples_key, int(max_age * 2))
+        
+        samples = []
+        stale = []
+        for field, value in (await redis_client.hgetall(self.samples_key)).items():
+            try:
+                peer = LoadSample.from_dict(json.loads(value))
+            except (TypeError, ValueError, KeyError):
+                stale.append(field)
+                continue
+            if now - peer.timestamp > max_age:
+                stale.append(field)
+            else:
+                samples.append(peer)
+        if stale:
+            await redis_client.hdel(self.samples_key, *stale)
+        
+        cluster_load, error_rate, workers = aggregate_samples(samples, now, max_age)
+        
+        # One worker per interval advances the controller
+        tick = f"{self.tick_key}:{int(now // self.interval)}"
+        state = await self._load_state()
+        if state:
+            self.controller.load_state(state)
+        if await redis_client.set(tick, self.worker_id, ex=int(self.interval * 2) + 1, nx=True):
+            self.controller.update(cluster_load, error_rate)
+            await redis_client.hset(self.state_key, mapping=self.controller.get_state())
+            self.stats["controller_updates"] += 1
+        
+        self.active_workers = max(1, workers)
+        self.synced_at = now
+        self.stats["syncs"] += 1
+    
+    async def _load_state(self) -> Dict[str, Any]:
+        raw = await redis_client.hgetall(self.state_key)
+        return {
+            (key.decode() if isinstance(key, bytes) else key): (value.decode() if isinstance(value, bytes) else value)
+            for key, value in raw.items()
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "synced": self.synced,
+            "active_workers": self.active_workers,
+            "worker_limit": self.worker_limit(),
+            "controller": self.controller.get_state(),
+            **self.stats
+        }
+
 class AdaptiveRateLimiter:
     """Adaptive rate limiting based on system load"""
     
-    def __init__(self, base_limit: int = 100, window_seconds: int = 60):
+    def __init__(self, base_limit: int = 100, window_seconds: int = 60,
+                 cluster_mode: bool = False, sync_interval: float = 10.0):
         self.base_limit = base_limit
         self.window_seconds = window_seconds
         self.request_counts = defaultdict(lambda: deque())
@@ -139,6 +277,18 @@ class AdaptiveRateLimiter:
         self.system_load = 0.0
         self.last_load_check = time.time()
         
+        # Cluster-wide limit shared through Redis; local rules apply while unsynced
+        self.coordinator = None
+        if cluster_mode:
+            self.coordinator = ClusterLimitCoordinator(
+                AIMDController(
+                    base_limit=base_limit,
+                    min_limit=max(1, base_limit // 10),
+                    max_limit=base_limit * 5
+                ),
+                interval=sync_interval
+            )
+        
     async def is_allowed(self, identifier: str, 
                         request_type: str = "api") -> tuple[bool, Dict[str, Any]]:
         """Check if request is allowed"""
@@ -176,6 +326,11 @@ class AdaptiveRateLimiter:
         """Calculate adaptive rate limit based on system conditions"""
         base_limit = self.user_limits[identifier]
         
+        if self.coordinator is not None:
+            worker_limit = self.coordinator.worker_limit()
+            if worker_limit is not None:
+                return max(1, int(worker_limit * base_limit / self.base_limit))
+        
         # Update system load
         await self._update_system_load()
         
@@ -194,23 +349,40 @@ class AdaptiveRateLimiter:
         now = time.time()
         if now - self.last_load_check > 10:  # Update every 10 seconds
             try:
-                # Get queue stats from request queue
-                queue_stats = request_queue.get_queue_stats()
-                active_ratio = queue_stats["active_requests"] / request_queue.max_concurrent
-                queue_ratio = queue_stats["total_queued"] / request_queue.max_queue_size
-                
-                self.system_load = (active_ratio + queue_ratio) / 2
+                self.system_load = self._measure_load()
                 self.last_load_check = now
                 
             except Exception as e:
                 logger.error(f"System load update failed: {e}")
+    
+    def _measure_load(self) -> float:
+        """This worker's load from the request queue (0..1)"""
+        queue_stats = request_queue.get_queue_stats()
+        active_ratio = queue_stats["active_requests"] / request_queue.max_concurrent
+        queue_ratio = queue_stats["total_queued"] / request_queue.max_queue_size
+        return (active_ratio + queue_ratio) / 2
+    
+    def record_response(self, status_code: int):
+        """Feed response outcomes into the cluster error rate"""
+        if self.coordinator is not None:
+            self.coordinator.record(status_code)
+    
+    async def start(self):
+        """Start syncing the cluster limit (called from application startup)"""
+        if self.coordinator is not None:
+            self.coordinator.start(self._measure_load)
+    
+    async def stop(self):
+        """Stop syncing the cluster limit (called from application shutdown)"""
+        if self.coordinator is not None:
+            await self.coordinator.stop()
 
 class RequestOptimizationMiddleware(BaseHTTPMiddleware):
     """Comprehensive request optimization middleware"""
     
     def __init__(self, app):
         super().__init__(app)
-        self.rate_limiter = AdaptiveRateLimiter()
+        self.rate_limiter = adaptive_rate_limiter
         self.metrics: deque = deque(maxlen=10000)
         
         # Request deduplication
@@ -283,6 +455,8 @@ class RequestOptimizationMiddleware(BaseHTTPMiddleware):
                     call_next, (request,), priority
                 )
             
+            self.rate_limiter.record_response(response.status_code)
+            
             # Add optimization headers
             response = await self._add_optimization_headers(
                 request, response, rate_info
@@ -465,6 +639,9 @@ class RequestOptimizationMiddleware(BaseHTTPMiddleware):
             "status_code_distribution": dict(status_codes),
             "queue_stats": request_queue.get_queue_stats(),
             "rate_limiter_active_users": len(self.rate_limiter.request_counts),
+            "adaptive_limit": (
+                self.rate_limiter.coordinator.get_stats() if self.rate_limiter.coordinator else None
+            ),
             "deduplication_active": len(self.pending_requests)
         }
 
@@ -474,6 +651,12 @@ request_queue = RequestQueue(
     max_queue_size=getattr(settings, 'MAX_QUEUE_SIZE', 1000)
 )
 
+# Shared by every RequestOptimizationMiddleware; the cluster sync runs from app startup
+adaptive_rate_limiter = AdaptiveRateLimiter(
+    cluster_mode=getattr(settings, 'ADAPTIVE_RATE_LIMIT_CLUSTER', True),
+    sync_interval=getattr(settings, 'ADAPTIVE_RATE_LIMIT_SYNC_INTERVAL', 10.0)
+)
+
 request_optimization_middleware = RequestOptimizationMiddleware
 
 # Utility functions
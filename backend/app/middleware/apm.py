@@ -16,6 +16,7 @@ from starlette.responses import Response as StarletteResponse
 from app.core.logger import get_logger
 from app.core.apm import apm_collector, record_endpoint_performance, performance_context
 from app.core.distributed_tracing import distributed_tracer
+from app.middleware.request_context import ContextMiddleware, RequestContext
 
 logger = get_logger(__name__)
 
@@ -352,6 +353,50 @@ class APMMiddleware(BaseHTTPMiddleware):
             "excluded_paths": self.excluded_paths
         }
 
+class ASGIAPMMiddleware(ContextMiddleware, APMMiddleware):
+    """Pure-ASGI APMMiddleware"""
+    
+    async def handle(self, context: RequestContext, receive, send):
+        if self._should_exclude_path(context.path) or not self._should_sample():
+            await self.app(context.scope, receive, send)
+            return
+        
+        request = context.request
+        request_id = context.request_id
+        start_time = time.time()
+        
+        self._record_request_start(request, request_id, start_time)
+        
+        try:
+            async with performance_context(f"http_request_{context.method}_{context.path}") as span:
+                span.set_attribute("http.method", context.method)
+                span.set_attribute("http.url", str(request.url))
+                span.set_attribute("http.route", getattr(request, 'route', {}).get('path', ''))
+                span.set_attribute("apm.request_id", request_id)
+                
+                system_before = self._capture_system_snapshot()
+                
+                context.on_response_start(
+                    lambda response: self._add_apm_headers(response, request_id, time.time() - start_time)
+                )
+                await self.app(context.scope, receive, send)
+                
+                system_after = self._capture_system_snapshot()
+                
+                if context.response is not None:
+                    await self._record_request_metrics(
+                        request, context.response, request_id, time.time() - start_time,
+                        system_before, system_after, span
+                    )
+                
+        except Exception as e:
+            response_time = time.time() - start_time
+            await self._record_error_metrics(request, request_id, response_time, e)
+            raise
+            
+        finally:
+            self._cleanup_request(request_id)
+
 class DatabaseAPMMiddleware:
     """APM middleware for database operations"""
     
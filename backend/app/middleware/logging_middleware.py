@@ -3,17 +3,30 @@ Request/Response logging middleware.
 """
 import time
 import json
+import random
 from typing import Optional, Dict, Any
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.types import Message
 
+from app.core.config import settings
 from app.core.logger import logger
 from app.utils.security_logger import get_client_ip
+from app.middleware.request_context import ContextMiddleware, RequestContext
 
 
 class LoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware for logging requests and responses"""
+    """
+    Middleware for logging requests and responses.
+    
+    Successful requests can be sampled per route: ``sample_rates`` maps path
+    prefixes to the fraction of requests logged, the longest matching prefix
+    wins and ``sample_rate`` covers the rest. A sampled-out request logs
+    nothing unless it fails or takes longer than ``slow_request_threshold``,
+    in which case its completion record is written with the full request
+    details. Sampled records carry their ``sample_rate`` so counts can be
+    scaled back up.
+    """
     
     def __init__(self, app, **kwargs):
         super().__init__(app)
@@ -24,6 +37,13 @@ class LoggingMiddleware(BaseHTTPMiddleware):
             "password", "token", "secret", "api_key", "authorization"
         ])
         self.max_body_size = kwargs.get("max_body_size", 1024)  # 1KB
+        self.slow_request_threshold = kwargs.get(
+            "slow_request_threshold", getattr(settings, 'LOG_SLOW_REQUEST_THRESHOLD', 1.0)
+        )
+        self.sample_rate = kwargs.get("sample_rate", getattr(settings, 'LOG_SAMPLE_RATE', 1.0))
+        sample_rates = kwargs.get("sample_rates", getattr(settings, 'LOG_SAMPLE_RATES', {}))
+        self.sample_rates = sorted(sample_rates.items(), key=lambda item: len(item[0]), reverse=True)
+        self.sampling_stats = {"sampled": 0, "skipped": 0}
     
     async def dispatch(self, request: Request, call_next):
         """Process request and log details"""
@@ -33,16 +53,19 @@ class LoggingMiddleware(BaseHTTPMiddleware):
         
         # Start timing
         start_time = time.time()
+        sample_rate = self._sample_rate(request.url.path)
+        sampled = sample_rate >= 1 or random.random() < sample_rate
         
         # Extract request details
         request_details = await self._extract_request_details(request)
         
         # Log incoming request
-        logger.info(
-            "Incoming request",
-            **request_details,
-            log_type="request"
-        )
+        if sampled:
+            logger.info(
+                "Incoming request",
+                **request_details,
+                log_type="request"
+            )
         
         # Process request
         response = await call_next(request)
@@ -55,19 +78,51 @@ class LoggingMiddleware(BaseHTTPMiddleware):
         
         # Combine request and response details
         log_data = {**request_details, **response_details}
+        self._log_completion(log_data, response.status_code, duration, sampled, sample_rate)
         
-        # Log based on status code
-        if response.status_code >= 500:
+        return response
+    
+    def _sample_rate(self, path: str) -> float:
+        """Fraction of successful requests to path that are logged"""
+        for prefix, rate in self.sample_rates:
+            if path.startswith(prefix):
+                return rate
+        return self.sample_rate
+    
+    def _log_completion(self, log_data: Dict[str, Any], status_code: int, duration: float,
+                        sampled: bool, sample_rate: float):
+        """Log the finished request; errors and slow requests are never sampled out"""
+        if status_code >= 500:
             logger.error("Request failed with server error", **log_data)
-        elif response.status_code >= 400:
+        elif status_code >= 400:
             logger.warning("Request failed with client error", **log_data)
-        else:
+        elif duration > self.slow_request_threshold:
+            logger.warning("Request completed slowly", slow_request=True, **log_data)
+        elif sampled:
+            if sample_rate < 1:
+                log_data["sample_rate"] = sample_rate
             logger.info("Request completed successfully", **log_data)
         
-        return response
+        self.sampling_stats["sampled" if sampled else "skipped"] += 1
     
     async def _extract_request_details(self, request: Request) -> Dict[str, Any]:
         """Extract relevant details from request"""
+        details = self._request_details(request)
+        
+        # Add request body if enabled and not too large
+        if self.log_request_body and request.method in ["POST", "PUT", "PATCH"]:
+            try:
+                body = await request.body()
+                details["request_body"] = self._describe_request_body(
+                    body, request.headers.get("content-type", "")
+                )
+            except Exception as e:
+                details["request_body"] = f"<error reading body: {str(e)}>"
+        
+        return details
+    
+    def _request_details(self, request: Request) -> Dict[str, Any]:
+        """Request details that do not need the body"""
         # Get client IP
         client_ip = get_client_ip(request)
         
@@ -97,27 +152,18 @@ class LoggingMiddleware(BaseHTTPMiddleware):
                 headers[header] = value
         details["headers"] = headers
         
-        # Add request body if enabled and not too large
-        if self.log_request_body and request.method in ["POST", "PUT", "PATCH"]:
-            try:
-                body = await request.body()
-                if len(body) <= self.max_body_size:
-                    content_type = request.headers.get("content-type", "")
-                    
-                    if "application/json" in content_type:
-                        body_data = json.loads(body)
-                        # Mask sensitive fields
-                        body_data = self._mask_sensitive_data(body_data)
-                        details["request_body"] = body_data
-                    else:
-                        details["request_body"] = f"<{content_type} data>"
-                else:
-                    details["request_body"] = f"<body too large: {len(body)} bytes>"
-            except Exception as e:
-                details["request_body"] = f"<error reading body: {str(e)}>"
-        
         return details
     
+    def _describe_request_body(self, body: bytes, content_type: str) -> Any:
+        """Loggable form of a request body, with sensitive fields masked"""
+        if len(body) > self.max_body_size:
+            return f"<body too large: {len(body)} bytes>"
+        
+        if "application/json" in content_type:
+            # Mask sensitive fields
+            return self._mask_sensitive_data(json.loads(body))
+        return f"<{content_type} data>"
+    
     async def _extract_response_details(
         self,
         response: Response,
@@ -174,16 +220,7 @@ class PerformanceLoggingMiddleware(BaseHTTPMiddleware):
         start_time = time.time()
         
         # Track memory usage before request (if psutil available)
-        memory_before = 0
-        memory_after = 0
-        memory_delta = 0
-        
-        try:
-            import psutil
-            process = psutil.Process()
-            memory_before = process.memory_info().rss / 1024 / 1024  # MB
-        except ImportError:
-            pass
+        memory_before = self._memory_mb()
         
         # Process request
         response = await call_next(request)
@@ -191,32 +228,43 @@ class PerformanceLoggingMiddleware(BaseHTTPMiddleware):
         # Calculate metrics
         duration = time.time() - start_time
         
+        memory_after = self._memory_mb()
+        
+        # Log if slow or if logging all requests
+        self._log_performance(
+            request.method, request.url.path, duration,
+            memory_before, memory_after, response.status_code
+        )
+        
+        # Add performance headers
+        response.headers["X-Response-Time"] = f"{round(duration * 1000, 2)}ms"
+        
+        return response
+    
+    def _memory_mb(self) -> float:
+        """Resident memory of this process in MB, or 0 without psutil"""
         try:
             import psutil
             process = psutil.Process()
-            memory_after = process.memory_info().rss / 1024 / 1024  # MB
-            memory_delta = memory_after - memory_before
+            return process.memory_info().rss / 1024 / 1024  # MB
         except ImportError:
-            pass
-        
-        # Log if slow or if logging all requests
+            return 0
+    
+    def _log_performance(self, method: str, path: str, duration: float,
+                         memory_before: float, memory_after: float, status_code: int):
+        """Log request performance if slow or if logging all requests"""
         if duration > self.slow_request_threshold or self.log_all_requests:
             logger.log_performance(
-                operation=f"{request.method} {request.url.path}",
+                operation=f"{method} {path}",
                 duration=duration,
                 metadata={
                     "memory_before_mb": round(memory_before, 2),
                     "memory_after_mb": round(memory_after, 2),
-                    "memory_delta_mb": round(memory_delta, 2),
-                    "status_code": response.status_code,
+                    "memory_delta_mb": round(memory_after - memory_before, 2),
+                    "status_code": status_code,
                     "slow_request": duration > self.slow_request_threshold
                 }
             )
-        
-        # Add performance headers
-        response.headers["X-Response-Time"] = f"{round(duration * 1000, 2)}ms"
-        
-        return response
 
 
 class AuditLoggingMiddleware(BaseHTTPMiddleware):
@@ -282,4 +330,102 @@ class AuditLoggingMiddleware(BaseHTTPMiddleware):
             audit_phase="complete"
         )
         
-        return response
\ No newline at end of file
+        return response
+
+
+class ASGILoggingMiddleware(ContextMiddleware, LoggingMiddleware):
+    """Pure-ASGI LoggingMiddleware reading the body through the request context"""
+    
+    async def handle(self, context: RequestContext, receive, send):
+        if any(context.path.startswith(path) for path in self.exclude_paths):
+            await self.app(context.scope, receive, send)
+            return
+        
+        start_time = time.time()
+        sample_rate = self._sample_rate(context.path)
+        sampled = sample_rate >= 1 or random.random() < sample_rate
+        
+        request_details = self._request_details(context.request)
+        if self.log_request_body and context.method in ["POST", "PUT", "PATCH"]:
+            try:
+                request_details["request_body"] = self._describe_request_body(
+                    await context.body(), context.headers.get("content-type", "")
+                )
+            except Exception as e:
+                request_details["request_body"] = f"<error reading body: {str(e)}>"
+        
+        if sampled:
+            logger.info(
+                "Incoming request",
+                **request_details,
+                log_type="request"
+            )
+        
+        await self.app(context.scope, receive, send)
+        
+        response = context.response
+        if response is None:
+            return
+        
+        duration = time.time() - start_time
+        response_details = await self._extract_response_details(response, duration)
+        log_data = {**request_details, **response_details}
+        self._log_completion(log_data, response.status_code, duration, sampled, sample_rate)
+
+
+class ASGIPerformanceLoggingMiddleware(ContextMiddleware, PerformanceLoggingMiddleware):
+    """Pure-ASGI PerformanceLoggingMiddleware"""
+    
+    async def handle(self, context: RequestContext, receive, send):
+        start_time = time.time()
+        memory_before = self._memory_mb()
+        
+        def add_response_time(response):
+            duration = time.time() - start_time
+            response.headers["X-Response-Time"] = f"{round(duration * 1000, 2)}ms"
+        
+        context.on_response_start(add_response_time)
+        await self.app(context.scope, receive, send)
+        
+        if context.response is not None:
+            self._log_performance(
+                context.method, context.path, time.time() - start_time,
+                memory_before, self._memory_mb(), context.response.status_code
+            )
+
+
+class ASGIAuditLoggingMiddleware(ContextMiddleware, AuditLoggingMiddleware):
+    """Pure-ASGI AuditLoggingMiddleware"""
+    
+    async def handle(self, context: RequestContext, receive, send):
+        needs_audit = (
+            any(context.path.startswith(path) for path in self.audit_paths) and
+            context.method in self.audit_methods
+        )
+        
+        if not needs_audit:
+            await self.app(context.scope, receive, send)
+            return
+        
+        user = getattr(context.state, "user", None)
+        audit_details = {
+            "user_id": user.id if user else None,
+            "client_ip": context.client_ip,
+            "request_id": getattr(context.state, "request_id", None),
+            "method": context.method,
+            "path": context.path,
+            "log_type": "audit"
+        }
+        
+        logger.info("Audit: Operation started", **audit_details, audit_phase="start")
+        
+        await self.app(context.scope, receive, send)
+        
+        status_code = context.status_code
+        logger.info(
+            "Audit: Operation completed",
+            **audit_details,
+            status_code=status_code,
+            success=status_code is not None and status_code < 400,
+            audit_phase="complete"
+        )
@@ -12,11 +12,30 @@ from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response as StarletteResponse
 
+from app.core.config import settings
+from app.core.label_cardinality import label_limiter
 from app.core.logger import get_logger
 from app.core.metrics_collector import metrics_collector, record_metric
+from app.core.prometheus_metrics import (
+    business_events,
+    observe_cache_operation,
+    observe_db_query,
+    observe_request,
+    observe_request_failure,
+    user_actions,
+)
+from app.middleware.request_context import ContextMiddleware, RequestContext
 
 logger = get_logger(__name__)
 
+# Endpoint label for requests that matched no route (404 probes, scanners)
+UNMATCHED_ENDPOINT = "__unmatched__"
+
+async def _record_to_collector(name: str, value: float, labels: Dict[str, str] = None):
+    """Record into the MetricsCollector (and from there Redis) unless METRICS_REDIS_ENABLED is off"""
+    if getattr(settings, 'METRICS_REDIS_ENABLED', True):
+        await record_metric(name, value, labels)
+
 class MetricsMiddleware(BaseHTTPMiddleware):
     """Middleware for automatic metrics collection"""
     
@@ -46,60 +65,58 @@ class MetricsMiddleware(BaseHTTPMiddleware):
         start_time = time.time()
         request_start = datetime.utcnow()
         
-        # Prepare labels
-        labels = self._get_request_labels(request)
-        
-        # Increment request counter
-        await record_metric("http_requests_total", 1.0, labels)
-        
         try:
             # Process request
             response = await call_next(request)
-            
-            # Calculate response time
-            response_time = time.time() - start_time
-            
-            # Update labels with response info
-            labels.update(self._get_response_labels(response))
-            
-            # Record metrics
-            await self._record_request_metrics(
-                request, response, response_time, labels
-            )
-            
-            # Add metrics headers
-            self._add_metrics_headers(response, response_time)
-            
-            return response
-            
         except Exception as e:
             # Record error metrics
-            response_time = time.time() - start_time
-            labels["status"] = "error"
-            labels["error"] = type(e).__name__
-            
-            await record_metric("http_request_duration", response_time, labels)
-            await record_metric("http_requests_errors_total", 1.0, labels)
-            
+            await self._record_request_failure(request, time.time() - start_time, e)
             raise
+        
+        # Calculate response time
+        response_time = time.time() - start_time
+        
+        # Labels use the matched route, known once the router has run
+        labels = self._get_request_labels(request)
+        await _record_to_collector("http_requests_total", 1.0, labels)
+        
+        # Update labels with response info
+        labels.update(self._get_response_labels(response))
+        
+        # Record metrics
+        await self._record_request_metrics(
+            request, response, response_time, labels
+        )
+        
+        # Add metrics headers
+        self._add_metrics_headers(response, response_time)
+        
+        return response
     
     def _should_exclude_path(self, path: str) -> bool:
         """Check if path should be excluded from metrics"""
         return any(path.startswith(excluded) for excluded in self.excluded_paths)
     
     def _get_request_labels(self, request: Request) -> Dict[str, str]:
-        """Extract labels from request"""
+        """Extract labels from request, with values bounded per label"""
         labels = {
             "method": request.method,
-            "endpoint": self._normalize_path(request.url.path),
+            "endpoint": self._route_template(request.scope),
             "scheme": request.url.scheme
         }
         
-        # Add route pattern if available
-        if hasattr(request, 'route') and request.route:
-            labels["route"] = getattr(request.route, 'path', request.url.path)
+        return label_limiter.limit("http_requests", labels)
+    
+    def _route_template(self, scope: Dict[str, Any]) -> str:
+        """Path template of the matched route, e.g. /api/v1/users/{user_id}"""
+        route = scope.get("route")
+        template = getattr(route, "path_format", None) or getattr(route, "path", None)
+        if template:
+            return template
         
-        return labels
+        # No FastAPI route (404s, mounted apps): one shared value, so junk
+        # paths can't use up the endpoint budget meant for route templates
+        return UNMATCHED_ENDPOINT
     
     def _get_response_labels(self, response: Response) -> Dict[str, str]:
         """Extract labels from response"""
@@ -110,6 +127,19 @@ class MetricsMiddleware(BaseHTTPMiddleware):
             "status_class": f"{status_code // 100}xx"
         }
     
+    async def _record_request_failure(self, request: Request, response_time: float,
+                                      error: Exception):
+        """Record metrics for a request whose handler raised"""
+        labels = self._get_request_labels(request)
+        await _record_to_collector("http_requests_total", 1.0, labels)
+        observe_request_failure(labels["method"], labels["endpoint"], response_time, error)
+        
+        labels["status"] = "error"
+        labels["error"] = type(error).__name__
+        
+        await _record_to_collector("http_request_duration", response_time, labels)
+        await _record_to_collector("http_requests_errors_total", 1.0, labels)
+    
     def _normalize_path(self, path: str) -> str:
         """Normalize path for metrics (remove dynamic segments)"""
         # Simple normalization - replace numeric segments with placeholders
@@ -127,23 +157,28 @@ class MetricsMiddleware(BaseHTTPMiddleware):
                                     response_time: float, labels: Dict[str, str]):
         """Record comprehensive request metrics"""
         try:
+            request_size = int(request.headers.get("content-length", 0))
+            response_size = int(response.headers.get("content-length", 0))
+            observe_request(
+                labels["method"], labels["endpoint"], response.status_code,
+                response_time, request_size, response_size
+            )
+            
             # Response time
-            await record_metric("http_request_duration", response_time, labels)
+            await _record_to_collector("http_request_duration", response_time, labels)
             
             # Request size
-            request_size = int(request.headers.get("content-length", 0))
             if request_size > 0:
-                await record_metric("http_request_size_bytes", request_size, labels)
+                await _record_to_collector("http_request_size_bytes", request_size, labels)
             
             # Response size
-            response_size = int(response.headers.get("content-length", 0))
             if response_size > 0:
-                await record_metric("http_response_size_bytes", response_size, labels)
+                await _record_to_collector("http_response_size_bytes", response_size, labels)
             
             # Status-specific metrics
             if response.status_code >= 400:
                 error_labels = {**labels, "error_type": "http_error"}
-                await record_metric("http_requests_errors_total", 1.0, error_labels)
+                await _record_to_collector("http_requests_errors_total", 1.0, error_labels)
             
             # Detailed metrics if enabled
             if self.enable_detailed_metrics:
@@ -159,29 +194,29 @@ class MetricsMiddleware(BaseHTTPMiddleware):
             # Slow request detection
             if response_time > 1.0:  # > 1 second
                 slow_labels = {**labels, "threshold": "1s"}
-                await record_metric("http_requests_slow_total", 1.0, slow_labels)
+                await _record_to_collector("http_requests_slow_total", 1.0, slow_labels)
             
             if response_time > 5.0:  # > 5 seconds
                 very_slow_labels = {**labels, "threshold": "5s"}
-                await record_metric("http_requests_very_slow_total", 1.0, very_slow_labels)
+                await _record_to_collector("http_requests_very_slow_total", 1.0, very_slow_labels)
             
             # Large response detection
             response_size = int(response.headers.get("content-length", 0))
             if response_size > 1024 * 1024:  # > 1MB
                 large_labels = {**labels, "size_threshold": "1MB"}
-                await record_metric("http_responses_large_total", 1.0, large_labels)
+                await _record_to_collector("http_responses_large_total", 1.0, large_labels)
             
             # Client information
             user_agent = request.headers.get("user-agent", "")
             if user_agent:
                 client_labels = {**labels, "client_type": self._classify_user_agent(user_agent)}
-                await record_metric("http_requests_by_client_total", 1.0, client_labels)
+                await _record_to_collector("http_requests_by_client_total", 1.0, client_labels)
             
             # Geographic information (if available)
             client_ip = self._get_client_ip(request)
             if client_ip:
                 geo_labels = {**labels, "region": self._get_region_from_ip(client_ip)}
-                await record_metric("http_requests_by_region_total", 1.0, geo_labels)
+                await _record_to_collector("http_requests_by_region_total", 1.0, geo_labels)
             
         except Exception as e:
             logger.error(f"Failed to record detailed metrics: {e}")
@@ -234,19 +269,21 @@ class DatabaseMetricsMiddleware:
     def __init__(self):
         self.active_queries: Dict[str, Dict[str, Any]] = {}
     
-    async def before_query(self, query: str, operation: str = "select") -> str:
+    async def before_query(self, query: str, operation: str = "select",
+                           table: str = "unknown") -> str:
         """Called before database query"""
         query_id = f"db_query_{int(time.time() * 1000000)}"
         
         self.active_queries[query_id] = {
             "query": query[:100],  # Truncated query
             "operation": operation.lower(),
+            "table": table,
             "start_time": time.time()
         }
         
         # Record query start
         labels = {"operation": operation.lower()}
-        await record_metric("database_queries_total", 1.0, labels)
+        await _record_to_collector("database_queries_total", 1.0, labels)
         
         return query_id
     
@@ -264,22 +301,27 @@ class DatabaseMetricsMiddleware:
             "status": "error" if error else "success"
         }
         
+        observe_db_query(
+            query_info["operation"], execution_time, table=query_info["table"],
+            error=error, rows_affected=rows_affected
+        )
+        
         # Record execution time
-        await record_metric("database_query_duration", execution_time, labels)
+        await _record_to_collector("database_query_duration", execution_time, labels)
         
         # Record rows affected
         if rows_affected > 0:
-            await record_metric("database_rows_affected", rows_affected, labels)
+            await _record_to_collector("database_rows_affected", rows_affected, labels)
         
         # Record errors
         if error:
             error_labels = {**labels, "error_type": type(error).__name__}
-            await record_metric("database_queries_errors_total", 1.0, error_labels)
+            await _record_to_collector("database_queries_errors_total", 1.0, error_labels)
         
         # Slow query detection
         if execution_time > 1.0:  # > 1 second
             slow_labels = {**labels, "threshold": "1s"}
-            await record_metric("database_queries_slow_total", 1.0, slow_labels)
+            await _record_to_collector("database_queries_slow_total", 1.0, slow_labels)
         
         # Clean up
         del self.active_queries[query_id]
@@ -291,25 +333,26 @@ class CacheMetricsMiddleware:
                                    hit: bool = None, size: int = None):
         """Record cache operation metrics"""
         try:
+            observe_cache_operation(operation, hit, size)
             labels = {"operation": operation}
             
             # Record operation
-            await record_metric("cache_operations_total", 1.0, labels)
+            await _record_to_collector("cache_operations_total", 1.0, labels)
             
             # Record hit/miss
             if hit is not None:
                 hit_labels = {**labels, "result": "hit" if hit else "miss"}
-                await record_metric("cache_hit_miss_total", 1.0, hit_labels)
+                await _record_to_collector("cache_hit_miss_total", 1.0, hit_labels)
                 
                 # Update hit rate calculation
                 if hit:
-                    await record_metric("cache_hits_total", 1.0, labels)
+                    await _record_to_collector("cache_hits_total", 1.0, labels)
                 else:
-                    await record_metric("cache_misses_total", 1.0, labels)
+                    await _record_to_collector("cache_misses_total", 1.0, labels)
             
             # Record size
             if size is not None:
-                await record_metric("cache_operation_size_bytes", size, labels)
+                await _record_to_collector("cache_operation_size_bytes", size, labels)
             
         except Exception as e:
             logger.error(f"Failed to record cache metrics: {e}")
@@ -324,17 +367,21 @@ class BusinessMetricsCollector:
                                 metadata: Dict[str, str] = None):
         """Record user action metrics"""
         try:
+            user_actions.labels(**label_limiter.limit("user_actions", {
+                "action": action,
+                "user_type": self._classify_user(user_id) if user_id else "anonymous"
+            })).inc()
             labels = {"action": action}
             
             if metadata:
                 labels.update(metadata)
             
-            await record_metric("user_actions_total", 1.0, labels)
+            await _record_to_collector("user_actions_total", 1.0, labels)
             
             # Record by user type if available
             if user_id:
                 user_labels = {**labels, "user_type": self._classify_user(user_id)}
-                await record_metric("user_actions_by_type_total", 1.0, user_labels)
+                await _record_to_collector("user_actions_by_type_total", 1.0, user_labels)
             
         except Exception as e:
             logger.error(f"Failed to record user action: {e}")
@@ -343,11 +390,15 @@ class BusinessMetricsCollector:
                                   labels: Dict[str, str] = None):
         """Record business event metrics"""
         try:
+            # Free-form labels only go to the collector; the exposition
+            # needs a fixed label set per metric, and counters can't go down
+            if value >= 0:
+                business_events.labels(**label_limiter.limit("business_events", {"event": event})).inc(value)
             event_labels = {"event": event}
             if labels:
                 event_labels.update(labels)
             
-            await record_metric("business_events_total", value, event_labels)
+            await _record_to_collector("business_events_total", value, event_labels)
             
         except Exception as e:
             logger.error(f"Failed to record business event: {e}")
@@ -361,4 +412,37 @@ class BusinessMetricsCollector:
 metrics_middleware = MetricsMiddleware
 database_metrics_middleware = DatabaseMetricsMiddleware()
 cache_metrics_middleware = CacheMetricsMiddleware()
-business_metrics_collector = BusinessMetricsCollector()
\ No newline at end of file
+business_metrics_collector = BusinessMetricsCollector()
+
+
+class ASGIMetricsMiddleware(ContextMiddleware, MetricsMiddleware):
+    """Pure-ASGI MetricsMiddleware"""
+    
+    async def handle(self, context: RequestContext, receive, send):
+        if self._should_exclude_path(context.path):
+            await self.app(context.scope, receive, send)
+            return
+        
+        start_time = time.time()
+        request = context.request
+        
+        context.on_response_start(
+            lambda response: self._add_metrics_headers(response, time.time() - start_time)
+        )
+        
+        try:
+            await self.app(context.scope, receive, send)
+        except Exception as e:
+            await self._record_request_failure(request, time.time() - start_time, e)
+            raise
+        
+        labels = self._get_request_labels(request)
+        await _record_to_collector("http_requests_total", 1.0, labels)
+        
+        response = context.response
+        if response is None:
+            return
+        
+        response_time = time.time() - start_time
+        labels.update(self._get_response_labels(response))
+        await self._record_request_metrics(request, response, response_time, labels)
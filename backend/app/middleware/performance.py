@@ -9,55 +9,24 @@ from datetime import datetime
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.types import ASGIApp
-import prometheus_client
-from prometheus_client import Counter, Histogram, Gauge
 import json
 
 from app.core.config import settings
 from app.utils.logger import performance_logger
-
-
-# Prometheus metrics
-request_count = Counter(
-    'http_requests_total',
-    'Total HTTP requests',
-    ['method', 'endpoint', 'status']
-)
-
-request_duration = Histogram(
-    'http_request_duration_seconds',
-    'HTTP request duration in seconds',
-    ['method', 'endpoint'],
-    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
-)
-
-active_requests = Gauge(
-    'http_requests_active',
-    'Number of active HTTP requests'
-)
-
-db_query_duration = Histogram(
-    'db_query_duration_seconds',
-    'Database query duration in seconds',
-    ['operation', 'table']
-)
-
-cache_hit_rate = Counter(
-    'cache_hits_total',
-    'Cache hit/miss counter',
-    ['cache_type', 'hit']
-)
-
-websocket_connections = Gauge(
-    'websocket_connections_active',
-    'Number of active WebSocket connections'
+from app.middleware.request_context import ContextMiddleware, RequestContext
+from app.core.prometheus_metrics import (
+    active_requests,
+    cache_hit_rate,
+    cpu_usage,
+    disk_usage,
+    generate_metrics,
+    memory_usage,
+    observe_db_query,
+    observe_request,
+    observe_request_failure,
+    websocket_connections,
 )
 
-# System metrics
-cpu_usage = Gauge('system_cpu_usage_percent', 'CPU usage percentage')
-memory_usage = Gauge('system_memory_usage_percent', 'Memory usage percentage')
-disk_usage = Gauge('system_disk_usage_percent', 'Disk usage percentage')
-
 
 class PerformanceMiddleware(BaseHTTPMiddleware):
     """
@@ -111,68 +80,62 @@ class PerformanceMiddleware(BaseHTTPMiddleware):
             # Calculate duration
             duration = time.time() - start_time
             
-            # Record metrics
-            request_count.labels(
-                method=method,
-                endpoint=path,
-                status=response.status_code
-            ).inc()
-            
-            request_duration.labels(
-                method=method,
-                endpoint=path
-            ).observe(duration)
-            
-            # Log slow requests
-            if duration > self.slow_request_threshold:
-                performance_logger.warning(
-                    "Slow request detected",
-                    path=path,
-                    method=method,
-                    duration=duration,
-                    status=response.status_code,
-                    threshold=self.slow_request_threshold
-                )
+            self._record_request(
+                method, path, duration, response.status_code,
+                request_size, response.headers.get('content-length', 0)
+            )
             
             # Add performance headers
             response.headers["X-Request-Duration"] = f"{duration:.3f}"
             response.headers["X-Process-Time"] = f"{duration:.3f}"
             
-            # Log request metrics
-            performance_logger.info(
-                "Request completed",
-                path=path,
-                method=method,
-                duration=duration,
-                status=response.status_code,
-                request_size=request_size,
-                response_size=response.headers.get('content-length', 0)
-            )
-            
             return response
             
         except Exception as e:
-            duration = time.time() - start_time
-            
-            # Record error metrics
-            request_count.labels(
-                method=method,
-                endpoint=path,
-                status=500
-            ).inc()
+            self._record_failure(method, path, time.time() - start_time, e)
+            raise
             
-            performance_logger.error(
-                "Request failed",
+        finally:
+            active_requests.dec()
+    
+    def _record_request(self, method: str, path: str, duration: float, status_code: int,
+                        request_size: int, response_size: Any):
+        """Record metrics and logs for a completed request"""
+        observe_request(method, path, status_code, duration, request_size, int(response_size or 0))
+        
+        # Log slow requests
+        if duration > self.slow_request_threshold:
+            performance_logger.warning(
+                "Slow request detected",
                 path=path,
                 method=method,
                 duration=duration,
-                error=str(e)
+                status=status_code,
+                threshold=self.slow_request_threshold
             )
-            
-            raise
-            
-        finally:
-            active_requests.dec()
+        
+        # Log request metrics
+        performance_logger.info(
+            "Request completed",
+            path=path,
+            method=method,
+            duration=duration,
+            status=status_code,
+            request_size=request_size,
+            response_size=response_size
+        )
+    
+    def _record_failure(self, method: str, path: str, duration: float, error: Exception):
+        """Record metrics and logs for a request that raised"""
+        observe_request_failure(method, path, duration, error)
+        
+        performance_logger.error(
+            "Request failed",
+            path=path,
+            method=method,
+            duration=duration,
+            error=str(error)
+        )
     
     async def _collect_system_metrics(self):
         """Collect system metrics periodically"""
@@ -214,6 +177,42 @@ class PerformanceMiddleware(BaseHTTPMiddleware):
                 await asyncio.sleep(60)
 
 
+class ASGIPerformanceMiddleware(ContextMiddleware, PerformanceMiddleware):
+    """Pure-ASGI PerformanceMiddleware"""
+    
+    async def handle(self, context: RequestContext, receive, send):
+        if context.path == "/health":
+            await self.app(context.scope, receive, send)
+            return
+        
+        active_requests.inc()
+        start_time = time.time()
+        request_size = int(context.headers.get('content-length', 0))
+        
+        def add_performance_headers(response):
+            duration = time.time() - start_time
+            response.headers["X-Request-Duration"] = f"{duration:.3f}"
+            response.headers["X-Process-Time"] = f"{duration:.3f}"
+        
+        context.on_response_start(add_performance_headers)
+        
+        try:
+            await self.app(context.scope, receive, send)
+            
+            if context.response is not None:
+                self._record_request(
+                    context.method, context.path, time.time() - start_time,
+                    context.response.status_code, request_size, context.response_size
+                )
+            
+        except Exception as e:
+            self._record_failure(context.method, context.path, time.time() - start_time, e)
+            raise
+            
+        finally:
+            active_requests.dec()
+
+
 class RequestTimingMiddleware:
     """
     Lightweight timing middleware for development.
@@ -258,10 +257,7 @@ def track_db_query(operation: str, table: str):
                 duration = time.time() - start_time
                 
                 # Record metric
-                db_query_duration.labels(
-                    operation=operation,
-                    table=table
-                ).observe(duration)
+                observe_db_query(operation, duration, table=table)
                 
                 # Log slow queries
                 if duration > 0.5:
@@ -275,6 +271,7 @@ def track_db_query(operation: str, table: str):
                 return result
             except Exception as e:
                 duration = time.time() - start_time
+                observe_db_query(operation, duration, table=table, error=e)
                 performance_logger.error(
                     "Database query failed",
                     operation=operation,
@@ -366,5 +363,5 @@ class PerformanceProfiler:
 
 # Export Prometheus metrics endpoint
 def get_metrics():
-    """Get Prometheus metrics"""
-    return prometheus_client.generate_latest()
\ No newline at end of file
+    """Get Prometheus metrics, merged across workers in multiprocess mode"""
+    return generate_metrics()[0]
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+Rate Limit Scripts
+Server-side Lua for atomic multi-window rate limiting
+"""
+
+import hashlib
+import math
+import uuid
+from typing import Any, Dict, List, Sequence, Tuple
+
+from redis.exceptions import NoScriptError
+
+# Both scripts check every window in KEYS atomically and record the request in
+# all of them only when every window allows it, so one round trip enforces the
+# minute and hour limits together. Time comes from the Redis server clock, so
+# workers with skewed clocks agree. Times are in microseconds.
+#
+# Reply: {allowed, limit, remaining, reset_us, retry_after_us, now_us} for the
+# most restrictive window.
+
+# Exact sliding window: one sorted-set member per accepted request.
+# ARGV: member, then limit and window_us for each key.
+SLIDING_WINDOW_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000000 + tonumber(time[2])
+local member = ARGV[1]
+
+local counts = {}
+local allowed = 1
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[i * 2])
+    local window = tonumber(ARGV[i * 2 + 1])
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    counts[i] = redis.call('ZCARD', key)
+    if counts[i] >= limit then
+        allowed = 0
+    end
+end
+
+local result = nil
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[i * 2])
+    local window = tonumber(ARGV[i * 2 + 1])
+    local count = counts[i]
+    if allowed == 1 then
+        redis.call('ZADD', key, now, member)
+        redis.call('PEXPIRE', key, math.ceil(window / 1000))
+        count = count + 1
+    end
+
+    local reset = now + window
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    if oldest[2] then
+        reset = tonumber(oldest[2]) + window
+    end
+    local retry_after = 0
+    if counts[i] >= limit then
+        retry_after = reset - now
+    end
+
+    local remaining = math.max(limit - count, 0)
+    if result == nil or retry_after > result[5] or (retry_after == result[5] and remaining < result[3]) then
+        result = {allowed, limit, remaining, reset, retry_after, now}
+    end
+end
+return result
+"""
+
+# GCRA: one theoretical arrival time (TAT) per window. A window of limit
+# requests per window_us emits one request every window_us / limit and
+# tolerates a burst of the full limit.
+# ARGV: unused, then limit and window_us for each key.
+GCRA_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000000 + tonumber(time[2])
+
+local tats = {}
+local allowed = 1
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[i * 2])
+    local window = tonumber(ARGV[i * 2 + 1])
+    local tat = tonumber(redis.call('GET', key) or now)
+    if tat < now then
+        tat = now
+    end
+    tats[i] = tat
+    if tat + window / limit - window > now then
+        allowed = 0
+    end
+end
+
+local result = nil
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[i * 2])
+    local window = tonumber(ARGV[i * 2 + 1])
+    local emission = window / limit
+    local tat = tats[i]
+    local allow_at = tat + emission - window
+
+    local retry_after = 0
+    if allow_at > now then
+        retry_after = allow_at - now
+    end
+    if allowed == 1 then
+        tat = tat + emission
+        redis.call('SET', key, string.format('%.0f', tat), 'PX', math.max(1, math.ceil((tat - now) / 1000)))
+    end
+
+    local remaining = math.max(math.floor((window - (tat - now)) / emission), 0)
+    if result == nil or retry_after > result[5] or (retry_after == result[5] and remaining < result[3]) then
+        result = {allowed, limit, remaining, tat, retry_after, now}
+    end
+end
+return result
+"""
+
+SCRIPTS = {
+    "sliding_window": SLIDING_WINDOW_SCRIPT,
+    "gcra": GCRA_SCRIPT,
+}
+
+
+class RateLimitScript:
+    """
+    A rate limit algorithm run through EVALSHA.
+
+    Only the script's SHA is sent. The body is loaded when the server
+    answers NOSCRIPT (first use, restart, failover, SCRIPT FLUSH) and the call
+    is retried.
+    """
+
+    def __init__(self, algorithm: str = "sliding_window"):
+        if algorithm not in SCRIPTS:
+            raise ValueError(f"Unknown rate limit algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self.source = SCRIPTS[algorithm]
+        self.sha = hashlib.sha1(self.source.encode()).hexdigest()
+        self.stats = {
+            "calls": 0,
+            "script_loads": 0
+        }
+
+    async def check(self, redis_client, keys: Sequence[str],
+                    windows: Sequence[Tuple[int, int]]) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Check and record one request against every (limit, window_seconds) window.
+
+        Returns (allowed, info) with the limit, remaining and reset (epoch
+        seconds) of the most restrictive window, plus retry_after in seconds.
+        """
+        args: List[Any] = [uuid.uuid4().hex]
+        for limit, window_seconds in windows:
+            args.extend((limit, window_seconds * 1000000))
+
+        reply = await self._evalsha(redis_client, keys, args)
+        self.stats["calls"] += 1
+
+        allowed, limit, remaining, reset_us, retry_after_us, _ = (int(value) for value in reply)
+        return bool(allowed), {
+            "limit": limit,
+            "remaining": remaining,
+            "reset": math.ceil(reset_us / 1000000),
+            "retry_after": math.ceil(retry_after_us / 1000000)
+        }
+
+    async def _evalsha(self, redis_client, keys: Sequence[str], args: Sequence[Any]) -> List[Any]:
+        try:
+            return await redis_client.evalsha(self.sha, len(keys), *keys, *args)
+        except NoScriptError:
+            await self._load(redis_client)
+            return await redis_client.evalsha(self.sha, len(keys), *keys, *args)
+
+    async def _load(self, redis_client):
+        self.sha = await redis_client.script_load(self.source)
+        self.stats["script_loads"] += 1
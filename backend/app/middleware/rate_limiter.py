@@ -1,132 +1,80 @@
-from typing import Dict, Optional, Tuple
+from typing import List, Optional, Tuple
 import time
-import redis
+import logging
 from datetime import datetime, timedelta
 from fastapi import Request, HTTPException, status
 from fastapi.responses import Response
 from starlette.middleware.base import BaseHTTPMiddleware
-from collections import defaultdict
-import asyncio
 
 from app.core.config import settings
+from app.core.memory_rate_limiter import MemoryRateLimiter
+from app.core.redis_client import EnhancedRedisClient, redis_client
+from app.middleware.rate_limit_scripts import RateLimitScript
+from app.middleware.request_context import ContextMiddleware, RequestContext
+
+logger = logging.getLogger(__name__)
 
 
 class RateLimiter:
-    """Rate limiter implementation using token bucket algorithm"""
+    """Rate limiter using atomic Redis scripts, with an in-memory fallback"""
     
     def __init__(
         self,
-        redis_client: Optional[redis.StrictRedis] = None,
+        redis_client: Optional[EnhancedRedisClient] = None,
         requests_per_minute: int = 60,
         requests_per_hour: int = 1000,
-        burst_size: int = 10
+        burst_size: int = 10,
+        algorithm: str = "sliding_window",
+        memory_max_entries: int = 10000
     ):
         self.redis_client = redis_client
         self.requests_per_minute = requests_per_minute
         self.requests_per_hour = requests_per_hour
         self.burst_size = burst_size
+        self.script = RateLimitScript(algorithm)
         
-        # Fallback to in-memory storage if Redis not available
-        self.memory_storage: Dict[str, Dict[str, any]] = defaultdict(dict)
-        self.cleanup_task = None
+        # Fallback to in-memory counters if Redis not available
+        self.memory_limiter = MemoryRateLimiter(max_entries=memory_max_entries)
     
     async def _get_redis_key(self, identifier: str, window: str) -> str:
         """Generate Redis key for rate limiting"""
+        if self.script.algorithm == "gcra":
+            return f"rate_limit:gcra:{identifier}:{window}"
         return f"rate_limit:{identifier}:{window}"
     
     async def _check_redis_limit(
         self,
         identifier: str,
-        limit: int,
-        window_seconds: int,
-        window_name: str
+        windows: List[Tuple[int, int, str]]
     ) -> Tuple[bool, dict]:
-        """Check rate limit using Redis"""
+        """
+        Check all (limit, window_seconds, window_name) windows in one round trip.
+        
+        The script checks and records atomically on the Redis server, so
+        concurrent requests from any worker are counted exactly.
+        """
         if not self.redis_client:
-            return await self._check_memory_limit(identifier, limit, window_seconds, window_name)
+            return await self._check_memory_limits(identifier, windows)
         
         try:
-            key = await self._get_redis_key(identifier, window_name)
-            current_time = int(time.time())
-            window_start = current_time - window_seconds
-            
-            # Use Redis sorted set for sliding window
-            pipeline = self.redis_client.pipeline()
-            
-            # Remove old entries
-            pipeline.zremrangebyscore(key, 0, window_start)
-            
-            # Count requests in current window
-            pipeline.zcard(key)
-            
-            # Add current request
-            pipeline.zadd(key, {str(current_time): current_time})
-            
-            # Set expiry
-            pipeline.expire(key, window_seconds)
-            
-            results = pipeline.execute()
-            request_count = results[1]
-            
-            if request_count >= limit:
-                return False, {
-                    "limit": limit,
-                    "remaining": 0,
-                    "reset": current_time + window_seconds
-                }
-            
-            return True, {
-                "limit": limit,
-                "remaining": limit - request_count - 1,
-                "reset": current_time + window_seconds
-            }
-            
-        except Exception:
+            keys = [await self._get_redis_key(identifier, name) for _, _, name in windows]
+            return await self.script.check(
+                self.redis_client, keys, [(limit, seconds) for limit, seconds, _ in windows]
+            )
+        except Exception as e:
             # Fallback to memory if Redis fails
-            return await self._check_memory_limit(identifier, limit, window_seconds, window_name)
+            logger.debug(f"Redis rate limit check failed, using memory: {e}")
+            return await self._check_memory_limits(identifier, windows)
     
-    async def _check_memory_limit(
+    async def _check_memory_limits(
         self,
         identifier: str,
-        limit: int,
-        window_seconds: int,
-        window_name: str
+        windows: List[Tuple[int, int, str]]
     ) -> Tuple[bool, dict]:
-        """Check rate limit using in-memory storage"""
-        current_time = time.time()
-        window_key = f"{identifier}:{window_name}"
-        
-        if window_key not in self.memory_storage:
-            self.memory_storage[window_key] = {
-                "requests": [],
-                "tokens": self.burst_size
-            }
-        
-        storage = self.memory_storage[window_key]
-        window_start = current_time - window_seconds
-        
-        # Remove old requests
-        storage["requests"] = [
-            req_time for req_time in storage["requests"]
-            if req_time > window_start
-        ]
-        
-        # Check if under limit
-        if len(storage["requests"]) >= limit:
-            return False, {
-                "limit": limit,
-                "remaining": 0,
-                "reset": int(current_time + window_seconds)
-            }
-        
-        # Add current request
-        storage["requests"].append(current_time)
-        
-        return True, {
-            "limit": limit,
-            "remaining": limit - len(storage["requests"]),
-            "reset": int(current_time + window_seconds)
-        }
+        """Check rate limit using in-memory sliding-window counters"""
+        return self.memory_limiter.check(
+            identifier, [(limit, seconds) for limit, seconds, _ in windows]
+        )
     
     async def check_rate_limit(
         self,
@@ -142,41 +90,10 @@ class RateLimiter:
             minute_limit = self.requests_per_minute
             hour_limit = self.requests_per_hour
         
-        # Check minute limit
-        minute_allowed, minute_info = await self._check_redis_limit(
-            identifier, minute_limit, 60, "minute"
-        )
-        
-        if not minute_allowed:
-            return False, minute_info
-        
-        # Check hour limit
-        hour_allowed, hour_info = await self._check_redis_limit(
-            identifier, hour_limit, 3600, "hour"
-        )
-        
-        return hour_allowed, hour_info
-    
-    async def cleanup_memory_storage(self):
-        """Periodically clean up old entries from memory storage"""
-        while True:
-            await asyncio.sleep(300)  # Clean up every 5 minutes
-            current_time = time.time()
-            
-            keys_to_delete = []
-            for key, storage in self.memory_storage.items():
-                # Remove entries older than 1 hour
-                storage["requests"] = [
-                    req_time for req_time in storage["requests"]
-                    if req_time > current_time - 3600
-                ]
-                
-                # Delete empty entries
-                if not storage["requests"]:
-                    keys_to_delete.append(key)
-            
-            for key in keys_to_delete:
-                del self.memory_storage[key]
+        return await self._check_redis_limit(identifier, [
+            (minute_limit, 60, "minute"),
+            (hour_limit, 3600, "hour")
+        ])
 
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
@@ -185,24 +102,19 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
     def __init__(self, app, **kwargs):
         super().__init__(app)
         
-        # Initialize Redis client
-        try:
-            self.redis_client = redis.StrictRedis(
-                host=settings.REDIS_HOST if hasattr(settings, 'REDIS_HOST') else "localhost",
-                port=settings.REDIS_PORT if hasattr(settings, 'REDIS_PORT') else 6379,
-                db=settings.REDIS_DB if hasattr(settings, 'REDIS_DB') else 1,
-                decode_responses=True
-            )
-            self.redis_client.ping()
-        except:
-            self.redis_client = None
+        # Shared async Redis client; checks fall back to memory while it is down
+        self.redis_client = redis_client if kwargs.get('use_redis', True) else None
         
         # Initialize rate limiter
         self.rate_limiter = RateLimiter(
             redis_client=self.redis_client,
             requests_per_minute=kwargs.get('requests_per_minute', 60),
             requests_per_hour=kwargs.get('requests_per_hour', 1000),
-            burst_size=kwargs.get('burst_size', 10)
+            burst_size=kwargs.get('burst_size', 10),
+            algorithm=kwargs.get('algorithm', getattr(settings, 'RATE_LIMIT_ALGORITHM', "sliding_window")),
+            memory_max_entries=kwargs.get(
+                'memory_max_entries', getattr(settings, 'RATE_LIMIT_MEMORY_MAX_ENTRIES', 10000)
+            )
         )
         
         # Paths to exclude from rate limiting
@@ -213,63 +125,98 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             "/metrics"
         ])
     
-    async def dispatch(self, request: Request, call_next):
-        """Process request with rate limiting"""
-        # Skip rate limiting for excluded paths
-        if any(request.url.path.startswith(path) for path in self.exclude_paths):
-            return await call_next(request)
-        
-        # Get client identifier
-        client_ip = request.client.host
+    def _is_excluded(self, path: str) -> bool:
+        return any(path.startswith(excluded) for excluded in self.exclude_paths)
+    
+    async def _check(self, client_ip: str, headers) -> Tuple[bool, dict]:
+        """Check the rate limit of a client"""
         identifier = client_ip
         
         # Check if user is authenticated
         is_authenticated = False
-        auth_header = request.headers.get("Authorization", "")
+        auth_header = headers.get("Authorization", "")
         if auth_header.startswith("Bearer "):
             is_authenticated = True
             # Use user ID as identifier if possible
             # This would require decoding the token, which we skip for performance
             identifier = f"auth:{client_ip}"
         
-        # Check rate limit
-        allowed, limit_info = await self.rate_limiter.check_rate_limit(
-            identifier, is_authenticated
-        )
-        
-        # Add rate limit headers
+        return await self.rate_limiter.check_rate_limit(identifier, is_authenticated)
+    
+    @staticmethod
+    def _rejection(limit_info: dict) -> Response:
         response = Response(
-            content="",
+            content=b"Rate limit exceeded. Please try again later.",
             status_code=status.HTTP_429_TOO_MANY_REQUESTS
         )
-        response.headers["X-RateLimit-Limit"] = str(limit_info["limit"])
-        response.headers["X-RateLimit-Remaining"] = str(limit_info["remaining"])
-        response.headers["X-RateLimit-Reset"] = str(limit_info["reset"])
-        response.headers["Retry-After"] = str(
-            limit_info["reset"] - int(time.time())
-        )
+        _set_limit_headers(response.headers, limit_info)
+        response.headers["Retry-After"] = str(_retry_after(limit_info))
+        return response
+    
+    async def dispatch(self, request: Request, call_next):
+        """Process request with rate limiting"""
+        # Skip rate limiting for excluded paths
+        if self._is_excluded(request.url.path):
+            return await call_next(request)
         
+        allowed, limit_info = await self._check(request.client.host, request.headers)
         if not allowed:
-            response.content = b"Rate limit exceeded. Please try again later."
-            return response
+            return self._rejection(limit_info)
         
         # Process request
         response = await call_next(request)
         
         # Add rate limit headers to successful response
-        response.headers["X-RateLimit-Limit"] = str(limit_info["limit"])
-        response.headers["X-RateLimit-Remaining"] = str(limit_info["remaining"])
-        response.headers["X-RateLimit-Reset"] = str(limit_info["reset"])
+        _set_limit_headers(response.headers, limit_info)
         
         return response
 
 
+class ASGIRateLimitMiddleware(ContextMiddleware, RateLimitMiddleware):
+    """Pure-ASGI RateLimitMiddleware, so it can sit among the other ASGI layers"""
+    
+    async def handle(self, context: RequestContext, receive, send):
+        if self._is_excluded(context.path):
+            await self.app(context.scope, receive, send)
+            return
+        
+        client = context.scope.get("client")
+        allowed, limit_info = await self._check(client[0] if client else "unknown", context.headers)
+        if not allowed:
+            await self._rejection(limit_info)(context.scope, receive, send)
+            return
+        
+        context.on_response_start(lambda response: _set_limit_headers(response.headers, limit_info))
+        await self.app(context.scope, receive, send)
+
+
+def _set_limit_headers(headers, limit_info: dict):
+    headers["X-RateLimit-Limit"] = str(limit_info["limit"])
+    headers["X-RateLimit-Remaining"] = str(limit_info["remaining"])
+    headers["X-RateLimit-Reset"] = str(limit_info["reset"])
+
+
+def _retry_after(limit_info: dict) -> int:
+    """Seconds until a rejected client may retry"""
+    if "retry_after" in limit_info:
+        return max(1, limit_info["retry_after"])
+    return max(1, limit_info["reset"] - int(time.time()))
+
+
 def create_rate_limit_decorator(
     requests_per_minute: int = 60,
     requests_per_hour: int = 1000,
     key_func: Optional[callable] = None
 ):
     """Create a rate limit decorator for specific endpoints"""
+    # One limiter per decorated endpoint, so counts persist across requests
+    rate_limiter = RateLimiter(
+        redis_client=redis_client,
+        requests_per_minute=requests_per_minute,
+        requests_per_hour=requests_per_hour,
+        algorithm=getattr(settings, 'RATE_LIMIT_ALGORITHM', "sliding_window")
+    )
+    
     def decorator(func):
         async def wrapper(request: Request, *args, **kwargs):
             # Get identifier
@@ -278,12 +225,6 @@ def create_rate_limit_decorator(
             else:
                 identifier = request.client.host
             
-            # Initialize rate limiter
-            rate_limiter = RateLimiter(
-                requests_per_minute=requests_per_minute,
-                requests_per_hour=requests_per_hour
-            )
-            
             # Check rate limit
             allowed, limit_info = await rate_limiter.check_rate_limit(identifier)
             
@@ -295,7 +236,7 @@ def create_rate_limit_decorator(
                         "X-RateLimit-Limit": str(limit_info["limit"]),
                         "X-RateLimit-Remaining": str(limit_info["remaining"]),
                         "X-RateLimit-Reset": str(limit_info["reset"]),
-                        "Retry-After": str(limit_info["reset"] - int(time.time()))
+                        "Retry-After": str(_retry_after(limit_info))
                     }
                 )
             
@@ -0,0 +1,237 @@
+"""
+Request Context
+Per-request state shared by the pure-ASGI middleware stack
+"""
+
+import time
+import uuid
+from typing import Any, Callable, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
+from starlette.requests import ClientDisconnect, Request
+from starlette.types import Message, Receive, Scope, Send
+
+CONTEXT_STATE_KEY = "request_context"
+
+
+class BodyTooLarge(Exception):
+    """The request body went past the limit given to ``RequestContext.body``"""
+
+
+class ResponseInfo:
+    """Status and headers of the response being sent"""
+
+    __slots__ = ("status_code", "headers")
+
+    def __init__(self, status_code: int, headers: MutableHeaders):
+        self.status_code = status_code
+        self.headers = headers
+
+
+class RequestContext:
+    """
+    Everything the middleware stack knows about one request.
+
+    The first ASGI middleware to see a request creates the context and stores
+    it in ``scope["state"]``, so handlers can reach it as
+    ``request.state.request_context``. Headers, query parameters and the client
+    IP are parsed once for the whole stack. The body is read at most once and
+    replayed to the application, and the outgoing ``send`` is wrapped once to
+    record the status and size and to run the header hooks middlewares
+    register with ``on_response_start``.
+    """
+
+    def __init__(self, scope: Scope, receive: Receive):
+        self.scope = scope
+        self.method: str = scope["method"]
+        self.path: str = scope["path"]
+        self.start_time = time.perf_counter()
+        self.headers = Headers(scope=scope)
+        self.query_string: str = scope.get("query_string", b"").decode("latin-1")
+
+        state = scope["state"]
+        self.request_id: str = (
+            state.get("request_id") or
+            self.headers.get("x-request-id") or
+            self.headers.get("x-correlation-id") or
+            str(uuid.uuid4())
+        )
+
+        self.response: Optional[ResponseInfo] = None
+        self.response_size = 0
+
+        self._receive = receive
+        self._body: Optional[bytes] = None
+        self._body_text: Optional[str] = None
+        self._body_replayed = False
+        self._body_too_large = False
+        self._query_params: Optional[QueryParams] = None
+        self._client_ip: Optional[str] = None
+        self._request: Optional[Request] = None
+        self._response_start_hooks: List[Callable[[ResponseInfo], Any]] = []
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the request entered the stack"""
+        return time.perf_counter() - self.start_time
+
+    @property
+    def status_code(self) -> Optional[int]:
+        return self.response.status_code if self.response else None
+
+    @property
+    def query_params(self) -> QueryParams:
+        if self._query_params is None:
+            self._query_params = QueryParams(self.query_string)
+        return self._query_params
+
+    @property
+    def client_ip(self) -> str:
+        if self._client_ip is None:
+            forwarded_for = self.headers.get("x-forwarded-for")
+            real_ip = self.headers.get("x-real-ip")
+            client = self.scope.get("client")
+            if forwarded_for:
+                self._client_ip = forwarded_for.split(",")[0].strip()
+            elif real_ip:
+                self._client_ip = real_ip
+            else:
+                self._client_ip = client[0] if client else "unknown"
+        return self._client_ip
+
+    @property
+    def request(self) -> Request:
+        """
+        A Starlette request over the same scope, for helpers written against
+        ``Request``. It has no receive channel; use ``body()`` for the body.
+        """
+        if self._request is None:
+            self._request = Request(self.scope)
+        return self._request
+
+    @property
+    def state(self):
+        return self.request.state
+
+    async def body(self, on_chunk: Optional[Callable[[bytes], Any]] = None,
+                   limit: Optional[int] = None) -> bytes:
+        """
+        Read the request body once; later calls return the cached bytes.
+
+        ``on_chunk`` sees each chunk as it arrives, or the whole cached body
+        if it has already been read. With ``limit``, reading stops at the
+        chunk that takes the body past ``limit`` bytes and ``BodyTooLarge``
+        is raised, now and on later calls; the rest is never received.
+        """
+        if self._body_too_large:
+            raise BodyTooLarge()
+        if self._body is None:
+            chunks = []
+            received = 0
+            more_body = True
+            while more_body:
+                message = await self._receive()
+                if message["type"] == "http.disconnect":
+                    raise ClientDisconnect()
+                chunk = message.get("body", b"")
+                chunks.append(chunk)
+                received += len(chunk)
+                if on_chunk is not None:
+                    on_chunk(chunk)
+                if limit is not None and received > limit:
+                    self._body_too_large = True
+                    raise BodyTooLarge()
+                more_body = message.get("more_body", False)
+            self._body = b"".join(chunks)
+        else:
+            if limit is not None and len(self._body) > limit:
+                raise BodyTooLarge()
+            if on_chunk is not None:
+                on_chunk(self._body)
+        return self._body
+
+    async def body_text(self) -> str:
+        """The body decoded as UTF-8, decoded once"""
+        if self._body_text is None:
+            self._body_text = (await self.body()).decode("utf-8")
+        return self._body_text
+
+    async def receive(self) -> Message:
+        """Receive channel for the application, replaying a body read by middleware"""
+        if self._body is not None and not self._body_replayed:
+            self._body_replayed = True
+            return {"type": "http.request", "body": self._body, "more_body": False}
+        return await self._receive()
+
+    def on_response_start(self, hook: Callable[[ResponseInfo], Any]):
+        """
+        Run ``hook`` when the response headers are sent.
+
+        Hooks run innermost middleware first, so an outer middleware sees and
+        may override headers set by an inner one, as with ``call_next``.
+        """
+        self._response_start_hooks.append(hook)
+
+    def wrap_send(self, send: Send) -> Send:
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                self.response = ResponseInfo(message["status"], MutableHeaders(scope=message))
+                for hook in reversed(self._response_start_hooks):
+                    hook(self.response)
+            elif message["type"] == "http.response.body":
+                self.response_size += len(message.get("body", b""))
+            await send(message)
+
+        return send_wrapper
+
+
+def bind_request_context(scope: Scope, receive: Receive,
+                         send: Send) -> Tuple[RequestContext, Receive, Send]:
+    """
+    Return the request's context and the channels to pass downstream.
+
+    Only the middleware that creates the context wraps ``receive`` and
+    ``send``; the ones inside it reuse the context and pass their channels on
+    unchanged.
+    """
+    state = scope.setdefault("state", {})
+    context = state.get(CONTEXT_STATE_KEY)
+    if context is None:
+        context = RequestContext(scope, receive)
+        state[CONTEXT_STATE_KEY] = context
+        state.setdefault("request_id", context.request_id)
+        receive, send = context.receive, context.wrap_send(send)
+    return context, receive, send
+
+
+def get_request_context(request: Request) -> Optional[RequestContext]:
+    """The context of a request handled by the ASGI stack, if any"""
+    return request.scope.get("state", {}).get(CONTEXT_STATE_KEY)
+
+
+class ContextMiddleware:
+    """
+    Base for pure-ASGI middlewares that share a ``RequestContext``.
+
+    Subclasses implement ``handle``; non-HTTP scopes pass straight through.
+    It defines no ``__init__`` so it can be mixed in ahead of an existing
+    middleware class to reuse that class's configuration and helpers, with
+    this ``__call__`` replacing ``BaseHTTPMiddleware.dispatch``.
+
+    Keep these layers contiguous in the stack. ``body()`` reads the channel
+    of the outermost layer, so a ``BaseHTTPMiddleware`` placed between two of
+    them would have its ``receive`` wrapper bypassed by the inner ones.
+    """
+
+    app: Any
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        context, receive, send = bind_request_context(scope, receive, send)
+        await self.handle(context, receive, send)
+
+    async def handle(self, context: RequestContext, receive: Receive, send: Send):
+        await self.app(context.scope, receive, send)
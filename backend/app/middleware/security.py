@@ -9,6 +9,102 @@ from starlette.middleware.cors import CORSMiddleware
 import re
 
 from app.core.config import settings
+from app.core.threat_scanner import ScanResult, threat_scanner
+from app.middleware.request_context import BodyTooLarge, ContextMiddleware, RequestContext
+
+SQL_INJECTION_TAG = "sql_injection"
+XSS_TAG = "xss"
+
+# The injection guards check the query string and body, not headers or path
+GUARDED_LOCATIONS = ("query", "body")
+SCANNED_BODY_METHODS = {"POST", "PUT", "PATCH"}
+
+
+def declared_body_length(headers) -> Optional[int]:
+    """The Content-Length header as an int, or None if it is missing or malformed"""
+    try:
+        return int(headers.get("content-length", ""))
+    except ValueError:
+        return None
+
+
+async def scan_request(request: Request) -> ScanResult:
+    """
+    Scan a request once against every registered signature.
+
+    The result is kept on request.state, so every security layer and the
+    intrusion detection system read the same tagged matches.
+    """
+    scan = getattr(request.state, "threat_scan", None)
+    if scan is not None:
+        return scan
+    
+    session = threat_scanner.session()
+    session.scan("path", request.url.path)
+    session.scan("query", request.url.query)
+    session.scan_headers(request.headers.items())
+    declared = declared_body_length(request.headers)
+    if declared is not None and declared > threat_scanner.max_body_bytes:
+        session.refuse_body(declared)
+    elif request.method in SCANNED_BODY_METHODS:
+        try:
+            session.feed_body(await request.body())
+        except Exception:
+            pass
+    
+    scan = session.finish()
+    request.state.threat_scan = scan
+    return scan
+
+
+async def scan_request_context(context: RequestContext) -> ScanResult:
+    """
+    scan_request for the ASGI stack, scanning body chunks as they are received.
+
+    A body declared or found to be longer than the scan limit is not buffered:
+    it is refused on its Content-Length before any of it is read, or reading
+    stops at the chunk that passes the limit.
+    """
+    scan = getattr(context.state, "threat_scan", None)
+    if scan is not None:
+        return scan
+    
+    session = threat_scanner.session()
+    session.scan("path", context.path)
+    session.scan("query", context.query_string)
+    session.scan_headers(context.headers.items())
+    declared = declared_body_length(context.headers)
+    if declared is not None and declared > threat_scanner.max_body_bytes:
+        session.refuse_body(declared)
+    elif context.method in SCANNED_BODY_METHODS:
+        try:
+            await context.body(on_chunk=session.feed_body, limit=threat_scanner.max_body_bytes)
+        except BodyTooLarge:
+            # The chunk past the limit was fed first, so the scan is already truncated
+            pass
+        except Exception:
+            pass
+    
+    scan = session.finish()
+    context.state.threat_scan = scan
+    return scan
+
+
+def guard_response(scan: ScanResult, tag: str, message: str) -> Optional[Response]:
+    """
+    The rejection for an injection guard, or None to let the request through.
+
+    Bodies longer than the scan limit are refused rather than passed on with
+    their tail unchecked.
+    """
+    if scan.body_truncated:
+        return Response(
+            content="Request entity too large",
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+    if scan.matched(tag, GUARDED_LOCATIONS):
+        return Response(content=message, status_code=status.HTTP_400_BAD_REQUEST)
+    return None
 
 
 class SecurityHeadersMiddleware(BaseHTTPMiddleware):
@@ -18,19 +114,21 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
         super().__init__(app)
         self.environment = environment
         self.is_production = environment == "production"
+        self.security_headers = self._build_security_headers()
     
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
+    def _build_security_headers(self) -> dict:
+        """Headers that are the same on every response, built once"""
+        headers = {}
         
         # Core security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        headers["X-Content-Type-Options"] = "nosniff"
+        headers["X-Frame-Options"] = "DENY"
+        headers["X-XSS-Protection"] = "1; mode=block"
+        headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
         
         # HSTS (only for HTTPS/production)
         if self.is_production:
-            response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains; preload"
+            headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains; preload"
         
         # Enhanced Permissions Policy
         permissions_policies = [
@@ -48,11 +146,7 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
             "display-capture=()",
             "document-domain=()"
         ]
-        response.headers["Permissions-Policy"] = ", ".join(permissions_policies)
-        
-        # Remove revealing server headers
-        response.headers.pop("server", None)
-        response.headers.pop("x-powered-by", None)
+        headers["Permissions-Policy"] = ", ".join(permissions_policies)
         
         # Enhanced Content Security Policy
         if self.is_production:
@@ -88,23 +182,37 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
                 "form-action 'self'"
             ]
         
-        response.headers["Content-Security-Policy"] = "; ".join(csp_directives)
+        headers["Content-Security-Policy"] = "; ".join(csp_directives)
         
         # Security.txt reference
-        response.headers["X-Security-Contact"] = "security@quest-edu.com"
+        headers["X-Security-Contact"] = "security@quest-edu.com"
         
         # Additional security headers
-        response.headers["X-Permitted-Cross-Domain-Policies"] = "none"
-        response.headers["Cross-Origin-Embedder-Policy"] = "require-corp"
-        response.headers["Cross-Origin-Opener-Policy"] = "same-origin"
-        response.headers["Cross-Origin-Resource-Policy"] = "same-origin"
+        headers["X-Permitted-Cross-Domain-Policies"] = "none"
+        headers["Cross-Origin-Embedder-Policy"] = "require-corp"
+        headers["Cross-Origin-Opener-Policy"] = "same-origin"
+        headers["Cross-Origin-Resource-Policy"] = "same-origin"
+    
+        return headers
+    
+    def _apply_security_headers(self, headers, path: str):
+        """Set security headers on a response's mutable headers"""
+        headers.update(self.security_headers)
         
-        # Cache control for sensitive endpoints
-        if any(path in request.url.path for path in ["/api/v1/auth", "/api/v1/admin", "/api/v1/users/me"]):
-            response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, proxy-revalidate"
-            response.headers["Pragma"] = "no-cache"
-            response.headers["Expires"] = "0"
+        # Remove revealing server headers
+        for name in ("server", "x-powered-by"):
+            if name in headers:
+                del headers[name]
         
+        # Cache control for sensitive endpoints
+        if any(sensitive in path for sensitive in ["/api/v1/auth", "/api/v1/admin", "/api/v1/users/me"]):
+            headers["Cache-Control"] = "no-store, no-cache, must-revalidate, proxy-revalidate"
+            headers["Pragma"] = "no-cache"
+            headers["Expires"] = "0"
+    
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        self._apply_security_headers(response.headers, request.url.path)
         return response
 
 
@@ -125,31 +233,14 @@ class SQLInjectionProtectionMiddleware(BaseHTTPMiddleware):
             r"(\bsleep\b\s*\()"
         ]
         self.compiled_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in self.sql_patterns]
+        threat_scanner.register(SQL_INJECTION_TAG, self.compiled_patterns)
     
     async def dispatch(self, request: Request, call_next):
-        # Check URL parameters
-        if request.url.query:
-            for pattern in self.compiled_patterns:
-                if pattern.search(request.url.query):
-                    return Response(
-                        content="Potential SQL injection detected",
-                        status_code=status.HTTP_400_BAD_REQUEST
-                    )
-        
-        # Check body for POST/PUT requests
-        if request.method in ["POST", "PUT", "PATCH"]:
-            try:
-                body = await request.body()
-                body_text = body.decode('utf-8')
-                
-                for pattern in self.compiled_patterns:
-                    if pattern.search(body_text):
-                        return Response(
-                            content="Potential SQL injection detected",
-                            status_code=status.HTTP_400_BAD_REQUEST
-                        )
-            except:
-                pass
+        # Check URL parameters and, for POST/PUT/PATCH, the body
+        scan = await scan_request(request)
+        response = guard_response(scan, SQL_INJECTION_TAG, "Potential SQL injection detected")
+        if response is not None:
+            return response
         
         return await call_next(request)
 
@@ -174,31 +265,14 @@ class XSSProtectionMiddleware(BaseHTTPMiddleware):
             r"data\s*:\s*text/html"
         ]
         self.compiled_patterns = [re.compile(pattern, re.IGNORECASE | re.DOTALL) for pattern in self.xss_patterns]
+        threat_scanner.register(XSS_TAG, self.compiled_patterns)
     
     async def dispatch(self, request: Request, call_next):
-        # Check URL parameters
-        if request.url.query:
-            for pattern in self.compiled_patterns:
-                if pattern.search(request.url.query):
-                    return Response(
-                        content="Potential XSS attack detected",
-                        status_code=status.HTTP_400_BAD_REQUEST
-                    )
-        
-        # Check body for POST/PUT requests
-        if request.method in ["POST", "PUT", "PATCH"]:
-            try:
-                body = await request.body()
-                body_text = body.decode('utf-8')
-                
-                for pattern in self.compiled_patterns:
-                    if pattern.search(body_text):
-                        return Response(
-                            content="Potential XSS attack detected",
-                            status_code=status.HTTP_400_BAD_REQUEST
-                        )
-            except:
-                pass
+        # Check URL parameters and, for POST/PUT/PATCH, the body
+        scan = await scan_request(request)
+        response = guard_response(scan, XSS_TAG, "Potential XSS attack detected")
+        if response is not None:
+            return response
         
         return await call_next(request)
 
@@ -233,6 +307,14 @@ class RequestValidationMiddleware(BaseHTTPMiddleware):
                 status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
             )
         
+        # Bodies sent without a content-length are measured by the request scan
+        scan = getattr(request.state, "threat_scan", None)
+        if scan is not None and scan.body_bytes > self.max_content_length:
+            return Response(
+                content="Request entity too large",
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        
         # Validate content type for requests with body
         if request.method in ["POST", "PUT", "PATCH"]:
             content_type = request.headers.get("content-type", "").split(";")[0].strip()
@@ -501,4 +583,74 @@ def create_cors_middleware(
         allowed_methods=allowed_methods,
         allowed_headers=allowed_headers,
         environment=environment
-    )
\ No newline at end of file
+    )
+
+
+class ASGISecurityHeadersMiddleware(ContextMiddleware, SecurityHeadersMiddleware):
+    """Pure-ASGI SecurityHeadersMiddleware"""
+    
+    async def handle(self, context: RequestContext, receive, send):
+        context.on_response_start(
+            lambda response: self._apply_security_headers(response.headers, context.path)
+        )
+        await self.app(context.scope, receive, send)
+
+
+class ASGISQLInjectionProtectionMiddleware(ContextMiddleware, SQLInjectionProtectionMiddleware):
+    """Pure-ASGI SQLInjectionProtectionMiddleware using the shared request scan"""
+    
+    async def handle(self, context: RequestContext, receive, send):
+        scan = await scan_request_context(context)
+        response = guard_response(scan, SQL_INJECTION_TAG, "Potential SQL injection detected")
+        if response is not None:
+            await response(context.scope, receive, send)
+            return
+        
+        await self.app(context.scope, receive, send)
+
+
+class ASGIXSSProtectionMiddleware(ContextMiddleware, XSSProtectionMiddleware):
+    """Pure-ASGI XSSProtectionMiddleware using the shared request scan"""
+    
+    async def handle(self, context: RequestContext, receive, send):
+        scan = await scan_request_context(context)
+        response = guard_response(scan, XSS_TAG, "Potential XSS attack detected")
+        if response is not None:
+            await response(context.scope, receive, send)
+            return
+        
+        await self.app(context.scope, receive, send)
+
+
+class ASGIRequestValidationMiddleware(ContextMiddleware, RequestValidationMiddleware):
+    """Pure-ASGI RequestValidationMiddleware"""
+    
+    async def handle(self, context: RequestContext, receive, send):
+        response = None
+        content_length = context.headers.get("content-length")
+        content_type = context.headers.get("content-type", "").split(";")[0].strip()
+        scan = getattr(context.state, "threat_scan", None)
+        
+        if context.method not in self.allowed_methods:
+            response = Response(
+                content="Method not allowed",
+                status_code=status.HTTP_405_METHOD_NOT_ALLOWED
+            )
+        elif ((content_length and int(content_length) > self.max_content_length) or
+              (scan is not None and scan.body_bytes > self.max_content_length)):
+            response = Response(
+                content="Request entity too large",
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        elif (context.method in ["POST", "PUT", "PATCH"] and content_type and
+              not any(allowed in content_type for allowed in self.allowed_content_types)):
+            response = Response(
+                content="Unsupported media type",
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        
+        if response is not None:
+            await response(context.scope, receive, send)
+            return
+        
+        await self.app(context.scope, receive, send)
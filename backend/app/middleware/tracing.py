@@ -17,6 +17,7 @@ from app.core.logger import get_logger
 from app.core.distributed_tracing import (
     distributed_tracer, get_trace_id, get_span_id, correlate_user
 )
+from app.middleware.request_context import ContextMiddleware, RequestContext
 
 logger = get_logger(__name__)
 
@@ -309,6 +310,46 @@ class TracingMiddleware(BaseHTTPMiddleware):
         except Exception as e:
             logger.error(f"Failed to add trace headers to response: {e}")
 
+class ASGITracingMiddleware(ContextMiddleware, TracingMiddleware):
+    """Pure-ASGI TracingMiddleware"""
+    
+    async def handle(self, context: RequestContext, receive, send):
+        if self._should_exclude_path(context.path):
+            await self.app(context.scope, receive, send)
+            return
+        
+        start_time = time.time()
+        request = context.request
+        request_id = context.request_id
+        operation_name = f"{context.method} {context.path}"
+        
+        async with distributed_tracer.trace_context(
+            operation_name,
+            **self._get_request_attributes(request, request_id)
+        ) as span:
+            
+            try:
+                self._enrich_span_with_request_data(span, request, request_id)
+                await self._correlate_user_context(request)
+                
+                # Runs inside the span, so the trace and span IDs are current
+                context.on_response_start(
+                    lambda response: self._add_trace_headers_to_response(response, request_id)
+                )
+                await self.app(context.scope, receive, send)
+                
+                if context.response is not None:
+                    self._enrich_span_with_response_data(span, context.response, start_time)
+                
+            except Exception as e:
+                distributed_tracer.record_exception(span, e)
+                
+                span.set_attribute("error", True)
+                span.set_attribute("error.type", type(e).__name__)
+                span.set_attribute("error.message", str(e))
+                
+                raise
+
 class RequestCorrelationMiddleware(BaseHTTPMiddleware):
     """Middleware for request correlation and baggage propagation"""
     
@@ -5,8 +5,6 @@ from typing import Dict, Any, Optional
 from fastapi import Request
 from sqlalchemy.orm import Session
 
-from app.models.user import User
-
 
 class SecurityLogger:
     """Security event logger"""
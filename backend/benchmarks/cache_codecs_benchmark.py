@@ -0,0 +1,149 @@
+"""
+Cache Codec Benchmark
+Compares serialization codecs and compressors on payload shapes cached by the API
+
+Usage (from the backend directory):
+    python -m benchmarks.cache_codecs_benchmark [--iterations 2000]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from app.core.cache_codecs import CodecRegistry
+
+
+def _user_profile(user_id: int) -> Dict[str, Any]:
+    return {
+        "id": user_id,
+        "email": f"student{user_id}@example.com",
+        "username": f"student{user_id}",
+        "full_name": "Test Student",
+        "role": "student",
+        "is_active": True,
+        "is_verified": True,
+        "created_at": datetime(2024, 3, 1, 12, 0).isoformat(),
+        "has_character": True,
+        "children_count": 0,
+        "first_name": "Test",
+        "last_name": "Student",
+        "age": 11,
+        "grade": 5,
+        "avatar_url": f"https://cdn.example.com/avatars/{user_id}.png"
+    }
+
+
+def _quest(quest_id: int) -> Dict[str, Any]:
+    return {
+        "id": quest_id,
+        "title": f"Fractions Adventure {quest_id}",
+        "description": "Help the village baker split pies evenly between the guild members. " * 3,
+        "quest_type": random.choice(["daily", "weekly", "story", "challenge"]),
+        "difficulty": random.choice(["easy", "medium", "hard"]),
+        "subject": random.choice(["math", "science", "english", "korean"]),
+        "objectives": [{"type": "answer", "count": 5, "topic": "fractions"}, {"type": "streak", "count": 3}],
+        "exp_reward": 120,
+        "coin_reward": 30,
+        "gem_reward": 1,
+        "achievement_points": 10,
+        "time_limit_minutes": 30,
+        "min_level": 3,
+        "max_attempts": None,
+        "prerequisites": [quest_id - 1] if quest_id > 1 else None,
+        "is_repeatable": False,
+        "cooldown_hours": None
+    }
+
+
+def _leaderboard(size: int) -> Dict[str, Any]:
+    return {
+        "period": "weekly",
+        "generated_at": datetime(2024, 3, 4).isoformat(),
+        "entries": [
+            {"rank": i + 1, "user_id": 1000 + i, "username": f"player{i}",
+             "level": random.randint(1, 60), "total_exp": random.randint(1000, 900000),
+             "avatar_url": f"https://cdn.example.com/avatars/{1000 + i}.png"}
+            for i in range(size)
+        ]
+    }
+
+
+def _analytics_series(points: int) -> Dict[str, Any]:
+    start = datetime(2024, 3, 1)
+    return {
+        "metric": "learning_time_minutes",
+        "user_id": 42,
+        "series": [
+            {"timestamp": (start + timedelta(minutes=15 * i)).isoformat(),
+             "value": round(random.uniform(0, 45), 3),
+             "subject": random.choice(["math", "science", "english"])}
+            for i in range(points)
+        ]
+    }
+
+
+PAYLOADS: Dict[str, Any] = {
+    "user_profile": _user_profile(42),
+    "quest_list_50": [_quest(i) for i in range(1, 51)],
+    "leaderboard_100": _leaderboard(100),
+    "analytics_series_2000": _analytics_series(2000),
+}
+
+
+def _time_per_call(func: Callable[[], Any], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run(iterations: int) -> List[Dict[str, Any]]:
+    registry = CodecRegistry(compression_threshold=0)
+    results = []
+
+    for payload_name, payload in PAYLOADS.items():
+        for codec in registry.available_codecs:
+            raw_size = len(registry.get_codec(codec).dumps(payload))
+            for compressor in registry.available_compressors:
+                # Fresh registry so adaptive thresholds don't skip compression mid-run
+                bench = CodecRegistry(default_codec=codec, default_compressor=compressor,
+                                      compression_threshold=0,
+                                      enable_compression=compressor != "none")
+                encoded, _ = bench.encode(payload)
+                payload_iterations = max(iterations * 1000 // max(raw_size, 1000), 20)
+
+                results.append({
+                    "payload": payload_name,
+                    "codec": codec,
+                    "compressor": compressor,
+                    "raw_bytes": raw_size,
+                    "stored_bytes": len(encoded),
+                    "encode_us": _time_per_call(lambda: bench.encode(payload), payload_iterations),
+                    "decode_us": _time_per_call(lambda: bench.decode(encoded), payload_iterations)
+                })
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000,
+                        help="iterations for a 1KB payload (scaled down for larger ones)")
+    args = parser.parse_args()
+
+    random.seed(7)
+    results = run(args.iterations)
+
+    header = f"{'payload':<24}{'codec':<9}{'compress':<10}{'raw B':>10}{'stored B':>10}{'enc us':>10}{'dec us':>10}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(f"{row['payload']:<24}{row['codec']:<9}{row['compressor']:<10}"
+              f"{row['raw_bytes']:>10}{row['stored_bytes']:>10}"
+              f"{row['encode_us']:>10.1f}{row['decode_us']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Login Storm Benchmark
+Latency of a cheap endpoint while many logins hash passwords concurrently
+
+Runs a small ASGI app in-process with a login endpoint (bcrypt verify) and a
+cheap endpoint, fires a burst of logins, and samples the cheap endpoint at a
+fixed rate meanwhile. The "inline" mode verifies on the event loop like the
+old handlers; "offloaded" uses the bounded password hashing pool. Keep
+--concurrency below the core count so the event loop keeps a core.
+
+Usage (from the backend directory):
+    python -m benchmarks.login_storm_benchmark [--logins 200] [--rounds 12] [--concurrency 4]
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List
+
+import httpx
+from fastapi import FastAPI
+
+from app.core.password_hashing import PasswordHasher
+
+
+def build_app(hasher: PasswordHasher, stored_hash: str, offloaded: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/login")
+    async def login():
+        if offloaded:
+            valid = await hasher.verify_async("benchmark-password", stored_hash)
+        else:
+            valid = hasher.verify("benchmark-password", stored_hash)
+        return {"valid": valid}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    return app
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_storm(mode: str, logins: int, rounds: int, concurrency: int,
+                    probe_rate: float) -> Dict[str, Any]:
+    hasher = PasswordHasher(rounds=rounds, max_concurrency=concurrency)
+    stored_hash = hasher.hash("benchmark-password")
+    app = build_app(hasher, stored_hash, offloaded=mode == "offloaded")
+
+    probe_latencies: List[float] = []
+    storm_done = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                 base_url="http://benchmark") as client:
+
+        async def timed_probe(due: float):
+            await client.get("/health")
+            probe_latencies.append(time.perf_counter() - due)
+
+        async def probe():
+            # Open loop: probes are due on a fixed schedule and latency counts
+            # from when each was due, so time the loop spends blocked is
+            # included instead of silently delaying the next probe
+            interval = 1.0 / probe_rate
+            due = time.perf_counter()
+            probes = []
+            while True:
+                while due <= time.perf_counter():
+                    probes.append(asyncio.create_task(timed_probe(due)))
+                    due += interval
+                if storm_done.is_set():
+                    break
+                await asyncio.sleep(due - time.perf_counter())
+            await asyncio.gather(*probes)
+
+        probe_task = asyncio.create_task(probe())
+        await asyncio.sleep(0.1)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[client.post("/login") for _ in range(logins)])
+        storm_seconds = time.perf_counter() - started
+
+        storm_done.set()
+        await probe_task
+
+    hasher.shutdown()
+    return {
+        "mode": mode,
+        "logins_per_second": logins / storm_seconds,
+        "probes": len(probe_latencies),
+        "p50_ms": _percentile(probe_latencies, 0.5) * 1000,
+        "p99_ms": _percentile(probe_latencies, 0.99) * 1000,
+        "max_ms": max(probe_latencies, default=0.0) * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200, help="logins fired at once")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--concurrency", type=int, default=4, help="password hashing pool size")
+    parser.add_argument("--probe-rate", type=float, default=100.0,
+                        help="requests per second to the cheap endpoint")
+    args = parser.parse_args()
+
+    header = f"{'mode':<12}{'logins/s':>10}{'probes':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for mode in ("inline", "offloaded"):
+        row = asyncio.run(run_storm(mode, args.logins, args.rounds, args.concurrency, args.probe_rate))
+        print(f"{row['mode']:<12}{row['logins_per_second']:>10.1f}{row['probes']:>8}"
+              f"{row['p50_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,8 +13,14 @@ from app.models.achievement import Achievement, UserAchievement, AchievementCate
 from app.models.quest import Quest, QuestProgress, QuestType, QuestDifficulty, QuestStatus
 from app.core.security import get_password_hash, create_token_pair
 import asyncio
+import sys
 from unittest.mock import Mock, patch
 
+import fakeredis
+
+from app.core import redis_client as redis_client_module
+from app.core.redis_client import EnhancedRedisClient
+
 
 # Test database setup
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -530,4 +536,23 @@ def test_user_with_quest_history(
     
     db.commit()
     db.refresh(test_user)
-    return test_user
\ No newline at end of file
+    return test_user
+
+
+# Redis fixtures
+@pytest.fixture
+def redis(monkeypatch) -> EnhancedRedisClient:
+    """
+    An EnhancedRedisClient over fakeredis, patched in for the shared client.
+
+    Every imported module holding ``redis_client`` gets the fake, so the code
+    under test and the tests talk to the same server.
+    """
+    client = EnhancedRedisClient()
+    client.client = fakeredis.FakeAsyncRedis()
+    client._initialized = True
+    shared = redis_client_module.redis_client
+    for module in list(sys.modules.values()):
+        if module is not redis_client_module and getattr(module, "redis_client", None) is shared:
+            monkeypatch.setattr(module, "redis_client", client)
+    return client
@@ -0,0 +1,77 @@
+"""
+Tests for cluster-wide adaptive rate limits
+"""
+from app.core.adaptive_limits import AIMDController, LoadSample, aggregate_samples, fair_share
+
+
+class TestAggregation:
+    """Test combining worker samples"""
+
+    def test_aggregates_live_samples(self):
+        """Test load is averaged and errors pooled over live workers"""
+        samples = [
+            LoadSample("a", 0.2, requests=900, errors=9, timestamp=100.0),
+            LoadSample("b", 0.6, requests=100, errors=1, timestamp=100.0),
+            LoadSample("gone", 1.0, requests=50, errors=50, timestamp=10.0),
+        ]
+
+        load, error_rate, workers = aggregate_samples(samples, now=105.0, max_age=30.0)
+
+        assert workers == 2
+        assert abs(load - 0.4) < 1e-9
+        assert abs(error_rate - 0.01) < 1e-9
+
+    def test_no_live_samples(self):
+        """Test an empty cluster reports no load"""
+        assert aggregate_samples([], now=0.0, max_age=30.0) == (0.0, 0.0, 0)
+
+    def test_fair_share_splits_limit(self):
+        """Test each worker enforces its part of the shared limit"""
+        assert fair_share(100, 4) == 25
+        assert fair_share(10, 3) == 4
+        assert fair_share(5, 0) == 5
+        assert fair_share(1, 8) == 1
+
+
+class TestAIMDController:
+    """Test additive increase and multiplicative decrease"""
+
+    def test_increases_additively_when_idle(self):
+        """Test the limit grows by the step under low load"""
+        controller = AIMDController(base_limit=100, additive_step=5, max_limit=120)
+        limits = [controller.update(load=0.1, error_rate=0.0) for _ in range(6)]
+
+        assert limits == [105, 110, 115, 120, 120, 120]
+
+    def test_decreases_multiplicatively_under_errors(self):
+        """Test a high error rate cuts the limit"""
+        controller = AIMDController(base_limit=100, decrease_factor=0.5, min_limit=20)
+        limits = [controller.update(load=0.1, error_rate=0.5) for _ in range(4)]
+
+        assert limits == [50, 25, 20, 20]
+
+    def test_holds_in_dead_band(self):
+        """Test moderate load leaves the limit unchanged"""
+        controller = AIMDController(base_limit=100)
+        for _ in range(5):
+            controller.update(load=0.7, error_rate=0.0)
+
+        assert controller.current_limit == 100
+
+    def test_smoothing_ignores_single_spike(self):
+        """Test one overloaded sample does not trigger a cut"""
+        controller = AIMDController(base_limit=100, smoothing=0.3)
+        for _ in range(5):
+            controller.update(load=0.65, error_rate=0.0)
+        controller.update(load=1.0, error_rate=0.0)
+
+        assert controller.current_limit == 100
+
+    def test_state_round_trip(self):
+        """Test another worker can continue from shared state"""
+        leader = AIMDController(base_limit=100)
+        leader.update(load=0.1, error_rate=0.0)
+        follower = AIMDController(base_limit=100)
+        follower.load_state({key: str(value) for key, value in leader.get_state().items()})
+
+        assert follower.update(load=0.1, error_rate=0.0) == leader.update(load=0.1, error_rate=0.0)
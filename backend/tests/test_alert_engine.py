@@ -0,0 +1,189 @@
+"""
+Tests for the windowed alert rule engine
+"""
+import asyncio
+from dataclasses import dataclass
+
+import pytest
+
+from app.core import alert_engine as alert_engine_module
+from app.core.alert_engine import AlertRuleEngine, AlertStateStore, MetricWindow
+
+
+@dataclass
+class Rule:
+    id: str
+    metric_name: str
+    condition: str = ">"
+    threshold: float = 0.0
+    aggregation: str = "last"
+    window_seconds: int = 60
+    duration_seconds: int = 0
+    enabled: bool = True
+
+
+class TestMetricWindow:
+    """Test aggregations over the sliding window"""
+
+    def test_aggregations_follow_window(self):
+        """Test points older than the window stop counting"""
+        window = MetricWindow(window_seconds=10)
+        for second, value in enumerate([100.0, 1.0, 2.0, 3.0]):
+            window.add(value, 1000.0 + second * 5)
+
+        assert window.value("max", 1015.0) == 3.0
+        assert window.value("avg", 1015.0) == pytest.approx(2.5)
+        assert window.value("last", 1015.0) == 3.0
+        assert window.value("rate", 1015.0) == pytest.approx(0.5)
+        assert window.value("absent", 1100.0) == 0.0
+        assert window.value("avg", 1100.0) is None
+
+    def test_p95(self):
+        """Test the p95 comes from the window's quantile sketch"""
+        window = MetricWindow(window_seconds=300)
+        for i in range(100):
+            window.add(float(i + 1), 1000.0 + i)
+
+        assert window.value("p95", 1100.0) == pytest.approx(96, rel=0.02)
+
+
+class TestAlertRuleEngine:
+    """Test for: durations, indexing and time-driven evaluation"""
+
+    def test_single_spike_does_not_fire(self):
+        """Test a windowed average ignores one outlier"""
+        engine = AlertRuleEngine()
+        engine.add_rule(Rule("cpu", "system_cpu_usage", threshold=80, aggregation="avg"))
+
+        transitions = []
+        for second, value in enumerate([20, 25, 100, 22, 21]):
+            transitions += engine.observe("system_cpu_usage", value, 1000.0 + second * 10)
+
+        assert transitions == []
+
+    def test_fires_after_for_duration_and_resolves(self):
+        """Test the condition must hold for duration_seconds before firing"""
+        engine = AlertRuleEngine()
+        engine.add_rule(Rule("cpu", "system_cpu_usage", threshold=80, duration_seconds=30))
+
+        assert engine.observe("system_cpu_usage", 90, 1000.0) == []
+        assert engine.observe("system_cpu_usage", 95, 1020.0) == []
+        fired = engine.observe("system_cpu_usage", 92, 1030.0)
+        assert [(t.action, t.value) for t in fired] == [("fired", 92)]
+        assert engine.observe("system_cpu_usage", 93, 1040.0) == []
+
+        resolved = engine.observe("system_cpu_usage", 10, 1050.0)
+        assert [t.action for t in resolved] == ["resolved"]
+
+    def test_pending_rule_fires_on_tick(self):
+        """Test a pending for: elapses without a new point"""
+        engine = AlertRuleEngine()
+        engine.add_rule(Rule("errors", "error_rate", threshold=5, aggregation="max",
+                             window_seconds=300, duration_seconds=60))
+
+        assert engine.observe("error_rate", 10, 1000.0) == []
+        assert [t.action for t in engine.tick(1061.0)] == ["fired"]
+        # Data ageing out of the window resolves it
+        assert [t.action for t in engine.tick(1400.0)] == ["resolved"]
+
+    def test_absent(self):
+        """Test absent fires when a metric stops reporting, after a grace window"""
+        engine = AlertRuleEngine()
+        engine.add_rule(Rule("heartbeat", "system_cpu_usage", aggregation="absent",
+                             window_seconds=60), now=1000.0)
+
+        assert engine.tick(1030.0) == []
+        engine.observe("system_cpu_usage", 50, 1030.0)
+        assert engine.tick(1080.0) == []
+        assert [t.action for t in engine.tick(1100.0)] == ["fired"]
+        assert [t.action for t in engine.observe("system_cpu_usage", 50, 1110.0)] == ["resolved"]
+
+    def test_rate_and_index(self):
+        """Test rules are evaluated only for their metric, and rates use the window"""
+        engine = AlertRuleEngine()
+        engine.add_rule(Rule("rps", "http_requests_total", threshold=2, aggregation="rate",
+                             window_seconds=10))
+        engine.add_rule(Rule("cpu", "system_cpu_usage", threshold=0))
+
+        transitions = []
+        for i in range(40):
+            transitions += engine.observe("http_requests_total", 1.0, 1000.0 + i * 0.25)
+
+        assert [t.rule.id for t in transitions] == ["rps"]
+        assert engine.get_state("cpu").evaluated_at is None
+        assert engine.get_stats()["windows"] == 2
+
+    def test_rules_share_windows_and_reindex(self):
+        """Test re-adding an edited rule moves it to its new window"""
+        engine = AlertRuleEngine()
+        first = Rule("a", "latency", window_seconds=60)
+        engine.add_rule(first)
+        engine.add_rule(Rule("b", "latency", window_seconds=60))
+        assert engine.get_stats()["windows"] == 1
+
+        first.metric_name = "cpu"
+        engine.add_rule(first)
+        assert engine.get_stats()["indexed_metrics"] == 2
+        engine.remove_rule("b")
+        engine.remove_rule("a")
+        assert engine.get_stats() == {
+            "rules": 0, "indexed_metrics": 0, "windows": 0,
+            "window_points": 0, "pending": 0, "firing": 0
+        }
+
+    def test_rejects_unknown_aggregation(self):
+        """Test invalid rules are refused"""
+        with pytest.raises(ValueError):
+            AlertRuleEngine().add_rule(Rule("x", "cpu", aggregation="median"))
+
+
+class TestAlertStateStore:
+    """Test notifications are deduplicated across workers"""
+
+    def test_one_notification_per_transition(self, redis):
+        """Test only the first worker notifies and resolution waits for the last"""
+        workers = [AlertStateStore(), AlertStateStore()]
+
+        async def run():
+            fired = [await worker.mark_firing("cpu_alert", 300, now=1000.0) for worker in workers]
+            first = await workers[0].mark_resolved("cpu_alert", 300, now=1010.0)
+            last = await workers[1].mark_resolved("cpu_alert", 300, now=1020.0)
+            return fired, first, last
+
+        assert asyncio.run(run()) == ([True, False], False, True)
+
+    def test_dead_worker_does_not_block_resolution(self, redis):
+        """Test a worker that stopped heartbeating is dropped from the firing set"""
+        live, dead = AlertStateStore(stale_after_seconds=60), AlertStateStore(stale_after_seconds=60)
+
+        async def run():
+            await dead.mark_firing("cpu_alert", 300, now=1000.0)
+            await live.mark_firing("cpu_alert", 300, now=1000.0)
+            # The live worker keeps its heartbeat; the dead one never refreshes
+            await live.refresh(now=1050.0)
+            await live.refresh(now=1100.0)
+            resolved = await live.mark_resolved("cpu_alert", 300, now=1100.0)
+            return resolved, await redis.client.zcard(AlertStateStore.firing_key("cpu_alert"))
+
+        assert asyncio.run(run()) == (True, 0)
+
+    def test_refreshed_worker_holds_the_alert(self, redis):
+        """Test a worker that is still firing keeps the alert open past the stale age"""
+        first, second = AlertStateStore(stale_after_seconds=60), AlertStateStore(stale_after_seconds=60)
+
+        async def run():
+            await first.mark_firing("cpu_alert", 300, now=1000.0)
+            await second.mark_firing("cpu_alert", 300, now=1000.0)
+            await first.refresh(now=1090.0)
+            return await second.mark_resolved("cpu_alert", 300, now=1100.0)
+
+        assert asyncio.run(run()) is False
+
+    def test_redis_failure_notifies(self, monkeypatch):
+        """Test alerts are still sent when the shared state is unavailable"""
+        class BrokenRedis:
+            def pipeline(self, transaction=True):
+                raise ConnectionError("redis unavailable")
+
+        monkeypatch.setattr(alert_engine_module, "redis_client", BrokenRedis())
+        assert asyncio.run(AlertStateStore().mark_firing("cpu_alert", 300)) is True
@@ -0,0 +1,109 @@
+"""
+Tests for the bulk cache operations and CachedManyDecorator, run against fakeredis
+"""
+import asyncio
+
+import pytest
+
+from app.core.advanced_cache import CacheConfiguration, CachedManyDecorator, MultiLayerCache
+
+
+@pytest.fixture
+def cache(redis, tmp_path):
+    cache = MultiLayerCache(CacheConfiguration(enable_l3=True, l3_path=str(tmp_path / "l3.db")))
+    cache.tag_index.gc_probability = 0
+    yield cache
+    cache.l3_cache.close()
+
+
+async def fill_layers(cache):
+    """One key per layer: l1 only in memory, l2 only in Redis, l3 only on disk"""
+    cache._store_in_l1("l1", "from-l1", 10)
+    await cache.set("l2", "from-l2", store_in_l1=False)
+    data, method = cache._serialize_data("from-l3", "l3")
+    await cache.l3_cache.aset("l3", data, method, 300)
+
+
+class TestBulkOperations:
+    """Test get_many/set_many/delete_many across the layers"""
+
+    def test_get_many_partial_hits_across_layers(self, cache):
+        """Test each key is served by the first layer holding it, in request order"""
+        async def run():
+            await fill_layers(cache)
+            return await cache.get_many(["missing", "l3", "l2", "l1", "l2"])
+
+        found = asyncio.run(run())
+
+        assert list(found.items()) == [("l3", "from-l3"), ("l2", "from-l2"), ("l1", "from-l1")]
+        assert (cache.stats["l2_hits"], cache.stats["l3_hits"]) == (1, 1)
+        # L2 and L3 hits are promoted to L1
+        assert cache.l1_cache.lookup("l2").value == "from-l2"
+        assert cache.l1_cache.lookup("l3").value == "from-l3"
+
+    def test_get_many_uses_one_round_trip(self, redis, cache):
+        """Test the keys missing from L1 are fetched in a single pipeline"""
+        async def run():
+            await cache.set_many({f"key:{i}": i for i in range(5)}, store_in_l1=False)
+            pipelines = []
+            original = redis.pipeline
+            redis.pipeline = lambda transaction=True: pipelines.append(transaction) or original(transaction)
+            found = await cache.get_many([f"key:{i}" for i in reversed(range(5))])
+            return found, pipelines
+
+        found, pipelines = asyncio.run(run())
+
+        assert list(found.values()) == [4, 3, 2, 1, 0]
+        assert pipelines == [False]
+
+    def test_set_many_ttls(self, redis, cache):
+        """Test a per-key TTL mapping falls back to the default TTL"""
+        async def run():
+            await cache.set_many({"a": 1, "b": 2}, ttl={"a": 30})
+            return await redis.client.ttl("cache:a"), await redis.client.ttl("cache:b")
+
+        ttl_a, ttl_b = asyncio.run(run())
+
+        assert 0 < ttl_a <= 30
+        assert 30 < ttl_b <= cache.config.default_ttl
+
+    def test_delete_many_clears_every_layer(self, redis, cache):
+        """Test deleted keys are gone from L1, Redis and disk"""
+        async def run():
+            await fill_layers(cache)
+            await cache.set("kept", "value")
+            deleted = await cache.delete_many(["l1", "l2", "l3", "l2"])
+            return deleted, await cache.get_many(["l1", "l2", "l3", "kept"])
+
+        deleted, found = asyncio.run(run())
+
+        assert deleted == 1
+        assert found == {"kept": "value"}
+        assert cache.l3_cache.get("l3") is None
+
+
+class TestCachedManyDecorator:
+    """Test per-id caching of list loaders"""
+
+    def test_loader_only_sees_misses(self, cache):
+        """Test cached ids are not passed to the loader and results keep the id order"""
+        calls = []
+
+        @CachedManyDecorator(cache, ttl=60, key_prefix="users")
+        async def load_users(ids, detail="short"):
+            calls.append(list(ids))
+            return {user_id: f"user-{user_id}-{detail}" for user_id in reversed(ids) if user_id != 99}
+
+        async def run():
+            first = await load_users([3, 1, 2])
+            second = await load_users([2, 4, 99, 1])
+            third = await load_users([1, 2], detail="long")
+            return first, second, third
+
+        first, second, third = asyncio.run(run())
+
+        assert list(first) == [3, 1, 2]
+        assert list(second.items()) == [(2, "user-2-short"), (4, "user-4-short"), (1, "user-1-short")]
+        # Other arguments get their own keys
+        assert third == {1: "user-1-long", 2: "user-2-long"}
+        assert calls == [[3, 1, 2], [4, 99], [1, 2]]
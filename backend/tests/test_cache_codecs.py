@@ -0,0 +1,143 @@
+"""
+Tests for cache serialization codecs
+"""
+import json
+import zlib
+
+import pytest
+
+from app.core.cache_codecs import (
+    AdaptiveCompressionPolicy,
+    CodecRegistry,
+    HEADER_MAGIC
+)
+
+
+SAMPLE = {"user_id": 42, "name": "tester", "scores": [1, 2, 3], "nested": {"level": 5}}
+
+
+class TestCodecRegistry:
+    """Test codec selection and header round trips"""
+
+    def test_round_trip(self):
+        """Test the default codec decodes what it encodes"""
+        registry = CodecRegistry(default_codec="json")
+        data, _ = registry.encode(SAMPLE)
+
+        assert data[0] == HEADER_MAGIC
+        assert registry.decode(data) == SAMPLE
+
+    def test_decode_independent_of_configuration(self):
+        """Test payloads decode with a registry configured differently"""
+        writer = CodecRegistry(default_codec="json", default_compressor="zlib", compression_threshold=10)
+        reader = CodecRegistry(default_codec="json", enable_compression=False)
+
+        value = {"items": [SAMPLE] * 20}
+        data, compressed = writer.encode(value)
+        assert compressed
+        assert reader.decode(data) == value
+
+    def test_namespace_codec_selection(self):
+        """Test per-namespace codecs are picked from the key prefix"""
+        registry = CodecRegistry(default_codec="json")
+        registry.set_namespace_codec("analytics", "pickle")
+
+        analytics, _ = registry.encode(SAMPLE, key="analytics:daily")
+        default, _ = registry.encode(SAMPLE, key="user:1")
+
+        assert analytics[1] >> 4 == registry.get_codec("pickle").codec_id
+        assert default[1] >> 4 == registry.get_codec("json").codec_id
+        assert registry.decode(analytics, key="analytics:daily") == SAMPLE
+
+    def test_pickle_is_not_a_default(self):
+        """Test pickle is neither registered nor usable as the registry default"""
+        registry = CodecRegistry(default_codec="pickle")
+
+        assert registry.default_codec == "json"
+        assert "pickle" not in registry.available_codecs
+
+    def test_pickle_rejected_outside_opted_in_namespace(self):
+        """Test a pickle-tagged payload planted under another namespace is not loaded"""
+        writer = CodecRegistry()
+        writer.set_namespace_codec("analytics", "pickle")
+        payload, _ = writer.encode(SAMPLE, key="analytics:daily")
+
+        reader = CodecRegistry()
+        reader.set_namespace_codec("analytics", "pickle")
+        with pytest.raises(ValueError):
+            reader.decode(payload, key="user:1")
+        with pytest.raises(ValueError):
+            reader.decode(payload)
+        with pytest.raises(ValueError):
+            CodecRegistry().decode(payload, key="analytics:daily")
+
+    def test_unavailable_codec_falls_back_to_json(self):
+        """Test an unknown codec name resolves to json once at configuration"""
+        registry = CodecRegistry(default_codec="does-not-exist")
+        assert registry.default_codec == "json"
+
+    def test_large_payload_is_compressed(self):
+        """Test compressible payloads above the threshold are compressed"""
+        registry = CodecRegistry(compression_threshold=100)
+        value = {"text": "a" * 5000}
+
+        data, compressed = registry.encode(value)
+
+        assert compressed is True
+        assert len(data) < 5000
+        assert registry.decode(data) == value
+
+    def test_small_payload_is_not_compressed(self):
+        """Test payloads below the threshold are stored raw"""
+        registry = CodecRegistry(compression_threshold=1024)
+        data, compressed = registry.encode(SAMPLE)
+
+        assert compressed is False
+        assert data[1] & 0x0F == 0
+
+    def test_policies_are_bounded(self):
+        """Test bare keys share the default policy and the table is capped"""
+        registry = CodecRegistry(compression_threshold=10, max_policies=3)
+        for i in range(100):
+            registry.encode(SAMPLE, key=f"{i:032x}")
+        assert list(registry._policies) == [""]
+        # One shared policy sees enough samples to adapt
+        assert registry._policies[""].threshold > 10
+
+        for namespace in ("a", "b", "c", "a", "d"):
+            registry.encode(SAMPLE, key=f"{namespace}:1")
+        assert list(registry._policies) == ["c", "a", "d"]
+
+    def test_decode_rejects_headerless_payload(self):
+        """Test legacy payloads are not mistaken for tagged ones"""
+        registry = CodecRegistry()
+        with pytest.raises(ValueError):
+            registry.decode(zlib.compress(json.dumps(SAMPLE).encode()))
+
+
+class TestAdaptiveCompressionPolicy:
+    """Test the ratio-driven compression threshold"""
+
+    def test_threshold_rises_when_compression_does_not_help(self):
+        """Test incompressible data pushes the threshold up"""
+        policy = AdaptiveCompressionPolicy(base_threshold=1000)
+        for _ in range(3):
+            policy.record(2000, 1990)
+
+        assert policy.threshold == 8000
+        assert policy.should_compress(2000) is False
+
+    def test_threshold_returns_to_base_when_compression_helps(self):
+        """Test good ratios lower the threshold back to its base"""
+        policy = AdaptiveCompressionPolicy(base_threshold=1000, threshold=16000)
+        for _ in range(10):
+            policy.record(2000, 200)
+
+        assert policy.threshold == 1000
+
+    def test_probe_below_raised_threshold(self):
+        """Test payloads between base and threshold are periodically sampled"""
+        policy = AdaptiveCompressionPolicy(base_threshold=1000, threshold=8000, probe_interval=5)
+        decisions = [policy.should_compress(2000) for _ in range(5)]
+
+        assert decisions == [False, False, False, False, True]
@@ -0,0 +1,163 @@
+"""
+Tests for the cross-worker cache invalidation bus
+"""
+import asyncio
+import json
+
+import pytest
+
+from app.core import cache_invalidation_bus as bus_module
+from app.core.cache_invalidation_bus import MESSAGE_VERSION, CacheInvalidationBus
+
+
+class FakeL1:
+    def __init__(self):
+        self.cleared = 0
+
+    def clear(self):
+        self.cleared += 1
+
+
+class FakeCache:
+    def __init__(self):
+        self.l1_cache = FakeL1()
+        self.evicted = []
+        self.evicted_patterns = []
+        self.invalidation_bus = None
+
+    def attach_invalidation_bus(self, bus):
+        self.invalidation_bus = bus
+
+    def evict_local(self, key):
+        self.evicted.append(key)
+        return True
+
+    def evict_local_pattern(self, pattern):
+        self.evicted_patterns.append(pattern)
+        return 1
+
+
+class FakeRedis:
+    def __init__(self):
+        self.published = []
+        self.fail = False
+
+    async def publish(self, channel, message):
+        if self.fail:
+            raise ConnectionError("redis unavailable")
+        self.published.append((channel, json.loads(message)))
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(bus_module, "redis_client", fake)
+    return fake
+
+
+def message(origin, keys=None, patterns=None):
+    return json.dumps({"v": MESSAGE_VERSION, "origin": origin,
+                       "keys": keys or {}, "patterns": patterns or {}})
+
+
+class TestPublishing:
+    """Test local invalidations are batched onto the channel"""
+
+    def test_invalidations_are_batched(self, redis):
+        """Test deletes queued within the interval go out as one message"""
+        bus = CacheInvalidationBus(FakeCache(), batch_interval=0.01)
+
+        async def run():
+            bus._running = True
+            bus.publish_keys(["user:1", "user:2"])
+            bus.publish_pattern("quests:")
+            bus.publish_keys(["user:3"])
+            await bus._flush_task
+
+        asyncio.run(run())
+
+        assert len(redis.published) == 1
+        channel, sent = redis.published[0]
+        assert channel == "cache:invalidation"
+        assert list(sent["keys"]) == ["user:1", "user:2", "user:3"]
+        assert list(sent["patterns"]) == ["quests:"]
+        assert sent["origin"] == bus.node_id
+
+    def test_large_batches_are_split(self, redis):
+        """Test a full batch is flushed at once and split by max_batch_size"""
+        bus = CacheInvalidationBus(FakeCache(), batch_interval=10, max_batch_size=2)
+
+        async def run():
+            bus._running = True
+            bus.publish_keys([f"user:{i}" for i in range(5)])
+            await bus._flush_task
+
+        asyncio.run(run())
+
+        assert [len(sent["keys"]) for _, sent in redis.published] == [2, 2, 1]
+
+    def test_redis_down_degrades(self, redis):
+        """Test failed publishes are counted and don't raise"""
+        bus = CacheInvalidationBus(FakeCache())
+        redis.fail = True
+        bus.publish_keys(["user:1"])
+        asyncio.run(bus._publish_pending())
+        asyncio.run(bus._publish_pending())
+
+        assert bus.stats["publish_failures"] == 1
+        assert bus._publish_degraded is True
+
+        redis.fail = False
+        bus.publish_keys(["user:1"])
+        asyncio.run(bus._publish_pending())
+        assert bus._publish_degraded is False
+        assert bus.stats["messages_published"] == 1
+
+
+class TestReceiving:
+    """Test remote invalidations are applied to the local L1"""
+
+    def test_out_of_order_messages_are_dropped(self):
+        """Test an older version from the same sender is ignored"""
+        cache = FakeCache()
+        bus = CacheInvalidationBus(cache)
+
+        bus.handle_message(message("worker-a", keys={"user:1": 200}))
+        bus.handle_message(message("worker-a", keys={"user:1": 100}))
+        bus.handle_message(message("worker-a", patterns={"quests:": 5}))
+        bus.handle_message(message("worker-a", patterns={"quests:": 5}))
+
+        assert cache.evicted == ["user:1"]
+        assert cache.evicted_patterns == ["quests:"]
+        assert bus.stats["out_of_order_dropped"] == 2
+
+    def test_versions_are_not_compared_across_senders(self):
+        """Test a sender whose clock is behind still invalidates"""
+        cache = FakeCache()
+        bus = CacheInvalidationBus(cache)
+
+        bus.handle_message(message("fast-clock", keys={"user:1": 10 ** 19}))
+        bus.handle_message(message("slow-clock", keys={"user:1": 10 ** 18}))
+
+        assert cache.evicted == ["user:1", "user:1"]
+        assert bus.stats["out_of_order_dropped"] == 0
+
+    def test_own_and_malformed_messages_are_ignored(self):
+        """Test the sender doesn't evict its own keys and bad payloads are skipped"""
+        cache = FakeCache()
+        bus = CacheInvalidationBus(cache)
+
+        bus.handle_message(message(bus.node_id, keys={"user:1": 1}))
+        bus.handle_message("not json")
+        bus.handle_message(json.dumps({"v": MESSAGE_VERSION + 1, "origin": "x", "keys": {"user:1": 1}}))
+
+        assert cache.evicted == []
+        assert bus.stats["messages_received"] == 0
+
+    def test_tracked_versions_are_bounded(self):
+        """Test the version table drops the oldest entries"""
+        bus = CacheInvalidationBus(FakeCache(), max_tracked_versions=3)
+        for i in range(10):
+            bus.handle_message(message("worker-a", keys={f"user:{i}": 1}))
+
+        assert len(bus._applied_versions) == 3
@@ -0,0 +1,171 @@
+"""
+Tests for stale-while-revalidate and early refresh in CacheDecorator
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.core import advanced_cache as advanced_cache_module
+from app.core.advanced_cache import CacheConfiguration, CacheDecorator, MultiLayerCache
+
+
+@pytest.fixture
+def cache(redis):
+    cache = MultiLayerCache(CacheConfiguration())
+    cache.tag_index.gc_probability = 0
+    return cache
+
+
+class Loader:
+    """Async function returning successive versions, optionally held on an event"""
+
+    __name__ = "load_quest"
+
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+        self.release = None
+
+    async def __call__(self, item_id):
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        if self.fail:
+            raise RuntimeError("backend down")
+        return f"{item_id}-v{self.calls}"
+
+
+def envelope(value, age, delta=0.01):
+    return {CacheDecorator.ENVELOPE_MARKER: 1, "value": value,
+            "stored_at": time.time() - age, "delta": delta}
+
+
+async def seed(cache, decorator, loader, value, *args):
+    await cache.set(decorator._build_cache_key(loader, args, {}), value, decorator.ttl)
+
+
+class TestStaleWhileRevalidate:
+    """Test stale entries are served while one refresh runs in the background"""
+
+    def test_stale_value_served_then_refreshed(self, cache):
+        """Test a stale hit returns at once and the next call sees the refresh"""
+        decorator = CacheDecorator(cache, ttl=600, soft_ttl=60)
+        loader = Loader()
+        cached = decorator(loader)
+
+        async def run():
+            await seed(cache, decorator, loader, envelope("quest-old", age=120), "quest")
+            first = await cached("quest")
+            await asyncio.gather(*decorator._refreshing.values())
+            return first, await cached("quest")
+
+        assert asyncio.run(run()) == ("quest-old", "quest-v1")
+        assert cache.stats["stale_hits"] == 1
+        assert cache.stats["background_refreshes"] == 1
+
+    def test_fresh_value_is_not_refreshed(self, cache):
+        """Test entries younger than soft_ttl don't trigger a refresh"""
+        decorator = CacheDecorator(cache, ttl=600, soft_ttl=60)
+        loader = Loader()
+        cached = decorator(loader)
+
+        async def run():
+            await seed(cache, decorator, loader, envelope("quest-old", age=10), "quest")
+            return await cached("quest")
+
+        assert asyncio.run(run()) == "quest-old"
+        assert loader.calls == 0 and decorator._refreshing == {}
+
+    def test_one_background_refresh_per_key(self, cache):
+        """Test concurrent stale hits share a single refresh"""
+        decorator = CacheDecorator(cache, ttl=600, soft_ttl=60)
+        loader = Loader()
+        cached = decorator(loader)
+
+        async def run():
+            loader.release = asyncio.Event()
+            await seed(cache, decorator, loader, envelope("quest-old", age=120), "quest")
+            served = await asyncio.gather(*[cached("quest") for _ in range(5)])
+            pending = len(decorator._refreshing)
+            loader.release.set()
+            await asyncio.gather(*decorator._refreshing.values())
+            return served, pending
+
+        served, pending = asyncio.run(run())
+
+        assert served == ["quest-old"] * 5
+        assert pending == 1
+        assert loader.calls == 1
+        assert decorator._refreshing == {}
+
+    def test_failed_refresh_keeps_stale_value(self, cache):
+        """Test a refresh error is counted and the stale value stays cached"""
+        decorator = CacheDecorator(cache, ttl=600, soft_ttl=60)
+        loader = Loader(fail=True)
+        cached = decorator(loader)
+
+        async def run():
+            await seed(cache, decorator, loader, envelope("quest-old", age=120), "quest")
+            await cached("quest")
+            await asyncio.gather(*decorator._refreshing.values())
+            return await cached("quest")
+
+        assert asyncio.run(run()) == "quest-old"
+        assert cache.stats["refresh_errors"] >= 1
+        assert cache.stats["background_refreshes"] == 0
+
+    def test_pre_envelope_values_are_returned(self, cache):
+        """Test values cached before revalidation was enabled are served as they are"""
+        decorator = CacheDecorator(cache, ttl=600, soft_ttl=60)
+        loader = Loader()
+        cached = decorator(loader)
+
+        async def run():
+            await seed(cache, decorator, loader, {"legacy": True}, "quest")
+            return await cached("quest")
+
+        assert asyncio.run(run()) == {"legacy": True}
+        assert loader.calls == 0 and decorator._refreshing == {}
+
+    def test_miss_stores_an_envelope(self, cache):
+        """Test a miss computes the value once and caches it with its compute time"""
+        decorator = CacheDecorator(cache, ttl=600, soft_ttl=60)
+        loader = Loader()
+        cached = decorator(loader)
+
+        async def run():
+            value = await cached("quest")
+            return value, await cache.get(decorator._build_cache_key(loader, ("quest",), {}))
+
+        value, stored = asyncio.run(run())
+
+        assert value == "quest-v1"
+        assert stored["value"] == "quest-v1"
+        assert stored["delta"] >= 0 and stored["stored_at"] <= time.time()
+
+
+class TestEarlyRefresh:
+    """Test XFetch refreshes ahead of the freshness deadline"""
+
+    def test_early_refresh_depends_on_compute_time(self, monkeypatch, cache):
+        """Test slow-to-compute entries refresh early and cheap ones don't"""
+        decorator = CacheDecorator(cache, ttl=600, soft_ttl=60, early_refresh_beta=1.0)
+        # 1 - random() = 1e-6, so -ln(...) is about 13.8
+        monkeypatch.setattr(advanced_cache_module.random, "random", lambda: 1 - 1e-6)
+
+        # 10s to compute, 30s left: 10 * 13.8 > 30
+        assert decorator._needs_refresh(envelope("slow", age=30, delta=10.0)) is True
+        # 0.5s to compute: 0.5 * 13.8 < 30
+        assert decorator._needs_refresh(envelope("cheap", age=30, delta=0.5)) is False
+        assert cache.stats["early_refreshes"] == 1
+        assert cache.stats["stale_hits"] == 0
+
+    def test_without_beta_only_stale_entries_refresh(self, monkeypatch, cache):
+        """Test early refresh is off by default"""
+        decorator = CacheDecorator(cache, ttl=600, soft_ttl=60)
+        monkeypatch.setattr(advanced_cache_module.random, "random", lambda: 1 - 1e-6)
+
+        assert decorator._needs_refresh(envelope("slow", age=30, delta=10.0)) is False
+        assert decorator._needs_refresh(envelope("slow", age=61, delta=10.0)) is True
+        assert cache.stats["early_refreshes"] == 0
@@ -0,0 +1,145 @@
+"""
+Tests for tag-indexed cache invalidation, run against fakeredis
+"""
+import asyncio
+
+import pytest
+
+from app.core import cache_invalidation as cache_invalidation_module
+from app.core.advanced_cache import CacheConfiguration, MultiLayerCache
+from app.core.cache_invalidation import CacheTag, SmartCacheInvalidator
+from app.core.cache_tag_index import CacheTagIndex
+
+
+@pytest.fixture
+def cache(redis):
+    cache = MultiLayerCache(CacheConfiguration())
+    cache.tag_index.gc_probability = 0
+    cache.tag_index.namespace_tags.add("homepage")
+    return cache
+
+
+async def raw_keys(redis):
+    return sorted(key.decode() for key in await redis.client.keys("*"))
+
+
+class TestDeriveTags:
+    """Test the tags implied by the key layout"""
+
+    def test_entity_and_namespace_tags(self):
+        """Test entity prefixes map to their entity tag and namespaces tag themselves"""
+        index = CacheTagIndex()
+        index.namespace_tags.update({"homepage", CacheTag.CONTENT.value})
+
+        assert index.derive_tags("user:42:quests") == {"user:42"}
+        assert index.derive_tags("profile:42") == {"user:42"}
+        assert index.derive_tags("settings:42:theme") == {"user:42"}
+        assert index.derive_tags("list:math:page:1") == {"content:math"}
+        assert index.derive_tags("content:7:body") == {"content:7", "content"}
+        assert index.derive_tags("homepage:featured") == {"homepage"}
+        assert index.derive_tags("report:weekly", tags=[CacheTag.ANALYTICS, "weekly"]) == {
+            "analytics", "weekly"
+        }
+        assert index.derive_tags("user:") == set()
+
+    def test_legacy_patterns_cover_derived_keys(self):
+        """Test the fallback patterns match the keys derive_tags indexes under a tag"""
+        index = CacheTagIndex()
+        index.namespace_tags.add("homepage")
+
+        assert sorted(index.legacy_patterns("user:42")) == ["profile:42", "settings:42", "user:42"]
+        assert sorted(index.legacy_patterns("content:math")) == ["content:math", "list:math"]
+        assert index.legacy_patterns("homepage") == ["homepage:"]
+        assert index.legacy_patterns("principal-user:42") == []
+
+
+class TestTagIndex:
+    """Test tag sets are written with entries and used to invalidate them"""
+
+    def test_set_writes_tag_sets(self, redis, cache):
+        """Test set() and set_many() index keys under derived and explicit tags"""
+        async def run():
+            await cache.set("user:1:quests", [1, 2])
+            await cache.set("report:weekly", {"n": 1}, tags=["reports"])
+            await cache.set_many({"profile:1": {"name": "a"}, "profile:2": {"name": "b"}},
+                                 tags={"profile:2": ["vip"]})
+            return {
+                tag: sorted(await cache.tag_index.members(tag))
+                for tag in ("user:1", "user:2", "reports", "vip")
+            }
+
+        assert asyncio.run(run()) == {
+            "user:1": ["profile:1", "user:1:quests"],
+            "user:2": ["profile:2"],
+            "reports": ["report:weekly"],
+            "vip": ["profile:2"]
+        }
+
+    def test_invalidate_by_tag(self, monkeypatch, redis, cache):
+        """Test invalidating a tag drops its entries and set but leaves other keys"""
+        monkeypatch.setattr(cache_invalidation_module, "multi_layer_cache", cache)
+        invalidator = SmartCacheInvalidator()
+        cache.tag_index.legacy_window_seconds = 0
+
+        async def run():
+            await cache.set("user:1:quests", [1])
+            await cache.set("settings:1:theme", "dark")
+            await cache.set("user:2:quests", [2])
+            invalidated = await invalidator.invalidate_by_tag("user:1")
+            return (sorted(invalidated), await raw_keys(redis),
+                    await cache.get("user:1:quests"), await cache.get("user:2:quests"))
+
+        invalidated, keys, evicted, kept = asyncio.run(run())
+
+        assert invalidated == ["settings:1:theme", "user:1:quests"]
+        assert "cache:user:1:quests" not in keys and "cache_tag:user:1" not in keys
+        assert "cache:user:2:quests" in keys
+        assert evicted is None and kept == [2]
+        assert invalidator.stats["tag_invalidations"] == 2
+
+    def test_untagged_entries_use_patterns_within_the_window(self, redis, cache):
+        """Test entries written before the index are invalidated by pattern for one window"""
+        async def run():
+            # Written by a worker that didn't index tags yet
+            await redis.client.hset("cache:user:1:quests", mapping={"data": b"x"})
+            await redis.client.hset("cache:homepage:featured", mapping={"data": b"x"})
+
+            await cache.invalidate_tag("user:1")
+            await cache.invalidate_tag("homepage")
+            inside = await raw_keys(redis)
+
+            await redis.client.hset("cache:user:1:quests", mapping={"data": b"x"})
+            cache.tag_index.legacy_window_seconds = 0
+            await cache.invalidate_tag("user:1")
+            return inside, await raw_keys(redis)
+
+        inside, after = asyncio.run(run())
+
+        assert inside == ["cache_tag_index:since"]
+        assert "cache:user:1:quests" in after
+        assert cache.tag_index.stats["legacy_fallbacks"] == 2
+
+    def test_window_starts_once_for_all_workers(self, redis):
+        """Test the first worker to check records the start for the others"""
+        first, second = CacheTagIndex(legacy_window_seconds=100), CacheTagIndex(legacy_window_seconds=100)
+
+        async def run():
+            return (await first.legacy_fallback_active(now=1000.0),
+                    await second.legacy_fallback_active(now=1050.0),
+                    await second.legacy_fallback_active(now=1100.0))
+
+        assert asyncio.run(run()) == (True, True, False)
+
+    def test_lazy_gc_drops_expired_members(self, redis, cache):
+        """Test sampled GC removes members whose entry is gone and keeps live ones"""
+        async def run():
+            await cache.set("user:1:quests", [1])
+            await cache.set("user:1:badges", [2])
+            await redis.client.delete("cache:user:1:badges")
+            removed = await cache.tag_index.collect_garbage("user:1")
+            return removed, await cache.tag_index.members("user:1")
+
+        removed, members = asyncio.run(run())
+
+        assert removed == 1
+        assert members == ["user:1:quests"]
@@ -0,0 +1,127 @@
+"""
+Tests for the persistent L3 disk cache
+"""
+import sqlite3
+import time
+
+import pytest
+
+from app.core.disk_cache import PersistentDiskCache
+
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    cache = PersistentDiskCache(str(tmp_path / "l3.db"), max_size_bytes=1000)
+    yield cache
+    cache.close()
+
+
+class TestPersistentDiskCache:
+    """Test disk tier storage, expiry and compaction"""
+
+    def test_set_and_get(self, disk_cache):
+        """Test round trip of data and serialization method"""
+        assert disk_cache.set("content:1", b"payload", "json", ttl=60) is True
+        assert disk_cache.get("content:1") == (b"payload", "json")
+        assert disk_cache.get("missing") is None
+        assert disk_cache.size_bytes == 7
+
+    def test_overwrite_updates_size(self, disk_cache):
+        """Test replacing a key adjusts the byte total"""
+        disk_cache.set("k", b"x" * 100, "json", ttl=60)
+        disk_cache.set("k", b"x" * 40, "json", ttl=60)
+        assert disk_cache.size_bytes == 40
+
+    def test_expired_entries_are_misses(self, disk_cache):
+        """Test TTL expiry on read and on purge"""
+        disk_cache.set("a", b"1", "json", ttl=0.01)
+        disk_cache.set("b", b"2", "json", ttl=0.01)
+        disk_cache.set("c", b"3", "json", ttl=60)
+        time.sleep(0.02)
+
+        assert disk_cache.get("a") is None
+        assert disk_cache.purge_expired() == 1
+        assert disk_cache.size_bytes == 1
+
+    def test_compaction_evicts_least_recently_used(self, tmp_path):
+        """Test exceeding the size limit evicts cold entries first"""
+        cache = PersistentDiskCache(str(tmp_path / "l3.db"), max_size_bytes=300,
+                                    low_watermark=0.85, touch_interval=0)
+        cache.set("old", b"x" * 100, "json", ttl=60)
+        time.sleep(0.01)
+        cache.set("warm", b"x" * 100, "json", ttl=60)
+        time.sleep(0.01)
+        cache.get("old")
+        time.sleep(0.01)
+        cache.set("new", b"x" * 150, "json", ttl=60)
+
+        assert cache.get("warm") is None
+        assert cache.get("old") is not None
+        assert cache.get("new") is not None
+        assert cache.size_bytes <= 300
+        assert cache.stats["compactions"] == 1
+        cache.close()
+
+    def test_delete_and_pattern(self, disk_cache):
+        """Test single, bulk and glob deletes"""
+        for key in ("user:1:a", "user:1:b", "user:2:a", "other"):
+            disk_cache.set(key, b"v", "json", ttl=60)
+
+        assert disk_cache.delete("other") is True
+        assert disk_cache.delete("other") is False
+        assert disk_cache.delete_pattern("*user:1:*") == 2
+        assert disk_cache.get("user:2:a") is not None
+        assert disk_cache.size_bytes == 1
+
+    def test_survives_reopen(self, tmp_path):
+        """Test entries and size accounting persist across restarts"""
+        path = str(tmp_path / "l3.db")
+        cache = PersistentDiskCache(path)
+        cache.set("report:1", b"compiled", "json", ttl=60)
+        cache.close()
+
+        reopened = PersistentDiskCache(path)
+        assert reopened.get("report:1") == (b"compiled", "json")
+        assert reopened.size_bytes == 8
+        reopened.close()
+
+    def test_size_is_shared_across_workers(self, tmp_path):
+        """Test workers on one file see each other's writes and compactions"""
+        path = str(tmp_path / "l3.db")
+        first = PersistentDiskCache(path, max_size_bytes=300, low_watermark=0.5)
+        second = PersistentDiskCache(path, max_size_bytes=300, low_watermark=0.5)
+
+        first.set("a", b"x" * 100, "json", ttl=60)
+        second.set("b", b"x" * 100, "json", ttl=60)
+        assert first.size_bytes == second.size_bytes == 200
+
+        second.set("b", b"x" * 50, "json", ttl=60)
+        first.delete("a")
+        assert second.size_bytes == 50
+
+        # The writer that crosses the limit compacts by the shared total
+        first.set("c", b"x" * 100, "json", ttl=60)
+        second.set("d", b"x" * 200, "json", ttl=60)
+        assert second.stats["compactions"] == 1
+        assert first.size_bytes <= 150
+        first.close()
+        second.close()
+
+    def test_total_is_built_for_existing_files(self, tmp_path):
+        """Test a file written before the size table gets its total on open"""
+        path = tmp_path / "l3.db"
+        conn = sqlite3.connect(str(path))
+        conn.execute(
+            "CREATE TABLE cache_entries (key TEXT PRIMARY KEY, data BLOB NOT NULL, method TEXT NOT NULL,"
+            " size INTEGER NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        conn.execute("INSERT INTO cache_entries VALUES ('k', x'616263', 'json', 3, ?, ?)",
+                     (time.time() + 60, time.time()))
+        conn.commit()
+        conn.close()
+
+        cache = PersistentDiskCache(str(path))
+        assert cache.size_bytes == 3
+        cache.set("k2", b"abcd", "json", ttl=60)
+        assert cache.size_bytes == 7
+        cache.close()
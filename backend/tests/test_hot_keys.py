@@ -0,0 +1,83 @@
+"""
+Tests for hot key tracking
+"""
+import pytest
+
+from app.core.hot_keys import CountMinSketch, HotKeyTracker
+
+
+class TestCountMinSketch:
+    """Test sketch estimates"""
+
+    def test_estimate_never_undercounts(self):
+        """Test estimates are at least the true count"""
+        sketch = CountMinSketch(width=64, depth=4)
+        counts = {f"key:{i}": i + 1 for i in range(200)}
+        for key, count in counts.items():
+            sketch.add(key, count)
+
+        for key, count in counts.items():
+            assert sketch.estimate(key) >= count
+
+    def test_decay_halves_counts(self):
+        """Test decay scales counters down"""
+        sketch = CountMinSketch(width=1024, depth=4)
+        sketch.add("hot", 100)
+        sketch.decay(0.5)
+
+        assert sketch.estimate("hot") == 50
+        assert sketch.total == 50
+
+    def test_invalid_dimensions_rejected(self):
+        """Test zero-sized sketches are rejected"""
+        with pytest.raises(ValueError):
+            CountMinSketch(width=0)
+
+
+class TestHotKeyTracker:
+    """Test top-K maintenance"""
+
+    def test_top_keys_ranked_by_frequency(self):
+        """Test the most accessed keys are reported first"""
+        tracker = HotKeyTracker(top_k=3)
+        for key, hits in (("a", 5), ("b", 20), ("c", 10), ("d", 1)):
+            for _ in range(hits):
+                tracker.record(key)
+
+        assert [key for key, _ in tracker.top()] == ["b", "c", "a"]
+
+    def test_new_hot_key_replaces_coldest(self):
+        """Test a key that overtakes the coldest tracked key replaces it"""
+        tracker = HotKeyTracker(top_k=2)
+        tracker.record("a", 10)
+        tracker.record("b", 2)
+        for _ in range(5):
+            tracker.record("c")
+
+        assert {key for key, _ in tracker.top()} == {"a", "c"}
+        assert tracker.stats["replacements"] == 1
+
+    def test_matches_a_full_scan(self):
+        """Test the heap picks the same coldest key as scanning the table"""
+        tracker = HotKeyTracker(top_k=20, width=4096)
+        for i in range(5000):
+            tracker.record(f"key:{(i * 7919) % 97 % (1 + i % 40)}")
+            coldest, count = tracker._min()
+            assert count == min(tracker._top.values())
+            assert tracker._top[coldest] == count
+
+        # Superseded entries don't accumulate
+        assert len(tracker._heap) <= 2 * tracker.top_k + 16
+        tracker.decay()
+        assert len(tracker._heap) == len(tracker._top)
+
+    def test_snapshot_round_trip(self):
+        """Test a snapshot seeds another tracker with the same ranking"""
+        tracker = HotKeyTracker(top_k=10)
+        for key, hits in (("x", 3), ("y", 7)):
+            tracker.record(key, hits)
+
+        restored = HotKeyTracker(top_k=10)
+        restored.load(tracker.snapshot())
+
+        assert restored.top() == tracker.top()
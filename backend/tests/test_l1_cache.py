@@ -0,0 +1,122 @@
+"""
+Tests for the L1 in-memory cache engine
+"""
+import time
+
+import pytest
+
+from app.core.l1_cache import L1CacheEngine
+
+
+class TestL1Eviction:
+    """Test strategy-specific eviction order"""
+
+    def test_lru_evicts_least_recently_used(self):
+        """Test LRU keeps recently read entries"""
+        cache = L1CacheEngine(max_size_bytes=30, strategy="lru")
+        cache.set("a", 1, 10)
+        cache.set("b", 2, 10)
+        cache.set("c", 3, 10)
+
+        cache.get("a")
+        cache.set("d", 4, 10)
+
+        assert "a" in cache
+        assert "b" not in cache
+        assert cache.evictions == 1
+
+    def test_fifo_ignores_reads(self):
+        """Test FIFO evicts by insertion order regardless of access"""
+        cache = L1CacheEngine(max_size_bytes=30, strategy="fifo")
+        cache.set("a", 1, 10)
+        cache.set("b", 2, 10)
+        cache.set("c", 3, 10)
+
+        cache.get("a")
+        cache.set("d", 4, 10)
+
+        assert "a" not in cache
+        assert "b" in cache
+
+    def test_lfu_evicts_least_frequently_used(self):
+        """Test LFU evicts the coldest entry"""
+        cache = L1CacheEngine(max_size_bytes=30, strategy="lfu")
+        cache.set("a", 1, 10)
+        cache.set("b", 2, 10)
+        cache.set("c", 3, 10)
+
+        for _ in range(3):
+            cache.get("a")
+        cache.get("c")
+        cache.set("d", 4, 10)
+
+        assert "b" not in cache
+        assert "a" in cache and "c" in cache and "d" in cache
+
+    def test_ttl_evicts_soonest_expiry(self):
+        """Test TTL strategy evicts the entry closest to expiry"""
+        cache = L1CacheEngine(max_size_bytes=30, strategy="ttl")
+        cache.set("long", 1, 10, ttl=300)
+        cache.set("short", 2, 10, ttl=5)
+        cache.set("forever", 3, 10)
+
+        cache.set("new", 4, 10, ttl=100)
+
+        assert "short" not in cache
+        assert "long" in cache and "forever" in cache
+
+    def test_unknown_strategy_rejected(self):
+        """Test invalid strategy names raise"""
+        with pytest.raises(ValueError):
+            L1CacheEngine(max_size_bytes=10, strategy="random")
+
+
+class TestL1Accounting:
+    """Test byte accounting, expiry and counters"""
+
+    def test_size_tracks_payload_bytes(self):
+        """Test size follows set, overwrite and delete"""
+        cache = L1CacheEngine(max_size_bytes=100)
+        cache.set("a", "x", 40)
+        cache.set("b", "y", 20)
+        assert cache.size_bytes == 60
+
+        cache.set("a", "z", 10)
+        assert cache.size_bytes == 30
+
+        cache.delete("b")
+        assert cache.size_bytes == 10
+
+    def test_oversized_entry_rejected(self):
+        """Test an entry larger than the budget is not stored"""
+        cache = L1CacheEngine(max_size_bytes=10)
+        assert cache.set("big", "x", 11) is False
+        assert len(cache) == 0
+        assert cache.rejections == 1
+
+    def test_expired_entry_is_a_miss(self):
+        """Test per-entry TTL expiry on access and on purge"""
+        cache = L1CacheEngine(max_size_bytes=100)
+        cache.set("a", 1, 10, ttl=0.01)
+        cache.set("b", 2, 10, ttl=0.01)
+        cache.set("c", 3, 10, ttl=60)
+        time.sleep(0.02)
+
+        assert cache.get("a") is None
+        assert cache.purge_expired() == 1
+        assert cache.keys() == ["c"]
+        assert cache.expirations == 2
+        assert cache.size_bytes == 10
+
+    def test_stats_counters(self):
+        """Test hit and miss counters"""
+        cache = L1CacheEngine(max_size_bytes=100)
+        cache.set("a", 1, 10)
+        cache.get("a")
+        cache.get("missing")
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+        assert stats["strategy"] == "lru"
@@ -0,0 +1,69 @@
+"""
+Tests for the metric label cardinality limiter
+"""
+from app.core.label_cardinality import OVERFLOW_VALUE, LabelCardinalityLimiter
+
+
+class TestLabelCardinalityLimiter:
+    """Test label values and series stay bounded per metric"""
+
+    def test_values_over_limit_go_to_overflow(self):
+        """Test unseen values past the limit share the overflow bucket"""
+        limiter = LabelCardinalityLimiter(max_values_per_label=3)
+        endpoints = [
+            limiter.limit("http_requests", {"method": "GET", "endpoint": f"/quests/{i}"})["endpoint"]
+            for i in range(10)
+        ]
+
+        assert endpoints[:3] == ["/quests/0", "/quests/1", "/quests/2"]
+        assert set(endpoints[3:]) == {OVERFLOW_VALUE}
+        # Admitted values keep their own series
+        assert limiter.limit("http_requests", {"method": "GET", "endpoint": "/quests/1"})["endpoint"] == "/quests/1"
+
+        stats = limiter.get_metric_stats("http_requests")
+        assert stats["labels"]["endpoint"] == {"values": 3, "overflowed": 7}
+        assert stats["labels"]["method"] == {"values": 1, "overflowed": 0}
+        assert stats["series"] == 4
+
+    def test_series_limit(self):
+        """Test combinations past the series limit collapse to one series"""
+        limiter = LabelCardinalityLimiter(max_values_per_label=10, max_series_per_metric=4)
+        seen = set()
+        for method in ("GET", "POST", "PUT"):
+            for status in ("200", "404", "500"):
+                labels = limiter.limit("http_requests_total", {"method": method, "status": status})
+                seen.add(tuple(sorted(labels.items())))
+
+        assert len(seen) == 5
+        assert (("method", OVERFLOW_VALUE), ("status", OVERFLOW_VALUE)) in seen
+        assert limiter.get_metric_stats("http_requests_total")["series_overflowed"] == 5
+
+    def test_label_names_are_capped(self):
+        """Test unseen label names past the limit fold into one overflow label"""
+        limiter = LabelCardinalityLimiter(max_labels_per_metric=2)
+        assert limiter.limit("events", {"type": "a", "source": "web"}) == {"type": "a", "source": "web"}
+
+        for i in range(50):
+            labels = limiter.limit("events", {"type": "a", f"request_{i}": str(i), f"trace_{i}": "x"})
+            assert labels == {"type": "a", OVERFLOW_VALUE: OVERFLOW_VALUE}
+
+        stats = limiter.get_metric_stats("events")
+        assert set(stats["labels"]) == {"type", "source"}
+        assert stats["labels_overflowed"] == 100
+        assert stats["series"] == 2
+
+    def test_metrics_are_limited_separately(self):
+        """Test each metric has its own budget and reports its own memory"""
+        limiter = LabelCardinalityLimiter(max_values_per_label=1)
+        assert limiter.limit("a", {"user": "1"}) == {"user": "1"}
+        assert limiter.limit("b", {"user": "2"}) == {"user": "2"}
+        assert limiter.limit("a", {"user": "2"}) == {"user": OVERFLOW_VALUE}
+        assert limiter.limit("a", None) == {}
+
+        stats = limiter.get_stats()
+        assert set(stats["metrics"]) == {"a", "b"}
+        assert stats["metrics"]["a"]["memory_bytes"] > 0
+        assert stats["total_memory_bytes"] == sum(m["memory_bytes"] for m in stats["metrics"].values())
+
+        limiter.reset("a")
+        assert limiter.limit("a", {"user": "3"}) == {"user": "3"}
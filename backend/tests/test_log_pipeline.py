@@ -0,0 +1,186 @@
+"""
+Tests for the queued log pipeline and request log sampling
+"""
+import io
+import logging
+import threading
+
+from app.core.log_pipeline import QueueLogHandler
+from app.middleware import logging_middleware
+from app.middleware.logging_middleware import LoggingMiddleware
+
+
+def make_record(message, level=logging.INFO):
+    return logging.LogRecord("test", level, __file__, 1, message, None, None)
+
+
+class BlockingHandler(logging.StreamHandler):
+    """Stream handler whose writes wait until released"""
+
+    def __init__(self):
+        super().__init__(io.StringIO())
+        self.unblock = threading.Event()
+        self.entered = threading.Event()
+
+    def flush(self):
+        self.entered.set()
+        self.unblock.wait(timeout=5)
+        super().flush()
+
+
+class FailingFlushHandler(logging.StreamHandler):
+    """Stream handler whose flush always raises"""
+
+    def __init__(self):
+        super().__init__(io.StringIO())
+        self.errors = 0
+
+    def flush(self):
+        raise OSError("disk full")
+
+    def handleError(self, record):
+        self.errors += 1
+
+
+class RecordingLogger:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, level):
+        return lambda message, **fields: self.calls.append((level, message, fields))
+
+
+class TestQueueLogHandler:
+    """Test the background writer, batching and overflow handling"""
+
+    def test_records_written_in_order(self):
+        """Test queued records reach every target in order"""
+        stream = io.StringIO()
+        target = logging.StreamHandler(stream)
+        target.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+        handler = QueueLogHandler([target], batch_size=4)
+
+        for i in range(10):
+            handler.handle(make_record(f"record {i}"))
+        handler.flush()
+
+        assert stream.getvalue().splitlines() == [f"INFO record {i}" for i in range(10)]
+        stats = handler.get_stats()
+        assert stats["written"] == 10
+        assert stats["dropped"] == 0
+        handler.close()
+
+    def test_flush_errors_do_not_feed_back_into_the_queue(self):
+        """Test a failing flush is reported on the handler, not logged again"""
+        target = FailingFlushHandler()
+        handler = QueueLogHandler([target])
+        # Anything logged by the pipeline itself would land back in its queue
+        pipeline_logger = logging.getLogger("app.core.log_pipeline")
+        pipeline_logger.addHandler(handler)
+        level = pipeline_logger.level
+        pipeline_logger.setLevel(logging.DEBUG)
+        try:
+            for i in range(3):
+                handler.handle(make_record(f"record {i}"))
+                handler.flush()
+            handler.flush()
+        finally:
+            pipeline_logger.removeHandler(handler)
+            pipeline_logger.setLevel(level)
+
+        stats = handler.get_stats()
+        assert stats["written"] == 3
+        assert stats["enqueued"] == 3
+        assert stats["flush_errors"] == target.errors == 3
+        assert target.stream.getvalue().splitlines() == [f"record {i}" for i in range(3)]
+        handler.close()
+
+    def test_target_level_respected(self):
+        """Test a target only receives records at or above its level"""
+        errors, everything = io.StringIO(), io.StringIO()
+        error_target = logging.StreamHandler(errors)
+        error_target.setLevel(logging.ERROR)
+        handler = QueueLogHandler([error_target, logging.StreamHandler(everything)])
+
+        handler.handle(make_record("fine"))
+        handler.handle(make_record("broken", logging.ERROR))
+        handler.flush()
+
+        assert errors.getvalue().splitlines() == ["broken"]
+        assert everything.getvalue().splitlines() == ["fine", "broken"]
+        handler.close()
+
+    def test_overflow_drops_info_and_keeps_warnings(self):
+        """Test a full queue drops low-priority records and writes warnings inline"""
+        target = BlockingHandler()
+        handler = QueueLogHandler([target], queue_size=2, batch_size=1)
+
+        handler.handle(make_record("first"))
+        assert target.entered.wait(timeout=5)
+        for i in range(5):
+            handler.handle(make_record(f"queued {i}"))
+        target.unblock.set()
+        handler.handle(make_record("overflow warning", logging.WARNING))
+
+        stats = handler.get_stats()
+        assert stats["dropped"] == 3
+        assert stats["dropped_by_level"] == {"INFO": 3}
+
+        handler.flush()
+        lines = target.stream.getvalue().splitlines()
+        # The warning found the queue full, so it may be written ahead of the queued records
+        assert sorted(lines) == sorted([
+            "first", "queued 0", "queued 1", "overflow warning",
+            "Log queue overflow: dropped 3 records since last report"
+        ])
+        handler.close()
+
+
+class TestRequestLogSampling:
+    """Test per-route sampling of successful request logs"""
+
+    def make_middleware(self, monkeypatch, **kwargs):
+        recorder = RecordingLogger()
+        monkeypatch.setattr(logging_middleware, "logger", recorder)
+        return LoggingMiddleware(None, **kwargs), recorder
+
+    def test_longest_prefix_wins(self, monkeypatch):
+        """Test the most specific route prefix sets the rate"""
+        middleware, _ = self.make_middleware(
+            monkeypatch, sample_rate=0.5, sample_rates={"/api/v1": 0.1, "/api/v1/auth": 1.0}
+        )
+
+        assert middleware._sample_rate("/api/v1/auth/login") == 1.0
+        assert middleware._sample_rate("/api/v1/quests") == 0.1
+        assert middleware._sample_rate("/static/app.js") == 0.5
+
+    def test_sampled_out_success_not_logged(self, monkeypatch):
+        """Test a sampled-out fast success writes nothing"""
+        middleware, recorder = self.make_middleware(monkeypatch, slow_request_threshold=1.0)
+
+        middleware._log_completion({"path": "/api/v1/quests"}, 200, 0.01, False, 0.0)
+
+        assert recorder.calls == []
+        assert middleware.sampling_stats == {"sampled": 0, "skipped": 1}
+
+    def test_errors_and_slow_requests_always_logged(self, monkeypatch):
+        """Test failures and slow requests bypass sampling"""
+        middleware, recorder = self.make_middleware(monkeypatch, slow_request_threshold=1.0)
+
+        middleware._log_completion({}, 503, 0.01, False, 0.0)
+        middleware._log_completion({}, 404, 0.01, False, 0.0)
+        middleware._log_completion({}, 200, 2.5, False, 0.0)
+
+        assert [(level, message) for level, message, _ in recorder.calls] == [
+            ("error", "Request failed with server error"),
+            ("warning", "Request failed with client error"),
+            ("warning", "Request completed slowly"),
+        ]
+
+    def test_sampled_record_carries_rate(self, monkeypatch):
+        """Test sampled successes record the rate they were sampled at"""
+        middleware, recorder = self.make_middleware(monkeypatch)
+
+        middleware._log_completion({}, 200, 0.01, True, 0.25)
+
+        assert recorder.calls == [("info", "Request completed successfully", {"sample_rate": 0.25})]
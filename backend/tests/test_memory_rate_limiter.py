@@ -0,0 +1,81 @@
+"""
+Tests for the in-process rate limiter backend
+"""
+from app.core.memory_rate_limiter import MemoryRateLimiter, SlidingWindowCounter
+
+WINDOWS = [(5, 60), (100, 3600)]
+
+
+class TestSlidingWindowCounter:
+    """Test fixed-slot sliding window estimates"""
+
+    def test_counts_within_window(self):
+        """Test requests inside the window are counted"""
+        counter = SlidingWindowCounter(window=60, slots=6)
+        for i in range(4):
+            counter.add(1000.0 + i)
+
+        assert counter.estimate(1005.0) == 4
+
+    def test_old_requests_age_out(self):
+        """Test requests older than the window are no longer counted"""
+        counter = SlidingWindowCounter(window=60, slots=6)
+        counter.add(1000.0)
+
+        assert counter.estimate(1000.0 + 75) == 0
+        assert counter.counts.count(0) == len(counter.counts)
+
+
+class TestMemoryRateLimiter:
+    """Test limits, eviction and sweeping"""
+
+    def test_rejects_over_limit(self):
+        """Test the limit is enforced and remaining counts down"""
+        limiter = MemoryRateLimiter()
+        results = [limiter.check("client", WINDOWS, now=1000.0 + i * 0.1) for i in range(6)]
+
+        assert [allowed for allowed, _ in results] == [True] * 5 + [False]
+        assert [info["remaining"] for _, info in results[:5]] == [4, 3, 2, 1, 0]
+        assert results[-1][1]["limit"] == 5
+        assert 0 < results[-1][1]["retry_after"] <= 61
+
+    def test_allows_again_after_retry_after(self):
+        """Test a rejected client is admitted once retry_after has passed"""
+        limiter = MemoryRateLimiter()
+        for i in range(5):
+            limiter.check("client", WINDOWS, now=1000.0 + i)
+        allowed, info = limiter.check("client", WINDOWS, now=1010.0)
+
+        assert not allowed
+        assert limiter.check("client", WINDOWS, now=1010.0 + info["retry_after"])[0]
+
+    def test_rejected_requests_not_recorded(self):
+        """Test rejected requests do not count against the longer window"""
+        limiter = MemoryRateLimiter()
+        for i in range(20):
+            limiter.check("client", WINDOWS, now=1000.0 + i * 0.1)
+
+        hour_counter = limiter._table["client"][1]
+        assert hour_counter.estimate(1003.0) == 5
+
+    def test_table_is_bounded(self):
+        """Test least recently seen identifiers are evicted"""
+        limiter = MemoryRateLimiter(max_entries=100)
+        limiter.check("keep", WINDOWS, now=1000.0)
+        for i in range(1000):
+            limiter.check(f"client-{i}", WINDOWS, now=1000.0)
+            if i % 50 == 0:
+                limiter.check("keep", WINDOWS, now=1000.0)
+
+        assert len(limiter) == 100
+        assert "keep" in limiter._table
+        assert limiter.stats["evictions"] == 901
+
+    def test_sweep_drops_idle_identifiers(self):
+        """Test identifiers idle past their longest window are swept"""
+        limiter = MemoryRateLimiter(sweep_interval=60)
+        limiter.check("idle", WINDOWS, now=1000.0)
+        limiter.check("active", WINDOWS, now=4000.0)
+
+        assert limiter.sweep(now=4700.0) == 1
+        assert list(limiter._table) == ["active"]
@@ -0,0 +1,188 @@
+"""
+Tests for buffered, downsampled metric persistence
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.metric_store import MetricStore, Resolution
+
+RESOLUTIONS = (
+    Resolution("10s", 10, 86400),
+    Resolution("1m", 60, 7 * 86400),
+    Resolution("1h", 3600, 30 * 86400),
+)
+
+
+def count_pipelines(redis):
+    """Record the transaction flag of every pipeline opened on redis"""
+    pipelines = []
+    original = redis.pipeline
+    redis.pipeline = lambda transaction=True: pipelines.append(transaction) or original(transaction)
+    return pipelines
+
+
+def fail_pipelines(redis):
+    def pipeline(transaction=True):
+        raise ConnectionError("redis unavailable")
+
+    redis.pipeline = pipeline
+
+
+def now_minute():
+    return datetime.utcnow().replace(second=0, microsecond=0)
+
+
+class TestMetricStore:
+    """Test buffering, batched flushes and rollup queries"""
+
+    def test_flush_batches_points(self, redis):
+        """Test one flush sends each point once and few commands in total"""
+        store = MetricStore(resolutions=RESOLUTIONS)
+        start = now_minute()
+        for i in range(300):
+            store.add("http_request_duration", start + timedelta(seconds=i % 60), 0.1)
+        pipelines = count_pipelines(redis)
+
+        async def run():
+            sent = await store.flush()
+            return sent, await redis.llen(MetricStore.raw_key("http_request_duration", start))
+
+        sent, stored = asyncio.run(run())
+
+        # rpush + expire for the hour key, zadd + trim + expire per resolution
+        assert sent == 2 + 3 * 3
+        assert pipelines == [False]
+        assert stored == 300
+        assert store.get_stats()["buffered_points"] == 0
+
+    def test_rollups_merge_across_workers(self, redis):
+        """Test partial rollups written by two workers add up"""
+        start = now_minute()
+        workers = [MetricStore(resolutions=RESOLUTIONS) for _ in range(2)]
+        for offset, store in enumerate(workers):
+            for i in range(6):
+                store.add("cpu", start + timedelta(seconds=i * 10), 10.0 * (offset + 1))
+
+        async def run():
+            for store in workers:
+                await store.flush()
+            return await workers[0].query_rollups("cpu", start, start + timedelta(minutes=1), resolution="1m")
+
+        resolution, buckets = asyncio.run(run())
+
+        assert resolution.name == "1m"
+        assert buckets[0]["count"] == 12
+        assert buckets[0]["sum"] == pytest.approx(180.0)
+        assert (buckets[0]["min"], buckets[0]["max"]) == (10.0, 20.0)
+        assert buckets[0]["avg"] == pytest.approx(15.0)
+
+    def test_unflushed_points_are_queryable(self, redis):
+        """Test queries include points still in the buffer"""
+        store = MetricStore(resolutions=RESOLUTIONS)
+        start = now_minute()
+        store.add("cpu", start, 50.0)
+        end = start + timedelta(seconds=5)
+
+        async def run():
+            _, buckets = await store.query_rollups("cpu", start, end, "10s")
+            return buckets, await store.query_raw("cpu", start, end)
+
+        buckets, raw = asyncio.run(run())
+
+        assert [bucket["count"] for bucket in buckets] == [1]
+        assert [point["value"] for point in raw] == [50.0]
+
+    def test_failed_flush_retries_rollups(self, redis):
+        """Test rollups survive a Redis outage and raw points are counted as dropped"""
+        store = MetricStore(resolutions=RESOLUTIONS)
+        start = now_minute()
+        key = MetricStore.rollup_key("cpu", RESOLUTIONS[1])
+        working = redis.pipeline
+
+        async def run():
+            store.add("cpu", start, 50.0)
+            fail_pipelines(redis)
+            failed = await store.flush()
+            dropped = store.stats["dropped_points"]
+
+            store.add("cpu", start, 60.0)
+            redis.pipeline = working
+            await store.flush()
+            _, buckets = await MetricStore(resolutions=RESOLUTIONS).query_rollups(
+                "cpu", start, start + timedelta(minutes=1), "1m"
+            )
+            return failed, dropped, buckets, await redis.client.zcard(key)
+
+        failed, dropped, buckets, members = asyncio.run(run())
+
+        assert (failed, dropped) == (0, 1)
+        assert [bucket["count"] for bucket in buckets] == [2]
+        assert members == 1
+
+    def test_flushes_replace_the_workers_member(self, redis):
+        """Test a bucket holds one member per worker however often it is flushed"""
+        workers = [MetricStore(resolutions=RESOLUTIONS) for _ in range(2)]
+        start = now_minute()
+        end = start + timedelta(minutes=1)
+
+        async def run():
+            for i in range(5):
+                for store in workers:
+                    store.add("cpu", start + timedelta(seconds=i), 10.0 + i)
+                    await store.flush()
+            members = await redis.client.zcard(MetricStore.rollup_key("cpu", RESOLUTIONS[1]))
+            _, reader = await MetricStore(resolutions=RESOLUTIONS).query_rollups("cpu", start, end, "1m")
+            _, writer = await workers[0].query_rollups("cpu", start, end, "1m")
+            return members, reader, writer
+
+        members, reader, writer = asyncio.run(run())
+
+        assert members == 2
+        # A fresh reader sees every worker's running totals once
+        assert reader[0]["count"] == 10
+        assert reader[0]["sum"] == pytest.approx(120.0)
+        # The writer does not count its own member twice
+        assert writer[0]["count"] == 10
+
+    def test_closed_buckets_are_forgotten(self, redis):
+        """Test ended buckets leave memory and late points add a new member"""
+        store = MetricStore(resolutions=RESOLUTIONS, close_after_seconds=0)
+        start = now_minute() - timedelta(hours=2)
+
+        async def run():
+            store.add("cpu", start, 1.0)
+            await store.flush()
+            open_buckets = store.get_stats()["open_buckets"]
+
+            store.add("cpu", start, 2.0)
+            await store.flush()
+            _, buckets = await store.query_rollups("cpu", start, start + timedelta(minutes=1), "1m")
+            return open_buckets, buckets, await redis.client.zcard(MetricStore.rollup_key("cpu", RESOLUTIONS[1]))
+
+        open_buckets, buckets, members = asyncio.run(run())
+
+        assert open_buckets == 0
+        assert members == 2
+        assert buckets[0]["count"] == 2
+
+    def test_buffer_is_bounded(self, redis):
+        """Test the oldest raw points are dropped once the buffer is full"""
+        store = MetricStore(resolutions=RESOLUTIONS, max_buffered_points=10)
+        start = now_minute()
+        for i in range(15):
+            store.add("cpu", start, float(i))
+
+        stats = store.get_stats()
+        assert stats["buffered_points"] == 10
+        assert stats["dropped_points"] == 5
+
+    def test_long_ranges_use_coarse_rollups(self):
+        """Test the resolution is the finest one that stays under max_points"""
+        store = MetricStore(resolutions=RESOLUTIONS)
+        end = datetime.utcnow()
+
+        assert store.choose_resolution(end - timedelta(hours=2), end, now=end).name == "10s"
+        assert store.choose_resolution(end - timedelta(hours=12), end, now=end).name == "1m"
+        assert store.choose_resolution(end - timedelta(days=7), end, now=end).name == "1h"
@@ -0,0 +1,96 @@
+"""
+Tests for offloaded password hashing
+"""
+import asyncio
+import threading
+
+import pytest
+
+from app.core.password_hashing import PasswordHasher
+
+
+class TestPasswordHasher:
+    """Test hashing, verification and rehash on cost change"""
+
+    def test_hash_and_verify(self):
+        """Test a hash verifies only the original password"""
+        hasher = PasswordHasher(rounds=4)
+        hashed = hasher.hash("correct horse")
+
+        assert hasher.verify("correct horse", hashed)
+        assert not hasher.verify("wrong horse", hashed)
+        assert hasher.stats["failed_verifications"] == 1
+
+    def test_malformed_hash_fails_verification(self):
+        """Test an unrecognised hash is treated as a mismatch"""
+        hasher = PasswordHasher(rounds=4)
+
+        assert hasher.verify_and_update("password", "not-a-hash") == (False, None)
+
+    def test_cost_change_returns_new_hash(self):
+        """Test a hash with an old cost factor is replaced on successful login"""
+        old_hash = PasswordHasher(rounds=4).hash("password")
+        hasher = PasswordHasher(rounds=5)
+
+        valid, new_hash = hasher.verify_and_update("password", old_hash)
+
+        assert valid
+        assert new_hash is not None and new_hash.startswith("$2b$05$")
+        assert hasher.verify_and_update("password", new_hash) == (True, None)
+        assert hasher.verify_and_update("wrong", old_hash) == (False, None)
+        assert hasher.stats["rehashes"] == 1
+
+    def test_invalid_concurrency_rejected(self):
+        """Test the pool needs at least one worker"""
+        with pytest.raises(ValueError):
+            PasswordHasher(max_concurrency=0)
+
+
+class TestPasswordHasherAsync:
+    """Test work runs on the bounded pool"""
+
+    @pytest.mark.asyncio
+    async def test_async_runs_off_the_event_loop(self):
+        """Test hashing happens on a pool thread"""
+        hasher = PasswordHasher(rounds=4)
+        threads = []
+        original_hash = hasher.hash
+
+        def tracking_hash(password):
+            threads.append(threading.current_thread().name)
+            return original_hash(password)
+
+        hasher.hash = tracking_hash
+        hashed = await hasher.hash_async("password")
+
+        assert await hasher.verify_async("password", hashed)
+        assert threads[0].startswith("password-hash")
+        hasher.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self):
+        """Test no more than max_concurrency hashes run at once"""
+        hasher = PasswordHasher(rounds=4, max_concurrency=2)
+        running = 0
+        peak = 0
+        lock = threading.Lock()
+        original_hash = hasher.hash
+
+        def tracking_hash(password):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            try:
+                return original_hash(password)
+            finally:
+                with lock:
+                    running -= 1
+
+        hasher.hash = tracking_hash
+        await asyncio.gather(*[hasher.hash_async(f"password-{i}") for i in range(8)])
+
+        assert peak <= 2
+        assert hasher.stats["offloaded"] == 8
+        assert hasher.stats["queued"] == 0
+        hasher.shutdown()
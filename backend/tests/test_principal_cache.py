@@ -0,0 +1,201 @@
+"""
+Tests for the verified principal cache and its use in get_current_user
+"""
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from app.api import deps
+from app.core import principal_cache as principal_cache_module
+from app.core.exceptions import TokenBlacklistedError
+from app.core.principal_cache import PrincipalCache
+from app.models.user import User, UserRole
+
+
+class FakeCache:
+    """multi_layer_cache stand-in recording TTLs and tags"""
+
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+        self.tags = {}
+
+    async def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    async def set(self, key, value, ttl=None, tags=None):
+        self.values[key] = value
+        self.ttls[key] = ttl
+        for tag in tags or ():
+            self.tags.setdefault(tag, set()).add(key)
+        return True
+
+    async def invalidate_tag(self, tag):
+        for key in self.tags.pop(tag, set()):
+            self.values.pop(key, None)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    fake = FakeCache()
+    monkeypatch.setattr(principal_cache_module, "multi_layer_cache", fake)
+    return fake
+
+
+@pytest.fixture
+def principals(monkeypatch, cache):
+    principals = PrincipalCache(ttl=60)
+    monkeypatch.setattr(principal_cache_module, "principal_cache", principals)
+    monkeypatch.setattr(deps, "principal_cache", principals)
+    return principals
+
+
+@pytest.fixture
+def queries(db):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def token_payload(user, jti="jti-1", expires_in=3600):
+    return {"sub": str(user.id), "jti": jti, "type": "access", "exp": int(time.time()) + expires_in}
+
+
+def accept_tokens(monkeypatch, payloads, revoked=()):
+    """Make decode_token_async return payloads[token], refusing revoked jtis"""
+    async def decode(token, token_type="access"):
+        payload = payloads[token]
+        if payload["jti"] in revoked:
+            raise TokenBlacklistedError()
+        return payload
+
+    monkeypatch.setattr(deps, "decode_token_async", decode)
+
+
+class TestPrincipalCache:
+    """Test what is cached and for how long"""
+
+    def test_ttl_is_capped_at_token_expiry(self, principals, cache, test_user):
+        """Test an entry never outlives its token"""
+        asyncio.run(principals.set("short", token_payload(test_user, "a", expires_in=20), test_user))
+        asyncio.run(principals.set("long", token_payload(test_user, "b", expires_in=3600), test_user))
+
+        assert 0 < cache.ttls["principal:a"] <= 20
+        assert cache.ttls["principal:b"] == 60
+        # An expired token is not cached at all
+        assert asyncio.run(principals.set("old", token_payload(test_user, "c", expires_in=-5), test_user)) is False
+
+    def test_entry_must_match_the_subject(self, principals, test_user):
+        """Test a cached principal is only returned for its own user"""
+        payload = token_payload(test_user)
+        asyncio.run(principals.set("token", payload, test_user))
+
+        assert asyncio.run(principals.get("token", payload))["id"] == test_user.id
+        assert asyncio.run(principals.get("token", {**payload, "sub": str(test_user.id + 1)})) is None
+
+    def test_attach_gives_a_usable_user(self, principals, db, test_user, queries):
+        """Test attach() builds a session-bound user without a SELECT"""
+        payload = token_payload(test_user)
+        asyncio.run(principals.set("token", payload, test_user))
+        cached = asyncio.run(principals.get("token", payload))
+        db.expunge_all()
+        queries.clear()
+
+        user = PrincipalCache.attach(db, cached)
+
+        assert (user.id, user.username, user.role, user.is_active) == (
+            test_user.id, "testuser", UserRole.STUDENT, True
+        )
+        assert queries == []
+        # Columns that are not cached load on access
+        assert user.full_name == "Test User"
+        assert len(queries) == 1
+
+    def test_user_updates_invalidate_entries(self, principals, db, test_user):
+        """Test committing an update or deactivation drops the user's entries"""
+        payload = token_payload(test_user)
+
+        async def run():
+            await principals.set("token", payload, test_user)
+            test_user.is_active = False
+            db.commit()
+            # The invalidation is scheduled on the running loop
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            return await principals.get("token", payload)
+
+        assert asyncio.run(run()) is None
+        assert principals.stats["invalidations"] == 1
+
+    def test_rollback_keeps_entries(self, principals, db, test_user):
+        """Test an update that is rolled back doesn't invalidate"""
+        payload = token_payload(test_user)
+
+        async def run():
+            await principals.set("token", payload, test_user)
+            test_user.username = "renamed"
+            db.flush()
+            db.rollback()
+            await asyncio.sleep(0)
+            return await principals.get("token", payload)
+
+        assert asyncio.run(run()) is not None
+        assert principals.stats["invalidations"] == 0
+
+
+class TestGetCurrentUser:
+    """Test get_current_user reads through the principal cache"""
+
+    def test_cache_hit_skips_the_database(self, monkeypatch, principals, db, test_user, queries):
+        """Test the second request with a token runs no user query"""
+        accept_tokens(monkeypatch, {"token": token_payload(test_user)})
+
+        first = asyncio.run(deps.get_current_user(db=db, token="token"))
+        db.expunge_all()
+        queries.clear()
+        second = asyncio.run(deps.get_current_user(db=db, token="token"))
+
+        assert first.id == second.id == test_user.id
+        assert queries == []
+        assert principals.stats["hits"] == 1
+
+    def test_deactivated_user_is_reloaded(self, monkeypatch, principals, db, test_user):
+        """Test a deactivation is seen on the next request"""
+        accept_tokens(monkeypatch, {"token": token_payload(test_user)})
+
+        async def run():
+            await deps.get_current_user(db=db, token="token")
+            test_user.is_active = False
+            db.commit()
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            return await deps.get_current_user(db=db, token="token")
+
+        user = asyncio.run(run())
+
+        assert user.is_active is False
+        with pytest.raises(HTTPException):
+            deps.get_current_active_user(current_user=user)
+
+    def test_revoked_token_is_not_served_from_cache(self, monkeypatch, principals, db, test_user):
+        """Test revocation is checked before the cached principal is used"""
+        payload = token_payload(test_user, jti="revoked")
+        accept_tokens(monkeypatch, {"token": payload})
+        asyncio.run(deps.get_current_user(db=db, token="token"))
+        assert asyncio.run(principals.get("token", payload)) is not None
+
+        accept_tokens(monkeypatch, {"token": payload}, revoked={"revoked"})
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(deps.get_current_user(db=db, token="token"))
+
+        assert exc_info.value.status_code == 401
+        assert exc_info.value.detail == "Token has been revoked"
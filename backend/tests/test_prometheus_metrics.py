@@ -0,0 +1,133 @@
+"""
+Tests for the Prometheus exposition registry
+"""
+import os
+import subprocess
+import sys
+import textwrap
+
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+
+from app.core import prometheus_metrics
+from app.core.prometheus_metrics import (
+    generate_metrics,
+    observe_cache_operation,
+    observe_db_query,
+    observe_request,
+    observe_request_failure,
+    scrape_allowed,
+)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def run_worker(multiproc_dir, code):
+    """Run code in a fresh process that shares the multiprocess directory"""
+    env = {**os.environ, "PYTHONPATH": BACKEND_DIR, prometheus_metrics.MULTIPROC_DIR_ENV: str(multiproc_dir)}
+    script = "from app.core import prometheus_metrics as pm\n" + textwrap.dedent(code)
+    result = subprocess.run(
+        [sys.executable, "-c", script], env=env, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def scraped_values(text):
+    values = {}
+    for family in text_string_to_metric_families(text):
+        for name, labels, value, *_ in family.samples:
+            values[(name, tuple(sorted(labels.items())))] = value
+    return values
+
+
+class TestObservations:
+    """Test the helpers the middlewares record through"""
+
+    def test_request_metrics(self):
+        """Test completed and failed requests update counts, latency and errors"""
+        labels = {"method": "GET", "endpoint": "/test/{id}"}
+        before = sample("http_requests_total", status="404", **labels)
+        before_errors = sample("http_requests_errors_total", error_type="http_error", **labels)
+
+        observe_request("GET", "/test/{id}", 404, 0.02, response_bytes=512)
+        observe_request_failure("GET", "/test/{id}", 0.5, RuntimeError("boom"))
+
+        assert sample("http_requests_total", status="404", **labels) == before + 1
+        assert sample("http_requests_errors_total", error_type="http_error", **labels) == before_errors + 1
+        assert sample("http_requests_errors_total", error_type="RuntimeError", **labels) >= 1
+        assert sample("http_response_size_bytes_count", **labels) >= 1
+
+    def test_db_and_cache_metrics(self):
+        """Test database and cache operations are counted by outcome"""
+        before = sample("db_queries_total", operation="update", status="error")
+        before_hits = sample("cache_operations_total", operation="get", result="hit")
+
+        observe_db_query("update", 0.1, table="users", error=ValueError(), rows_affected=3)
+        observe_cache_operation("get", hit=True, size=128)
+
+        assert sample("db_queries_total", operation="update", status="error") == before + 1
+        assert sample("db_rows_affected_total", operation="update") >= 3
+        assert sample("cache_operations_total", operation="get", result="hit") == before_hits + 1
+
+    def test_exposition_format(self):
+        """Test the scrape body parses and carries the Prometheus content type"""
+        observe_request("POST", "/exposition", 201, 0.01)
+
+        body, content_type = generate_metrics()
+        values = scraped_values(body.decode())
+
+        assert content_type.startswith("text/plain")
+        key = ("http_requests_total", (("endpoint", "/exposition"), ("method", "POST"), ("status", "201")))
+        assert values[key] >= 1
+
+
+class TestMultiprocess:
+    """Test values from several worker processes are merged at scrape time"""
+
+    def test_workers_are_aggregated(self, tmp_path):
+        """Test counters sum across workers and dead workers leave live gauges"""
+        worker = """
+            pm.observe_request("GET", "/quests", 200, 0.05)
+            pm.active_requests.inc()
+            print(__import__("os").getpid())
+        """
+        first_pid = int(run_worker(tmp_path, worker))
+        run_worker(tmp_path, worker)
+        run_worker(tmp_path, f"pm.mark_process_dead({first_pid})")
+
+        scrape = run_worker(tmp_path, """
+            import sys
+            body, _ = pm.generate_metrics()
+            sys.stdout.write(body.decode())
+        """)
+        values = scraped_values(scrape)
+
+        labels = (("endpoint", "/quests"), ("method", "GET"), ("status", "200"))
+        assert values[("http_requests_total", labels)] == 2
+        assert values[("http_request_duration_seconds_count", labels[:2])] == 2
+        assert values[("http_requests_active", ())] == 1
+
+
+class TestScrapeAccess:
+    """Test who may scrape the metrics endpoint"""
+
+    def test_allowed_addresses_and_networks(self):
+        """Test addresses match exactly or by network"""
+        allowed = ["127.0.0.1", "::1", "10.0.0.0/8"]
+
+        assert scrape_allowed("127.0.0.1", allowed)
+        assert scrape_allowed("::1", allowed)
+        assert scrape_allowed("10.2.3.4", allowed)
+        assert not scrape_allowed("192.168.1.5", allowed)
+
+    def test_unknown_clients_are_refused(self):
+        """Test missing or malformed peers and bad entries don't grant access"""
+        assert not scrape_allowed(None, ["127.0.0.1"])
+        assert not scrape_allowed("testclient", ["127.0.0.1"])
+        assert not scrape_allowed("127.0.0.1", ["not-an-ip"])
+        assert not scrape_allowed("127.0.0.1", [])
@@ -0,0 +1,86 @@
+"""
+Tests for the pure-ASGI rate limit middleware inside the ASGI stack
+"""
+import asyncio
+
+from app.middleware.rate_limiter import ASGIRateLimitMiddleware
+from app.middleware.request_context import ContextMiddleware
+
+
+class BodyReadingMiddleware(ContextMiddleware):
+    def __init__(self, app, seen):
+        self.app = app
+        self.seen = seen
+
+    async def handle(self, context, receive, send):
+        self.seen.append(await context.body())
+        await self.app(context.scope, receive, send)
+
+
+def make_stack(requests_per_minute):
+    """Body-reading layers on both sides of the rate limiter, as in main.py"""
+    seen = []
+    app_received = []
+
+    async def app(scope, receive, send):
+        message = await receive()
+        app_received.append(message["body"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    limiter = ASGIRateLimitMiddleware(
+        BodyReadingMiddleware(app, seen), use_redis=False, requests_per_minute=requests_per_minute
+    )
+    return BodyReadingMiddleware(limiter, seen), seen, app_received
+
+
+def call(stack, path="/api/v1/quests", body=b"title=Fractions"):
+    scope = {
+        "type": "http", "method": "POST", "path": path, "query_string": b"",
+        "headers": [], "client": ("10.0.0.1", 1234),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(stack(scope, receive, send))
+    return sent[0]["status"], dict(sent[0]["headers"])
+
+
+class TestASGIRateLimitMiddleware:
+    """Test limits, headers and body sharing with ASGI layers on both sides"""
+
+    def test_allowed_requests_get_limit_headers(self):
+        """Test the limit headers are added and the body reaches every layer once"""
+        stack, seen, app_received = make_stack(requests_per_minute=5)
+
+        status, headers = call(stack)
+
+        assert status == 200
+        assert headers[b"x-ratelimit-limit"] == b"5"
+        assert headers[b"x-ratelimit-remaining"] == b"4"
+        assert seen == [b"title=Fractions"] * 2
+        assert app_received == [b"title=Fractions"]
+
+    def test_requests_over_the_limit_are_refused(self):
+        """Test the limiter answers 429 with Retry-After and stops the request"""
+        stack, seen, app_received = make_stack(requests_per_minute=2)
+        statuses = [call(stack)[0] for _ in range(2)]
+        status, headers = call(stack)
+
+        assert statuses == [200, 200]
+        assert status == 429
+        assert int(headers[b"retry-after"]) >= 1
+        assert len(app_received) == 2
+
+    def test_excluded_paths_are_not_limited(self):
+        """Test health checks pass without counting"""
+        stack, _, _ = make_stack(requests_per_minute=1)
+
+        assert [call(stack, path="/health")[0] for _ in range(3)] == [200, 200, 200]
+        assert call(stack)[0] == 200
@@ -0,0 +1,115 @@
+"""
+Tests for the Lua rate limit scripts, run against fakeredis with Lua support
+"""
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.middleware.rate_limit_scripts import RateLimitScript
+
+ALGORITHMS = ("sliding_window", "gcra")
+
+
+async def check_many(script, redis, keys, windows, count):
+    return [await script.check(redis, keys, windows) for _ in range(count)]
+
+
+def allowed(results):
+    return [is_allowed for is_allowed, _ in results]
+
+
+class TestRateLimitScripts:
+    """Test limits, refill and script loading for both algorithms"""
+
+    @pytest.mark.parametrize("algorithm", ALGORITHMS)
+    def test_limit_is_enforced(self, algorithm):
+        """Test requests past the limit are refused with a retry-after"""
+        async def run():
+            redis = fakeredis.FakeAsyncRedis()
+            return await check_many(RateLimitScript(algorithm), redis, ["rl:minute"], [(5, 60)], 7)
+
+        results = asyncio.run(run())
+
+        assert allowed(results) == [True] * 5 + [False] * 2
+        assert [info["remaining"] for _, info in results[:5]] == [4, 3, 2, 1, 0]
+        refused = results[-1][1]
+        assert refused["limit"] == 5
+        assert refused["remaining"] == 0
+        assert 0 < refused["retry_after"] <= 60
+
+    @pytest.mark.parametrize("algorithm", ALGORITHMS)
+    def test_most_restrictive_window_wins(self, algorithm):
+        """Test the hour window refuses even when the minute window has room"""
+        async def run():
+            redis = fakeredis.FakeAsyncRedis()
+            return await check_many(
+                RateLimitScript(algorithm), redis, ["rl:m", "rl:h"], [(100, 60), (3, 3600)], 4
+            )
+
+        results = asyncio.run(run())
+
+        assert allowed(results) == [True, True, True, False]
+        assert results[-1][1]["limit"] == 3
+        assert results[-1][1]["retry_after"] > 60
+
+    @pytest.mark.parametrize("algorithm", ALGORITHMS)
+    def test_refused_requests_are_not_recorded(self, algorithm):
+        """Test a refusal by one window doesn't use up the others"""
+        async def run():
+            redis = fakeredis.FakeAsyncRedis()
+            script = RateLimitScript(algorithm)
+            await check_many(script, redis, ["rl:m", "rl:h"], [(100, 60), (1, 3600)], 3)
+            return await script.check(redis, ["rl:m"], [(100, 60)])
+
+        is_allowed, info = asyncio.run(run())
+
+        assert is_allowed
+        assert info["remaining"] == 98
+
+    def test_sliding_window_refills(self):
+        """Test requests are allowed again once the oldest leave the window"""
+        async def run():
+            redis = fakeredis.FakeAsyncRedis()
+            script = RateLimitScript("sliding_window")
+            before = await check_many(script, redis, ["rl:s"], [(2, 1)], 3)
+            await asyncio.sleep(1.05)
+            return before, await check_many(script, redis, ["rl:s"], [(2, 1)], 3)
+
+        before, after = asyncio.run(run())
+
+        assert allowed(before) == [True, True, False]
+        assert allowed(after) == [True, True, False]
+
+    def test_gcra_refills_one_emission_at_a_time(self):
+        """Test GCRA frees one request per window / limit"""
+        async def run():
+            redis = fakeredis.FakeAsyncRedis()
+            script = RateLimitScript("gcra")
+            before = await check_many(script, redis, ["rl:g"], [(2, 1)], 3)
+            await asyncio.sleep(0.55)
+            return before, await check_many(script, redis, ["rl:g"], [(2, 1)], 2)
+
+        before, after = asyncio.run(run())
+
+        assert allowed(before) == [True, True, False]
+        assert allowed(after) == [True, False]
+
+    @pytest.mark.parametrize("algorithm", ALGORITHMS)
+    def test_script_is_reloaded_after_noscript(self, algorithm):
+        """Test a flushed script cache is refilled and the call retried"""
+        script = RateLimitScript(algorithm)
+
+        async def run():
+            redis = fakeredis.FakeAsyncRedis()
+            await script.check(redis, ["rl:n"], [(5, 60)])
+            loads = script.stats["script_loads"]
+            await redis.script_flush()
+            return loads, await script.check(redis, ["rl:n"], [(5, 60)])
+
+        loads, (is_allowed, info) = asyncio.run(run())
+
+        assert loads == 1
+        assert is_allowed
+        assert info["remaining"] == 3
+        assert script.stats == {"calls": 2, "script_loads": 2}
@@ -0,0 +1,173 @@
+"""
+Tests for auto-pipelining in the Redis client
+"""
+import asyncio
+
+import pytest
+from redis.exceptions import ConnectionError, ResponseError
+
+from app.core.redis_client import EnhancedRedisClient
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args))
+
+    async def execute(self, raise_on_error=True):
+        self.client.batches.append([name for name, _ in self.commands])
+        if self.client.fail_batches:
+            raise ConnectionError("connection reset")
+        results = []
+        for name, args in self.commands:
+            try:
+                results.append(self.client.reply(name, *args))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeClient:
+    """redis.asyncio.Redis stand-in; direct calls are recorded apart from batches"""
+
+    def __init__(self):
+        self.data = {b"greeting": b"hello", b"list": [b"x"]}
+        self.batches = []
+        self.direct = []
+        self.fail_batches = False
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def reply(self, name, *args):
+        if name == "get":
+            value = self.data.get(args[0].encode())
+            if isinstance(value, list):
+                raise ResponseError("WRONGTYPE Operation against a key holding the wrong kind of value")
+            return value
+        if name == "incr":
+            return 1
+        return True
+
+    async def get(self, key):
+        self.direct.append("get")
+        return self.reply("get", key)
+
+    async def incr(self, name, amount=1):
+        self.direct.append("incr")
+        return self.reply("incr", name)
+
+    async def blpop(self, keys, timeout=0):
+        self.direct.append("blpop")
+        return None
+
+    async def ping(self):
+        self.direct.append("ping")
+        return True
+
+
+def make_client():
+    client = EnhancedRedisClient(auto_pipeline=True)
+    client.client = FakeClient()
+    client._initialized = True
+    return client
+
+
+class TestAutoPipeline:
+    """Test concurrent commands share one pipeline"""
+
+    def test_concurrent_commands_are_batched(self):
+        """Test commands issued together go out in one pipeline, in order"""
+        client = make_client()
+
+        async def run():
+            return await asyncio.gather(
+                client.get("greeting"), client.incr("counter"), client.get("missing")
+            )
+
+        assert asyncio.run(run()) == [b"hello", 1, None]
+        assert client.client.batches == [["get", "incr", "get"]]
+        assert client.client.direct == []
+        assert client.pipeline_stats["batches"] == 1
+
+    def test_command_errors_reach_only_their_caller(self):
+        """Test one command's error reply doesn't fail the rest of the batch"""
+        client = make_client()
+
+        async def run():
+            return await asyncio.gather(
+                client.get("list"), client.get("greeting"), return_exceptions=True
+            )
+
+        error, value = asyncio.run(run())
+
+        assert isinstance(error, ResponseError)
+        assert value == b"hello"
+        # An error reply means Redis is up
+        assert client.failure_count == 0
+
+    def test_failed_batch_fails_every_command(self):
+        """Test a connection error is raised to each caller and counted per command"""
+        client = make_client()
+        client.client.fail_batches = True
+
+        async def run():
+            return await asyncio.gather(
+                *(client.get("greeting") for _ in range(3)), return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+
+        assert all(isinstance(result, ConnectionError) for result in results)
+        assert client.pipeline_stats["batch_failures"] == 1
+        assert client.failure_count == 3
+
+    def test_circuit_breaker_opens_on_batch_failures(self):
+        """Test failures from pipelined commands count toward the breaker"""
+        client = make_client()
+        client.client.fail_batches = True
+
+        async def run():
+            await asyncio.gather(
+                *(client.get("greeting") for _ in range(client.failure_threshold)),
+                return_exceptions=True
+            )
+            with pytest.raises(ConnectionError, match="Circuit breaker"):
+                await client.get("greeting")
+
+        asyncio.run(run())
+        assert client.is_circuit_open
+
+    def test_blocking_and_health_commands_are_not_batched(self):
+        """Test excluded commands go straight to the connection"""
+        client = make_client()
+
+        async def run():
+            await asyncio.gather(
+                client._execute_with_metrics("blpop", client.client.blpop, ["queue"], timeout=1),
+                client.ping(),
+                client.get("greeting")
+            )
+
+        asyncio.run(run())
+
+        assert client.client.direct == ["blpop", "ping"]
+        assert client.client.batches == [["get"]]
+
+    def test_disabled_sends_directly(self):
+        """Test commands are not queued when auto-pipelining is off"""
+        client = make_client()
+        client.auto_pipeline = False
+
+        assert asyncio.run(client.get("greeting")) == b"hello"
+        assert client.client.direct == ["get"]
+        assert client.client.batches == []
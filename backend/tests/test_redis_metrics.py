@@ -0,0 +1,76 @@
+"""
+Tests for Redis operation metrics
+"""
+import time
+
+from app.core.redis_metrics import LatencyHistogram, RedisOperationMetrics
+
+
+class TestLatencyHistogram:
+    """Test histogram bucketing"""
+
+    def test_quantiles_follow_buckets(self):
+        """Test quantiles return the bucket bound holding the rank"""
+        histogram = LatencyHistogram(bounds=(0.001, 0.01, 0.1))
+        for _ in range(90):
+            histogram.observe(0.0005)
+        for _ in range(10):
+            histogram.observe(0.05)
+
+        assert histogram.quantile(0.5) == 0.001
+        assert histogram.quantile(0.95) == 0.1
+        assert histogram.count == 100
+        assert histogram.max == 0.05
+
+    def test_overflow_bucket_reports_max(self):
+        """Test latencies above the last bound are reported by max"""
+        histogram = LatencyHistogram(bounds=(0.001,))
+        histogram.observe(2.0)
+
+        assert histogram.quantile(0.99) == 2.0
+
+
+class TestRedisOperationMetrics:
+    """Test counters, ring buffer and summaries"""
+
+    def test_summary_counts_recent_operations(self):
+        """Test summary reports totals and success rate"""
+        metrics = RedisOperationMetrics()
+        started = time.perf_counter()
+        for _ in range(3):
+            metrics.record("get", started, True, result=b"abc")
+        metrics.record("get", started, False, "ConnectionError")
+
+        summary = metrics.summary()
+        assert summary["total_operations"] == 4
+        assert summary["recent_operations"] == 4
+        assert summary["success_rate"] == 75.0
+
+        operation = metrics.operation_summary()["get"]
+        assert operation["calls"] == 4
+        assert operation["error_types"] == {"ConnectionError": 1}
+
+    def test_recent_window_excludes_old_seconds(self):
+        """Test per-second slots older than the window are not counted"""
+        metrics = RedisOperationMetrics(ring_seconds=60)
+        started = time.perf_counter()
+        for _ in range(5):
+            metrics.record("set", started, True)
+        metrics._slot_second = [second - 120 for second in metrics._slot_second]
+
+        assert metrics.summary(window=60) == {"total_operations": 5}
+
+    def test_size_accounting_is_optional(self):
+        """Test result sizes are only measured when enabled"""
+        started = time.perf_counter()
+        disabled = RedisOperationMetrics()
+        disabled.record("lrange", started, True, result=[b"ab", b"cd"])
+        enabled = RedisOperationMetrics(size_accounting=True)
+        enabled.record("lrange", started, True, result=[b"ab", b"cd"])
+
+        assert "avg_bytes" not in disabled.operation_summary()["lrange"]
+        assert enabled.operation_summary()["lrange"]["avg_bytes"] == 4
+
+    def test_empty_summary(self):
+        """Test summary before any call"""
+        assert RedisOperationMetrics().summary() == {"total_operations": 0}
@@ -0,0 +1,152 @@
+"""
+Tests for the shared request context of the ASGI middleware stack
+"""
+import asyncio
+
+import pytest
+
+from app.middleware.request_context import BodyTooLarge, ContextMiddleware, RequestContext
+
+
+def make_scope(headers=None, method="POST", path="/quests", query_string=b""):
+    return {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query_string,
+        "headers": headers or [],
+        "client": ("10.0.0.1", 1234),
+    }
+
+
+def chunked_receive(chunks):
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1}
+        for index, chunk in enumerate(chunks)
+    ]
+    reads = []
+
+    async def receive():
+        reads.append(1)
+        if messages:
+            return messages.pop(0)
+        return {"type": "http.disconnect"}
+
+    return receive, reads
+
+
+class BodyReadingMiddleware(ContextMiddleware):
+    def __init__(self, app, name, seen):
+        self.app = app
+        self.name = name
+        self.seen = seen
+
+    async def handle(self, context: RequestContext, receive, send):
+        self.seen.append((self.name, id(context), await context.body()))
+
+        def set_header(response):
+            response.headers["x-layer"] = self.name
+
+        context.on_response_start(set_header)
+        await self.app(context.scope, receive, send)
+
+
+def run_stack(scope, chunks):
+    seen = []
+    app_received = []
+
+    async def app(scope, receive, send):
+        message = await receive()
+        app_received.append(message["body"])
+        await send({"type": "http.response.start", "status": 201, "headers": [(b"x-layer", b"app")]})
+        await send({"type": "http.response.body", "body": b"created"})
+
+    stack = BodyReadingMiddleware(BodyReadingMiddleware(app, "inner", seen), "outer", seen)
+    receive, reads = chunked_receive(chunks)
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(stack(scope, receive, send))
+    return seen, app_received, sent, reads
+
+
+class TestRequestContext:
+    """Test body sharing, header hooks and context reuse"""
+
+    def test_body_read_once_and_replayed(self):
+        """Test middlewares share one body read and the app still receives it"""
+        seen, app_received, _, reads = run_stack(make_scope(), [b"title=", b"Fractions"])
+
+        assert [body for _, _, body in seen] == [b"title=Fractions"] * 2
+        assert app_received == [b"title=Fractions"]
+        assert len(reads) == 2
+
+    def test_body_limit_stops_reading(self):
+        """Test reading stops at the chunk past the limit and stays refused"""
+        receive, reads = chunked_receive([b"a" * 10, b"b" * 10, b"c" * 10])
+        context = RequestContext(dict(make_scope(), state={}), receive)
+
+        with pytest.raises(BodyTooLarge):
+            asyncio.run(context.body(limit=15))
+        with pytest.raises(BodyTooLarge):
+            asyncio.run(context.body())
+        assert len(reads) == 2
+
+    def test_body_limit_on_cached_body(self):
+        """Test a limit applies to a body another middleware already read"""
+        receive, _ = chunked_receive([b"title=Fractions"])
+        context = RequestContext(dict(make_scope(), state={}), receive)
+        asyncio.run(context.body())
+
+        assert asyncio.run(context.body(limit=100)) == b"title=Fractions"
+        with pytest.raises(BodyTooLarge):
+            asyncio.run(context.body(limit=5))
+
+    def test_context_shared_across_middlewares(self):
+        """Test nested middlewares see the same context object"""
+        scope = make_scope(headers=[(b"x-request-id", b"req-1")])
+        seen, _, _, _ = run_stack(scope, [b""])
+
+        context = scope["state"]["request_context"]
+        assert {context_id for _, context_id, _ in seen} == {id(context)}
+        assert context.request_id == "req-1"
+        assert scope["state"]["request_id"] == "req-1"
+
+    def test_outer_hook_runs_last(self):
+        """Test outer middleware headers override inner ones, as with call_next"""
+        scope = make_scope()
+        _, _, sent, _ = run_stack(scope, [b""])
+
+        start = sent[0]
+        assert (b"x-layer", b"outer") in start["headers"]
+        assert [key for key, _ in start["headers"]].count(b"x-layer") == 1
+
+        context = scope["state"]["request_context"]
+        assert context.status_code == 201
+        assert context.response_size == len(b"created")
+
+    def test_client_ip_prefers_forwarded_for(self):
+        """Test the client IP honours proxy headers"""
+        forwarded = RequestContext(
+            dict(make_scope(headers=[(b"x-forwarded-for", b"1.2.3.4, 10.0.0.2")]), state={}), None
+        )
+        direct = RequestContext(dict(make_scope(), state={}), None)
+
+        assert forwarded.client_ip == "1.2.3.4"
+        assert direct.client_ip == "10.0.0.1"
+
+    def test_non_http_scope_passes_through(self):
+        """Test lifespan and websocket scopes skip the context"""
+        calls = []
+
+        async def app(scope, receive, send):
+            calls.append(scope["type"])
+
+        middleware = BodyReadingMiddleware(app, "outer", [])
+        scope = {"type": "lifespan"}
+        asyncio.run(middleware(scope, None, None))
+
+        assert calls == ["lifespan"]
+        assert "state" not in scope
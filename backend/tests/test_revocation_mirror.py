@@ -0,0 +1,77 @@
+"""
+Tests for the local token revocation mirror
+"""
+import time
+
+import pytest
+
+from app.core.revocation_mirror import BloomFilter, RevocationMirror
+
+
+class TestBloomFilter:
+    """Test Bloom filter membership"""
+
+    def test_added_items_are_members(self):
+        """Test there are no false negatives"""
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        items = [f"jti-{i}" for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+
+        assert all(item in bloom for item in items)
+
+    def test_false_positive_rate_is_bounded(self):
+        """Test unseen items are rarely reported present"""
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"jti-{i}")
+
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        assert false_positives < 300
+
+    def test_invalid_parameters_rejected(self):
+        """Test nonsensical sizing is rejected"""
+        with pytest.raises(ValueError):
+            BloomFilter(capacity=10, error_rate=1.5)
+
+
+class TestRevocationMirror:
+    """Test revocation lookups and maintenance"""
+
+    def test_revoked_until_expiry(self):
+        """Test a revoked id stops counting once its token expires"""
+        mirror = RevocationMirror(capacity=100)
+        now = time.time()
+        mirror.add("revoked", now + 60)
+
+        assert mirror.is_revoked("revoked", now=now)
+        assert not mirror.is_revoked("revoked", now=now + 120)
+        assert not mirror.is_revoked("never-revoked", now=now)
+
+    def test_unknown_ids_answered_by_bloom(self):
+        """Test most non-revoked lookups stop at the Bloom filter"""
+        mirror = RevocationMirror(capacity=100)
+        mirror.add("revoked", time.time() + 60)
+        for i in range(100):
+            mirror.is_revoked(f"live-{i}")
+
+        assert mirror.stats["bloom_negatives"] >= 95
+
+    def test_prune_drops_expired_ids(self):
+        """Test expired ids are removed from the exact set"""
+        mirror = RevocationMirror(capacity=100)
+        now = time.time()
+        mirror.add("old", now - 1)
+        mirror.add("new", now + 60)
+
+        assert mirror.prune(now=now) == 1
+        assert len(mirror) == 1
+
+    def test_replace_skips_expired_entries(self):
+        """Test a snapshot only keeps live revocations"""
+        mirror = RevocationMirror(capacity=100)
+        now = time.time()
+        mirror.replace([("live", now + 60), ("stale", now - 60)])
+
+        assert mirror.is_revoked("live")
+        assert len(mirror) == 1
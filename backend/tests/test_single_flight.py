@@ -0,0 +1,110 @@
+"""
+Tests for single-flight request coalescing
+"""
+import asyncio
+
+import pytest
+
+from app.core.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    """Test per-key coalescing of concurrent loaders"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_execution(self):
+        """Test only the leader runs the loader"""
+        flight = SingleFlight()
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "value"
+
+        results = await asyncio.gather(*[flight.do("key", loader) for _ in range(10)])
+
+        assert results == ["value"] * 10
+        assert calls == 1
+
+        stats = flight.get_stats()
+        assert stats["total_flights"] == 1
+        assert stats["total_waiters"] == 9
+        assert stats["keys"]["key"]["max_waiters"] == 9
+        assert stats["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_waiters_receive_leader_exception(self):
+        """Test the leader's exception is shared with every waiter"""
+        flight = SingleFlight()
+
+        async def loader():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            *[flight.do("key", loader) for _ in range(3)],
+            return_exceptions=True
+        )
+
+        assert all(isinstance(r, ValueError) for r in results)
+        assert flight.get_key_stats("key").errors == 1
+
+    @pytest.mark.asyncio
+    async def test_distinct_keys_do_not_coalesce(self):
+        """Test different keys run independently"""
+        flight = SingleFlight()
+        calls = []
+
+        async def loader(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return key
+
+        results = await asyncio.gather(
+            flight.do("a", lambda: loader("a")),
+            flight.do("b", lambda: loader("b"))
+        )
+
+        assert results == ["a", "b"]
+        assert sorted(calls) == ["a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_key_released_after_completion(self):
+        """Test a later call starts a new flight"""
+        flight = SingleFlight()
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        assert await flight.do("key", loader) == 1
+        assert await flight.do("key", loader) == 2
+        assert not flight.in_flight("key")
+
+    @pytest.mark.asyncio
+    async def test_waiters_retry_when_leader_cancelled(self):
+        """Test cancelling the leader does not cancel waiters"""
+        flight = SingleFlight()
+        started = asyncio.Event()
+
+        async def slow_loader():
+            started.set()
+            await asyncio.sleep(10)
+
+        async def fast_loader():
+            return "fresh"
+
+        leader = asyncio.create_task(flight.do("key", slow_loader))
+        await started.wait()
+        waiter = asyncio.create_task(flight.do("key", fast_loader))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+
+        assert await waiter == "fresh"
+        with pytest.raises(asyncio.CancelledError):
+            await leader
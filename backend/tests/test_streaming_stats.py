@@ -0,0 +1,137 @@
+"""
+Tests for the streaming metric aggregators
+"""
+import random
+import statistics
+from collections import deque
+
+import pytest
+
+from app.core.streaming_stats import QuantileSketch, RunningStats, WindowAggregator, WindowedRate
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(len(ordered) * q)]
+
+
+class TestRunningStats:
+    """Test Welford mean and variance with removal"""
+
+    def test_matches_statistics_over_sliding_window(self):
+        """Test add/remove tracks the values still in the window"""
+        rng = random.Random(7)
+        stats = RunningStats()
+        window = deque()
+        for _ in range(2000):
+            value = rng.lognormvariate(0, 1)
+            window.append(value)
+            stats.add(value)
+            if len(window) > 100:
+                stats.remove(window.popleft())
+
+        assert stats.count == 100
+        assert stats.mean == pytest.approx(statistics.mean(window))
+        assert stats.stddev == pytest.approx(statistics.stdev(window))
+
+
+class TestQuantileSketch:
+    """Test quantile accuracy, removal and merging"""
+
+    def test_relative_accuracy(self):
+        """Test quantiles are within the configured relative error"""
+        rng = random.Random(3)
+        values = [rng.expovariate(5) for _ in range(5000)]
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        for value in values:
+            sketch.add(value)
+
+        for q in (0.5, 0.9, 0.95, 0.99):
+            assert sketch.quantile(q) == pytest.approx(exact_quantile(values, q), rel=0.01)
+
+    def test_removal_and_merge(self):
+        """Test removed values stop counting and merged sketches combine"""
+        first, second = QuantileSketch(), QuantileSketch()
+        for value in range(1, 101):
+            first.add(value)
+        for value in range(101, 201):
+            second.add(value)
+        first.merge(second)
+        for value in range(1, 51):
+            first.remove(value)
+
+        assert first.count == 150
+        assert first.quantile(0) == pytest.approx(51, rel=0.01)
+        assert first.quantile(0.5) == pytest.approx(126, rel=0.01)
+
+    def test_negative_and_zero_values(self):
+        """Test values below zero sort before zero and positives"""
+        sketch = QuantileSketch()
+        for value in (-10, -1, 0, 0, 1, 10):
+            sketch.add(value)
+
+        assert sketch.quantiles([0, 0.4, 0.99]) == [
+            pytest.approx(-10, rel=0.01), 0.0, pytest.approx(10, rel=0.01)
+        ]
+
+
+class TestWindowedRate:
+    """Test counter rates over a time window"""
+
+    def test_rate_over_window(self):
+        """Test increments outside the window stop counting"""
+        rate = WindowedRate(window_seconds=10)
+        for second in range(30):
+            rate.add(2.0, 1000 + second)
+
+        assert rate.rate(1029.5) == pytest.approx(2.0)
+        assert rate.rate(1045) == 0.0
+
+    def test_short_history_uses_elapsed_time(self):
+        """Test a window that has just started is not diluted"""
+        rate = WindowedRate(window_seconds=60)
+        rate.add(5.0, 100.0)
+        rate.add(5.0, 104.0)
+
+        assert rate.rate(105.0) == pytest.approx(2.0)
+
+
+class TestWindowAggregator:
+    """Test the summary keys the metrics collector exposes"""
+
+    def test_summary_follows_window(self):
+        """Test min/max/avg/percentiles cover only values still in the window"""
+        aggregator = WindowAggregator()
+        window = deque()
+        rng = random.Random(11)
+        for i in range(500):
+            value = rng.uniform(0.01, 2.0)
+            if len(window) == 50:
+                aggregator.remove_oldest(window.popleft())
+            window.append(value)
+            aggregator.add(value, 1000.0 + i)
+
+        summary = aggregator.summary()
+        assert summary["count"] == 50
+        assert summary["sum"] == pytest.approx(sum(window))
+        assert summary["avg"] == pytest.approx(statistics.mean(window))
+        assert summary["min"] == min(window)
+        assert summary["max"] == max(window)
+        assert summary["stddev"] == pytest.approx(statistics.stdev(window))
+        assert summary["p95"] == pytest.approx(exact_quantile(window, 0.95), rel=0.01)
+        assert "rate_per_second" not in summary
+
+    def test_keys_appear_with_enough_data(self):
+        """Test stddev/median need 2 points and percentiles 10, as before"""
+        aggregator = WindowAggregator(track_rate=True)
+        aggregator.add(1.0, 0.0)
+        assert set(aggregator.summary()) == {"count", "sum", "avg", "min", "max"}
+
+        aggregator.add(1.0, 1.0)
+        assert {"stddev", "median", "rate_per_second"} <= set(aggregator.summary())
+        assert "p99" not in aggregator.summary()
+
+        for i in range(8):
+            aggregator.add(1.0, 2.0 + i)
+        assert {"p50", "p90", "p95", "p99"} <= set(aggregator.summary())
+
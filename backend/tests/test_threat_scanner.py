@@ -0,0 +1,198 @@
+"""
+Tests for the shared request threat scanner
+"""
+import asyncio
+import re
+
+from app.core.threat_scanner import ThreatScanner, required_literals, threat_scanner
+
+SQL_PATTERNS = [
+    re.compile(r"(\b(union|select|insert|update|delete|drop)\b)", re.IGNORECASE),
+    re.compile(r"(\bor\b\s*\d+\s*=\s*\d+)", re.IGNORECASE),
+    re.compile(r"(\bsleep\b\s*\()", re.IGNORECASE),
+]
+XSS_PATTERNS = [
+    re.compile(r"<\s*script[^>]*>.*?<\s*/\s*script\s*>", re.IGNORECASE | re.DOTALL),
+    re.compile(r"javascript\s*:", re.IGNORECASE),
+    re.compile(r"on\w+\s*=", re.IGNORECASE),
+]
+TRAVERSAL_PATTERNS = [re.compile(r"\.\.[\\/]|\.\.%2[fF]|\.\.%5[cC]")]
+
+
+def make_scanner(**kwargs) -> ThreatScanner:
+    scanner = ThreatScanner(**kwargs)
+    scanner.register("sqli", SQL_PATTERNS)
+    scanner.register("xss", XSS_PATTERNS)
+    scanner.register("traversal", TRAVERSAL_PATTERNS)
+    return scanner
+
+
+def scan_separately(text):
+    found = {}
+    for tag, patterns in (("sqli", SQL_PATTERNS), ("xss", XSS_PATTERNS), ("traversal", TRAVERSAL_PATTERNS)):
+        for pattern in patterns:
+            if pattern.search(text):
+                found[tag] = pattern.pattern
+                break
+    return found
+
+
+class TestRequiredLiterals:
+    """Test anchor extraction from signatures"""
+
+    def test_branches_and_groups(self):
+        """Test every alternative contributes an anchor"""
+        assert required_literals(SQL_PATTERNS[0]) == {"union", "select", "insert", "update", "delete", "drop"}
+        assert required_literals(XSS_PATTERNS[0]) == {"script"}
+
+    def test_superstrings_collapse(self):
+        """Test an anchor implied by a shorter one is dropped"""
+        assert required_literals(TRAVERSAL_PATTERNS[0]) == {".."}
+
+    def test_no_literal_means_always_run(self):
+        """Test patterns without a required literal are not anchored"""
+        assert required_literals(re.compile(r"\w+\s*\d")) is None
+        assert required_literals(re.compile(r"(a|\d)")) is None
+
+
+class TestThreatScanner:
+    """Test scanning matches running each pattern separately"""
+
+    def test_matches_separate_patterns(self):
+        """Test tags and reported signatures equal a per-pattern scan"""
+        scanner = make_scanner()
+        inputs = [
+            "title=Fractions&grade=4",
+            "id=1 OR 1=1",
+            "<SCRIPT>alert(1)</script>",
+            "name=x onload=steal()",
+            "file=..%2Fetc/passwd",
+            "SeLeCt * from users; sleep(5)",
+            "",
+        ]
+        for text in inputs:
+            assert scanner.scan_text(text) == scan_separately(text), text
+
+    def test_clean_input_runs_no_regex(self):
+        """Test input without anchors is rejected by the anchor table alone"""
+        scanner = make_scanner()
+        assert scanner.scan_text("title=Maths&grade=4&page=2") == {}
+        assert scanner.stats["regex_runs"] == 0
+
+    def test_streamed_body_match_across_chunks(self):
+        """Test a signature split between body chunks is still found"""
+        session = make_scanner().session()
+        session.scan("query", "page=1")
+        for chunk in (b"a" * 100 + b"<scr", b"ipt>x</scr", b"ipt>" + b"b" * 100):
+            session.feed_body(chunk)
+        result = session.finish()
+
+        assert result.matched("xss", ("body",))
+        assert not result.matched("xss", ("query",))
+        assert result.body_bytes == 218
+
+    def test_long_match_split_across_chunks(self):
+        """Test a match longer than any chunk is still found"""
+        session = make_scanner().session()
+        script = b"<script>" + b"x" * 5000 + b"</script>"
+        for start in range(0, len(script), 512):
+            session.feed_body(script[start:start + 512])
+
+        assert session.finish().matched("xss", ("body",))
+
+    def test_body_scan_is_capped(self):
+        """Test bytes past max_body_bytes are counted but not scanned"""
+        session = make_scanner(max_body_bytes=1024).session()
+        session.feed_body(b"a" * 2000 + b" union select 1")
+        result = session.finish()
+
+        assert result.body_truncated
+        assert result.body_bytes == 2015
+        assert not result.matched("sqli")
+
+    def test_undecodable_body_is_skipped(self):
+        """Test a body that is not UTF-8 is not scanned, as before"""
+        session = make_scanner().session()
+        session.feed_body(b"union select ")
+        session.feed_body(b"\xff\xfe")
+        result = session.finish()
+
+        assert result.body_undecodable
+        assert not result.matched("sqli", ("body",))
+
+    def test_scan_whole_request(self):
+        """Test matches are tagged by where they were found"""
+        result = make_scanner().scan(
+            path="/files/../secret",
+            query="q=javascript:alert(1)",
+            headers={"user-agent": "sqlmap union select"},
+            body="title=Fractions"
+        )
+
+        assert result.matches == {
+            "path": {"traversal": TRAVERSAL_PATTERNS[0].pattern},
+            "query": {"xss": XSS_PATTERNS[1].pattern},
+            "headers": {"sqli": SQL_PATTERNS[0].pattern},
+        }
+
+
+class TestGuards:
+    """Test the injection guards refuse bodies they could not scan in full"""
+
+    def run_guard(self, body, headers=(), chunks=None):
+        from app.middleware.security import ASGISQLInjectionProtectionMiddleware
+
+        reached = []
+
+        async def app(scope, receive, send):
+            reached.append(scope["path"])
+
+        chunks = chunks or [body]
+        messages = [
+            {"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1}
+            for index, chunk in enumerate(chunks)
+        ]
+        sent = []
+        self.reads = 0
+
+        async def receive():
+            self.reads += 1
+            return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http", "method": "POST", "path": "/quests", "query_string": b"",
+            "headers": [(b"content-type", b"text/plain"), *headers], "client": ("10.0.0.1", 1234),
+        }
+        asyncio.run(ASGISQLInjectionProtectionMiddleware(app)(scope, receive, send))
+        status = sent[0]["status"] if sent else None
+        return status, reached
+
+    def test_body_past_the_cap_is_refused(self, monkeypatch):
+        """Test an attack placed after max_body_bytes gets a 413, not a pass"""
+        monkeypatch.setattr(threat_scanner, "max_body_bytes", 1024)
+
+        assert self.run_guard(b"a" * 2000 + b" union select 1") == (413, [])
+        assert self.run_guard(b"title=Fractions") == (None, ["/quests"])
+
+    def test_declared_length_refused_before_reading(self, monkeypatch):
+        """Test a Content-Length past the cap gets a 413 without receiving the body"""
+        monkeypatch.setattr(threat_scanner, "max_body_bytes", 1024)
+
+        assert self.run_guard(b"", headers=[(b"content-length", b"5000")]) == (413, [])
+        assert self.reads == 0
+
+    def test_streamed_body_stops_at_the_cap(self, monkeypatch):
+        """Test a chunked body is not read past the chunk that crosses the cap"""
+        monkeypatch.setattr(threat_scanner, "max_body_bytes", 1024)
+
+        assert self.run_guard(None, chunks=[b"a" * 600] * 5) == (413, [])
+        assert self.reads == 2
+
+    def test_scan_limit_covers_validation_limit(self):
+        """Test the default scan limit is not below the request size limit"""
+        from app.middleware.security import RequestValidationMiddleware
+
+        assert threat_scanner.max_body_bytes >= RequestValidationMiddleware(None).max_content_length
@@ -0,0 +1,59 @@
+"""
+Tests for the revocation checks made while the local mirror is not synced
+"""
+import asyncio
+import time
+
+from app.core import security
+from app.core import token_revocation as token_revocation_module
+from app.core.token_revocation import TokenRevocationService
+
+
+class FakeSyncRedis:
+    """Sync redis stand-in holding the revocation set and legacy keys"""
+
+    def __init__(self, revoked=None, legacy=()):
+        self.revoked = revoked or {}
+        self.legacy = set(legacy)
+
+    def zscore(self, key, member):
+        return self.revoked.get(member)
+
+    def exists(self, name):
+        return int(name in self.legacy)
+
+
+class FakeAsyncRedis(FakeSyncRedis):
+    async def zscore(self, key, member):
+        return super().zscore(key, member)
+
+    async def exists(self, name):
+        return super().exists(name)
+
+
+def redis_state():
+    now = time.time()
+    return {"revoked": {"new": now + 60, "expired": now - 60}, "legacy": {"blacklist:old"}}
+
+
+class TestRemoteRevocationCheck:
+    """Test ids revoked in the sorted set or in legacy keys are both seen"""
+
+    def test_sync_fallback(self, monkeypatch):
+        """Test the synchronous check honours legacy blacklist keys"""
+        monkeypatch.setattr(security, "redis_client", FakeSyncRedis(**redis_state()))
+
+        assert security._is_revoked_in_redis("new") is True
+        assert security._is_revoked_in_redis("old") is True
+        assert security._is_revoked_in_redis("expired") is False
+        assert security._is_revoked_in_redis("live") is False
+
+    def test_async_check_before_sync(self, monkeypatch):
+        """Test the service checks legacy keys until the mirror has imported them"""
+        monkeypatch.setattr(token_revocation_module, "redis_client", FakeAsyncRedis(**redis_state()))
+        service = TokenRevocationService()
+
+        results = [asyncio.run(service.is_revoked(jti)) for jti in ("new", "old", "expired", "live")]
+
+        assert results == [True, True, False, False]
+        assert service.stats["remote_checks"] == 4